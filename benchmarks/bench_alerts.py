@@ -0,0 +1,71 @@
+"""
+Débit de l'évaluation des règles d'alerte (voir src/alerts.py) sur un flux synthétique, selon le type de règle et
+la taille de sa fenêtre : le coût par échantillon doit rester constant quand la fenêtre grandit, et les quatre
+règles réunies doivent suivre un flux de --rate échantillons par seconde.
+
+Utilisation : python -m benchmarks.bench_alerts [--samples 200000] [--rate 10000] [--windows 1 10 60]
+"""
+import argparse
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from src import alerts
+
+def make_samples(count, rate):
+    """
+    Flux synthétique de 'count' échantillons à 'rate' échantillons par seconde, avec métriques système
+    """
+    rng = np.random.default_rng(0)
+    base = datetime(2025, 1, 1)
+    cpu, ram, load = rng.uniform(0, 100, count), rng.uniform(0, 100, count), rng.uniform(0, 8, count)
+    return [{'timestamp': (base + timedelta(microseconds=i * 1_000_000 // rate)).isoformat(), 'cpu': float(cpu[i]),
+             'ram': float(ram[i]), 'top_processes': [], 'system': {'load1': float(load[i])}} for i in range(count)]
+
+class NullSink:
+    def send(self, alert):
+        pass
+
+    def close(self):
+        pass
+
+def throughput(rules, samples):
+    """
+    :return: Tuple (échantillons par seconde, alertes émises)
+    """
+    engine = alerts.AlertEngine(rules, [NullSink()])
+    start = time.perf_counter()
+    for sample in samples:
+        engine.process(sample)
+    elapsed = time.perf_counter() - start
+    return len(samples) / elapsed, engine.stats["fired"]
+
+def main():
+    parser = argparse.ArgumentParser(description="Alert rules throughput benchmark")
+    parser.add_argument("--samples", type=int, default=200_000, help="Samples in the stream")
+    parser.add_argument("--rate", type=int, default=10_000, help="Stream rate (samples per second of stream time)")
+    parser.add_argument("--windows", type=float, nargs="+", default=[1, 10, 60], help="Rule windows (in seconds)")
+    args = parser.parse_args()
+
+    samples = make_samples(args.samples, args.rate)
+    print(f"{args.samples} samples at {args.rate}/s\n")
+    print(f"{'rule':>12}{'window (s)':>12}{'samples/s':>12}{'us/sample':>11}{'fired':>7}")
+    baseline, _ = throughput([], samples)
+    print(f"{'none':>12}{'-':>12}{baseline:>12.0f}{1e6 / baseline:>11.2f}{0:>7}")
+    for window in args.windows:
+        for name, rule in [("threshold", alerts.ThresholdRule("t", "cpu", ">", 99.9)),
+                           ("sustained", alerts.SustainedRule("s", "cpu", ">", 50, window)),
+                           ("rate", alerts.RateRule("r", "ram", ">", 5, window)),
+                           ("percentile", alerts.PercentileRule("p", "load1", ">", 7.5, window, 95))]:
+            speed, fired = throughput([rule], samples)
+            print(f"{name:>12}{window:>12g}{speed:>12.0f}{1e6 / speed:>11.2f}{fired:>7}")
+    rules = [alerts.ThresholdRule("t", "cpu", ">", 99.9), alerts.SustainedRule("s", "cpu", ">", 50, 10),
+             alerts.RateRule("r", "ram", ">", 5, 10), alerts.PercentileRule("p", "load1", ">", 7.5, 60, 95)]
+    speed, fired = throughput(rules, samples)
+    print(f"{'all four':>12}{'-':>12}{speed:>12.0f}{1e6 / speed:>11.2f}{fired:>7}")
+    # Les quatre règles doivent suivre le flux en temps réel
+    print(f"\nall four rules {'keep up with' if speed > args.rate else 'FALL BEHIND'} a {args.rate}/s stream")
+
+if __name__ == "__main__":
+    main()
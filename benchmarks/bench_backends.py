@@ -0,0 +1,78 @@
+"""
+Comparaison des moteurs de stockage (SQLite et segments binaires) sur les mêmes opérations : écriture par lots et
+par échantillon, lecture de toute la période et d'une heure, derniers échantillons et agrégats d'une heure.
+
+Utilisation : python -m benchmarks.bench_backends [--rows 1000000] [--batch 1000] [--repeat 5]
+"""
+import argparse
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from src import storage
+from src.backends import SQLiteBackend, SegmentBackend
+
+BASE = datetime(2025, 1, 1)
+
+def make_rows(start, count, rng):
+    """
+    Échantillons validés à 1 s d'intervalle à partir de l'index 'start' (format de storage.validate_metrics)
+    """
+    return [storage.validate_metrics({'timestamp': (BASE + timedelta(seconds=i)).isoformat(), 'cpu': cpu, 'ram': ram,
+                                      'top_processes': []})
+            for i, cpu, ram in zip(range(start, start + count), rng.uniform(0, 100, count).tolist(),
+                                   rng.uniform(30, 60, count).tolist())]
+
+def best_of(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+def main():
+    parser = argparse.ArgumentParser(description="Storage backends benchmark")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="Samples written (one per second)")
+    parser.add_argument("--batch", type=int, default=1000, help="Samples per write batch")
+    parser.add_argument("--single", type=int, default=2000, help="Samples written one at a time")
+    parser.add_argument("--limit", type=int, default=60, help="Samples per last-N read")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per read measure (best is kept)")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    batches = [make_rows(start, min(args.batch, args.rows - start), rng) for start in range(0, args.rows, args.batch)]
+    singles = make_rows(args.rows, args.single, rng)
+    end = BASE + timedelta(seconds=args.rows + args.single)
+    hour = (end - timedelta(hours=1), end)
+
+    print(f"{'operation':<28}{'sqlite':>12}{'segment':>12}")
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, backend in (("sqlite", SQLiteBackend(os.path.join(tmp, "bench.db"))),
+                              ("segment", SegmentBackend(os.path.join(tmp, "segments")))):
+            with backend:
+                timings = results[name] = {}
+                start = time.perf_counter()
+                for rows in batches:
+                    backend.write_batch(rows)
+                timings["write batch (rows/s)"] = args.rows / (time.perf_counter() - start)
+                start = time.perf_counter()
+                for row in singles:
+                    backend.write_batch([row])
+                timings["write single (rows/s)"] = args.single / (time.perf_counter() - start)
+
+                timings["read all (ms)"] = best_of(lambda: backend.read_range(BASE), args.repeat) * 1e3
+                timings["read last hour (ms)"] = best_of(lambda: backend.read_range(*hour), args.repeat) * 1e3
+                timings[f"read last {args.limit} (ms)"] = best_of(lambda: backend.read_last(args.limit), args.repeat) * 1e3
+                timings["rollup 1m, last hour (ms)"] = best_of(lambda: backend.read_rollup("1m", *hour), args.repeat) * 1e3
+                timings["rollup 1h, all (ms)"] = best_of(lambda: backend.read_rollup("1h", BASE), args.repeat) * 1e3
+
+    for operation in results["sqlite"]:
+        print(f"{operation:<28}{results['sqlite'][operation]:>12.1f}{results['segment'][operation]:>12.1f}")
+
+if __name__ == "__main__":
+    main()
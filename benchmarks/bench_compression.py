@@ -0,0 +1,94 @@
+"""
+Compression des données brutes archivées (voir src/compression.py) : débit du codec, octets par échantillon,
+et taille de la base avant et après 'cli archive', sur une collecte générée ou sur une copie d'une base réelle.
+
+Utilisation : python -m benchmarks.bench_compression [--rows 86400] [--processes 0] [--block 3600] [--db data/metrics.db]
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from src import compression, rollup, storage
+
+BASE = datetime(2025, 1, 1)
+
+def make_rows(count, seed=0):
+    """
+    Collecte réaliste : un échantillon par seconde avec une gigue de quelques ms, valeurs au dixième (psutil)
+    """
+    rng = np.random.default_rng(seed)
+    rows = np.zeros(count, dtype=rollup.RAW_DTYPE)
+    rows['ts'] = storage.to_epoch_ms(BASE) + np.arange(count) * 1000 + rng.integers(-5, 6, count)
+    rows['cpu'] = np.round(np.clip(25 + np.cumsum(rng.normal(0, 1.5, count)), 0, 100), 1)
+    rows['ram'] = np.round(np.clip(50 + np.cumsum(rng.normal(0, 0.05, count)), 0, 100), 1)
+    return rows
+
+def fill_database(db_path, rows, processes):
+    storage.init_database(db_path)
+    top = [{'pid': pid, 'name': f"proc-{pid}", 'cpu_percent': 1.0} for pid in range(processes)]
+    with storage.MetricsWriter(db_path, batch_size=1000, retention_interval=None) as writer:
+        for ts, cpu, ram in rows.tolist():
+            writer.write({'timestamp': storage.from_epoch_ms(ts).isoformat(), 'cpu': cpu, 'ram': ram,
+                          'top_processes': top})
+
+def measure_codec(rows, block):
+    """
+    Compression par blocs de 'block' échantillons
+    :return: (échantillons/s en compression, échantillons/s en décompression, octets par échantillon)
+    """
+    parts = [rows[i:i + block] for i in range(0, len(rows), block)]
+    start = time.perf_counter()
+    blocks = [compression.encode(part) for part in parts]
+    encode = time.perf_counter() - start
+    start = time.perf_counter()
+    decoded = [compression.decode(data) for data in blocks]
+    decode = time.perf_counter() - start
+    assert np.concatenate(decoded).tobytes() == rows.tobytes()
+    return len(rows) / encode, len(rows) / decode, sum(map(len, blocks)) / len(rows)
+
+def main():
+    parser = argparse.ArgumentParser(description="Compressed archive benchmark")
+    parser.add_argument("--rows", type=int, default=86_400, help="Generated samples (one per second)")
+    parser.add_argument("--processes", type=int, default=0, help="Top processes stored per generated sample")
+    parser.add_argument("--block", type=int, default=3600, help="Block duration (in seconds)")
+    parser.add_argument("--db", type=str, help="Measure a copy of this database instead of generated samples")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.db")
+        if args.db:
+            # Copie : la base mesurée n'est jamais modifiée
+            shutil.copy(args.db, db_path)
+            storage.init_database(db_path)
+            rows = np.concatenate(list(storage.iter_metrics_chunks(db_path=db_path, host=None)))
+        else:
+            rows = make_rows(args.rows)
+            fill_database(db_path, rows, args.processes)
+
+        encode, decode, per_sample = measure_codec(rows, args.block)
+        print(f"{'codec':<10}{'samples':>10}{'encode/s':>12}{'decode/s':>12}{'bytes/sample':>14}")
+        print(f"{'gorilla':<10}{len(rows):>10}{encode:>12.0f}{decode:>12.0f}{per_sample:>14.2f}")
+
+        conn = storage.connect(db_path)
+        before = storage.database_size(conn)
+        start = time.perf_counter()
+        # Date de référence après le dernier échantillon : tous les blocs complets sont archivés
+        now = storage.from_epoch_ms(int(rows['ts'].max())) + timedelta(days=1, seconds=args.block)
+        archived, blocks = storage.archive_metrics(1, db_path, now=now, block_seconds=args.block)
+        elapsed = time.perf_counter() - start
+        after = storage.database_size(conn)
+        conn.close()
+
+        print()
+        print(f"{'database':<10}{'bytes':>12}{'bytes/sample':>14}")
+        print(f"{'raw':<10}{before:>12}{before / len(rows):>14.2f}")
+        print(f"{'archived':<10}{after:>12}{after / len(rows):>14.2f}")
+        print(f"\n{archived} samples archived in {blocks} blocks ({elapsed:.2f} s), size reduced {before / after:.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Coût de la vue en direct (cli top) : temps et octets écrits par image, en affichage incrémental et en
+réaffichage complet, puis occupation CPU de la boucle complète (collecte + affichage) à 10 Hz.
+
+Utilisation : python -m benchmarks.bench_dashboard [--frames 1000] [--seconds 10] [--interval 0.1]
+"""
+import argparse
+import io
+import os
+import time
+from datetime import datetime, timedelta
+
+from src import collector
+from src.dashboard import Dashboard
+from src.scheduler import Scheduler
+
+SIZE = (120, 40)
+
+def make_metrics(i):
+    return {
+        'timestamp': (datetime(2025, 1, 1) + timedelta(seconds=i // 10)).isoformat(),
+        'cpu': float(i * 7 % 100),
+        'ram': 50.0 + i % 3,
+        'top_processes': [{'pid': pid, 'name': f"proc-{pid}", 'cpu_percent': float((i // 10 + pid) % 100)} for pid in range(5)],
+        'system': {'cpu_cores': [float((i + core) % 100) for core in range(64)], 'load1': 1.0, 'load5': 1.0, 'load15': 1.0,
+                   'swap': 0.0, 'disk_read': 0.0, 'disk_write': 1024.0, 'net_recv': 0.0, 'net_sent': 0.0, 'ctx_switches': 1000.0}
+    }
+
+def frames(count, incremental):
+    """
+    Affichage de 'count' images dans un flux en mémoire
+    :return: Couple (secondes par image, octets par image)
+    """
+    stream = io.StringIO()
+    dashboard = Dashboard(stream=stream, size=SIZE)
+    start = time.perf_counter()
+    for i in range(count):
+        dashboard.update(make_metrics(i))
+        if not incremental:
+            dashboard.screen = None
+        dashboard.draw()
+    elapsed = time.perf_counter() - start
+    return elapsed / count, len(stream.getvalue().encode()) / count
+
+def live_loop(seconds, interval, process_every=10):
+    """
+    Boucle de cli top (sortie vers /dev/null)
+    :return: Couple (occupation CPU en %, nombre de ticks)
+    """
+    collector.get_cpu_usage(interval=None)
+    sampler = collector.ProcessSampler()
+    sampler.sample(0)
+    system_sampler = collector.SystemSampler()
+    system_sampler.sample()
+    scheduler = Scheduler(interval)
+    with open(os.devnull, "w") as devnull:
+        dashboard = Dashboard(stream=devnull, size=SIZE)
+        processes = []
+        cpu_start, wall_start = time.process_time(), time.perf_counter()
+        for tick, _ in enumerate(scheduler.ticks(seconds)):
+            if tick % process_every == 0:
+                processes = sampler.sample()
+            dashboard.update(collector.collect_metrics(cpu_interval=None, system_sampler=system_sampler, top_processes=processes))
+            dashboard.draw()
+        cpu, wall = time.process_time() - cpu_start, time.perf_counter() - wall_start
+    return cpu / wall * 100, scheduler.tick_count
+
+def main():
+    parser = argparse.ArgumentParser(description="Live dashboard benchmark")
+    parser.add_argument("--frames", type=int, default=1000, help="Frames rendered per drawing mode")
+    parser.add_argument("--seconds", type=float, default=10, help="Duration of the live loop measurement")
+    parser.add_argument("--interval", type=float, default=0.1, help="Refresh interval of the live loop")
+    args = parser.parse_args()
+
+    print(f"{'mode':>12}{'ms/frame':>10}{'bytes/frame':>13}")
+    for name, incremental in (("full", False), ("incremental", True)):
+        cost, size = frames(args.frames, incremental)
+        print(f"{name:>12}{cost * 1000:>10.3f}{size:>13.0f}")
+
+    cpu, ticks = live_loop(args.seconds, args.interval)
+    print(f"live loop: {ticks} ticks at {1 / args.interval:.0f} Hz, {cpu:.1f}% of one CPU")
+
+if __name__ == "__main__":
+    main()
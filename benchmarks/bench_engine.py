@@ -0,0 +1,62 @@
+"""
+Durée d'un tick de collecte : sondes exécutées l'une après l'autre (collector.collect_metrics) ou en parallèle dans
+leurs processus (voir src/engine.py), puis avec une sonde bloquée pendant 2 s : le tick parallèle reste borné par
+le délai des sondes.
+
+Utilisation : python -m benchmarks.bench_engine [--ticks 20] [--track] [--timeout 0.5]
+"""
+import argparse
+import functools
+import statistics
+import time
+
+from src import collector, engine, tracker
+
+def hung_probe():
+    return functools.partial(time.sleep, 2)
+
+def tick_ms(collect, ticks):
+    """
+    :return: Tuple (durée médiane, durée maximale) d'un tick, en millisecondes
+    """
+    durations = []
+    for _ in range(ticks):
+        start = time.perf_counter()
+        collect()
+        durations.append(time.perf_counter() - start)
+    return statistics.median(durations) * 1000, max(durations) * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description="Sequential vs parallel collection tick benchmark")
+    parser.add_argument("--ticks", type=int, default=20, help="Ticks per measure")
+    parser.add_argument("--track", action="store_true", help="Also track every process in detail")
+    parser.add_argument("--timeout", type=float, default=0.5, help="Probe timeout of the parallel engine (in seconds)")
+    args = parser.parse_args()
+
+    collector.get_cpu_usage(interval=None)
+    sampler = collector.ProcessSampler()
+    sampler.sample(0)
+    system_sampler = collector.SystemSampler()
+    system_sampler.sample()
+    process_tracker = tracker.ProcessTracker() if args.track else None
+
+    def sequential():
+        collector.collect_metrics(cpu_interval=None, sampler=sampler, system_sampler=system_sampler,
+                                  tracker=process_tracker)
+
+    print(f"{'mode':<24}{'median (ms)':>12}{'max (ms)':>10}")
+    median, worst = tick_ms(sequential, args.ticks)
+    print(f"{'sequential':<24}{median:>12.2f}{worst:>10.2f}")
+    with engine.CollectionEngine(engine.default_probes(track=args.track, timeout=args.timeout)) as collection:
+        median, worst = tick_ms(collection.collect, args.ticks)
+    print(f"{'parallel':<24}{median:>12.2f}{worst:>10.2f}")
+    probes = engine.default_probes(track=args.track, timeout=args.timeout) + [engine.Probe('hung', hung_probe,
+                                                                                           timeout=args.timeout)]
+    with engine.CollectionEngine(probes) as collection:
+        median, worst = tick_ms(collection.collect, args.ticks)
+        hung = collection.stats['hung']
+    print(f"{'parallel + 2s probe':<24}{median:>12.2f}{worst:>10.2f}  "
+          f"({hung['timeouts']} probe timeouts, {hung['busy']} busy ticks)")
+
+if __name__ == "__main__":
+    main()
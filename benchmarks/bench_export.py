@@ -0,0 +1,54 @@
+"""
+Débit et mémoire (RSS maximale) d'un export en flux selon le nombre de lignes exportées.
+Chaque export tourne dans un processus séparé pour mesurer sa RSS propre.
+
+Utilisation : python -m benchmarks.bench_export [--rows 1000000 5000000] [--format csv]
+"""
+import argparse
+import multiprocessing
+import os
+import resource
+import tempfile
+import time
+from datetime import datetime
+
+from src import export, storage
+
+BASE = datetime(2025, 1, 1)
+
+def fill(db_path, count):
+    storage.init_database(db_path)
+    base = storage.to_epoch_ms(BASE)
+    conn = storage.connect(db_path)
+    with conn:
+        conn.executemany("INSERT INTO metrics (ts, cpu, ram) VALUES (?, ?, ?)",
+                         ((base + i * 1000, float(i % 100), float((i * 7) % 100)) for i in range(count)))
+    conn.close()
+
+def run_export(output, fmt, db_path):
+    export.export_metrics(output, fmt, db_path=db_path)
+
+def main():
+    parser = argparse.ArgumentParser(description="Streaming export benchmark")
+    parser.add_argument("--rows", type=int, nargs="+", default=[1_000_000, 5_000_000], help="Row counts to export")
+    parser.add_argument("--format", choices=export.FORMATS, default="csv", help="Export format")
+    args = parser.parse_args()
+
+    print(f"{'rows':>10}{'seconds':>10}{'rows/s':>12}{'max RSS (MB)':>14}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for count in args.rows:
+            db_path = os.path.join(tmp, f"bench_{count}.db")
+            fill(db_path, count)
+
+            start = time.perf_counter()
+            child = multiprocessing.get_context("spawn").Process(
+                target=run_export, args=(os.path.join(tmp, f"out_{count}.{args.format}"), args.format, db_path))
+            child.start()
+            child.join()
+            elapsed = time.perf_counter() - start
+            # ru_maxrss (en Ko sous Linux) : maximum sur les enfants terminés, soit ici le dernier export
+            max_rss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+            print(f"{count:>10}{elapsed:>10.1f}{count / elapsed:>12.0f}{max_rss:>14.1f}")
+
+if __name__ == "__main__":
+    main()
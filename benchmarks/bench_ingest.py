@@ -0,0 +1,82 @@
+"""
+Débit du serveur d'ingestion (échantillons écrits par seconde) selon le nombre d'agents simultanés et la taille des lots.
+Chaque agent simulé tourne dans un processus séparé et envoie ses échantillons aussi vite que possible.
+
+Utilisation : python -m benchmarks.bench_ingest [--agents 1 4 16] [--samples 5000] [--batch-sizes 20 100]
+"""
+import argparse
+import multiprocessing
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from config.config import INGEST_WRITE_BATCH_SIZE
+from src import storage
+from src.agent import Agent
+from src.ingest import IngestServer
+
+BASE = datetime(2025, 1, 1)
+
+def run_agent(server, name, count, batch_size, ready, go):
+    agent = Agent(server, host=name, batch_size=batch_size, max_buffer=count)
+    processes = [{'pid': pid, 'name': f"proc-{pid}", 'cpu_percent': 1.0} for pid in range(5)]
+    samples = [{
+        'timestamp': (BASE + timedelta(seconds=i)).isoformat(),
+        'cpu': float(i % 100),
+        'ram': 50.0,
+        'top_processes': processes
+    } for i in range(count)]
+    # Démarrage simultané de tous les agents, une fois les processus lancés
+    ready.release()
+    go.wait()
+    for sample in samples:
+        agent.add(sample)
+    # Les lots refusés (503) sont renvoyés, après le délai demandé, jusqu'à épuisement du tampon
+    while agent.buffer:
+        if time.monotonic() >= agent.retry_at:
+            agent.send(force=True)
+        time.sleep(0.01)
+    agent.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingest server throughput benchmark")
+    parser.add_argument("--agents", type=int, nargs="+", default=[1, 4, 16], help="Simultaneous agents to test")
+    parser.add_argument("--samples", type=int, default=5000, help="Samples sent by each agent")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[20, 100], help="Samples per request to test")
+    parser.add_argument("--write-batch-size", type=int, default=INGEST_WRITE_BATCH_SIZE, help="Samples per server transaction")
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context("spawn")
+    print(f"{'agents':>8}{'batch':>8}{'samples':>10}{'seconds':>10}{'samples/s':>12}{'throttled':>11}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for batch_size in args.batch_sizes:
+            for agents in args.agents:
+                db_path = os.path.join(tmp, f"bench_{agents}_{batch_size}.db")
+                server = IngestServer(("127.0.0.1", 0), db_path, batch_size=args.write_batch_size)
+                server.start()
+                url = f"{server.address[0]}:{server.address[1]}"
+
+                ready, go = context.Semaphore(0), context.Event()
+                children = [context.Process(target=run_agent, args=(url, f"host-{n}", args.samples, batch_size, ready, go))
+                            for n in range(agents)]
+                for child in children:
+                    child.start()
+                for _ in children:
+                    ready.acquire()
+                start = time.perf_counter()
+                go.set()
+                for child in children:
+                    child.join()
+                # Le débit compte jusqu'à l'écriture du dernier lot en file
+                server.close()
+                elapsed = time.perf_counter() - start
+
+                total = server.stats["written"]
+                assert total == agents * args.samples
+                print(f"{agents:>8}{batch_size:>8}{total:>10}{elapsed:>10.2f}{total / elapsed:>12.0f}"
+                      f"{server.stats['throttled']:>11}")
+                storage.delete_database(db_path)
+
+if __name__ == "__main__":
+    main()
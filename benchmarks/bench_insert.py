@@ -0,0 +1,61 @@
+"""
+Comparaison du débit d'insertion (lignes/s) entre l'écriture ligne par ligne
+(storage.insert_metrics) et l'écriture par lots (storage.MetricsWriter).
+
+Utilisation : python -m benchmarks.bench_insert [--rows N] [--batch-size N]
+"""
+import argparse
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from src import storage
+
+def make_samples(count):
+    """
+    Génération d'échantillons factices
+    :param count: Nombre d'échantillons
+    :return: Liste de dictionnaires d'échantillons
+    """
+    base = datetime(2025, 1, 1)
+    return [{
+        'timestamp': (base + timedelta(seconds=i)).isoformat(),
+        'cpu': float(i % 100),
+        'ram': float((i * 7) % 100),
+        'top_processes': [{'pid': 1000 + j, 'name': f"proc{j}", 'cpu_percent': 1.0} for j in range(5)]
+    } for i in range(count)]
+
+def bench_per_row(samples, db_path):
+    storage.init_database(db_path)
+    start = time.perf_counter()
+    for sample in samples:
+        storage.insert_metrics(sample, db_path)
+    return time.perf_counter() - start
+
+def bench_writer(samples, db_path, batch_size):
+    storage.init_database(db_path)
+    start = time.perf_counter()
+    with storage.MetricsWriter(db_path, batch_size=batch_size, flush_interval=float("inf")) as writer:
+        for sample in samples:
+            writer.write(sample)
+    return time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description="Insert throughput benchmark")
+    parser.add_argument("--rows", type=int, default=2000, help="Number of samples to insert")
+    parser.add_argument("--batch-size", type=int, default=100, help="MetricsWriter batch size")
+    args = parser.parse_args()
+
+    samples = make_samples(args.rows)
+    with tempfile.TemporaryDirectory() as tmp:
+        per_row = bench_per_row(samples, os.path.join(tmp, "per_row.db"))
+        batched = bench_writer(samples, os.path.join(tmp, "batched.db"), args.batch_size)
+
+    print(f"{'path':<24}{'seconds':>10}{'rows/s':>14}")
+    print(f"{'insert_metrics':<24}{per_row:>10.3f}{args.rows / per_row:>14.0f}")
+    print(f"{'MetricsWriter':<24}{batched:>10.3f}{args.rows / batched:>14.0f}")
+    print(f"speedup: x{per_row / batched:.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+"""
+Coût des mesures internes par appel instrumenté : fonction vide et get_ram_usage, sans décorateur,
+avec les mesures désactivées puis activées.
+
+Utilisation : python -m benchmarks.bench_instrument [--calls 200000]
+"""
+import argparse
+import time
+
+from src import collector, instrument
+
+def noop():
+    return None
+
+def per_call(func, calls):
+    """
+    Durée moyenne d'un appel (en nanosecondes)
+    """
+    start = time.perf_counter_ns()
+    for _ in range(calls):
+        func()
+    return (time.perf_counter_ns() - start) / calls
+
+def main():
+    parser = argparse.ArgumentParser(description="Instrumentation overhead benchmark")
+    parser.add_argument("--calls", type=int, default=200_000, help="Calls per measure")
+    args = parser.parse_args()
+
+    timed_noop = instrument.timed("bench.noop")(noop)
+    print(f"{'function':<18}{'plain (ns)':>12}{'disabled (ns)':>15}{'enabled (ns)':>14}")
+    for name, plain, wrapped, calls in (
+        ("noop", noop, timed_noop, args.calls),
+        ("get_ram_usage", collector.get_ram_usage.__wrapped__, collector.get_ram_usage, args.calls // 20),
+    ):
+        per_call(plain, calls)  # Échauffement (caches, psutil)
+        base = per_call(plain, calls)
+        instrument.set_enabled(False)
+        disabled = per_call(wrapped, calls)
+        instrument.set_enabled(True)
+        enabled = per_call(wrapped, calls)
+        print(f"{name:<18}{base:>12.0f}{disabled:>15.0f}{enabled:>14.0f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Coût d'un tick de sélection des processus les plus consommateurs selon le nombre de processus,
+entre l'ancien parcours complet (process_iter + tri) et collector.ProcessSampler.
+
+Des processus 'sleep' sont lancés pour atteindre chaque palier.
+Utilisation : python -m benchmarks.bench_process_sampler [--counts 0 1000 5000] [--ticks 10]
+"""
+import argparse
+import subprocess
+import time
+
+import psutil
+
+from src import collector
+
+def legacy_top_processes(top_n=5):
+    """
+    Ancienne implémentation de collector.get_top_processes, pour référence
+    """
+    processes = []
+    for proc in psutil.process_iter(['pid', 'name', 'cpu_percent']):
+        try:
+            info = proc.info
+            if info['pid'] == 0 or 'idle' in info['name'].lower():
+                continue
+            processes.append(info)
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            continue
+    return sorted(processes, key=lambda p: p['cpu_percent'], reverse=True)[:top_n]
+
+def per_tick(func, ticks):
+    func()  # amorçage
+    start = time.perf_counter()
+    for _ in range(ticks):
+        func()
+    return (time.perf_counter() - start) / ticks
+
+def main():
+    parser = argparse.ArgumentParser(description="Top processes sampling benchmark")
+    parser.add_argument("--counts", type=int, nargs="+", default=[0, 1000, 5000], help="Extra processes to spawn")
+    parser.add_argument("--ticks", type=int, default=10, help="Ticks measured per configuration")
+    args = parser.parse_args()
+
+    children = []
+    print(f"{'processes':>10}{'legacy (ms)':>14}{'sampler (ms)':>14}{'pid subset (ms)':>17}")
+    try:
+        for count in args.counts:
+            while len(children) < count:
+                children.append(subprocess.Popen(["sleep", "3600"]))
+            total = len(psutil.pids())
+
+            legacy = per_tick(legacy_top_processes, args.ticks)
+            sampler = collector.ProcessSampler()
+            sampled = per_tick(sampler.sample, args.ticks)
+            subset = collector.ProcessSampler(pids=[child.pid for child in children[:10]] or None)
+            subset_cost = per_tick(subset.sample, args.ticks)
+            print(f"{total:>10}{legacy * 1000:>14.2f}{sampled * 1000:>14.2f}{subset_cost * 1000:>17.2f}")
+    finally:
+        for child in children:
+            child.kill()
+        for child in children:
+            child.wait()
+
+if __name__ == "__main__":
+    main()
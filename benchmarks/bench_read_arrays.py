@@ -0,0 +1,59 @@
+"""
+Mémoire et durée de lecture d'une période entre l'API en listes (get_last_time_metrics)
+et l'API en colonnes NumPy (get_time_metrics_arrays).
+
+Utilisation : python -m benchmarks.bench_read_arrays [--rows 2000000]
+"""
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+from src import storage
+
+BASE = datetime(2025, 1, 1)
+
+def fill(db_path, count):
+    storage.init_database(db_path)
+    base = storage.to_epoch_ms(BASE)
+    conn = storage.connect(db_path)
+    with conn:
+        conn.executemany("INSERT INTO metrics (ts, cpu, ram) VALUES (?, ?, ?)",
+                         ((base + i * 1000, float(i % 100), float((i * 7) % 100)) for i in range(count)))
+    conn.close()
+
+def measure(func):
+    """
+    Durée d'un appel, puis mémoire conservée et pic mémoire (octets) d'un second appel tracé
+    """
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    del result
+
+    tracemalloc.start()
+    result = func()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return elapsed, current, peak
+
+def main():
+    parser = argparse.ArgumentParser(description="Columnar read benchmark")
+    parser.add_argument("--rows", type=int, default=2_000_000, help="Number of rows to read")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.db")
+        fill(db_path, args.rows)
+        lists = measure(lambda: storage.get_last_time_metrics(BASE, db_path))
+        arrays = measure(lambda: storage.get_time_metrics_arrays(BASE, db_path=db_path))
+
+    print(f"{'api':<26}{'seconds':>10}{'B/row kept':>12}{'B/row peak':>12}")
+    for name, (elapsed, current, peak) in (("get_last_time_metrics", lists), ("get_time_metrics_arrays", arrays)):
+        print(f"{name:<26}{elapsed:>10.2f}{current / args.rows:>12.1f}{peak / args.rows:>12.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Durée des lectures récentes (derniers échantillons, dernière minute) servies par la base ou par le cache de lecture,
+pendant qu'un écrivain ajoute des échantillons entre les lectures.
+
+Utilisation : python -m benchmarks.bench_read_cache [--rows 100000] [--reads 2000] [--limit 60]
+"""
+import argparse
+import itertools
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from config.config import READ_CACHE_CAPACITY
+from src import storage
+from src.cache import MetricsCache
+
+BASE = datetime(2025, 1, 1)
+
+def make_sample(i):
+    return {
+        'timestamp': (BASE + timedelta(seconds=i)).isoformat(),
+        'cpu': float(i % 100),
+        'ram': 50.0,
+        'top_processes': [{'pid': pid, 'name': f"proc-{pid}", 'cpu_percent': 1.0} for pid in range(5)]
+    }
+
+def run(db_path, args, seconds, reader, cache=None):
+    """
+    Lectures alternées avec des écritures (une écriture toutes les 'write_every' lectures)
+    :param seconds: Compteur des dates (en secondes depuis BASE) des échantillons écrits
+    :param reader: Fonction de lecture, appelée avec la date du dernier échantillon écrit
+    :return: Durée moyenne d'une lecture (en secondes)
+    """
+    elapsed = 0.0
+    with storage.MetricsWriter(db_path, batch_size=1, retention_interval=None, cache=cache) as writer:
+        for n in range(args.reads):
+            if n % args.write_every == 0:
+                last = next(seconds)
+                writer.write(make_sample(last))
+            start = time.perf_counter()
+            reader(BASE + timedelta(seconds=last))
+            elapsed += time.perf_counter() - start
+    return elapsed / args.reads
+
+def main():
+    parser = argparse.ArgumentParser(description="Read cache benchmark")
+    parser.add_argument("--rows", type=int, default=100_000, help="Rows already in the database")
+    parser.add_argument("--reads", type=int, default=2000, help="Reads per scenario")
+    parser.add_argument("--limit", type=int, default=60, help="Samples per read")
+    parser.add_argument("--write-every", type=int, default=10, help="Reads between two writes")
+    parser.add_argument("--capacity", type=int, default=READ_CACHE_CAPACITY, help="Cache capacity")
+    args = parser.parse_args()
+
+    print(f"{'read':<26}{'source':>8}{'us/read':>10}{'hit ratio':>11}")
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.db")
+        storage.init_database(db_path)
+        with storage.MetricsWriter(db_path, batch_size=1000, retention_interval=None) as writer:
+            for i in range(args.rows):
+                writer.write(make_sample(i))
+
+        seconds = itertools.count(args.rows)
+        window = timedelta(seconds=args.limit)
+
+        for name, db_read, cache_read in (
+            ("get_last_metrics", lambda last: storage.get_last_metrics(args.limit, db_path),
+             lambda cache: lambda last: cache.get_last_metrics(args.limit)),
+            ("get_time_metrics_arrays", lambda last: storage.get_time_metrics_arrays(last - window, db_path=db_path),
+             lambda cache: lambda last: cache.get_time_metrics_arrays(last - window)),
+        ):
+            print(f"{name:<26}{'sqlite':>8}{run(db_path, args, seconds, db_read) * 1e6:>10.1f}{'-':>11}")
+            # Cache créé à froid (premières lectures complétées par la base), puis cache déjà rempli
+            cache = MetricsCache(db_path, capacity=args.capacity)
+            for source in ("cold", "warm"):
+                cache.stats = {"hits": 0, "misses": 0}
+                per_read = run(db_path, args, seconds, cache_read(cache), cache)
+                ratio = cache.stats["hits"] / (cache.stats["hits"] + cache.stats["misses"])
+                print(f"{name:<26}{source:>8}{per_read * 1e6:>10.1f}{ratio:>11.1%}")
+            cache.close()
+
+if __name__ == "__main__":
+    main()
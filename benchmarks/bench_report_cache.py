@@ -0,0 +1,83 @@
+"""
+Latence d'un rapport relancé à intervalle régulier (ex : cron toutes les minutes sur '--last day'), avec et sans
+le cache persistant des séries agrégées (voir src/report_cache.py). Entre deux rapports, une minute d'échantillons
+est ajoutée à la base.
+
+Utilisation : python -m benchmarks.bench_report_cache [--days 30] [--interval 1] [--runs 20] [--range-days 1 7]
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from config.config import DATA_PATH
+from src import report, storage
+from src.backends import SQLiteBackend
+from src.report_cache import ReportCache
+from benchmarks.bench_rollup_report import fill
+
+def add_minute(writer, end, interval):
+    """
+    Ajout d'une minute d'échantillons après 'end'
+    :return: Nouvelle date du dernier échantillon
+    """
+    for _ in range(int(60 // interval)):
+        end += timedelta(seconds=interval)
+        writer.write({'timestamp': end.isoformat(), 'cpu': 50.0, 'ram': 40.0, 'top_processes': []})
+    writer.flush()
+    return end
+
+def run(db_path, args, days, cache, render):
+    """
+    Rapports successifs séparés par l'ajout d'une minute d'échantillons
+    :return: Liste des durées (en secondes) du deuxième rapport au dernier (le premier remplit le cache)
+    """
+    durations = []
+    end = datetime.now()
+    with storage.MetricsWriter(db_path, batch_size=1000, retention_interval=None, selfstats_interval=None) as writer:
+        for _ in range(args.runs + 1):
+            end = add_minute(writer, end, args.interval)
+            since = end - timedelta(days=days)
+            start = time.perf_counter()
+            if render:
+                backend = SQLiteBackend(db_path, report_cache=cache)
+                report.generate_plot(since=since, save=True, filename="bench_report.png", backend=backend)
+                backend.close()
+            else:
+                resolution = storage.choose_resolution(since, db_path=db_path)
+                if cache is not None:
+                    cache.get_rollup_arrays(resolution, since, db_path=db_path)
+                else:
+                    storage.get_rollup_arrays(resolution, since, db_path=db_path)
+            durations.append(time.perf_counter() - start)
+    return durations[1:]
+
+def main():
+    parser = argparse.ArgumentParser(description="Repeated report benchmark")
+    parser.add_argument("--days", type=int, default=30, help="Days of data in the database")
+    parser.add_argument("--interval", type=float, default=1, help="Sample interval (in seconds)")
+    parser.add_argument("--runs", type=int, default=20, help="Repeated reports per scenario")
+    parser.add_argument("--range-days", type=int, nargs="+", default=[1, 7, 30], help="Report ranges (in days)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.db")
+        count = fill(db_path, args.days, int(args.interval))
+        print(f"{count} raw rows, one minute of samples added between two reports\n")
+        print(f"{'range':>6}{'step':>8}{'no cache (ms)':>15}{'cache (ms)':>12}{'speedup':>9}")
+        for days in args.range_days:
+            for render in (False, True):
+                direct = run(db_path, args, days, None, render)
+                cache = ReportCache(os.path.join(tmp, "report_cache.db"))
+                cached = run(db_path, args, days, cache, render)
+                cache.close()
+                step = "report" if render else "query"
+                direct_ms, cached_ms = statistics.median(direct) * 1000, statistics.median(cached) * 1000
+                print(f"{days:>5}d{step:>8}{direct_ms:>15.2f}{cached_ms:>12.2f}{direct_ms / cached_ms:>8.1f}x")
+
+    os.remove(os.path.join(DATA_PATH, "bench_report.png"))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Temps de démarrage de la CLI (import de src.cli, sans matplotlib) et durée d'enregistrement d'un rapport
+d'un million de points bruts : tracé réduit (min/max par colonne de pixels, sans marqueurs) contre tracé de
+tous les points avec marqueurs.
+
+Utilisation : python -m benchmarks.bench_report_render [--rows 1000000] [--repeat 5] [--skip-full]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+
+from config.config import DATA_PATH
+from src import report, storage
+
+BASE = datetime(2025, 1, 1)
+
+def fill(db_path, count):
+    storage.init_database(db_path)
+    base = storage.to_epoch_ms(BASE)
+    rng = np.random.default_rng(0)
+    conn = storage.connect(db_path)
+    with conn:
+        conn.executemany("INSERT INTO metrics (ts, cpu, ram) VALUES (?, ?, ?)",
+                         zip(range(base, base + count * 1000, 1000), rng.uniform(0, 100, count).tolist(),
+                             rng.uniform(30, 60, count).tolist()))
+    conn.close()
+
+def startup(code, repeat):
+    """
+    Durée minimale (en secondes) d'un interpréteur exécutant 'code'
+    """
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code], check=True)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+def full_plot(db_path, limit, path):
+    """
+    Tracé de tous les points avec marqueurs (comportement précédent de report.generate_plot)
+    """
+    plt = report._pyplot(save=True)
+    timestamps, cpu, ram = storage.get_last_metrics_arrays(limit, db_path)
+    plt.figure(figsize=(12, 6))
+    plt.plot(timestamps, cpu, label="CPU Usage (%)", marker='o')
+    plt.plot(timestamps, ram, label="RAM Usage (%)", marker='s')
+    plt.legend(loc="upper right")
+    plt.tight_layout()
+    plt.savefig(path)
+    plt.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="CLI startup and report rendering benchmark")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="Raw points in the report")
+    parser.add_argument("--repeat", type=int, default=5, help="Interpreter starts per measure (best is kept)")
+    parser.add_argument("--skip-full", action="store_true", help="Skip the slow all-points rendering")
+    args = parser.parse_args()
+
+    print(f"{'startup':<32}{'seconds':>10}")
+    print(f"{'python (empty)':<32}{startup('pass', args.repeat):>10.3f}")
+    print(f"{'import src.cli':<32}{startup('import src.cli', args.repeat):>10.3f}")
+    print(f"{'import src.cli + pyplot':<32}{startup('import src.cli, matplotlib.pyplot', args.repeat):>10.3f}")
+
+    filename = "bench_report.png"
+    print(f"\n{'render ' + str(args.rows) + ' points':<32}{'seconds':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.db")
+        fill(db_path, args.rows)
+        start = time.perf_counter()
+        storage.get_last_metrics_arrays(args.rows, db_path)
+        read = time.perf_counter() - start
+        print(f"{'read (get_last_metrics_arrays)':<32}{read:>10.3f}")
+        # pyplot est importé à part : son chargement est compté dans le démarrage ci-dessus
+        report._pyplot(save=True)
+        start = time.perf_counter()
+        report.generate_plot(limit=args.rows, save=True, filename=filename, db_path=db_path)
+        total = time.perf_counter() - start
+        print(f"{'min/max per pixel column':<32}{total:>10.3f}  (render + save: {total - read:.3f})")
+        if not args.skip_full:
+            start = time.perf_counter()
+            full_plot(db_path, args.rows, os.path.join(DATA_PATH, filename))
+            total = time.perf_counter() - start
+            print(f"{'all points with markers':<32}{total:>10.3f}  (render + save: {total - read:.3f})")
+    os.remove(os.path.join(DATA_PATH, filename))
+
+if __name__ == "__main__":
+    main()
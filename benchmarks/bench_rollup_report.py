@@ -0,0 +1,68 @@
+"""
+Durée d'un rapport sur 30 jours selon la densité des données brutes.
+Grâce aux agrégats, la durée doit rester à peu près constante quel que soit le nombre de lignes.
+
+Utilisation : python -m benchmarks.bench_rollup_report [--days 30] [--intervals 60 10 1]
+"""
+import argparse
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from config.config import DATA_PATH
+from src import report, rollup, storage
+
+def fill(db_path, days, interval):
+    """
+    Remplissage direct de la table brute puis calcul des agrégats
+    :return: Nombre de lignes brutes
+    """
+    storage.init_database(db_path)
+    count = days * 86400 // interval
+    end = storage.to_epoch_ms(datetime.now())
+    rng = np.random.default_rng(0)
+    ts = end - (count - np.arange(count)) * interval * 1000
+    cpu = rng.uniform(0, 100, count).round(1)
+    ram = rng.uniform(30, 60, count).round(1)
+
+    conn = storage.connect(db_path)
+    with conn:
+        conn.executemany("INSERT INTO metrics (ts, cpu, ram) VALUES (?, ?, ?)",
+                         zip(ts.tolist(), cpu.tolist(), ram.tolist()))
+        rollup.rebuild(conn)
+    conn.close()
+    return count
+
+def main():
+    parser = argparse.ArgumentParser(description="Long-range report benchmark")
+    parser.add_argument("--days", type=int, default=30, help="Report range (in days)")
+    parser.add_argument("--intervals", type=int, nargs="+", default=[60, 10, 1], help="Sample intervals to test (in seconds)")
+    args = parser.parse_args()
+
+    print(f"{'interval':>10}{'raw rows':>12}{'resolution':>12}{'query (ms)':>12}{'report (ms)':>13}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for interval in args.intervals:
+            db_path = os.path.join(tmp, f"bench_{interval}.db")
+            count = fill(db_path, args.days, interval)
+            since = datetime.now() - timedelta(days=args.days)
+
+            start = time.perf_counter()
+            resolution = storage.choose_resolution(since, db_path=db_path)
+            if resolution is None:
+                storage.get_time_metrics_arrays(since, db_path=db_path)
+            else:
+                storage.get_rollup_arrays(resolution, since, db_path=db_path)
+            query = time.perf_counter() - start
+
+            start = time.perf_counter()
+            report.generate_plot(since=since, save=True, filename="bench_report.png", db_path=db_path)
+            render = time.perf_counter() - start
+            print(f"{interval:>9}s{count:>12}{str(resolution):>12}{query * 1000:>12.1f}{render * 1000:>13.1f}")
+
+    os.remove(os.path.join(DATA_PATH, "bench_report.png"))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+Durée du calcul des statistiques (percentiles, moyenne glissante, anomalies) sur une semaine d'échantillons à 1 s,
+séparée de la durée de lecture de la période dans la base.
+
+Utilisation : python -m benchmarks.bench_stats [--rows 604800] [--repeat 5]
+"""
+import argparse
+import os
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+
+from src import report, storage
+
+BASE = datetime(2025, 1, 1)
+
+def fill(db_path, count):
+    storage.init_database(db_path)
+    base = storage.to_epoch_ms(BASE)
+    rng = np.random.default_rng(0)
+    cpu = np.clip(rng.normal(30, 10, count), 0, 100)
+    ram = np.clip(rng.normal(60, 5, count), 0, 100)
+    conn = storage.connect(db_path)
+    with conn:
+        conn.executemany("INSERT INTO metrics (ts, cpu, ram) VALUES (?, ?, ?)",
+                         zip(range(base, base + count * 1000, 1000), cpu.tolist(), ram.tolist()))
+    conn.close()
+
+def best_of(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+def main():
+    parser = argparse.ArgumentParser(description="Statistics computation benchmark")
+    parser.add_argument("--rows", type=int, default=7 * 24 * 3600, help="Number of samples (default: one week at 1s)")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per measure (best is kept)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.db")
+        fill(db_path, args.rows)
+        read = best_of(lambda: storage.get_time_metrics_arrays(BASE, db_path=db_path), args.repeat)
+        arrays = storage.get_time_metrics_arrays(BASE, db_path=db_path)
+
+    print(f"{'step':<32}{'seconds':>10}")
+    print(f"{'read (get_time_metrics_arrays)':<32}{read:>10.3f}")
+    for method in report.ANOMALY_METHODS:
+        compute = best_of(lambda: [report.compute_series_stats(values, method=method) for values in (arrays.cpu, arrays.ram)],
+                          args.repeat)
+        print(f"{'compute cpu+ram (' + method + ')':<32}{compute:>10.3f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+"""
+Suite de mesures de storage.py à grande échelle, sur un jeu de données synthétique (voir benchmarks/datagen.py) :
+remplissage, débit d'insertion par MetricsWriter, latence des lectures des N derniers échantillons et par période,
+taille de la base et durée du rendu d'un rapport.
+
+Les résultats sont affichés et peuvent être enregistrés en JSON (--json) avec le commit courant, pour comparer
+deux exécutions (--compare) d'un commit à l'autre : avec les mêmes paramètres (graine, date de fin --end), le jeu
+de données est identique. Avec --db, la base est conservée et réutilisée d'une exécution
+à l'autre (le remplissage n'a lieu que si elle n'existe pas) ; la mesure d'insertion y ajoute --insert-rows échantillons.
+
+Utilisation : python -m benchmarks.bench_suite [--days 28] [--interval 10] [--db data/suite.db] [--json results.json]
+              [--compare previous.json]
+Exemple à 10 millions de lignes : python -m benchmarks.bench_suite --days 28 --interval 0.25 --db data/suite_10m.db
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import subprocess
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from config.config import DATA_PATH, PROJECT_ROOT, WRITE_BATCH_SIZE
+from src import report, storage
+from benchmarks import datagen
+
+def git_revision():
+    """
+    :return: Tuple (hash du commit courant, arbre de travail modifié) ; (None, None) hors dépôt git
+    """
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=PROJECT_ROOT, capture_output=True, text=True,
+                                check=True).stdout.strip()
+        status = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=PROJECT_ROOT,
+                                capture_output=True, text=True, check=True).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+    return commit, bool(status.strip())
+
+def median_ms(func, runs):
+    """
+    :return: Durée médiane (en millisecondes) de 'runs' appels, après un appel d'amorçage
+    """
+    func()
+    durations = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        func()
+        durations.append(time.perf_counter() - start)
+    return round(statistics.median(durations) * 1000, 3)
+
+def measure(db_path, args, results):
+    """
+    Mesures sur la base remplie, ajoutées à 'results' au fil de l'eau (clés suffixées par leur unité)
+    """
+    conn = storage.connect(db_path)
+    rows, end_ms = conn.execute("SELECT COUNT(*), MAX(ts) FROM metrics").fetchone()
+    results["rows"] = rows
+    results["db_bytes"] = os.path.getsize(db_path)
+    results["db_bytes_per_row"] = round(results["db_bytes"] / rows, 1)
+    conn.close()
+    end = storage.from_epoch_ms(end_ms)
+
+    # N derniers échantillons
+    for limit in (10, 1000, 100_000):
+        results[f"last_{limit}_ms"] = median_ms(lambda: storage.get_last_metrics_arrays(limit, db_path), args.runs)
+    results["last_100_processes_ms"] = median_ms(lambda: storage.get_last_metrics(100, db_path), args.runs)
+
+    # Périodes : données brutes, agrégats choisis par le rapport, historique d'un processus
+    for name, delta in (("hour", timedelta(hours=1)), ("day", timedelta(days=1))):
+        since = end - delta
+        results[f"range_raw_{name}_ms"] = median_ms(lambda: storage.get_time_metrics_arrays(since, db_path=db_path),
+                                                   args.runs)
+    for name, delta in (("day", timedelta(days=1)), ("week", timedelta(days=7)), ("month", timedelta(days=30))):
+        since = end - delta
+        resolution = storage.choose_resolution(since, db_path=db_path)
+        if resolution is None:
+            continue
+        results[f"range_rollup_{name}_ms"] = median_ms(
+            lambda: storage.get_rollup_arrays(resolution, since, db_path=db_path), args.runs)
+    if args.top_n:
+        results["process_history_day_ms"] = median_ms(
+            lambda: storage.get_process_history(name="postgres", since=end - timedelta(days=1), db_path=db_path),
+            args.runs)
+
+    # Rendu du rapport (fichier PNG, backend Agg), sans son message de confirmation : la sortie peut être du JSON
+    for name, delta in (("day", timedelta(days=1)), ("week", timedelta(days=7))):
+        with contextlib.redirect_stdout(io.StringIO()):
+            results[f"report_{name}_ms"] = median_ms(
+                lambda: report.generate_plot(since=end - delta, save=True, filename="bench_suite.png",
+                                             db_path=db_path), max(1, args.runs // 4))
+    os.remove(os.path.join(DATA_PATH, "bench_suite.png"))
+
+    # Insertion par le chemin normal de la collecte, à la suite des données existantes
+    samples = datagen.make_samples(args.insert_rows, args.interval, start_ms=end_ms + int(args.interval * 1000),
+                                   top_n=args.top_n, seed=args.seed + 1)
+    start = time.perf_counter()
+    with storage.MetricsWriter(db_path, batch_size=WRITE_BATCH_SIZE, flush_interval=float("inf"),
+                               retention_interval=None, selfstats_interval=None) as writer:
+        for sample in samples:
+            writer.write(sample)
+    results["insert_rows_per_s"] = round(len(samples) / (time.perf_counter() - start))
+
+def print_results(results, previous=None):
+    """
+    Affichage des résultats, avec l'évolution par rapport à une exécution précédente
+    """
+    header = f"{'measure':<26}{'value':>14}"
+    if previous is not None:
+        header += f"{'previous':>14}{'change':>9}"
+    print(header)
+    for key, value in results.items():
+        line = f"{key:<26}{value:>14.2f}" if isinstance(value, float) else f"{key:<26}{value:>14}"
+        old = (previous or {}).get(key)
+        if previous is not None and isinstance(old, (int, float)) and old:
+            line += f"{old:>14.2f}" if isinstance(old, float) else f"{old:>14}"
+            line += f"{(value - old) / old:>+9.1%}"
+        print(line)
+
+def main():
+    parser = argparse.ArgumentParser(description="Storage benchmark suite on a synthetic dataset")
+    parser.add_argument("--days", type=float, default=28, help="Covered duration of the dataset (in days)")
+    parser.add_argument("--interval", type=float, default=10, help="Sample interval (in seconds, e.g. 0.25)")
+    parser.add_argument("--top-n", type=int, default=5, help="Top processes per sample (0 for none)")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed of the dataset")
+    parser.add_argument("--end", type=str, default=datagen.DEFAULT_END.isoformat(timespec="minutes"),
+                        help="Datetime of the last sample of the dataset (ISO format: YYYY-MM-DDTHH:MM)")
+    parser.add_argument("--db", type=str, help="Database to reuse (filled if missing; default: temporary)")
+    parser.add_argument("--runs", type=int, default=20, help="Runs per query measure (median)")
+    parser.add_argument("--insert-rows", type=int, default=20_000, help="Samples inserted through MetricsWriter")
+    parser.add_argument("--json", type=str, help="Write the results to this JSON file ('-' for stdout)")
+    parser.add_argument("--compare", type=str, help="Previous JSON results to compare with")
+    args = parser.parse_args()
+
+    commit, dirty = git_revision()
+    run = {
+        "commit": commit,
+        "dirty": dirty,
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "machine": platform.platform(),
+        "params": {key: getattr(args, key) for key in ("days", "interval", "top_n", "seed", "end", "runs",
+                                                        "insert_rows")},
+        "results": {},
+    }
+    results = run["results"]
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = args.db or os.path.join(tmp, "suite.db")
+        if not os.path.exists(db_path):
+            start = time.perf_counter()
+            end_ms = storage.to_epoch_ms(datetime.fromisoformat(args.end))
+            count = datagen.fill_database(db_path, args.days, args.interval, end_ms=end_ms, top_n=args.top_n,
+                                          seed=args.seed)
+            results["fill_rows_per_s"] = round(count / (time.perf_counter() - start))
+        measure(db_path, args, results)
+
+    if args.json == "-":
+        print(json.dumps(run, indent=2))
+        return
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as file:
+            json.dump(run, file, indent=2)
+    previous = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as file:
+            previous_run = json.load(file)
+        previous = previous_run["results"]
+        print(f"compared with {previous_run.get('commit')} ({previous_run.get('date')})")
+    print(f"commit {commit}{' (dirty)' if dirty else ''}, sqlite {sqlite3.sqlite_version}\n")
+    print_results(results, previous)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Coût d'un tick de collector.SystemSampler selon le nombre de cœurs, comparé au budget SYSTEM_TICK_BUDGET,
+et coût d'écriture et place occupée par échantillon avec et sans métriques système.
+
+Les machines à nombreux cœurs sont simulées par un fichier au format de /proc/stat ;
+les autres compteurs (disques, réseau, swap, charge) sont ceux de la machine.
+Utilisation : python -m benchmarks.bench_system_sampler [--cores 16 128 256] [--ticks 200] [--rows 2000]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from config.config import SYSTEM_TICK_BUDGET
+from src import collector, storage
+
+BASE = datetime(2025, 1, 1)
+BUDGET_CORES = 128
+
+def write_stat_file(path, cores):
+    """
+    Fichier au format de /proc/stat pour 'cores' cœurs (dont une ligne 'intr' longue, comme sur une vraie machine)
+    """
+    lines = ["cpu  1000 0 500 100000 10 0 5 0 0 0"]
+    lines += [f"cpu{i} {1000 + i} 0 {500 + i} 100000 10 0 5 0 0 0" for i in range(cores)]
+    lines += ["intr " + " ".join(["0"] * 1000), "ctxt 123456789", "btime 1700000000", "processes 1000"]
+    with open(path, "w") as file:
+        file.write("\n".join(lines) + "\n")
+
+def per_tick(sampler, ticks):
+    sampler.sample()  # amorçage
+    start = time.perf_counter()
+    for _ in range(ticks):
+        sampler.sample()
+    return (time.perf_counter() - start) / ticks
+
+def write_cost(db_path, rows, system):
+    """
+    Écriture de 'rows' échantillons avec MetricsWriter
+    :return: Couple (secondes par échantillon, octets par échantillon)
+    """
+    storage.init_database(db_path)
+    start = time.perf_counter()
+    with storage.MetricsWriter(db_path, retention_interval=None) as writer:
+        for i in range(rows):
+            sample = {'timestamp': (BASE + timedelta(seconds=i)).isoformat(), 'cpu': 10.0, 'ram': 20.0, 'top_processes': []}
+            if system is not None:
+                sample['system'] = system
+            writer.write(sample)
+    elapsed = time.perf_counter() - start
+    conn = storage.connect(db_path)
+    size = storage.database_size(conn)
+    conn.close()
+    return elapsed / rows, size / rows
+
+def main():
+    parser = argparse.ArgumentParser(description="System metrics sampling benchmark")
+    parser.add_argument("--cores", type=int, nargs="+", default=[16, 128, 256], help="Simulated core counts")
+    parser.add_argument("--ticks", type=int, default=200, help="Ticks measured per configuration")
+    parser.add_argument("--rows", type=int, default=2000, help="Samples written per storage measurement")
+    args = parser.parse_args()
+
+    within_budget = True
+    print(f"budget: {SYSTEM_TICK_BUDGET * 1000:.2f}ms per tick at {BUDGET_CORES} cores")
+    print(f"{'cores':>8}{'tick (ms)':>12}{'write (us)':>12}{'bytes/row':>11}")
+    with tempfile.TemporaryDirectory() as tmp:
+        cost, size = write_cost(os.path.join(tmp, "base.db"), args.rows, None)
+        print(f"{'none':>8}{'-':>12}{cost * 1e6:>12.1f}{size:>11.0f}")
+
+        local = per_tick(collector.SystemSampler(), args.ticks)
+        print(f"{'local':>8}{local * 1000:>12.3f}{'-':>12}{'-':>11}")
+
+        for cores in args.cores:
+            stat_path = os.path.join(tmp, f"stat_{cores}")
+            write_stat_file(stat_path, cores)
+            sampler = collector.SystemSampler(stat_path=stat_path)
+            tick = per_tick(sampler, args.ticks)
+            cost, size = write_cost(os.path.join(tmp, f"bench_{cores}.db"), args.rows, sampler.sample())
+            print(f"{cores:>8}{tick * 1000:>12.3f}{cost * 1e6:>12.1f}{size:>11.0f}")
+            if cores == BUDGET_CORES and tick > SYSTEM_TICK_BUDGET:
+                within_budget = False
+
+    print("within budget" if within_budget else "BUDGET EXCEEDED")
+    sys.exit(0 if within_budget else 1)
+
+if __name__ == "__main__":
+    main()
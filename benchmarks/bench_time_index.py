@@ -0,0 +1,88 @@
+"""
+Latence des lectures par période (--since/--last) et des N dernières lignes,
+entre le schéma v1 (date ISO en TEXT, sans index) et le schéma v2 (date entière indexée).
+Mesure aussi la durée de migration sur place d'une base v1.
+
+Utilisation : python -m benchmarks.bench_time_index [--rows 10000000]
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from src import storage
+
+BASE = datetime(2025, 1, 1)
+
+def legacy_rows(count):
+    for i in range(count):
+        yield ((BASE + timedelta(seconds=i)).isoformat(), float(i % 100), float((i * 7) % 100), "[]")
+
+def build_legacy(db_path, count):
+    conn = sqlite3.connect(db_path)
+    conn.execute("""
+        CREATE TABLE metrics (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp TEXT NOT NULL,
+            cpu REAL NOT NULL,
+            ram REAL NOT NULL,
+            top_processes TEXT
+        )
+    """)
+    conn.executemany("INSERT INTO metrics (timestamp, cpu, ram, top_processes) VALUES (?, ?, ?, ?)", legacy_rows(count))
+    conn.commit()
+    conn.close()
+
+def timed(conn, sql, params, repeat=5):
+    """
+    Meilleur temps d'exécution d'une requête
+    :return: (secondes, nombre de lignes)
+    """
+    best, count = float("inf"), 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        count = len(conn.execute(sql, params).fetchall())
+        best = min(best, time.perf_counter() - start)
+    return best, count
+
+def main():
+    parser = argparse.ArgumentParser(description="Time index benchmark")
+    parser.add_argument("--rows", type=int, default=10_000_000, help="Number of rows (1 sample per second)")
+    args = parser.parse_args()
+
+    since = BASE + timedelta(seconds=args.rows - 3600)  # dernière heure
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.db")
+
+        start = time.perf_counter()
+        build_legacy(db_path, args.rows)
+        print(f"built {args.rows} v1 rows in {time.perf_counter() - start:.1f}s")
+
+        conn = sqlite3.connect(db_path)
+        v1_range = timed(conn, """
+            SELECT timestamp, cpu, ram, top_processes FROM metrics
+            WHERE timestamp >= ? ORDER BY timestamp ASC
+        """, (since.isoformat(),), repeat=1)
+        v1_last = timed(conn, "SELECT timestamp, cpu, ram, top_processes FROM metrics ORDER BY id DESC LIMIT ?", (100,))
+        v1_size = os.path.getsize(db_path)
+
+        start = time.perf_counter()
+        storage.migrate(conn)
+        migration = time.perf_counter() - start
+
+        v2_range = timed(conn, "SELECT ts, cpu, ram FROM metrics WHERE ts >= ? ORDER BY ts ASC", (storage.to_epoch_ms(since),))
+        v2_last = timed(conn, "SELECT ts, cpu, ram FROM metrics ORDER BY id DESC LIMIT ?", (100,))
+        conn.execute("VACUUM")
+        conn.close()
+        v2_size = os.path.getsize(db_path)
+
+    print(f"migration v1 -> v{storage.SCHEMA_VERSION}: {migration:.1f}s")
+    print(f"{'query':<20}{'v1 (ms)':>12}{'v2 (ms)':>12}{'rows':>8}")
+    print(f"{'range last hour':<20}{v1_range[0] * 1000:>12.2f}{v2_range[0] * 1000:>12.2f}{v2_range[1]:>8}")
+    print(f"{'last 100':<20}{v1_last[0] * 1000:>12.2f}{v2_last[0] * 1000:>12.2f}{v2_last[1]:>8}")
+    print(f"db size: v1 {v1_size / 1e6:.0f}MB, v2 {v2_size / 1e6:.0f}MB")
+
+if __name__ == "__main__":
+    main()
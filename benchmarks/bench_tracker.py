@@ -0,0 +1,84 @@
+"""
+Coût d'un tick de suivi détaillé (tracker.ProcessTracker) selon le nombre de processus suivis, comparé au même
+suivi par psutil, et coût de l'écriture d'un tick dans la base. La part d'un intervalle d'une seconde occupée
+par le suivi indique s'il est tenable à cette cadence.
+
+Des processus 'sleep' sont lancés pour atteindre chaque palier.
+Utilisation : python -m benchmarks.bench_tracker [--counts 10 100 1000] [--ticks 10]
+"""
+import argparse
+import os
+import subprocess
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import psutil
+
+from src import storage, tracker
+
+def psutil_tick(procs):
+    """
+    Même mesure par psutil (un objet Process par pid, conservé entre les ticks)
+    """
+    values = []
+    for proc in procs:
+        try:
+            values.append(tracker.read_psutil_counters(proc))
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            continue
+    return values
+
+def per_tick(func, ticks):
+    func()  # amorçage
+    start = time.perf_counter()
+    for _ in range(ticks):
+        func()
+    return (time.perf_counter() - start) / ticks
+
+def write_cost(db_path, process_tracker, ticks):
+    """
+    Durée moyenne de l'écriture d'un échantillon avec ses processus suivis (une transaction par tick)
+    """
+    base = datetime(2025, 1, 1)
+    samples = [{'timestamp': (base + timedelta(seconds=i)).isoformat(), 'cpu': 1.0, 'ram': 1.0, 'top_processes': [],
+                'tracked': process_tracker.sample()} for i in range(ticks)]
+    with storage.MetricsWriter(db_path, batch_size=1, retention_interval=None, selfstats_interval=None) as writer:
+        start = time.perf_counter()
+        for sample in samples:
+            writer.write(sample)
+        return (time.perf_counter() - start) / ticks
+
+def main():
+    parser = argparse.ArgumentParser(description="Process tracking benchmark")
+    parser.add_argument("--counts", type=int, nargs="+", default=[10, 100, 1000], help="Tracked processes")
+    parser.add_argument("--ticks", type=int, default=10, help="Ticks measured per configuration")
+    args = parser.parse_args()
+
+    children = []
+    print(f"{'tracked':>8}{'tracker (ms)':>14}{'us/process':>12}{'psutil (ms)':>13}{'write (ms)':>12}{'1s budget':>11}")
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.db")
+        storage.init_database(db_path)
+        try:
+            for count in args.counts:
+                while len(children) < count:
+                    children.append(subprocess.Popen(["sleep", "3600"]))
+                pids = [child.pid for child in children[:count]]
+
+                process_tracker = tracker.ProcessTracker(pids=pids)
+                tracked = per_tick(process_tracker.sample, args.ticks)
+                procs = [psutil.Process(pid) for pid in pids]
+                legacy = per_tick(lambda: psutil_tick(procs), args.ticks)
+                write = write_cost(db_path, process_tracker, args.ticks)
+                budget = (tracked + write) / 1.0
+                print(f"{count:>8}{tracked * 1000:>14.2f}{tracked / count * 1e6:>12.1f}{legacy * 1000:>13.2f}"
+                      f"{write * 1000:>12.2f}{budget:>11.1%}")
+        finally:
+            for child in children:
+                child.kill()
+            for child in children:
+                child.wait()
+
+if __name__ == "__main__":
+    main()
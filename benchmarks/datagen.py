@@ -0,0 +1,228 @@
+"""
+Générateur de jeux de données synthétiques réalistes, écrits directement dans une base à grande échelle
+(plusieurs semaines, jusqu'à des dizaines de millions de lignes) :
+- CPU suivant un cycle journalier (creux la nuit, pic l'après-midi, week-ends plus calmes), avec bruit et pics brefs ;
+- RAM en dents de scie (fuite lente puis redémarrage), bornée ;
+- processus les plus consommateurs tirés d'emplacements dont les occupants se renouvellent : services longs
+  redémarrés de temps en temps, commandes éphémères de quelques minutes (nouveau pid à chaque démarrage).
+
+Le jeu de données ne dépend que de ses paramètres (graine, date de fin fixe par défaut) : deux exécutions
+produisent les mêmes lignes.
+Utilisation : python -m benchmarks.datagen --db data/synthetic.db [--days 28] [--interval 1] [--top-n 5]
+              [--end 2025-02-01T00:00]
+"""
+import argparse
+import os
+import time
+from datetime import datetime
+
+import numpy as np
+
+from src import processes, rollup, storage
+
+# Programmes des emplacements de services (longue durée) et des commandes éphémères
+SERVICES = ("systemd", "postgres", "nginx", "dockerd", "java", "node", "redis-server", "sshd", "containerd", "chrome")
+COMMANDS = ("python3", "gcc", "make", "rsync", "ffmpeg", "backup.sh", "git", "tar", "cc1plus", "pytest")
+
+DAY_MS = 86_400_000
+HOUR_MS = 3_600_000
+
+# Date du dernier échantillon par défaut : fixe, pour que deux exécutions écrivent les mêmes dates
+DEFAULT_END = datetime(2025, 2, 1)
+
+def diurnal_cpu(ts, rng):
+    """
+    CPU d'un jour type selon l'heure locale, plus calme le week-end, avec bruit et pics brefs
+    :param ts: Dates (ms depuis EPOCH, voir storage.to_epoch_ms)
+    :return: Tableau de pourcentages arrondis au dixième
+    """
+    # Les dates stockées sont des heures locales sans fuseau : le reste de la division par un jour est l'heure locale
+    hours = (ts % DAY_MS) / HOUR_MS
+    # Creux vers 4 h, pic vers 15 h
+    load = 12 + 38 * np.clip(np.sin((hours - 7) / 24 * 2 * np.pi) * 0.9 + 0.35, 0, None)
+    weekday = (ts // DAY_MS + 3) % 7  # 1970-01-01 était un jeudi : 0 = lundi
+    load = np.where(weekday >= 5, load * 0.45, load)
+    cpu = load + rng.normal(0, 4, len(ts))
+    # Pics : environ un toutes les dix minutes, de 5 à 60 échantillons
+    starts = np.flatnonzero(rng.random(len(ts)) < (ts[1] - ts[0] if len(ts) > 1 else 1000) / 600_000)
+    for start, length in zip(starts, rng.integers(5, 60, len(starts))):
+        cpu[start:start + length] = rng.uniform(85, 100)
+    return np.clip(cpu, 0, 100).round(1)
+
+def sawtooth_ram(ts, rng, leak_hours=30):
+    """
+    RAM en dents de scie : montée lente puis retour au niveau de base à chaque redémarrage simulé
+    :param ts: Dates (ms depuis EPOCH)
+    :param leak_hours: Durée moyenne (en heures) d'une dent
+    :return: Tableau de pourcentages arrondis au dixième
+    """
+    phase = (ts % (leak_hours * HOUR_MS)) / (leak_hours * HOUR_MS)
+    ram = 35 + 40 * phase + 3 * np.sin(ts / HOUR_MS) + rng.normal(0, 0.5, len(ts))
+    return np.clip(ram, 0, 100).round(1)
+
+class ProcessModel:
+    """
+    Emplacements de processus renouvelés au fil du temps. Chaque emplacement exécute toujours le même programme ;
+    à chaque redémarrage (instants tirés par un processus de Poisson), son occupant reçoit un nouveau pid,
+    attribué dans l'ordre global des démarrages comme par le noyau.
+    """
+
+    def __init__(self, start_ms, end_ms, rng, services=SERVICES, commands=COMMANDS,
+                 service_life_hours=72.0, command_life_minutes=5.0):
+        """
+        :param start_ms, end_ms: Période couverte (ms depuis EPOCH)
+        :param rng: numpy.random.Generator
+        :param service_life_hours: Durée de vie moyenne d'un service (en heures)
+        :param command_life_minutes: Durée de vie moyenne d'une commande éphémère (en minutes)
+        """
+        self.names = list(services) + list(commands)
+        lives = [service_life_hours * HOUR_MS] * len(services) + [command_life_minutes * 60_000] * len(commands)
+        # Part de CPU habituelle de chaque emplacement : quelques services lourds, des commandes plus variables
+        self.weights = rng.lognormal(0, 1, len(self.names))
+        events = []
+        for slot, life in enumerate(lives):
+            count = rng.poisson((end_ms - start_ms) / life) + 1
+            times = np.sort(rng.uniform(start_ms, end_ms, count))
+            times[0] = start_ms - 1  # Occupant présent dès le début
+            events.append(times)
+        # pids attribués dans l'ordre chronologique de tous les démarrages
+        order = np.argsort(np.concatenate(events), kind="stable")
+        pids = np.empty(len(order), dtype=np.int64)
+        pids[order] = 300 + np.arange(len(order))
+        self.changes = events
+        self.pids = np.split(pids, np.cumsum([len(times) for times in events])[:-1])
+
+    def sample(self, ts, cpu, rng, top_n):
+        """
+        Processus les plus consommateurs de chaque échantillon
+        :param ts: Dates des échantillons (ms depuis EPOCH)
+        :param cpu: CPU total des échantillons
+        :param top_n: Nombre de processus par échantillon
+        :return: Tuple de tableaux (index de l'échantillon, rang, pid, index du nom, cpu_percent), un élément par processus
+        """
+        slots = len(self.names)
+        top_n = min(top_n, slots)
+        pid_by_slot = np.empty((len(ts), slots), dtype=np.int64)
+        for slot in range(slots):
+            pid_by_slot[:, slot] = self.pids[slot][np.searchsorted(self.changes[slot], ts, side="right") - 1]
+        share = self.weights * rng.lognormal(0, 0.6, (len(ts), slots))
+        top = np.argsort(-share, axis=1)[:, :top_n]
+        rows = np.arange(len(ts))[:, None]
+        top_share = share[rows, top]
+        cpu_percent = (cpu[:, None] * top_share / share.sum(axis=1)[:, None]).round(1)
+        return (np.repeat(np.arange(len(ts)), top_n), np.tile(np.arange(top_n), len(ts)),
+                pid_by_slot[rows, top].ravel(), top.ravel(), cpu_percent.ravel())
+
+def iter_chunks(count, interval, end_ms=None, top_n=5, seed=0, chunk_size=100_000):
+    """
+    Génération du jeu de données par tranches chronologiques
+    :param count: Nombre d'échantillons
+    :param interval: Intervalle entre deux échantillons (en secondes, ex : 0.25)
+    :param end_ms: Date du dernier échantillon (ms depuis EPOCH) ; None pour DEFAULT_END
+    :param top_n: Processus par échantillon (0 pour aucun)
+    :param seed: Graine du générateur
+    :param chunk_size: Échantillons par tranche
+    :return: Itérateur de dictionnaires : ts, cpu, ram (tableaux) et processes (voir ProcessModel.sample, ou None)
+    """
+    interval_ms = max(1, int(round(interval * 1000)))
+    end_ms = end_ms if end_ms is not None else storage.to_epoch_ms(DEFAULT_END)
+    start_ms = end_ms - (count - 1) * interval_ms
+    rng = np.random.default_rng(seed)
+    model = ProcessModel(start_ms, end_ms, rng) if top_n else None
+    for first in range(0, count, chunk_size):
+        ts = start_ms + np.arange(first, min(first + chunk_size, count), dtype=np.int64) * interval_ms
+        cpu = diurnal_cpu(ts, rng)
+        yield {
+            'ts': ts,
+            'cpu': cpu,
+            'ram': sawtooth_ram(ts, rng),
+            'processes': model.sample(ts, cpu, rng, top_n) if model is not None else None,
+            'names': model.names if model is not None else None,
+        }
+
+def make_samples(count, interval=1.0, start_ms=None, top_n=5, seed=0):
+    """
+    Échantillons au format de collector.collect_metrics, pour mesurer le chemin d'écriture normal (MetricsWriter)
+    :param count: Nombre d'échantillons
+    :param start_ms: Date du premier échantillon (ms depuis EPOCH) ; None pour le 2025-01-01
+    :return: Liste de dictionnaires
+    """
+    samples = []
+    start_ms = start_ms if start_ms is not None else storage.to_epoch_ms(datetime(2025, 1, 1))
+    end_ms = start_ms + (count - 1) * max(1, int(round(interval * 1000)))
+    for chunk in iter_chunks(count, interval, end_ms=end_ms, top_n=top_n, seed=seed):
+        lists = [[] for _ in chunk['ts']]
+        if chunk['processes'] is not None:
+            for index, _, pid, name, cpu_percent in zip(*(column.tolist() for column in chunk['processes'])):
+                lists[index].append({'pid': pid, 'name': chunk['names'][name], 'cpu_percent': cpu_percent})
+        samples.extend({'timestamp': storage.from_epoch_ms(ts).isoformat(), 'cpu': cpu, 'ram': ram,
+                        'top_processes': processes}
+                       for ts, cpu, ram, processes in zip(chunk['ts'].tolist(), chunk['cpu'].tolist(),
+                                                          chunk['ram'].tolist(), lists))
+    return samples
+
+def fill_database(db_path, days, interval, end_ms=None, top_n=5, seed=0, chunk_size=100_000, progress=None):
+    """
+    Écriture directe d'un jeu de données dans les tables brutes, une transaction par tranche, puis calcul des agrégats
+    :param db_path: Chemin de la base (créée au besoin)
+    :param days: Durée couverte (en jours)
+    :param interval: Intervalle entre deux échantillons (en secondes, ex : 0.25)
+    :param progress: Fonction appelée avec le nombre de lignes écrites après chaque tranche ; None pour aucune
+    :return: Nombre d'échantillons écrits
+    (autres paramètres : voir iter_chunks)
+    """
+    storage.init_database(db_path)
+    conn = storage.connect(db_path)
+    # Index secondaires mis à jour en mémoire plutôt que relus du disque à chaque tranche
+    conn.execute("PRAGMA cache_size = -262144")
+    written = 0
+    try:
+        next_id = conn.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM metrics").fetchone()[0]
+        name_ids = None
+        count = int(days * DAY_MS // max(1, int(round(interval * 1000))))
+        for chunk in iter_chunks(count, interval, end_ms, top_n, seed, chunk_size):
+            ids = next_id + np.arange(len(chunk['ts']))
+            with conn:
+                conn.executemany("INSERT INTO metrics (id, ts, cpu, ram) VALUES (?, ?, ?, ?)",
+                                 zip(ids.tolist(), chunk['ts'].tolist(), chunk['cpu'].tolist(), chunk['ram'].tolist()))
+                if chunk['processes'] is not None:
+                    if name_ids is None:
+                        cache = processes.intern_names(conn, chunk['names'], {})
+                        name_ids = np.array([cache[name] for name in chunk['names']])
+                    index, rank, pid, name, cpu_percent = chunk['processes']
+                    conn.executemany("""
+                        INSERT INTO metric_processes (metric_id, rank, pid, name_id, cpu_percent)
+                        VALUES (?, ?, ?, ?, ?)
+                    """, zip(ids[index].tolist(), rank.tolist(), pid.tolist(), name_ids[name].tolist(),
+                             cpu_percent.tolist()))
+            next_id += len(ids)
+            written += len(ids)
+            if progress is not None:
+                progress(written)
+        with conn:
+            rollup.rebuild(conn)
+    finally:
+        conn.close()
+    return written
+
+def main():
+    parser = argparse.ArgumentParser(description="Synthetic metrics generator")
+    parser.add_argument("--db", type=str, required=True, help="Database to fill (created if needed)")
+    parser.add_argument("--days", type=float, default=28, help="Covered duration (in days)")
+    parser.add_argument("--interval", type=float, default=1, help="Sample interval (in seconds, e.g. 0.25)")
+    parser.add_argument("--top-n", type=int, default=5, help="Top processes per sample (0 for none)")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    parser.add_argument("--end", type=str, default=DEFAULT_END.isoformat(timespec="minutes"),
+                        help="Datetime of the last sample (ISO format: YYYY-MM-DDTHH:MM)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    end_ms = storage.to_epoch_ms(datetime.fromisoformat(args.end))
+    count = fill_database(args.db, args.days, args.interval, end_ms=end_ms, top_n=args.top_n, seed=args.seed,
+                          progress=lambda written: print(f"\r{written} rows", end="", flush=True))
+    elapsed = time.perf_counter() - start
+    print(f"\r{count} rows written in {elapsed:.1f}s ({count / elapsed:.0f} rows/s), "
+          f"{os.path.getsize(args.db) / 1024 ** 2:.1f} MiB")
+
+if __name__ == "__main__":
+    main()
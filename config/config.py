@@ -1,8 +1,88 @@
-import os
-
-# Chemin vers le dossier de données (relatif à la racine du projet)
-PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-DATA_PATH = os.path.join(PROJECT_ROOT, "data")
-DB_PATH = os.path.join(DATA_PATH, "metrics.db")
-
-DB_TEST_PATH = os.path.join(DATA_PATH, "metrics_test.db")
\ No newline at end of file
+import os
+
+# Chemin vers le dossier de données (relatif à la racine du projet)
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_PATH = os.path.join(PROJECT_ROOT, "data")
+DB_PATH = os.path.join(DATA_PATH, "metrics.db")
+
+DB_TEST_PATH = os.path.join(DATA_PATH, "metrics_test.db")
+
+# Rétention (voir storage.enforce_retention)
+RETENTION_MAX_AGE = {"raw": 7, "1m": 90, "1h": 730}   # Âge maximal des données par résolution (en jours, None = illimité)
+RETENTION_MAX_DB_SIZE = 1024 ** 3                     # Taille maximale des données (en octets, None = illimitée)
+RETENTION_BATCH_SIZE = 5000                           # Nombre de lignes supprimées par transaction
+RETENTION_INTERVAL = 60.0                             # Délai (en secondes) entre deux passes pendant la collecte
+RETENTION_MAX_BATCHES = 10                            # Nombre maximal de transactions de suppression par passe pendant la collecte
+
+# Archivage compressé des données brutes (voir src/compression.py et 'cli archive')
+ARCHIVE_MIN_AGE = 1           # Âge (en jours) à partir duquel les données brutes peuvent être compressées
+ARCHIVE_BLOCK_SECONDS = 3600  # Durée couverte par un bloc compressé (en secondes)
+
+# Mesures internes du moniteur (voir src/instrument.py)
+INSTRUMENT_ENABLED = True     # Mesure des étapes de collecte et de stockage (désactivable par 'cli --no-instrument')
+SELFSTATS_INTERVAL = 60.0     # Délai (en secondes) entre deux écritures des mesures internes
+
+# Accès concurrents à la base : un écrivain et plusieurs lecteurs (mode WAL)
+DB_BUSY_TIMEOUT = 5.0         # Attente maximale (en secondes) d'un verrou avant l'erreur 'database is locked'
+DB_RETRY_ATTEMPTS = 3         # Nombre de nouvelles tentatives d'une opération refusée par un verrou
+DB_RETRY_DELAY = 0.1          # Délai (en secondes) avant la première nouvelle tentative, doublé à chaque tentative
+
+# Écriture des métriques par lots (voir storage.MetricsWriter)
+WRITE_BATCH_SIZE = 100        # Nombre d'échantillons accumulés avant écriture sur disque
+WRITE_FLUSH_INTERVAL = 5.0    # Délai maximal (en secondes) avant écriture sur disque
+
+# Collecte parallèle des sondes coûteuses (voir src/engine.py et 'cli collect --parallel')
+ENGINE_PROBE_TIMEOUT = 0.5    # Attente maximale (en secondes) du résultat d'une sonde dans un tick
+ENGINE_RESTART_AFTER = 5.0    # Durée (en secondes) sans réponse d'une sonde avant le remplacement de son processus
+ENGINE_START_TIMEOUT = 10.0   # Attente maximale (en secondes) du démarrage du processus d'une sonde
+
+# API asynchrone (voir src/aio.py)
+AIO_QUEUE_SIZE = 100          # Nombre d'échantillons en attente par abonné d'un SampleHub avant abandon des plus anciens
+
+# Moteur à segments binaires (voir src/backends.py)
+SEGMENT_PATH = os.path.join(DATA_PATH, "segments")   # Répertoire des segments
+SEGMENT_MAX_RECORDS = 1_000_000                       # Nombre d'enregistrements (16 octets) par segment
+
+# Tables d'agrégats (voir src/rollup.py) : (nom, taille des seaux en secondes), de la plus fine à la plus grossière
+ROLLUP_RESOLUTIONS = [("1m", 60), ("1h", 3600)]
+
+# Nombre d'échantillons récents conservés en mémoire par le cache de lecture (voir src/cache.py)
+READ_CACHE_CAPACITY = 10_000
+
+# Nombre de points visé par un rapport (environ la largeur du graphique en pixels)
+REPORT_MAX_POINTS = 1200
+
+# Cache persistant des séries agrégées des rapports (voir src/report_cache.py)
+REPORT_CACHE_PATH = os.path.join(DATA_PATH, "report_cache.db")
+REPORT_CACHE_MAX_BYTES = 16 * 1024 ** 2  # Taille maximale des séries conservées (en octets), au-delà éviction LRU
+
+# Statistiques d'une période (voir report.compute_stats)
+STATS_WINDOW = 60             # Fenêtre de la moyenne glissante (en échantillons)
+STATS_THRESHOLD = 3.0         # Seuil de détection des anomalies (en écarts-types)
+STATS_EWMA_ALPHA = 0.1        # Poids du nouvel échantillon dans la moyenne mobile exponentielle
+STATS_EWMA_BLOCK = 1024       # Taille des blocs de calcul de la moyenne mobile exponentielle
+
+# Alertes évaluées pendant la collecte (voir src/alerts.py et 'cli collect --alerts')
+ALERTS_PATH = os.path.join(PROJECT_ROOT, "config", "alerts.json")   # Règles et destinations par défaut
+ALERTS_LOG_PATH = os.path.join(DATA_PATH, "alerts.log")              # Fichier par défaut des destinations 'log'
+ALERTS_WEBHOOK_TIMEOUT = 2.0  # Délai maximal (en secondes) d'un envoi à un webhook
+
+# Nombre de lignes lues et écrites à la fois lors d'un export (voir src/export.py)
+EXPORT_CHUNK_SIZE = 50_000
+
+
+# Collecte multi-hôtes (voir src/agent.py et src/ingest.py)
+INGEST_BIND = "127.0.0.1"     # Adresse d'écoute du serveur d'ingestion
+INGEST_PORT = 8765            # Port du serveur d'ingestion
+INGEST_QUEUE_SIZE = 100       # Nombre de lots en attente d'écriture au-delà duquel les agents sont refusés (503)
+INGEST_MAX_SAMPLES = 10_000   # Nombre maximal d'échantillons par requête
+INGEST_MAX_BYTES = 16 * 1024 ** 2  # Taille maximale du corps d'une requête (en octets), refusée avant lecture
+INGEST_WRITE_BATCH_SIZE = 1000  # Nombre d'échantillons, tous agents confondus, écrits par transaction
+INGEST_READ_LIMIT = 60        # Nombre d'échantillons retournés par défaut par GET /metrics
+AGENT_BATCH_SIZE = 20         # Nombre d'échantillons envoyés par requête
+AGENT_MAX_BUFFER = 10_000     # Nombre d'échantillons conservés par l'agent quand le serveur est indisponible
+AGENT_MAX_BACKOFF = 60.0      # Délai maximal (en secondes) entre deux tentatives d'envoi
+
+
+# Coût maximal (en secondes) d'un tick de collector.SystemSampler sur une machine de 128 cœurs (voir benchmarks/bench_system_sampler.py)
+SYSTEM_TICK_BUDGET = 0.002
@@ -0,0 +1,110 @@
+import collections
+import http.client
+import itertools
+import json
+import socket
+import time
+from urllib.parse import urlsplit
+
+from config.config import AGENT_BATCH_SIZE, AGENT_MAX_BUFFER, AGENT_MAX_BACKOFF
+from src.ingest import INGEST_PATH
+
+class Agent:
+    """
+    Envoi des échantillons collectés localement au serveur d'ingestion (voir src/ingest.py), par lots de 'batch_size'.
+    Les échantillons non envoyés (serveur indisponible ou saturé) restent en tampon, dans la limite de 'max_buffer' :
+    au-delà, les plus anciens sont abandonnés. Les tentatives suivantes sont espacées par un délai croissant.
+    """
+
+    def __init__(self, server, host=None, batch_size=AGENT_BATCH_SIZE, max_buffer=AGENT_MAX_BUFFER,
+                 max_backoff=AGENT_MAX_BACKOFF, timeout=5.0, clock=time.monotonic):
+        """
+        :param server: Adresse du serveur d'ingestion ('hôte:port' ou 'http://hôte:port')
+        :param host: Nom de l'hôte joint aux échantillons ; None pour le nom de la machine
+        :param batch_size: Nombre d'échantillons envoyés par requête
+        :param max_buffer: Nombre maximal d'échantillons en attente d'envoi
+        :param max_backoff: Délai maximal (en secondes) entre deux tentatives d'envoi
+        :param timeout: Délai maximal (en secondes) d'une requête
+        :param clock: Horloge monotone (en secondes), remplaçable dans les tests
+        """
+        url = urlsplit(server if "://" in server else f"http://{server}")
+        self.address = (url.hostname, url.port or 80)
+        self.host = host if host is not None else socket.gethostname()
+        self.batch_size = batch_size
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+        self.clock = clock
+        self.buffer = collections.deque(maxlen=max_buffer)
+        self.stats = {"sent": 0, "dropped": 0, "rejected": 0, "retries": 0}
+        self.backoff = 0.0
+        self.retry_at = 0.0
+        self.conn = None
+
+    def add(self, metrics: dict):
+        """
+        Ajout d'un échantillon au tampon, avec envoi si un lot complet est prêt
+        :param metrics: Dictionnaire retourné par collector.collect_metrics
+        """
+        if len(self.buffer) == self.buffer.maxlen:
+            self.stats["dropped"] += 1
+        self.buffer.append(metrics)
+        if len(self.buffer) >= self.batch_size:
+            self.send()
+
+    def _post(self, samples):
+        """
+        Envoi d'un lot sur la connexion persistante, ouverte au besoin
+        :return: Couple (code HTTP, en-tête Retry-After ou None)
+        """
+        if self.conn is None:
+            self.conn = http.client.HTTPConnection(*self.address, timeout=self.timeout)
+        body = json.dumps({"host": self.host, "samples": samples}).encode()
+        self.conn.request("POST", INGEST_PATH, body, {"Content-Type": "application/json"})
+        response = self.conn.getresponse()
+        response.read()
+        return response.status, response.getheader("Retry-After")
+
+    def send(self, force=False):
+        """
+        Envoi des échantillons en attente, lot par lot, jusqu'au premier échec
+        :param force: Envoyer aussi le dernier lot incomplet, sans attendre la fin du délai entre tentatives
+        :return: Nombre d'échantillons envoyés
+        """
+        sent = 0
+        while self.buffer and (force or len(self.buffer) >= self.batch_size):
+            if not force and self.clock() < self.retry_at:
+                break
+            samples = list(itertools.islice(self.buffer, self.batch_size))
+            try:
+                status, retry_after = self._post(samples)
+            except (OSError, http.client.HTTPException):
+                # Serveur injoignable ou connexion coupée : nouvelle connexion à la prochaine tentative
+                self.close()
+                status, retry_after = None, None
+
+            if status == 202 or status == 400:
+                # Un lot invalide ne sera jamais accepté : il est abandonné plutôt que renvoyé
+                for _ in samples:
+                    self.buffer.popleft()
+                if status == 202:
+                    self.stats["sent"] += len(samples)
+                    sent += len(samples)
+                else:
+                    self.stats["rejected"] += len(samples)
+                self.backoff = 0.0
+                continue
+
+            # 503 (serveur saturé) ou erreur : attente doublée à chaque échec, au moins celle demandée par le serveur
+            self.stats["retries"] += 1
+            self.backoff = min(max(self.backoff * 2, float(retry_after or 0), 1.0), self.max_backoff)
+            self.retry_at = self.clock() + self.backoff
+            break
+        return sent
+
+    def close(self):
+        """
+        Fermeture de la connexion au serveur (les échantillons en attente sont conservés)
+        """
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
@@ -0,0 +1,250 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from config.config import AIO_QUEUE_SIZE, DB_PATH, RETENTION_INTERVAL, WRITE_BATCH_SIZE, WRITE_FLUSH_INTERVAL
+from src import collector, storage
+from src.scheduler import Scheduler
+
+def make_collect(pids=None, cgroup=None, system=True):
+    """
+    Préparation d'une collecte sans attente, amorcée comme pour 'cli collect'
+    :param pids: Processus suivis (voir collector.ProcessSampler) ; None pour tous
+    :param cgroup: Cgroup des processus suivis ; None pour tous
+    :param system: Collecte des métriques détaillées (voir collector.SystemSampler)
+    :return: Fonction sans argument retournant un échantillon ; appel bloquant, à exécuter hors de la boucle asyncio
+    """
+    # Amorçage des mesures CPU : chaque appel mesure l'utilisation depuis l'appel précédent
+    collector.get_cpu_usage(interval=None)
+    sampler = collector.ProcessSampler(pids=pids, cgroup=cgroup)
+    sampler.sample(0)
+    system_sampler = collector.SystemSampler() if system else None
+    if system_sampler is not None:
+        system_sampler.sample()
+    return lambda: collector.collect_metrics(cpu_interval=None, sampler=sampler, system_sampler=system_sampler)
+
+async def samples(interval, duration=None, collect=None, executor=None, scheduler=None):
+    """
+    Générateur asynchrone d'échantillons à intervalle fixe. Les appels à psutil et la lecture de /proc sont exécutés
+    dans un pool de fils : la boucle asyncio n'est jamais bloquée par la collecte.
+    :param interval: Intervalle entre deux échantillons (en secondes)
+    :param duration: Durée totale (en secondes) ; None pour un flux sans fin
+    :param collect: Fonction bloquante retournant un échantillon ; None pour make_collect()
+    :param executor: Pool de fils des appels bloquants ; None pour le pool par défaut de la boucle
+    :param scheduler: Cadenceur dont les statistiques sont mises à jour (voir Scheduler.stats) ; None pour un nouveau
+    :return: Générateur asynchrone des dictionnaires retournés par collector.collect_metrics
+    """
+    loop = asyncio.get_running_loop()
+    if collect is None:
+        collect = await loop.run_in_executor(executor, make_collect)
+    scheduler = scheduler or Scheduler(interval)
+    async for _ in scheduler.ticks_async(duration):
+        # Un seul appel en cours à la fois : l'état des échantillonneurs n'est jamais partagé entre deux fils
+        yield await loop.run_in_executor(executor, collect)
+
+class Subscription:
+    """
+    Abonnement à un SampleHub : itérateur asynchrone des échantillons reçus depuis l'abonnement.
+    La file est bornée : un abonné trop lent perd ses plus anciens échantillons sans ralentir la collecte.
+    """
+
+    def __init__(self, hub, maxsize):
+        self.hub = hub
+        self.queue = asyncio.Queue(maxsize)
+        self.dropped = 0
+        self.closed = False
+
+    def put(self, sample):
+        """
+        Ajout d'un échantillon sans attente (None pour la fin du flux)
+        """
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+            self.hub.stats["dropped"] += 1
+        self.queue.put_nowait(sample)
+
+    def close(self):
+        """
+        Désabonnement : les échantillons suivants ne sont plus reçus
+        """
+        self.hub.subscribers.discard(self)
+        self.closed = True
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self.closed:
+            raise StopAsyncIteration
+        sample = await self.queue.get()
+        if sample is None:
+            self.close()
+            raise StopAsyncIteration
+        return sample
+
+class SampleHub:
+    """
+    Diffusion d'un même flux d'échantillons à plusieurs abonnés : une seule collecte par tick, quel que soit
+    le nombre d'abonnés. S'utilise comme gestionnaire de contexte asynchrone :
+
+        async with SampleHub(1.0) as hub:
+            async for sample in hub.subscribe():
+                ...
+    """
+
+    def __init__(self, interval, duration=None, collect=None, executor=None):
+        """
+        :param interval: Intervalle entre deux échantillons (en secondes)
+        :param duration: Durée totale (en secondes) ; None pour un flux sans fin
+        :param collect: Fonction bloquante retournant un échantillon ; None pour make_collect()
+        :param executor: Pool de fils des appels bloquants ; None pour le pool par défaut de la boucle
+        """
+        self.interval = interval
+        self.duration = duration
+        self.collect = collect
+        self.executor = executor
+        self.scheduler = Scheduler(interval)
+        self.subscribers = set()
+        self.stats = {"samples": 0, "dropped": 0}
+        self.task = None
+        self.done = False
+
+    def subscribe(self, maxsize=AIO_QUEUE_SIZE):
+        """
+        Nouvel abonné, qui reçoit les échantillons collectés à partir de maintenant
+        :param maxsize: Nombre d'échantillons en attente au-delà duquel les plus anciens sont abandonnés
+        :return: Subscription
+        """
+        subscription = Subscription(self, maxsize)
+        if self.done:
+            subscription.put(None)
+        else:
+            self.subscribers.add(subscription)
+        return subscription
+
+    def start(self):
+        """
+        Démarrage de la collecte dans une tâche de la boucle courante
+        """
+        if self.task is None:
+            self.task = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self):
+        try:
+            async for sample in samples(self.interval, self.duration, self.collect, self.executor, self.scheduler):
+                self.stats["samples"] += 1
+                for subscription in list(self.subscribers):
+                    subscription.put(sample)
+        finally:
+            # Fin du flux (durée écoulée, arrêt ou erreur de collecte) : les abonnés sortent de leur boucle
+            self.done = True
+            for subscription in list(self.subscribers):
+                subscription.put(None)
+
+    async def close(self):
+        """
+        Arrêt de la collecte
+        """
+        if self.task is None:
+            return
+        self.task.cancel()
+        try:
+            await self.task
+        except asyncio.CancelledError:
+            pass
+        self.task = None
+
+    async def __aenter__(self):
+        self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+class AsyncMetricsWriter:
+    """
+    Écriture asynchrone des métriques par lots. Les échantillons sont validés et mis en tampon dans la boucle ;
+    chaque lot est écrit par un storage.MetricsWriter dans un fil dédié, qui garde la connexion SQLite.
+    Le tampon est vidé à la fermeture : utiliser l'écrivain comme gestionnaire de contexte asynchrone.
+    """
+
+    def __init__(self, db_path=DB_PATH, batch_size=WRITE_BATCH_SIZE, flush_interval=WRITE_FLUSH_INTERVAL,
+                 retention_interval=RETENTION_INTERVAL, cache=None):
+        """
+        :param db_path: Chemin de la base de données
+        :param batch_size: Nombre d'échantillons accumulés avant écriture
+        :param flush_interval: Délai maximal (en secondes) entre deux écritures
+        :param retention_interval: Délai (en secondes) entre deux passes de rétention ; None pour les désactiver
+        :param cache: Cache de lecture alimenté à chaque écriture (voir src/cache.py) ; None pour aucun
+        """
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.retention_interval = retention_interval
+        self.cache = cache
+        self.buffer = []
+        self.last_flush = time.monotonic()
+        self.written = 0
+        # Un seul fil : les lots sont écrits dans l'ordre, par la connexion créée dans ce fil
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="metrics-writer")
+        self.writer = None
+
+    async def write(self, metrics: dict):
+        """
+        Ajout d'un échantillon au tampon, avec écriture si un seuil est atteint
+        :param metrics: Dictionnaire contenant les données à insérer dans la base de données
+        """
+        self.buffer.append(storage.validate_metrics(metrics))
+        if len(self.buffer) >= self.batch_size or time.monotonic() - self.last_flush >= self.flush_interval:
+            await self.flush()
+
+    async def consume(self, stream):
+        """
+        Écriture de tous les échantillons d'un flux (ex : samples() ou SampleHub.subscribe())
+        :param stream: Itérable asynchrone d'échantillons
+        """
+        async for metrics in stream:
+            await self.write(metrics)
+
+    async def flush(self):
+        """
+        Écriture de tous les échantillons en attente en une seule transaction
+        :return: Nombre d'échantillons écrits
+        """
+        rows, self.buffer = self.buffer, []
+        self.last_flush = time.monotonic()
+        count = await asyncio.get_running_loop().run_in_executor(self.executor, self._write_rows, rows)
+        self.written += count
+        return count
+
+    def _write_rows(self, rows):
+        # Fil d'écriture
+        if self.writer is None:
+            self.writer = storage.MetricsWriter(self.db_path, self.batch_size, self.flush_interval,
+                                                self.retention_interval, self.cache)
+        self.writer.buffer.extend(rows)
+        return self.writer.flush()
+
+    def _close_writer(self):
+        # Fil d'écriture
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
+    async def close(self):
+        """
+        Écriture des échantillons restants puis fermeture de la connexion
+        """
+        try:
+            if self.buffer:
+                await self.flush()
+        finally:
+            await asyncio.get_running_loop().run_in_executor(self.executor, self._close_writer)
+            self.executor.shutdown()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
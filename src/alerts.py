@@ -0,0 +1,371 @@
+import abc
+import collections
+import http.client
+import json
+import math
+import operator
+import os
+from datetime import datetime
+from urllib.parse import urlsplit
+
+from config.config import ALERTS_LOG_PATH, ALERTS_WEBHOOK_TIMEOUT
+
+# Comparaisons possibles entre la valeur observée et le seuil d'une règle
+OPERATORS = {">": operator.gt, ">=": operator.ge, "<": operator.lt, "<=": operator.le}
+
+# Métriques d'un échantillon lues directement ; les autres sont cherchées dans sample['system'] (voir src/system.py)
+TOP_LEVEL_METRICS = ("cpu", "ram")
+
+class Rule(abc.ABC):
+    """
+    Règle d'alerte évaluée échantillon par échantillon. Une alerte 'firing' est émise quand la condition devient vraie,
+    une alerte 'resolved' quand elle redevient fausse.
+    """
+    kind = None
+
+    def __init__(self, name, metric, op, threshold):
+        """
+        :param name: Nom de la règle (repris dans les alertes)
+        :param metric: Métrique surveillée : 'cpu', 'ram' ou une métrique système (ex : 'load1')
+        :param op: Comparaison avec le seuil (voir OPERATORS)
+        :param threshold: Seuil
+        """
+        self.name = name
+        self.metric = metric
+        self.op = op
+        self.compare = OPERATORS[op]
+        self.threshold = threshold
+        self.active = False
+
+    @abc.abstractmethod
+    def update(self, ts, value):
+        """
+        Prise en compte d'un échantillon
+        :param ts: Date de l'échantillon (en secondes)
+        :param value: Valeur de la métrique
+        :return: Couple (condition vraie, valeur observée)
+        """
+
+    def describe(self):
+        return f"{self.metric} {self.op} {self.threshold}"
+
+class ThresholdRule(Rule):
+    """
+    Valeur de l'échantillon comparée au seuil
+    """
+    kind = "threshold"
+
+    def update(self, ts, value):
+        return self.compare(value, self.threshold), value
+
+class SustainedRule(Rule):
+    """
+    Condition vraie sans interruption pendant au moins 'duration' secondes
+    """
+    kind = "sustained"
+
+    def __init__(self, name, metric, op, threshold, duration):
+        super().__init__(name, metric, op, threshold)
+        self.duration = duration
+        # Date du premier échantillon de la série en cours vérifiant la condition
+        self.since = None
+
+    def update(self, ts, value):
+        if not self.compare(value, self.threshold):
+            self.since = None
+            return False, value
+        if self.since is None:
+            self.since = ts
+        return ts - self.since >= self.duration, value
+
+    def describe(self):
+        return f"{super().describe()} for {self.duration:g}s"
+
+class RateRule(Rule):
+    """
+    Variation par seconde de la métrique sur les 'window' dernières secondes comparée au seuil
+    (ex : '>' 10 pour une hausse de plus de 10 points par seconde). La règle n'est évaluée qu'une fois la fenêtre
+    couverte par le flux : sur deux échantillons proches, le bruit donnerait des variations démesurées.
+    """
+    kind = "rate"
+
+    def __init__(self, name, metric, op, threshold, window):
+        super().__init__(name, metric, op, threshold)
+        self.window = window
+        self.points = collections.deque()
+        self.first_ts = None
+
+    def update(self, ts, value):
+        points = self.points
+        points.append((ts, value))
+        # Le plus ancien point conservé est le dernier antérieur ou égal au début de la fenêtre
+        while len(points) > 1 and points[1][0] <= ts - self.window:
+            points.popleft()
+        if self.first_ts is None:
+            self.first_ts = ts
+        first_ts, first_value = points[0]
+        if ts - self.first_ts < self.window or ts <= first_ts:
+            return False, 0.0
+        rate = (value - first_value) / (ts - first_ts)
+        return self.compare(rate, self.threshold), rate
+
+    def describe(self):
+        return f"rate of {self.metric} over {self.window:g}s {self.op} {self.threshold}/s"
+
+class PercentileRule(Rule):
+    """
+    Percentile de la métrique sur les 'window' dernières secondes comparé au seuil, par rang le plus proche
+    (numpy.percentile(..., method='inverted_cdf')).
+
+    Le percentile n'est pas calculé : seul compte le nombre de valeurs de la fenêtre vérifiant la comparaison.
+    Par exemple, le p95 dépasse 90 si et seulement si plus de n - ceil(0.95 * n) valeurs dépassent 90 :
+    coût constant par échantillon, quelle que soit la taille de la fenêtre. La règle n'est évaluée qu'une fois
+    la fenêtre couverte par le flux.
+    """
+    kind = "percentile"
+
+    def __init__(self, name, metric, op, threshold, window, percentile):
+        super().__init__(name, metric, op, threshold)
+        self.window = window
+        self.percentile = percentile
+        self.flags = collections.deque()
+        self.matching = 0
+        self.first_ts = None
+
+    def update(self, ts, value):
+        flags = self.flags
+        match = self.compare(value, self.threshold)
+        flags.append((ts, match))
+        self.matching += match
+        while flags[0][0] <= ts - self.window:
+            self.matching -= flags.popleft()[1]
+        if self.first_ts is None:
+            self.first_ts = ts
+        share = 100 * self.matching / len(flags)
+        if ts - self.first_ts < self.window:
+            return False, share
+        # Rang (à partir de 1) du percentile dans la fenêtre triée
+        rank = max(1, math.ceil(self.percentile * len(flags) / 100))
+        if self.op in (">", ">="):
+            # Les valeurs vérifiant la comparaison occupent le haut de la fenêtre triée
+            return len(flags) - self.matching < rank, share
+        return self.matching >= rank, share
+
+    def describe(self):
+        return f"p{self.percentile:g} of {self.metric} over {self.window:g}s {self.op} {self.threshold}"
+
+# Types de règles : classe et paramètres propres au type
+RULE_TYPES = {
+    "threshold": (ThresholdRule, ()),
+    "sustained": (SustainedRule, ("duration",)),
+    "rate": (RateRule, ("window",)),
+    "percentile": (PercentileRule, ("window", "percentile")),
+}
+
+class StdoutSink:
+    """
+    Affichage des alertes dans la console
+    """
+
+    def send(self, alert):
+        print(f"[ALERT] {alert['message']}")
+
+    def close(self):
+        pass
+
+class LogSink:
+    """
+    Ajout des alertes à un fichier, une ligne JSON par alerte
+    """
+
+    def __init__(self, path=ALERTS_LOG_PATH):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.file = open(path, "a", encoding="utf-8", buffering=1)
+
+    def send(self, alert):
+        self.file.write(json.dumps(alert) + "\n")
+
+    def close(self):
+        self.file.close()
+
+class WebhookSink:
+    """
+    Envoi de chaque alerte en JSON par une requête POST (connexion persistante, ouverte au besoin).
+    L'envoi bloque la collecte au plus 'timeout' secondes : les alertes ne sont émises qu'aux changements d'état.
+    """
+
+    def __init__(self, url, timeout=ALERTS_WEBHOOK_TIMEOUT):
+        parts = urlsplit(url if "://" in url else f"http://{url}")
+        if parts.scheme != "http":
+            raise ValueError(f"Webhook URL must use http: {url}")
+        self.address = (parts.hostname, parts.port or 80)
+        self.path = parts.path or "/"
+        self.timeout = timeout
+        self.conn = None
+
+    def send(self, alert):
+        if self.conn is None:
+            self.conn = http.client.HTTPConnection(*self.address, timeout=self.timeout)
+        try:
+            self.conn.request("POST", self.path, json.dumps(alert).encode(), {"Content-Type": "application/json"})
+            response = self.conn.getresponse()
+            response.read()
+        except (OSError, http.client.HTTPException):
+            # Connexion coupée ou serveur injoignable : nouvelle connexion à la prochaine alerte
+            self.close()
+            raise
+        if response.status >= 300:
+            raise OSError(f"Webhook answered {response.status}")
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+# Types de destinations : classe et paramètres acceptés
+SINK_TYPES = {
+    "stdout": (StdoutSink, ()),
+    "log": (LogSink, ("path",)),
+    "webhook": (WebhookSink, ("url", "timeout")),
+}
+
+def _number(config, key, positive=False):
+    value = config.get(key)
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or (positive and value <= 0):
+        raise ValueError(f"Rule '{config.get('name')}': '{key}' must be a {'positive ' if positive else ''}number")
+    return value
+
+def parse_rule(config):
+    """
+    Création d'une règle depuis sa configuration
+    :param config: Dictionnaire : name, type (voir RULE_TYPES), metric, op, value et les paramètres du type
+                   (duration, window en secondes ; percentile entre 0 et 100)
+    :return: Rule
+    """
+    if not isinstance(config, dict) or not isinstance(config.get("name"), str):
+        raise ValueError("Each rule must be an object with a 'name'")
+    name = config["name"]
+    if config.get("type") not in RULE_TYPES:
+        raise ValueError(f"Rule '{name}': 'type' must be one of {', '.join(RULE_TYPES)}")
+    if not isinstance(config.get("metric"), str):
+        raise ValueError(f"Rule '{name}': 'metric' must be a string")
+    op = config.get("op", ">")
+    if op not in OPERATORS:
+        raise ValueError(f"Rule '{name}': 'op' must be one of {', '.join(OPERATORS)}")
+    cls, params = RULE_TYPES[config["type"]]
+    values = [_number(config, param, positive=True) for param in params]
+    if config["type"] == "percentile" and values[1] > 100:
+        raise ValueError(f"Rule '{name}': 'percentile' must be between 0 and 100")
+    return cls(name, config["metric"], op, _number(config, "value"), *values)
+
+def parse_sink(config):
+    """
+    Création d'une destination depuis sa configuration
+    :param config: Dictionnaire : type (voir SINK_TYPES) et ses paramètres (path pour 'log' ; url, timeout pour 'webhook')
+    :return: Destination (méthodes send et close)
+    """
+    if not isinstance(config, dict) or config.get("type") not in SINK_TYPES:
+        raise ValueError(f"Each sink must be an object with a 'type' among {', '.join(SINK_TYPES)}")
+    cls, params = SINK_TYPES[config["type"]]
+    if config["type"] == "webhook" and not isinstance(config.get("url"), str):
+        raise ValueError("Webhook sinks need an 'url'")
+    return cls(**{param: config[param] for param in params if param in config})
+
+def metric_value(sample, metric):
+    """
+    :return: Valeur de la métrique dans l'échantillon ; None si l'échantillon ne la contient pas
+    """
+    if metric in TOP_LEVEL_METRICS:
+        return sample.get(metric)
+    system = sample.get('system')
+    return system.get(metric) if system is not None else None
+
+class AlertEngine:
+    """
+    Évaluation incrémentale de règles d'alerte sur le flux d'échantillons de la collecte (coût constant par échantillon
+    et par règle) et envoi des alertes aux destinations. Une destination en échec n'interrompt pas la collecte :
+    l'erreur est comptée dans stats['sink_errors'].
+    """
+
+    def __init__(self, rules, sinks=None):
+        """
+        :param rules: Liste de Rule
+        :param sinks: Liste de destinations ; None pour la console seule
+        """
+        self.rules = rules
+        self.sinks = sinks if sinks is not None else [StdoutSink()]
+        # Règles regroupées par métrique : une seule lecture de la valeur par échantillon
+        self.by_metric = {}
+        for rule in rules:
+            self.by_metric.setdefault(rule.metric, []).append(rule)
+        self.stats = {"samples": 0, "fired": 0, "resolved": 0, "sink_errors": 0}
+
+    @classmethod
+    def from_config(cls, path):
+        """
+        Chargement des règles et des destinations depuis un fichier JSON : {"rules": [...], "sinks": [...]}
+        (voir parse_rule et parse_sink ; sans 'sinks', les alertes sont affichées dans la console)
+        :param path: Chemin du fichier de configuration
+        :return: AlertEngine
+        """
+        with open(path, encoding="utf-8") as file:
+            config = json.load(file)
+        if not isinstance(config, dict) or not isinstance(config.get("rules"), list):
+            raise ValueError(f"{path}: expected an object with a 'rules' list")
+        rules = [parse_rule(rule) for rule in config["rules"]]
+        sinks = [parse_sink(sink) for sink in config.get("sinks", [{"type": "stdout"}])]
+        return cls(rules, sinks)
+
+    def process(self, sample):
+        """
+        Évaluation des règles sur un échantillon et envoi des alertes émises
+        :param sample: Dictionnaire retourné par collector.collect_metrics
+        :return: Liste des alertes émises (dictionnaires : rule, state, timestamp, metric, value, message)
+        """
+        self.stats["samples"] += 1
+        ts = None
+        alerts = []
+        for metric, rules in self.by_metric.items():
+            value = metric_value(sample, metric)
+            if value is None:
+                continue
+            if ts is None:
+                ts = datetime.fromisoformat(sample['timestamp']).timestamp()
+            for rule in rules:
+                active, observed = rule.update(ts, value)
+                if active != rule.active:
+                    rule.active = active
+                    alerts.append(self._alert(rule, sample['timestamp'], observed))
+        for alert in alerts:
+            self.stats["fired" if alert['state'] == "firing" else "resolved"] += 1
+            for sink in self.sinks:
+                try:
+                    sink.send(alert)
+                except (OSError, http.client.HTTPException):
+                    self.stats["sink_errors"] += 1
+        return alerts
+
+    def _alert(self, rule, timestamp, observed):
+        state = "firing" if rule.active else "resolved"
+        if rule.kind == "percentile":
+            detail = f"{observed:.1f}% of the window {rule.op} {rule.threshold}"
+        else:
+            detail = f"observed {observed:.2f}"
+        return {
+            'rule': rule.name,
+            'state': state,
+            'timestamp': timestamp,
+            'metric': rule.metric,
+            'value': observed,
+            'message': f"{timestamp} {rule.name} {state}: {rule.describe()} ({detail})",
+        }
+
+    def close(self):
+        for sink in self.sinks:
+            sink.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,440 @@
+import abc
+import glob
+import os
+from datetime import datetime
+
+import numpy as np
+
+from config.config import (DB_PATH, READ_CACHE_CAPACITY, REPORT_MAX_POINTS, ROLLUP_RESOLUTIONS, SEGMENT_MAX_RECORDS,
+                           SEGMENT_PATH)
+from src import rollup, storage
+from src.cache import MetricsCache
+
+# Moteurs de stockage disponibles (option --backend de la CLI)
+BACKENDS = ("sqlite", "segment")
+
+# Enregistrement d'un segment : 16 octets, même disposition que storage.ROW_DTYPE
+SEGMENT_DTYPE = storage.ROW_DTYPE
+
+# Nom des fichiers d'un répertoire de segments
+SEGMENT_SUFFIX = ".seg"
+RETENTION_FILE = "retention"
+
+_MIN_TS = np.iinfo(np.int64).min
+_MAX_TS = np.iinfo(np.int64).max
+
+def _range_ms(since, until):
+    """
+    Bornes [début, fin[ d'une période en ms depuis EPOCH
+    """
+    start = storage.to_epoch_ms(since) if since is not None else _MIN_TS
+    end = storage.to_epoch_ms(until) if until is not None else _MAX_TS
+    return start, end
+
+def _to_arrays(rows):
+    """
+    Conversion d'un tableau SEGMENT_DTYPE trié par date en MetricsArrays
+    """
+    return storage.MetricsArrays(rows['ts'].astype('datetime64[ms]'), np.ascontiguousarray(rows['cpu']),
+                                 np.ascontiguousarray(rows['ram']))
+
+def _resolution_seconds(resolution):
+    seconds = dict(ROLLUP_RESOLUTIONS).get(resolution)
+    if seconds is None:
+        raise ValueError(f"Résolution inconnue : {resolution}")
+    return seconds
+
+
+class StorageBackend(abc.ABC):
+    """
+    Interface commune des moteurs de stockage des métriques CPU/RAM : écriture par lots, lecture d'une période,
+    derniers échantillons, agrégats et rétention. Toutes les lectures retournent des colonnes NumPy triées par date.
+    """
+
+    @abc.abstractmethod
+    def write_batch(self, rows):
+        """
+        Écriture d'un lot d'échantillons
+        :param rows: Liste de tuples retournés par storage.validate_metrics
+        :return: Nombre d'échantillons écrits
+        """
+
+    @abc.abstractmethod
+    def read_range(self, since: datetime, until: datetime = None):
+        """
+        Lecture des échantillons d'une période
+        :param since: Date de début (incluse) ; None depuis le premier échantillon
+        :param until: Date de fin (exclue) ; None jusqu'au dernier échantillon
+        :return: MetricsArrays
+        """
+
+    @abc.abstractmethod
+    def read_last(self, limit):
+        """
+        Lecture des derniers échantillons
+        :param limit: Nombre maximum d'échantillons
+        :return: MetricsArrays
+        """
+
+    @abc.abstractmethod
+    def read_rollup(self, resolution, since: datetime, until: datetime = None):
+        """
+        Lecture des agrégats d'une résolution sur une période
+        :param resolution: Nom de la résolution (voir ROLLUP_RESOLUTIONS, ex : '1m')
+        :param since: Date de début (incluse, arrondie au début de son seau)
+        :param until: Date de fin (exclue) ; None jusqu'au dernier seau
+        :return: storage.RollupArrays
+        """
+
+    @abc.abstractmethod
+    def apply_retention(self, max_age, now: datetime = None):
+        """
+        Suppression des échantillons plus anciens que 'max_age' jours
+        :param max_age: Âge maximal des données brutes (en jours)
+        :param now: Date de référence ; None pour maintenant
+        :return: Nombre d'échantillons supprimés
+        """
+
+    @abc.abstractmethod
+    def choose_resolution(self, since: datetime, until: datetime = None, max_points=REPORT_MAX_POINTS):
+        """
+        Choix de la résolution la plus fine ne dépassant pas environ 'max_points' points sur la période
+        :return: None pour les données brutes, sinon le nom de la résolution
+        """
+
+    def write(self, metrics: dict):
+        """
+        Écriture d'un seul échantillon (ex : à chaque tick de collecte)
+        :param metrics: Dictionnaire contenant les données à insérer
+        """
+        return self.write_batch([storage.validate_metrics(metrics)])
+
+    def close(self):
+        """
+        Libération des ressources du moteur
+        """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class SQLiteBackend(StorageBackend):
+    """
+    Moteur SQLite : délègue à src/storage.py (toutes les colonnes, agrégats maintenus à l'écriture).
+    Les lectures brutes passent par un cache des échantillons récents (voir src/cache.py), alimenté par les écritures
+    du moteur : les derniers échantillons et les périodes récentes sont servis sans lecture de la base.
+    """
+
+    def __init__(self, db_path=DB_PATH, host=storage.LOCAL_HOST, cache_capacity=READ_CACHE_CAPACITY, report_cache=None):
+        """
+        :param db_path: Chemin de la base de données
+        :param host: Hôte des lectures ; les écritures gardent l'hôte de chaque échantillon
+        :param cache_capacity: Nombre d'échantillons du cache de lecture ; 0 pour lire directement la base
+        :param report_cache: Cache persistant des agrégats lus (voir src/report_cache.py) ; None pour lire la base
+        """
+        self.db_path = db_path
+        self.host = host
+        self.cache_capacity = cache_capacity
+        self.report_cache = report_cache
+        # Connexion d'écriture ouverte à la première écriture : un lecteur n'en a pas besoin
+        self.writer = None
+        self.cache = None
+
+    def _cache(self):
+        if self.cache is None and self.cache_capacity:
+            self.cache = MetricsCache(self.db_path, self.cache_capacity)
+        return self.cache
+
+    def _writer(self):
+        if self.writer is None:
+            storage.init_database(self.db_path)
+            self.writer = storage.MetricsWriter(self.db_path, retention_interval=None, cache=self._cache(),
+                                                selfstats_interval=None)
+        return self.writer
+
+    def write_batch(self, rows):
+        writer = self._writer()
+        writer.extend(rows)
+        writer.flush()
+        return len(rows)
+
+    def read_range(self, since, until=None):
+        cache = self._cache()
+        if cache is None:
+            return storage.get_time_metrics_arrays(since or storage.EPOCH, until, db_path=self.db_path, host=self.host)
+        return cache.get_time_metrics_arrays(since or storage.EPOCH, until, host=self.host)
+
+    def read_last(self, limit):
+        cache = self._cache()
+        if cache is None:
+            return storage.get_last_metrics_arrays(limit, self.db_path, host=self.host)
+        return cache.get_last_metrics_arrays(limit, host=self.host)
+
+    def read_rollup(self, resolution, since, until=None):
+        if self.report_cache is not None:
+            return self.report_cache.get_rollup_arrays(resolution, since, until, db_path=self.db_path, host=self.host)
+        return storage.get_rollup_arrays(resolution, since, until, db_path=self.db_path, host=self.host)
+
+    def apply_retention(self, max_age, now=None):
+        conn = self._writer().conn
+        return storage.apply_retention(conn, now=now, max_age={"raw": max_age}, max_size=None)["raw"]
+
+    def choose_resolution(self, since, until=None, max_points=REPORT_MAX_POINTS):
+        return storage.choose_resolution(since, until, max_points, db_path=self.db_path, host=self.host)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+        if self.cache is not None:
+            self.cache.close()
+            self.cache = None
+
+
+class Segment:
+    """
+    Fichier de segment : enregistrements SEGMENT_DTYPE triés par date, ajoutés en fin de fichier uniquement
+    """
+    __slots__ = ('path', 'count', 'first_ts', 'last_ts')
+
+    def __init__(self, path, count=0, first_ts=_MAX_TS, last_ts=_MIN_TS):
+        self.path = path
+        self.count = count
+        self.first_ts = first_ts
+        self.last_ts = last_ts
+
+    def records(self):
+        """
+        Projection en mémoire des enregistrements écrits (aucune copie)
+        :return: np.memmap SEGMENT_DTYPE, ou tableau vide
+        """
+        if self.count == 0:
+            return np.empty(0, dtype=SEGMENT_DTYPE)
+        return np.memmap(self.path, dtype=SEGMENT_DTYPE, mode='r', shape=(self.count,))
+
+
+class SegmentBackend(StorageBackend):
+    """
+    Moteur à segments binaires en ajout seul, pour les écritures séquentielles et les lectures de périodes.
+    Chaque segment est trié par date : une lecture projette les fichiers en mémoire (mmap) et localise la période
+    par recherche dichotomique. Un lot plus ancien que la fin du segment courant ouvre un nouveau segment.
+    Seules les métriques CPU/RAM de la machine locale sont conservées (ni processus, ni métriques système) ;
+    les agrégats sont calculés à la lecture. Un seul écrivain par répertoire.
+    """
+
+    def __init__(self, path=SEGMENT_PATH, max_records=SEGMENT_MAX_RECORDS):
+        """
+        :param path: Répertoire des segments (créé au besoin)
+        :param max_records: Nombre d'enregistrements par segment avant ouverture du suivant
+        """
+        self.path = path
+        self.max_records = max_records
+        os.makedirs(path, exist_ok=True)
+
+        self.floor = self._read_floor()
+        self.segments = [self._open_segment(name) for name in sorted(glob.glob(os.path.join(path, "*" + SEGMENT_SUFFIX)))]
+        self.active = None
+
+    def _read_floor(self):
+        """
+        Date minimale conservée par la rétention (en ms depuis EPOCH)
+        """
+        try:
+            with open(os.path.join(self.path, RETENTION_FILE)) as file:
+                return int(file.read())
+        except FileNotFoundError:
+            return _MIN_TS
+
+    def _write_floor(self):
+        temp = os.path.join(self.path, RETENTION_FILE + ".tmp")
+        with open(temp, "w") as file:
+            file.write(str(self.floor))
+        os.replace(temp, os.path.join(self.path, RETENTION_FILE))
+
+    @staticmethod
+    def _open_segment(path):
+        """
+        Index d'un segment existant ; un enregistrement incomplet (écriture interrompue) est tronqué
+        """
+        size = os.path.getsize(path)
+        count = size // SEGMENT_DTYPE.itemsize
+        if size != count * SEGMENT_DTYPE.itemsize:
+            os.truncate(path, count * SEGMENT_DTYPE.itemsize)
+        segment = Segment(path, count)
+        if count:
+            records = segment.records()
+            segment.first_ts, segment.last_ts = int(records['ts'][0]), int(records['ts'][-1])
+        return segment
+
+    def _rotate(self):
+        """
+        Ouverture d'un nouveau segment en écriture
+        """
+        if self.active is not None:
+            self.active.close()
+        number = int(os.path.basename(self.segments[-1].path)[:-len(SEGMENT_SUFFIX)]) + 1 if self.segments else 0
+        segment = Segment(os.path.join(self.path, f"{number:010d}{SEGMENT_SUFFIX}"))
+        self.segments.append(segment)
+        self.active = open(segment.path, "ab")
+
+    def write_batch(self, rows):
+        records = np.array([(ts, cpu, ram) for ts, cpu, ram, *_ in rows], dtype=SEGMENT_DTYPE)
+        records = records[np.argsort(records['ts'], kind='stable')]
+        written = len(records)
+        while len(records):
+            segment = self.segments[-1] if self.segments else None
+            if segment is None or segment.count >= self.max_records or records['ts'][0] < segment.last_ts:
+                self._rotate()
+                segment = self.segments[-1]
+            elif self.active is None:
+                # Reprise du dernier segment (après réouverture du répertoire)
+                self.active = open(segment.path, "ab")
+            chunk = records[:self.max_records - segment.count]
+            self.active.write(chunk.tobytes())
+            segment.count += len(chunk)
+            segment.first_ts = min(segment.first_ts, int(chunk['ts'][0]))
+            segment.last_ts = int(chunk['ts'][-1])
+            records = records[len(chunk):]
+        if self.active is not None:
+            # Lisible par les projections mmap dès le retour
+            self.active.flush()
+        return written
+
+    def _overlapping(self):
+        """
+        Indique si des segments se chevauchent (lots écrits dans le désordre)
+        """
+        previous = _MIN_TS
+        for segment in self.segments:
+            if segment.count == 0:
+                continue
+            if segment.first_ts < previous:
+                return True
+            previous = segment.last_ts
+        return False
+
+    @staticmethod
+    def _merge(parts):
+        """
+        Concaténation de morceaux triés, puis tri stable par date si des morceaux se chevauchent
+        """
+        if not parts:
+            return np.empty(0, dtype=SEGMENT_DTYPE)
+        rows = np.concatenate(parts)
+        if len(parts) > 1 and np.any(rows['ts'][1:] < rows['ts'][:-1]):
+            rows = rows[np.argsort(rows['ts'], kind='stable')]
+        return rows
+
+    def _range_rows(self, start, end):
+        start = max(start, self.floor)
+        parts = []
+        for segment in self.segments:
+            if segment.count == 0 or segment.last_ts < start or segment.first_ts >= end:
+                continue
+            records = segment.records()
+            lo, hi = np.searchsorted(records['ts'], [start, end], side='left')
+            if hi > lo:
+                parts.append(np.array(records[lo:hi]))
+        return self._merge(parts)
+
+    def read_range(self, since, until=None):
+        return _to_arrays(self._range_rows(*_range_ms(since, until)))
+
+    def read_last(self, limit):
+        parts = []
+        collected = 0
+        ordered = not self._overlapping()
+        for segment in reversed(self.segments):
+            if segment.count == 0 or segment.last_ts < self.floor:
+                continue
+            records = segment.records()
+            lo = max(int(np.searchsorted(records['ts'], self.floor, side='left')), segment.count - limit)
+            parts.append(np.array(records[lo:]))
+            collected += segment.count - lo
+            # Segments ordonnés : les plus récents suffisent
+            if ordered and collected >= limit:
+                break
+        rows = self._merge(parts[::-1])
+        return _to_arrays(rows[max(0, len(rows) - limit):])
+
+    def read_rollup(self, resolution, since, until=None):
+        resolution_ms = _resolution_seconds(resolution) * 1000
+        start, end = _range_ms(since, until)
+        start = start // resolution_ms * resolution_ms
+        # Seaux complets, comme les agrégats SQLite : la fin est arrondie au seau suivant
+        stop = -(-end // resolution_ms) * resolution_ms if until is not None else _MAX_TS
+        rows = self._range_rows(start, stop).astype(rollup.RAW_DTYPE)
+        # Mêmes agrégats que ceux tenus à jour par SQLite (p95 approché au-dessus de la résolution la plus fine)
+        buckets = rollup.aggregate_levels(rows)[resolution].astype(storage.ROLLUP_DTYPE)
+        buckets = buckets[buckets['bucket'] < end]
+        return storage.RollupArrays(buckets['bucket'].astype('datetime64[ms]'), np.ascontiguousarray(buckets['count']),
+                                    *(np.ascontiguousarray(buckets[column]) for column in rollup.COLUMNS[2:]))
+
+    def apply_retention(self, max_age, now=None):
+        cutoff = storage.to_epoch_ms(now or datetime.now()) - int(max_age * 86_400_000)
+        if cutoff <= self.floor:
+            return 0
+        deleted = 0
+        for segment in self.segments:
+            if segment.count and segment.first_ts < cutoff:
+                timestamps = segment.records()['ts']
+                deleted += int(np.searchsorted(timestamps, cutoff, side='left')
+                               - np.searchsorted(timestamps, self.floor, side='left'))
+        # La date minimale masque les lignes expirées avant la suppression des fichiers entièrement expirés
+        self.floor = cutoff
+        self._write_floor()
+
+        kept = []
+        for segment in self.segments:
+            if segment.count and segment.last_ts < cutoff:
+                if segment is self.segments[-1] and self.active is not None:
+                    self.active.close()
+                    self.active = None
+                os.remove(segment.path)
+            else:
+                kept.append(segment)
+        self.segments = kept
+        return deleted
+
+    def choose_resolution(self, since, until=None, max_points=REPORT_MAX_POINTS):
+        start, end = _range_ms(since, until)
+        start = max(start, self.floor)
+        budget = 2 * max_points
+        # Comptage exact des lignes par recherche dichotomique dans chaque segment
+        count = 0
+        for segment in self.segments:
+            if segment.count and segment.last_ts >= start and segment.first_ts < end:
+                count += int(np.diff(np.searchsorted(segment.records()['ts'], [start, end], side='left'))[0])
+        if count <= budget:
+            return None
+        last = max((segment.last_ts for segment in self.segments if segment.count), default=start)
+        span = min(end, last + 1) - start
+        for name, seconds in ROLLUP_RESOLUTIONS:
+            if span / (seconds * 1000) <= budget:
+                return name
+        return ROLLUP_RESOLUTIONS[-1][0]
+
+    def close(self):
+        if self.active is not None:
+            self.active.close()
+            self.active = None
+
+
+def open_backend(name, host=storage.LOCAL_HOST, report_cache=None):
+    """
+    Ouverture d'un moteur de stockage à son emplacement par défaut
+    :param name: Nom du moteur (voir BACKENDS)
+    :param host: Hôte des lectures (moteur SQLite uniquement)
+    :param report_cache: Cache persistant des agrégats (moteur SQLite uniquement, voir src/report_cache.py)
+    :return: StorageBackend
+    """
+    if name == "sqlite":
+        return SQLiteBackend(DB_PATH, host, report_cache=report_cache)
+    if name == "segment":
+        if host != storage.LOCAL_HOST:
+            raise ValueError("The segment backend only stores metrics of the local machine")
+        return SegmentBackend(SEGMENT_PATH)
+    raise ValueError(f"Moteur de stockage inconnu : {name}")
@@ -0,0 +1,324 @@
+import functools
+import threading
+from datetime import datetime
+
+import numpy as np
+
+from config.config import DB_PATH, READ_CACHE_CAPACITY
+from src import compression, processes, storage
+from src.ringbuffer import RingBuffer
+
+# Échantillon conservé en mémoire : mêmes valeurs que celles relues depuis la base
+CACHE_DTYPE = np.dtype([('id', '<i8'), ('ts', '<i8'), ('cpu', '<f8'), ('ram', '<f8'), ('host', 'O'),
+                        ('processes', 'O')])
+
+INT64_MIN = np.iinfo(np.int64).min
+INT64_MAX = np.iinfo(np.int64).max
+
+def _locked(method):
+    """
+    Exécution d'une méthode du cache sous son verrou : l'écrivain et les lecteurs peuvent être dans des fils différents
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self.lock:
+            return method(self, *args, **kwargs)
+    return wrapper
+
+class MetricsCache:
+    """
+    Cache de lecture des échantillons récents, devant les lectures de storage.
+    Le cache contient toujours les dernières lignes de la table 'metrics' (identifiants consécutifs jusqu'au plus
+    récent) ; il est alimenté par MetricsWriter ou insert_metrics après chaque écriture validée.
+
+    Les lectures sont servies depuis la mémoire quand le cache couvre la demande ; sinon seule la partie la plus
+    ancienne est lue dans SQLite. Les écritures d'autres connexions (autre processus, rétention) sont détectées
+    par 'PRAGMA data_version' : le cache est alors revérifié, et vidé s'il ne correspond plus à la base.
+
+    Les lectures d'un hôte suivent storage : derniers échantillons de l'hôte par date, période filtrée sur l'hôte.
+    Le cache peut être partagé entre fils (ex : fil d'écriture et requêtes du serveur d'ingestion).
+    """
+
+    def __init__(self, db_path=DB_PATH, capacity=READ_CACHE_CAPACITY):
+        """
+        :param db_path: Chemin de la base de données
+        :param capacity: Nombre maximal d'échantillons conservés en mémoire
+        """
+        self.buffer = RingBuffer(capacity, CACHE_DTYPE)
+        self.stats = {"hits": 0, "misses": 0}
+        self.lock = threading.RLock()
+        # Connexion utilisée sous le verrou, depuis le fil de l'écrivain comme depuis ceux des lecteurs
+        self.conn = storage.connect(db_path, check_same_thread=False)
+        self.reset()
+
+    @_locked
+    def reset(self):
+        """
+        Vidage du cache, qui reprend à partir de la dernière ligne actuellement en base
+        """
+        # data_version est lu avant la base : une écriture intermédiaire sera détectée à la lecture suivante
+        self.data_version = self.conn.execute("PRAGMA data_version").fetchone()[0]
+        last_id, last_ts = self.conn.execute("SELECT MAX(id), MAX(ts) FROM metrics").fetchone()
+        # Échantillons archivés : lus dans la base, jamais dans le cache (voir src/compression.py)
+        archived_ts = self.conn.execute("SELECT MAX(last_ts) FROM metrics_blocks").fetchone()[0]
+        if archived_ts is not None:
+            last_ts = archived_ts if last_ts is None else max(last_ts, archived_ts)
+        self.buffer.clear()
+        self.last_id = last_id or 0
+        # Toutes les lignes de date >= 'covered_since' sont dans le cache
+        self.covered_since = INT64_MIN if last_ts is None else last_ts + 1
+
+    def _evict(self, timestamps):
+        """
+        Prise en compte d'échantillons sortis du cache mais peut-être encore en base
+        :param timestamps: Dates (en ms) des échantillons sortis
+        """
+        if len(timestamps):
+            self.covered_since = max(self.covered_since, int(timestamps.max()) + 1)
+
+    @_locked
+    def add(self, metric_ids, rows):
+        """
+        Ajout d'échantillons qui viennent d'être écrits (transaction validée)
+        :param metric_ids: Identifiants des échantillons dans la table 'metrics'
+        :param rows: Tuples retournés par storage.validate_metrics
+        """
+        if not len(rows):
+            return
+        if metric_ids[0] != self.last_id + 1:
+            # Lignes écrites entre-temps par une autre connexion : le cache ne serait plus contigu
+            self.reset()
+            return
+
+        entries = np.array([
+            (metric_id, row[0], float(row[1]), float(row[2]), row[3], processes.dump_json(row[4]))
+            for metric_id, row in zip(metric_ids, rows)
+        ], dtype=CACHE_DTYPE)
+        overflow = len(self.buffer) + len(entries) - self.buffer.capacity
+        if overflow > 0:
+            # Plus anciens échantillons du cache, suivis des nouveaux si le lot dépasse la capacité
+            ordered = np.concatenate((self.buffer.first(overflow)['ts'], entries['ts']))
+            self._evict(ordered[:overflow])
+        self.buffer.extend(entries)
+        self.last_id = metric_ids[-1]
+
+    def _validate(self):
+        """
+        Vérification du cache après une écriture d'une autre connexion ; sans écriture, aucune requête
+        """
+        version = self.conn.execute("PRAGMA data_version").fetchone()[0]
+        if version == self.data_version:
+            return
+        self.data_version = version
+
+        last_id = self.conn.execute("SELECT MAX(id) FROM metrics").fetchone()[0] or 0
+        if last_id != self.last_id:
+            self.reset()
+            return
+        if not len(self.buffer):
+            return
+
+        # Suppressions (rétention) : seules les plus anciennes lignes du cache peuvent avoir disparu
+        entries = self.buffer.values()
+        first_id, count = self.conn.execute(
+            "SELECT MIN(id), COUNT(*) FROM metrics WHERE id >= ?", (int(entries['id'][0]),)
+        ).fetchone()
+        if count == len(entries):
+            return
+        kept = entries['id'] >= (first_id or INT64_MAX)
+        if np.count_nonzero(kept) != count:
+            self.reset()
+            return
+        self._evict(entries['ts'][~kept])
+        self.buffer.clear()
+        self.buffer.extend(entries[kept])
+
+    def _count(self, hit):
+        self.stats["hits" if hit else "misses"] += 1
+
+    def _covered(self, start, end, host=None):
+        """
+        Échantillons du cache d'une période, limitée à la partie entièrement couverte par le cache
+        :return: Tableau CACHE_DTYPE, dans l'ordre de l'index (ts, cpu, ram) utilisé par les requêtes sur une période
+        """
+        # Sélection sur place avant copie : seuls les échantillons retenus sont copiés
+        stored = self.buffer.view()
+        selected = (stored['ts'] >= max(start, self.covered_since)) & (stored['ts'] < end)
+        if host is not None:
+            selected &= stored['host'] == host
+        cached = stored[selected]
+        return cached[np.lexsort((cached['id'], cached['ram'], cached['cpu'], cached['ts']))]
+
+    def _last_entries(self, limit, host=None, columns=False):
+        """
+        Derniers échantillons, en complétant le cache par les lignes plus anciennes de la base
+        :param limit: Nombre d'échantillons
+        :param host: Hôte des échantillons (les plus récents par date) ; None pour les derniers ajoutés, tous hôtes confondus
+        :param columns: Lecture des seules colonnes ts, cpu, ram (voir _fetch)
+        :return: Tableau CACHE_DTYPE (storage.ROW_DTYPE si 'columns'), du plus ancien au plus récent
+        """
+        self._validate()
+        if host is None:
+            cached = len(self.buffer)
+            self._count(limit <= cached)
+            if limit <= cached:
+                return self._rows(self.buffer.last(limit), columns)
+            # Identifiants consécutifs jusqu'à 'last_id' : le plus ancien du cache s'en déduit
+            first_id = self.last_id - cached + 1
+            older = self._fetch("id < ? ORDER BY id DESC LIMIT ?", (first_id, limit - cached), columns)[::-1]
+            return np.concatenate((older, self._rows(self.buffer.values(), columns)))
+
+        # Seuls les échantillons de la partie couverte sont sûrement les plus récents de l'hôte
+        cached = self._covered(self.covered_since, INT64_MAX, host)
+        self._count(limit <= len(cached))
+        if limit <= len(cached):
+            return self._rows(cached[len(cached) - limit:], columns)
+        older = self._fetch("host = ? AND ts < ? ORDER BY ts DESC LIMIT ?",
+                            (host, self.covered_since, limit - len(cached)), columns)[::-1]
+        return np.concatenate((older, self._rows(cached, columns)))
+
+    def _range_entries(self, start, end, host=None, columns=False):
+        """
+        Échantillons d'une période, en complétant le cache par les lignes plus anciennes de la base
+        :param start: Début de la période (en ms, inclus)
+        :param end: Fin de la période (en ms, exclue)
+        :param host: Hôte des échantillons ; None pour tous les hôtes
+        :param columns: Lecture des seules colonnes ts, cpu, ram (voir _fetch)
+        :return: Tableau CACHE_DTYPE (storage.ROW_DTYPE si 'columns'), trié par date
+        """
+        self._validate()
+        cached = self._rows(self._covered(start, end, host), columns)
+        self._count(start >= self.covered_since)
+        if start >= self.covered_since:
+            return cached
+        condition = "ts >= ? AND ts < ? ORDER BY ts ASC"
+        params = (start, min(end, self.covered_since))
+        if host is not None:
+            condition, params = f"host = ? AND {condition}", (host, *params)
+        # Partie ancienne : lignes de la base et échantillons archivés de la même période
+        older = self._fetch(condition, params, columns, archived=(start, min(end, self.covered_since), host))
+        return np.concatenate((older, cached))
+
+    def _fetch(self, condition, params, columns=False, archived=None):
+        """
+        Lecture de lignes dans la base, au format du cache
+        :param condition: Clause WHERE (et ORDER BY / LIMIT) de la requête
+        :param params: Paramètres de la requête
+        :param columns: Lecture des seules colonnes ts, cpu, ram, sans les processus : une longue période est
+                        alors lue aussi vite que par storage.get_time_metrics_arrays
+        :param archived: Période (début, fin, hôte) dont les échantillons archivés sont ajoutés, comme dans
+                         storage.get_time_metrics_arrays (voir src/compression.py) ; None pour aucun
+        :return: Tableau CACHE_DTYPE, ou storage.ROW_DTYPE si 'columns'
+        """
+        blocks = None
+        with storage.read_snapshot(self.conn):
+            if columns:
+                rows = np.fromiter(self.conn.execute(f"SELECT ts, cpu, ram FROM metrics WHERE {condition}", params),
+                                   dtype=storage.ROW_DTYPE)
+            else:
+                rows = self.conn.execute(f"SELECT id, ts, cpu, ram, host FROM metrics WHERE {condition}", params).fetchall()
+                process_json = processes.load_json(self.conn, f"SELECT id FROM metrics WHERE {condition}", params)
+            if archived is not None:
+                blocks = compression.read(self.conn, *archived)
+        if not columns:
+            rows = np.array([(*row, process_json.get(row[0], "[]")) for row in rows], dtype=CACHE_DTYPE)
+        if blocks is None or not len(blocks):
+            return rows
+        # Échantillons archivés (sans identifiant ni processus) en premier à date égale ; tri stable
+        merged = np.zeros(len(blocks), dtype=rows.dtype)
+        for field in ('ts', 'cpu', 'ram'):
+            merged[field] = blocks[field]
+        if not columns:
+            merged['host'] = archived[2]
+            merged['processes'] = "[]"
+        merged = np.concatenate((merged, rows))
+        return merged[np.argsort(merged['ts'], kind='stable')]
+
+    @staticmethod
+    def _rows(entries, columns):
+        """
+        Conversion d'échantillons du cache au format de _fetch
+        """
+        if not columns:
+            return entries
+        rows = np.empty(len(entries), dtype=storage.ROW_DTYPE)
+        for field in storage.ROW_DTYPE.names:
+            rows[field] = entries[field]
+        return rows
+
+    @staticmethod
+    def _lists(entries):
+        """
+        Conversion au format de storage.get_last_metrics
+        """
+        if not len(entries):
+            return [], [], [], []
+        return (
+            [storage.from_epoch_ms(ts) for ts in entries['ts'].tolist()],
+            entries['cpu'].tolist(),
+            entries['ram'].tolist(),
+            list(entries['processes'])
+        )
+
+    @staticmethod
+    def _arrays(rows):
+        """
+        Conversion au format de storage.get_last_metrics_arrays
+        :param rows: Tableau storage.ROW_DTYPE
+        """
+        return storage.MetricsArrays(
+            rows['ts'].astype('datetime64[ms]'),
+            np.ascontiguousarray(rows['cpu']),
+            np.ascontiguousarray(rows['ram'])
+        )
+
+    @_locked
+    def get_last_metrics(self, limit=5):
+        """
+        Équivalent de storage.get_last_metrics
+        :param limit: Nombre de ligne à récupérer
+        :return: Quadruplets de listes avec timestamps, cpu, ram, et top_processes
+        """
+        return self._lists(self._last_entries(limit)[::-1])
+
+    @_locked
+    def get_last_time_metrics(self, since: datetime):
+        """
+        Équivalent de storage.get_last_time_metrics
+        :param since: Date de début de récupération
+        :return: Quadruplets de listes avec timestamps, cpu, ram, et top_processes
+        """
+        if since is None:
+            raise ValueError("Le paramètre 'since' ne peut pas être None")
+        return self._lists(self._range_entries(storage.to_epoch_ms(since), INT64_MAX))
+
+    @_locked
+    def get_last_metrics_arrays(self, limit=5, host=None):
+        """
+        Équivalent de storage.get_last_metrics_arrays
+        :param limit: Nombre de ligne à récupérer
+        :param host: Hôte des lignes (les plus récentes par date) ; None pour les dernières lignes ajoutées, tous hôtes confondus
+        :return: MetricsArrays, de la plus ancienne à la plus récente des lignes récupérées
+        """
+        return self._arrays(self._last_entries(limit, host, columns=True))
+
+    @_locked
+    def get_time_metrics_arrays(self, since: datetime, until: datetime = None, host=None):
+        """
+        Équivalent de storage.get_time_metrics_arrays
+        :param since: Date de début de récupération (incluse)
+        :param until: Date de fin de récupération (exclue) ; None pour aller jusqu'à la dernière ligne
+        :param host: Hôte des lignes ; None pour tous les hôtes
+        :return: MetricsArrays
+        """
+        if since is None:
+            raise ValueError("Le paramètre 'since' ne peut pas être None")
+        end = storage.to_epoch_ms(until) if until is not None else INT64_MAX
+        return self._arrays(self._range_entries(storage.to_epoch_ms(since), end, host, columns=True))
+
+    @_locked
+    def close(self):
+        """
+        Fermeture de la connexion de vérification
+        """
+        self.conn.close()
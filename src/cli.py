@@ -1,62 +1,372 @@
-import argparse
-import time
-from datetime import datetime, timedelta
-
-from src import collector, storage, report
-
-def collect_command(args):
-    """
-    Commande de collecte de données sur une période donnée
-    :param args: interval : Temps en seconde entre 2 récupération de données ; duration : Durée de récupération des données
-    """
-    print(f"Collecting metrics every {args.interval}s for {args.duration}s...")
-    # storage.delete_database()
-    storage.init_database()
-    start_time = time.time()
-    while time.time() - start_time < args.duration:
-        data = collector.collect_metrics()
-        storage.insert_metrics(data)
-        print(f"[{data['timestamp']}] CPU: {data['cpu']}% | RAM: {data['ram']}%")
-        time.sleep(args.interval)
-
-def parse_time_filter(args):
-    """
-    Filtre des valeurs de manière temporelle
-    :param args: since : Date de début des données à afficher ; last : Pour afficher la dernière heure ou jour d'enregistrement
-    :return: Date de début des données à afficher
-    """
-    if args.since:
-        return datetime.fromisoformat(args.since)
-    elif args.last == "hour":
-        return datetime.now() - timedelta(hours=1)
-    elif args.last == "day":
-        return datetime.now() - timedelta(days=1)
-    return None
-
-def main():
-    parser = argparse.ArgumentParser(description="System Monitor CLI")
-    subparsers = parser.add_subparsers(dest='command')
-
-    # Commande : collect
-    collect_parser = subparsers.add_parser("collect", help="Collect system metrics")
-    collect_parser.add_argument("--interval", type=int, default=5, help="Interval between collections (in seconds)")
-    collect_parser.add_argument("--duration", type=int, default=60, help="Total duration of the collection (in seconds)")
-    collect_parser.set_defaults(func=collect_command)
-
-    # Commande : report
-    report_parser = subparsers.add_parser("report", help="Generate performance report")
-    report_parser.add_argument("--limit", type=int, default=100, help="Number of data points to include")
-    report_parser.add_argument("--since", type=str, help="Start datetime (ISO format: YYYY-MM-DDTHH:MM)")
-    report_parser.add_argument("--last", choices=["hour", "day"], help="Use a pre-defined time filter")
-    report_parser.add_argument("--save", action="store_true", help="Save report as PNG instead of showing it")
-    report_parser.set_defaults(func=lambda args: report.generate_plot(limit=args.limit, since=parse_time_filter(args), save=args.save))
-
-    # Parse & exécute
-    args = parser.parse_args()
-    if hasattr(args, 'func'):
-        args.func(args)
-    else:
-        parser.print_help()
-
-if __name__ == "__main__":
-    main()
\ No newline at end of file
+import argparse
+import time
+from datetime import datetime, timedelta
+
+from config.config import ALERTS_PATH, ENGINE_PROBE_TIMEOUT, EXPORT_CHUNK_SIZE, INGEST_BIND, INGEST_PORT, AGENT_BATCH_SIZE, STATS_WINDOW, STATS_THRESHOLD, ARCHIVE_MIN_AGE
+from src import backends, collector, export, instrument, storage, report, tracker
+from src.agent import Agent
+from src.alerts import AlertEngine
+from src.dashboard import Dashboard
+from src.engine import CollectionEngine, default_probes
+from src.ingest import IngestServer
+from src.report_cache import ReportCache
+from src.scheduler import Scheduler
+
+def run_collection(args, handle):
+    """
+    Boucle de collecte cadencée, commune aux commandes collect et agent
+    :param args: interval, duration : Cadence et durée de la collecte ; pids, cgroup, container : Processus suivis ;
+                 track : Suivi détaillé de ces processus (voir src/tracker.py) ; parallel : Sondes coûteuses exécutées
+                 en parallèle (voir src/engine.py) ; process_interval : Délai entre deux parcours des processus
+    :param handle: Fonction appelée avec chaque échantillon
+    """
+    cgroup = args.cgroup
+    if args.container:
+        cgroup = tracker.find_container_cgroup(args.container)
+    engine = None
+    if args.parallel:
+        # Une sonde ne peut pas retenir le tick au-delà de la moitié de l'intervalle
+        timeout = min(ENGINE_PROBE_TIMEOUT, args.interval / 2)
+        engine = CollectionEngine(default_probes(pids=args.pids, cgroup=cgroup, track=args.track,
+                                                 process_interval=args.process_interval, timeout=timeout))
+        collect = engine.collect
+    else:
+        # Amorçage des mesures CPU : les ticks suivants mesurent l'utilisation depuis le tick précédent
+        collector.get_cpu_usage(interval=None)
+        sampler = collector.ProcessSampler(pids=args.pids, cgroup=cgroup)
+        sampler.sample(0)
+        system_sampler = collector.SystemSampler()
+        system_sampler.sample()
+        process_tracker = None
+        if args.track:
+            process_tracker = tracker.ProcessTracker(pids=args.pids, cgroup=cgroup)
+            process_tracker.sample()
+
+        def collect():
+            return collector.collect_metrics(cpu_interval=None, sampler=sampler, system_sampler=system_sampler,
+                                             tracker=process_tracker)
+    scheduler = Scheduler(args.interval)
+
+    missed = 0
+    try:
+        for lateness in scheduler.ticks(args.duration):
+            data = collect()
+            handle(data)
+            tracked = f" | Tracked: {len(data['tracked'])}" if args.track else ""
+            print(f"[{data['timestamp']}] CPU: {data['cpu']}% | RAM: {data['ram']}%{tracked}")
+            if scheduler.missed_count > missed:
+                print(f"[!] {scheduler.missed_count - missed} tick(s) missed (tick {lateness * 1000:.1f}ms late)")
+                missed = scheduler.missed_count
+    finally:
+        if engine is not None:
+            engine.close()
+
+    stats = scheduler.stats()
+    print(f"Ticks: {stats['ticks']} | Late: {stats['late']} | Missed: {stats['missed']} | "
+          f"Jitter mean/p95/max: {stats['jitter_mean'] * 1000:.2f}/{stats['jitter_p95'] * 1000:.2f}/{stats['jitter_max'] * 1000:.2f}ms")
+    if engine is not None:
+        for name, probe_stats in engine.stats.items():
+            print(f"Probe {name}: {probe_stats['runs']} runs | {probe_stats['timeouts']} timeouts | "
+                  f"{probe_stats['busy']} busy | {probe_stats['errors']} errors | {probe_stats['restarts']} restarts")
+
+def collect_command(args):
+    """
+    Commande de collecte de données sur une période donnée
+    :param args: interval : Temps en seconde entre 2 récupération de données ; duration : Durée de récupération des données ; backend : Moteur de stockage (voir src/backends.py) ;
+                 alerts : Fichier des règles d'alerte évaluées sur chaque échantillon (voir src/alerts.py), ou None
+    """
+    if args.track and args.backend != "sqlite":
+        print("[!] --track requires the sqlite backend (segments only store CPU and RAM)")
+        return
+    engine = AlertEngine.from_config(args.alerts) if args.alerts else None
+
+    def with_alerts(write):
+        if engine is None:
+            return write
+
+        def handle(data):
+            write(data)
+            engine.process(data)
+        return handle
+
+    print(f"Collecting metrics every {args.interval}s for {args.duration}s...")
+    try:
+        if args.backend != "sqlite":
+            # Une écriture par tick : le moteur à segments n'ajoute que 16 octets en fin de fichier
+            with backends.open_backend(args.backend) as backend:
+                run_collection(args, with_alerts(backend.write))
+            return
+
+        # storage.delete_database()
+        storage.init_database()
+
+        # L'écrivain vide son tampon en sortie de bloc, y compris sur Ctrl+C
+        with storage.MetricsWriter() as writer:
+            run_collection(args, with_alerts(writer.write))
+    finally:
+        if engine is not None:
+            engine.close()
+            print(f"Alerts fired: {engine.stats['fired']} | Resolved: {engine.stats['resolved']} | "
+                  f"Sink errors: {engine.stats['sink_errors']}")
+
+def agent_command(args):
+    """
+    Commande de collecte envoyée au serveur d'ingestion au lieu de la base locale
+    :param args: server : Adresse du serveur ; host : Nom de l'hôte ; batch_size : Échantillons par envoi ; voir run_collection
+    """
+    agent = Agent(args.server, host=args.host, batch_size=args.batch_size)
+    print(f"Sending metrics of '{agent.host}' to {args.server} every {args.interval}s for {args.duration}s...")
+    try:
+        run_collection(args, agent.add)
+    finally:
+        # Dernière tentative pour le lot incomplet, y compris sur Ctrl+C
+        agent.send(force=True)
+        agent.close()
+    print(f"Sent: {agent.stats['sent']} | Pending: {len(agent.buffer)} | Dropped: {agent.stats['dropped']} | "
+          f"Rejected: {agent.stats['rejected']} | Retries: {agent.stats['retries']}")
+
+def serve_command(args):
+    """
+    Commande de démarrage du serveur d'ingestion, jusqu'à Ctrl+C
+    :param args: bind, port : Adresse d'écoute
+    """
+    server = IngestServer((args.bind, args.port))
+    server.start()
+    print(f"Ingest server listening on {server.address[0]}:{server.address[1]} (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+    print(f"Accepted: {server.stats['accepted']} | Written: {server.stats['written']} | "
+          f"Throttled: {server.stats['throttled']} | Rejected: {server.stats['rejected']} | Failed: {server.stats['failed']}")
+
+def top_command(args):
+    """
+    Commande d'affichage en direct des métriques dans le terminal
+    :param args: interval, duration : Cadence et durée ; history : Ticks affichés ; process_every : Ticks entre deux
+                 échantillonnages des processus ; record : Enregistrer aussi les échantillons ; pids, cgroup : Processus suivis
+    """
+    collector.get_cpu_usage(interval=None)
+    sampler = collector.ProcessSampler(pids=args.pids, cgroup=args.cgroup)
+    sampler.sample(0)
+    system_sampler = collector.SystemSampler()
+    system_sampler.sample()
+    scheduler = Scheduler(args.interval)
+    dashboard = Dashboard(history=args.history)
+
+    writer = None
+    if args.record:
+        storage.init_database()
+        # Les sparklines prolongent l'enregistrement précédent ; les ticks suivants sont lus en mémoire par la vue
+        dashboard.preload(storage.get_last_metrics_arrays(args.history, host=storage.LOCAL_HOST))
+        writer = storage.MetricsWriter()
+    processes = []
+    try:
+        for tick, _ in enumerate(scheduler.ticks(args.duration)):
+            # Le parcours des processus est le poste le plus coûteux : il n'est pas refait à chaque tick
+            sampled = tick % args.process_every == 0
+            if sampled:
+                processes = sampler.sample()
+            data = collector.collect_metrics(cpu_interval=None, system_sampler=system_sampler, top_processes=processes)
+            dashboard.update(data)
+            dashboard.draw()
+            if writer is not None:
+                # Le tableau de bord garde la dernière liste affichée, mais seuls les ticks échantillonnés l'enregistrent
+                writer.write(data if sampled else {**data, 'top_processes': []})
+    except KeyboardInterrupt:
+        pass
+    finally:
+        dashboard.close()
+        if writer is not None:
+            writer.close()
+
+def parse_time_filter(args):
+    """
+    Filtre des valeurs de manière temporelle
+    :param args: since : Date de début des données à afficher ; last : Pour afficher la dernière heure ou jour d'enregistrement
+    :return: Date de début des données à afficher
+    """
+    if args.since:
+        return datetime.fromisoformat(args.since)
+    elif args.last == "hour":
+        return datetime.now() - timedelta(hours=1)
+    elif args.last == "day":
+        return datetime.now() - timedelta(days=1)
+    return None
+
+def report_command(args):
+    """
+    Commande de génération d'un rapport graphique
+    :param args: limit : Nombre de points sans période ; since/last : Période ; save : Enregistrement ; host : Hôte ;
+                 backend : Moteur de stockage ; no_cache : Désactivation du cache des agrégats (voir src/report_cache.py)
+    """
+    cache = ReportCache() if args.backend == "sqlite" and not args.no_cache else None
+    try:
+        with backends.open_backend(args.backend, args.host, report_cache=cache) as backend:
+            report.generate_plot(limit=args.limit, since=parse_time_filter(args), save=args.save, host=args.host,
+                                 backend=backend)
+    finally:
+        if cache is not None:
+            cache.close()
+
+def stats_command(args):
+    """
+    Commande de calcul des statistiques d'une période
+    :param args: since/last/until : Période ; host : Hôte ; window : Fenêtre glissante ; method/threshold : Anomalies ; format : Sortie
+    """
+    since = parse_time_filter(args) or datetime.now() - timedelta(hours=1)
+    until = datetime.fromisoformat(args.until) if args.until else None
+    with backends.open_backend(args.backend, args.host) as backend:
+        stats = report.compute_stats(since, until, host=args.host, window=args.window, method=args.method,
+                                     threshold=args.threshold, backend=backend)
+    print(report.format_stats(stats, args.format))
+
+def selfstats_command(args):
+    """
+    Commande d'affichage des mesures internes du moniteur (latence par étape, dérive des ticks, CPU et mémoire)
+    :param args: since/last/until : Période
+    """
+    until = datetime.fromisoformat(args.until) if args.until else None
+    print(instrument.format_selfstats(storage.get_selfstats(parse_time_filter(args), until)))
+
+def export_command(args):
+    """
+    Commande d'export en flux des métriques d'une période
+    :param args: format : Format de sortie ; output : Fichier de sortie ; since/last/until : Période ; chunk_size : Taille des blocs
+    """
+    until = datetime.fromisoformat(args.until) if args.until else None
+    count = export.export_metrics(args.output, args.format, parse_time_filter(args), until, args.chunk_size, host=args.host)
+    if args.output != "-":
+        print(f"[✓] {count} rows exported to {args.output}")
+
+def archive_command(args):
+    """
+    Commande de compression des données brutes anciennes (voir src/compression.py)
+    :param args: older_than : Âge minimal (en jours) des données archivées
+    """
+    archived, blocks = storage.archive_metrics(args.older_than)
+    print(f"[✓] {archived} samples archived in {blocks} blocks")
+
+def main():
+    parser = argparse.ArgumentParser(description="System Monitor CLI")
+    parser.add_argument("--no-instrument", action="store_true", help="Disable the monitor's own timing hooks")
+    subparsers = parser.add_subparsers(dest='command')
+
+    # Commande : collect
+    collect_parser = subparsers.add_parser("collect", help="Collect system metrics")
+    collect_parser.add_argument("--interval", type=float, default=5, help="Interval between collections (in seconds, e.g. 0.1)")
+    collect_parser.add_argument("--duration", type=float, default=60, help="Total duration of the collection (in seconds)")
+    collect_parser.add_argument("--pids", type=int, nargs="+", help="Only track these processes for the top processes")
+    collect_parser.add_argument("--cgroup", type=str, help="Only track processes of this cgroup (path relative to /sys/fs/cgroup)")
+    collect_parser.add_argument("--container", type=str, help="Only track processes of this container (id, at least 12 characters)")
+    collect_parser.add_argument("--track", action="store_true",
+                                help="Record CPU time, RSS, I/O, threads and FDs of every tracked process at each tick")
+    collect_parser.add_argument("--parallel", action="store_true",
+                                help="Run the expensive probes (processes, system, tracking) concurrently in worker processes")
+    collect_parser.add_argument("--process-interval", type=float, default=0,
+                                help="Seconds between two top processes scans with --parallel (default: every tick)")
+    collect_parser.add_argument("--backend", choices=backends.BACKENDS, default="sqlite",
+                                help="Storage backend (segment: CPU/RAM only, append-only binary files)")
+    collect_parser.add_argument("--alerts", type=str, nargs="?", const=ALERTS_PATH,
+                                help="Evaluate the alert rules of this JSON file on every sample (default: config/alerts.json)")
+    collect_parser.set_defaults(func=collect_command)
+
+    # Commande : top
+    top_parser = subparsers.add_parser("top", aliases=["watch"], help="Live view of system metrics in the terminal")
+    top_parser.add_argument("--interval", type=float, default=0.1, help="Refresh interval (in seconds)")
+    top_parser.add_argument("--duration", type=float, help="Total duration (in seconds, default: until Ctrl+C)")
+    top_parser.add_argument("--history", type=int, default=600, help="Number of ticks kept for the sparklines")
+    top_parser.add_argument("--process-every", type=int, default=10, help="Ticks between two top processes refreshes")
+    top_parser.add_argument("--record", action="store_true", help="Also store the samples in the database")
+    top_parser.add_argument("--pids", type=int, nargs="+", help="Only track these processes for the top processes")
+    top_parser.add_argument("--cgroup", type=str, help="Only track processes of this cgroup (path relative to /sys/fs/cgroup)")
+    top_parser.set_defaults(func=top_command)
+
+    # Commande : agent
+    agent_parser = subparsers.add_parser("agent", help="Collect system metrics and send them to an ingest server")
+    agent_parser.add_argument("--server", type=str, default=f"{INGEST_BIND}:{INGEST_PORT}", help="Ingest server address (host:port)")
+    agent_parser.add_argument("--host", type=str, help="Host name attached to the samples (default: machine name)")
+    agent_parser.add_argument("--batch-size", type=int, default=AGENT_BATCH_SIZE, help="Samples sent per request")
+    agent_parser.add_argument("--interval", type=float, default=5, help="Interval between collections (in seconds, e.g. 0.1)")
+    agent_parser.add_argument("--duration", type=float, default=60, help="Total duration of the collection (in seconds)")
+    agent_parser.add_argument("--pids", type=int, nargs="+", help="Only track these processes for the top processes")
+    agent_parser.add_argument("--cgroup", type=str, help="Only track processes of this cgroup (path relative to /sys/fs/cgroup)")
+    agent_parser.add_argument("--container", type=str, help="Only track processes of this container (id, at least 12 characters)")
+    agent_parser.add_argument("--track", action="store_true",
+                              help="Record CPU time, RSS, I/O, threads and FDs of every tracked process at each tick")
+    agent_parser.add_argument("--parallel", action="store_true",
+                              help="Run the expensive probes (processes, system, tracking) concurrently in worker processes")
+    agent_parser.add_argument("--process-interval", type=float, default=0,
+                              help="Seconds between two top processes scans with --parallel (default: every tick)")
+    agent_parser.set_defaults(func=agent_command)
+
+    # Commande : serve
+    serve_parser = subparsers.add_parser("serve", help="Run the ingest server receiving metrics from agents")
+    serve_parser.add_argument("--bind", type=str, default=INGEST_BIND, help="Listening address (0.0.0.0 for all interfaces)")
+    serve_parser.add_argument("--port", type=int, default=INGEST_PORT, help="Listening port")
+    serve_parser.set_defaults(func=serve_command)
+
+    # Commande : report
+    report_parser = subparsers.add_parser("report", help="Generate performance report")
+    report_parser.add_argument("--limit", type=int, default=100, help="Number of data points to include")
+    report_parser.add_argument("--since", type=str, help="Start datetime (ISO format: YYYY-MM-DDTHH:MM)")
+    report_parser.add_argument("--last", choices=["hour", "day"], help="Use a pre-defined time filter")
+    report_parser.add_argument("--save", action="store_true", help="Save report as PNG instead of showing it")
+    report_parser.add_argument("--host", type=str, default=storage.LOCAL_HOST, help="Host to report on (default: this machine)")
+    report_parser.add_argument("--backend", choices=backends.BACKENDS, default="sqlite", help="Storage backend to read")
+    report_parser.add_argument("--no-cache", action="store_true", help="Read every bucket from the database (no report cache)")
+    report_parser.set_defaults(func=report_command, selfstats=True)
+
+    # Commande : stats
+    stats_parser = subparsers.add_parser("stats", help="Compute statistics and anomalies over a time range")
+    stats_parser.add_argument("--since", type=str, help="Start datetime (ISO format: YYYY-MM-DDTHH:MM, default: last hour)")
+    stats_parser.add_argument("--until", type=str, help="End datetime, excluded (ISO format: YYYY-MM-DDTHH:MM)")
+    stats_parser.add_argument("--last", choices=["hour", "day"], help="Use a pre-defined time filter")
+    stats_parser.add_argument("--host", type=str, default=storage.LOCAL_HOST, help="Host to analyse (default: this machine)")
+    stats_parser.add_argument("--window", type=int, default=STATS_WINDOW, help="Rolling average window (in samples)")
+    stats_parser.add_argument("--method", choices=report.ANOMALY_METHODS, default="zscore", help="Anomaly detection method")
+    stats_parser.add_argument("--threshold", type=float, default=STATS_THRESHOLD, help="Anomaly threshold (in standard deviations)")
+    stats_parser.add_argument("--format", choices=["text", "json"], default="text", help="Output format")
+    stats_parser.add_argument("--backend", choices=backends.BACKENDS, default="sqlite", help="Storage backend to read")
+    stats_parser.set_defaults(func=stats_command, selfstats=True)
+
+    # Commande : export
+    export_parser = subparsers.add_parser("export", help="Export metrics to CSV, JSON lines or Parquet")
+    export_parser.add_argument("--format", choices=export.FORMATS, default="csv", help="Output format")
+    export_parser.add_argument("--output", type=str, default="-", help="Output file ('-' for stdout, csv/jsonl only)")
+    export_parser.add_argument("--since", type=str, help="Start datetime (ISO format: YYYY-MM-DDTHH:MM)")
+    export_parser.add_argument("--until", type=str, help="End datetime, excluded (ISO format: YYYY-MM-DDTHH:MM)")
+    export_parser.add_argument("--last", choices=["hour", "day"], help="Use a pre-defined time filter")
+    export_parser.add_argument("--chunk-size", type=int, default=EXPORT_CHUNK_SIZE, help="Rows read and written at a time")
+    export_parser.add_argument("--host", type=str, default=storage.LOCAL_HOST, help="Host to export (default: this machine)")
+    export_parser.set_defaults(func=export_command)
+
+    # Commande : archive
+    archive_parser = subparsers.add_parser("archive", help="Compress old raw samples into blocks (processes and system metrics are dropped)")
+    archive_parser.add_argument("--older-than", type=float, default=ARCHIVE_MIN_AGE, help="Minimum age of the archived samples (in days)")
+    archive_parser.set_defaults(func=archive_command)
+
+    # Commande : selfstats
+    selfstats_parser = subparsers.add_parser("selfstats", help="Show the monitor's own overhead (stage latencies, tick drift, CPU, RSS)")
+    selfstats_parser.add_argument("--since", type=str, help="Start datetime (ISO format: YYYY-MM-DDTHH:MM)")
+    selfstats_parser.add_argument("--until", type=str, help="End datetime, excluded (ISO format: YYYY-MM-DDTHH:MM)")
+    selfstats_parser.add_argument("--last", choices=["hour", "day"], help="Use a pre-defined time filter")
+    selfstats_parser.set_defaults(func=selfstats_command)
+
+    # Parse & exécute
+    args = parser.parse_args()
+    if args.no_instrument:
+        instrument.set_enabled(False)
+    if hasattr(args, 'func'):
+        args.func(args)
+        # Commandes de lecture : leurs mesures sont écrites à la fin (la collecte les écrit via MetricsWriter)
+        if getattr(args, 'selfstats', False):
+            storage.write_selfstats()
+    else:
+        parser.print_help()
+
+if __name__ == "__main__":
+    main()
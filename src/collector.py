@@ -1,65 +1,344 @@
-import psutil
-import datetime
-
-def get_timestamp():
-    """
-    Récupération de la date courante
-    :return: Date courante
-    """
-    return datetime.datetime.now().isoformat()
-
-def get_cpu_usage():
-    """
-    Récupération du pourcentage de l'utilisation CPU courante
-    :return: Taux d'utilisation du CPU courante
-    """
-    return psutil.cpu_percent(interval=1)
-
-def get_max_cpu_percent():
-    """
-    Récupération du pourcentage maximal possible d'utilisation CPU par processus, basé sur le nombre de cœurs logiques
-    :return: Taux maximal possible d'utilisation du CPU courante
-    """
-    return 100.0 * psutil.cpu_count()
-
-
-def get_ram_usage():
-    """
-    Récupération du pourcentage de l'utilisation RAM courante
-    :return: Taux d'utilisation de la RAM courante
-    """
-    return psutil.virtual_memory().percent
-
-def get_top_processes(top_n=5):
-    """
-    Récupération des processus en cours qui consomme le plus de CPU
-    :param top_n: nombre de processus à récupérer
-    :return: Liste des processus en cours qui consomme le plus de CPU
-    """
-    processes = []
-    for proc in psutil.process_iter(['pid', 'name', 'cpu_percent']):
-        try:
-            info = proc.info
-
-            # Exclure les processus systèmes inutiles ou faux positifs
-            if info['pid'] == 0 or 'idle' in info['name'].lower():
-                continue
-
-            processes.append(info)
-
-        except (psutil.NoSuchProcess, psutil.AccessDenied):
-            continue
-
-    return sorted(processes, key=lambda p: p['cpu_percent'], reverse=True)[:top_n]
-
-def collect_metrics():
-    """
-    Récupération des différentes métriques
-    :return:
-    """
-    return {
-        'timestamp': get_timestamp(),
-        'cpu': get_cpu_usage(),
-        'ram': get_ram_usage(),
-        'top_processes': get_top_processes()
-    }
\ No newline at end of file
+import psutil
+import datetime
+import heapq
+import os
+import time
+
+import numpy as np
+
+from src import instrument
+
+# Racine des cgroups (v2 unifié ou v1 par contrôleur)
+CGROUP_ROOT = "/sys/fs/cgroup"
+
+# Lecture directe de /proc disponible (Linux) : évite le coût de psutil sur les lectures par tick
+PROC_AVAILABLE = os.path.isdir("/proc/self")
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+PROC_STAT_PATH = "/proc/stat"
+
+def get_timestamp():
+    """
+    Récupération de la date courante
+    :return: Date courante
+    """
+    return datetime.datetime.now().isoformat()
+
+@instrument.timed("collector.cpu")
+def get_cpu_usage(interval=1):
+    """
+    Récupération du pourcentage de l'utilisation CPU courante
+    :param interval: Durée de mesure bloquante (en secondes) ; None pour une mesure non bloquante depuis l'appel précédent
+    :return: Taux d'utilisation du CPU courante
+    """
+    return psutil.cpu_percent(interval=interval)
+
+def get_max_cpu_percent():
+    """
+    Récupération du pourcentage maximal possible d'utilisation CPU par processus, basé sur le nombre de cœurs logiques
+    :return: Taux maximal possible d'utilisation du CPU courante
+    """
+    return 100.0 * psutil.cpu_count()
+
+
+@instrument.timed("collector.ram")
+def get_ram_usage():
+    """
+    Récupération du pourcentage de l'utilisation RAM courante
+    :return: Taux d'utilisation de la RAM courante
+    """
+    return psutil.virtual_memory().percent
+
+def read_cgroup_pids(cgroup):
+    """
+    Récupération des processus d'un cgroup
+    :param cgroup: Chemin du cgroup, absolu ou relatif à CGROUP_ROOT (ex : 'system.slice/docker-<id>.scope')
+    :return: Ensemble des pids du cgroup (vide si le cgroup n'existe plus)
+    """
+    path = cgroup if os.path.isabs(cgroup) else os.path.join(CGROUP_ROOT, cgroup)
+    try:
+        with open(os.path.join(path, "cgroup.procs")) as file:
+            return {int(line) for line in file if line.strip()}
+    except FileNotFoundError:
+        return set()
+
+def read_proc_stat(pid):
+    """
+    Lecture brute de /proc/<pid>/stat
+    :param pid: Identifiant du processus
+    :return: Champs situés après le nom du processus (le 1er est l'état, le 12e utime, le 13e stime)
+    """
+    fd = os.open(f"/proc/{pid}/stat", os.O_RDONLY)
+    try:
+        data = os.read(fd, 1024)
+    finally:
+        os.close(fd)
+    # Le nom peut contenir des espaces et des parenthèses : on découpe après la dernière ')'
+    return data[data.rindex(b")") + 2:].split()
+
+def get_process_times(proc):
+    """
+    Date de démarrage et temps CPU cumulé (utilisateur + système) d'un processus, lus ensemble
+    :param proc: psutil.Process
+    :return: Couple (date de démarrage : identifie le processus derrière le pid, temps CPU en secondes)
+    """
+    if PROC_AVAILABLE:
+        try:
+            fields = read_proc_stat(proc.pid)
+        except (FileNotFoundError, ProcessLookupError):
+            raise psutil.NoSuchProcess(proc.pid)
+        # 20e champ après le nom : starttime (en ticks depuis le démarrage de la machine)
+        return int(fields[19]), (int(fields[11]) + int(fields[12])) / CLOCK_TICKS
+    # psutil compare la date de démarrage mémorisée à celle du pid actuel
+    if not proc.is_running():
+        raise psutil.NoSuchProcess(proc.pid)
+    times = proc.cpu_times()
+    return proc.create_time(), times.user + times.system
+
+class ProcessSampler:
+    """
+    Échantillonneur persistant des processus les plus consommateurs de CPU.
+    Les objets psutil.Process et les noms sont conservés d'un tick à l'autre : un tick ne lit
+    que le temps CPU de chaque processus, et l'utilisation est calculée par différence avec le
+    tick précédent. Les N premiers sont sélectionnés par tas, sans trier toute la liste.
+    """
+
+    def __init__(self, pids=None, cgroup=None, clock=time.monotonic):
+        """
+        :param pids: Restreindre l'échantillonnage à ces pids ; None pour tous les processus
+        :param cgroup: Restreindre l'échantillonnage aux processus de ce cgroup (voir read_cgroup_pids)
+        :param clock: Horloge monotone (injectable pour les tests)
+        """
+        self.pids = set(pids) if pids is not None else None
+        self.cgroup = cgroup
+        self.clock = clock
+        self.max_percent = get_max_cpu_percent()
+        # pid -> [psutil.Process, nom, temps CPU cumulé au tick précédent, date de démarrage] ; nom None = processus exclu
+        self.handles = {}
+        self.last_time = None
+
+    def target_pids(self):
+        """
+        Processus à échantillonner à ce tick
+        :return: Itérable de pids
+        """
+        if self.cgroup is not None:
+            pids = read_cgroup_pids(self.cgroup)
+            return pids & self.pids if self.pids is not None else pids
+        if self.pids is not None:
+            return self.pids
+        return psutil.pids()
+
+    def _open(self, pid):
+        """
+        Ouverture d'un processus jamais vu (ou d'un nouveau processus ayant repris un pid)
+        :return: Entrée de self.handles, ou None si le processus est inaccessible
+        """
+        try:
+            proc = psutil.Process(pid)
+            name = proc.name()
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            return None
+        # Exclure les processus systèmes inutiles ou faux positifs
+        if pid == 0 or 'idle' in name.lower():
+            name = None
+        return [proc, name, None, None]
+
+    def sample(self, top_n=5):
+        """
+        Échantillonnage des processus et sélection des plus consommateurs
+        :param top_n: nombre de processus à récupérer
+        :return: Liste de dictionnaires pid, name, cpu_percent, du plus au moins consommateur.
+                 Au premier appel, faute de tick précédent, les cpu_percent valent 0.0.
+        """
+        now = self.clock()
+        elapsed = now - self.last_time if self.last_time is not None else None
+        self.last_time = now
+
+        handles = {}
+        candidates = []
+        for pid in self.target_pids():
+            entry = self.handles.get(pid) or self._open(pid)
+            if entry is None:
+                continue
+            try:
+                start, total = get_process_times(entry[0])
+                if entry[3] is not None and start != entry[3]:
+                    # pid réutilisé par un autre processus : ni son nom ni son temps CPU ne sont ceux de l'ancien
+                    entry = self._open(pid)
+                    if entry is None:
+                        continue
+                    start, total = get_process_times(entry[0])
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                continue
+            handles[pid] = entry
+            proc, name, previous, _ = entry
+            entry[2:] = [total, start]
+            if name is None:
+                continue
+
+            cpu_percent = 0.0
+            if previous is not None and elapsed and total >= previous:
+                # Borné au maximum théorique : la granularité des temps CPU peut le dépasser sur un tick court
+                cpu_percent = min(round((total - previous) / elapsed * 100, 1), self.max_percent)
+            candidates.append((cpu_percent, -pid, name))
+
+        # Les processus disparus sont oubliés
+        self.handles = handles
+
+        return [{'pid': -neg_pid, 'name': name, 'cpu_percent': cpu_percent}
+                for cpu_percent, neg_pid, name in heapq.nlargest(top_n, candidates)]
+
+def parse_cpu_stat(data):
+    """
+    Analyse du contenu de /proc/stat
+    :param data: Contenu brut du fichier
+    :return: Couple (temps par cœur : tableau int64 (cœurs, 8) user/nice/system/idle/iowait/irq/softirq/steal en ticks,
+             nombre cumulé de changements de contexte)
+    """
+    rows = []
+    for line in data.split(b"\n"):
+        # 'cpu0 ...', 'cpu1 ...' ; la ligne 'cpu ' (total de la machine) est ignorée
+        if line.startswith(b"cpu"):
+            if line[3:4].isdigit():
+                rows.append(line.split(None, 9)[1:9])
+        elif rows:
+            # Les lignes des cœurs se suivent en début de fichier : la suite (dont 'intr', très longue) n'est pas découpée
+            break
+    start = data.find(b"\nctxt ") + 6
+    ctx_switches = int(data[start:data.index(b"\n", start)]) if start > 5 else 0
+    return np.array(rows, dtype=np.int64), ctx_switches
+
+def read_cpu_times(stat_path=PROC_STAT_PATH):
+    """
+    Lecture des temps CPU par cœur et du nombre de changements de contexte
+    :param stat_path: Fichier au format de /proc/stat (remplaçable dans les tests et les mesures)
+    :return: Couple (temps par cœur : tableau (cœurs, colonnes), changements de contexte) ;
+             les colonnes 3 et 4 sont les temps d'inactivité (idle, iowait)
+    """
+    if PROC_AVAILABLE or stat_path != PROC_STAT_PATH:
+        with open(stat_path, "rb") as file:
+            return parse_cpu_stat(file.read())
+    # Sans /proc : colonnes de psutil réordonnées pour placer idle et iowait en 3e et 4e position
+    times = psutil.cpu_times(percpu=True)
+    fields = times[0]._fields
+    idle = [fields.index(name) for name in ("idle", "iowait") if name in fields]
+    busy = [i for i in range(len(fields)) if i not in idle]
+    columns = busy[:3] + idle + busy[3:]
+    values = np.array(times, dtype=np.float64)[:, columns]
+    if len(idle) == 1:
+        values = np.insert(values, 4, 0.0, axis=1)
+    return values, psutil.cpu_stats().ctx_switches
+
+def read_io_counters():
+    """
+    Compteurs cumulés des disques et du réseau
+    :return: Tableau float64 : octets lus, écrits sur disque, reçus, envoyés sur le réseau
+    """
+    disk = psutil.disk_io_counters()
+    net = psutil.net_io_counters()
+    return np.array([
+        disk.read_bytes if disk else 0, disk.write_bytes if disk else 0,
+        net.bytes_recv if net else 0, net.bytes_sent if net else 0
+    ], dtype=np.float64)
+
+class SystemSampler:
+    """
+    Échantillonneur persistant des métriques système détaillées : CPU par cœur, débits disque et réseau,
+    charge moyenne, swap et changements de contexte.
+    Les compteurs cumulés du tick précédent sont conservés : les taux sont calculés par différence,
+    en une opération vectorisée pour l'ensemble des cœurs.
+    """
+
+    def __init__(self, stat_path=PROC_STAT_PATH, clock=time.monotonic):
+        """
+        :param stat_path: Fichier au format de /proc/stat (remplaçable dans les tests et les mesures)
+        :param clock: Horloge monotone (injectable pour les tests)
+        """
+        self.stat_path = stat_path
+        self.clock = clock
+        self.previous = None
+
+    @instrument.timed("collector.system")
+    def sample(self):
+        """
+        Échantillonnage des compteurs et calcul des taux depuis le tick précédent
+        :return: Dictionnaire cpu_cores (liste des % par cœur), load1, load5, load15, swap (%),
+                 disk_read, disk_write, net_recv, net_sent (octets/s) et ctx_switches (par seconde).
+                 Au premier appel, faute de tick précédent, les taux valent 0.0.
+        """
+        now = self.clock()
+        times, ctx_switches = read_cpu_times(self.stat_path)
+        counters = np.append(read_io_counters(), ctx_switches)
+        load1, load5, load15 = psutil.getloadavg()
+
+        cores = np.zeros(len(times))
+        rates = np.zeros(5)
+        if self.previous is not None:
+            last_time, last_times, last_counters = self.previous
+            elapsed = now - last_time
+            if len(last_times) == len(times) and elapsed > 0:
+                delta = times - last_times
+                total = delta.sum(axis=1)
+                busy = total - delta[:, 3] - delta[:, 4]
+                cores = np.divide(busy * 100.0, total, out=np.zeros(len(total)), where=total > 0)
+            # Compteur remis à zéro (disque retiré, redémarrage d'interface) : taux nul plutôt que négatif
+            if elapsed > 0:
+                rates = np.maximum(counters - last_counters, 0) / elapsed
+        self.previous = (now, times, counters)
+
+        disk_read, disk_write, net_recv, net_sent, ctx_rate = rates.round(1).tolist()
+        return {
+            'cpu_cores': np.clip(cores, 0.0, 100.0).round(1).tolist(),
+            'load1': load1,
+            'load5': load5,
+            'load15': load15,
+            'swap': psutil.swap_memory().percent,
+            'disk_read': disk_read,
+            'disk_write': disk_write,
+            'net_recv': net_recv,
+            'net_sent': net_sent,
+            'ctx_switches': ctx_rate
+        }
+
+# Échantillonneur par défaut, partagé par les appels successifs de get_top_processes
+_default_sampler = None
+
+@instrument.timed("collector.top_processes")
+def get_top_processes(top_n=5, sampler=None):
+    """
+    Récupération des processus en cours qui consomme le plus de CPU
+    :param top_n: nombre de processus à récupérer
+    :param sampler: ProcessSampler à utiliser ; None pour l'échantillonneur par défaut (amorcé au premier appel)
+    :return: Liste des processus en cours qui consomme le plus de CPU
+    """
+    global _default_sampler
+    if sampler is None:
+        if _default_sampler is None:
+            _default_sampler = ProcessSampler()
+            _default_sampler.sample(0)
+            time.sleep(0.1)
+        sampler = _default_sampler
+    return sampler.sample(top_n)
+
+def collect_metrics(cpu_interval=1, sampler=None, system_sampler=None, top_processes=None, tracker=None):
+    """
+    Récupération des différentes métriques
+    :param cpu_interval: Durée de mesure du CPU (voir get_cpu_usage) ; None pour ne pas bloquer
+    :param sampler: ProcessSampler à utiliser pour les processus (voir get_top_processes)
+    :param system_sampler: SystemSampler à utiliser pour les métriques détaillées ; None pour ne pas les collecter
+    :param top_processes: Processus déjà échantillonnés à reprendre ; None pour les échantillonner
+    :param tracker: tracker.ProcessTracker des processus suivis en détail ; None pour aucun suivi
+    :return: Dictionnaire des métriques : timestamp, cpu, ram, top_processes (et system avec un system_sampler,
+             tracked avec un tracker)
+    """
+    metrics = {
+        'timestamp': get_timestamp(),
+        'cpu': get_cpu_usage(cpu_interval),
+        'ram': get_ram_usage(),
+        'top_processes': top_processes if top_processes is not None else get_top_processes(sampler=sampler)
+    }
+    if system_sampler is not None:
+        metrics['system'] = system_sampler.sample()
+    if tracker is not None:
+        metrics['tracked'] = tracker.sample()
+    return metrics
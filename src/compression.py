@@ -0,0 +1,297 @@
+import struct
+
+import numpy as np
+
+from src.rollup import RAW_DTYPE
+
+# En-tête d'un bloc : date du premier échantillon (ms depuis EPOCH) et nombre d'échantillons
+HEADER = struct.Struct("<qI")
+
+# Codage des écarts entre deux intervalles successifs (delta-of-delta, en ms) : (préfixe, largeur du préfixe,
+# nombre de bits de la valeur) ; au-delà, préfixe '1111' et valeur sur 64 bits
+DOD_CLASSES = ((0b10, 2, 7), (0b110, 3, 9), (0b1110, 4, 12))
+DOD_ESCAPE = (0b1111, 4, 64)
+
+_MASK64 = (1 << 64) - 1
+
+class _BitWriter:
+    """
+    Écriture d'une suite de champs de largeur quelconque, bit de poids fort en premier
+    """
+    __slots__ = ('data', 'acc', 'bits')
+
+    def __init__(self):
+        self.data = bytearray()
+        self.acc = 0
+        self.bits = 0
+
+    def write(self, value, width):
+        self.acc = (self.acc << width) | value
+        self.bits += width
+        if self.bits >= 64:
+            # Octets complets vers le tampon : l'accumulateur reste sous 72 bits
+            keep = self.bits & 7
+            self.data += (self.acc >> keep).to_bytes(self.bits >> 3, 'big')
+            self.acc &= (1 << keep) - 1
+            self.bits = keep
+
+    def getvalue(self):
+        padding = -self.bits & 7
+        return bytes(self.data) + (self.acc << padding).to_bytes((self.bits + padding) >> 3, 'big')
+
+class _BitReader:
+    """
+    Lecture des champs écrits par _BitWriter
+    """
+    __slots__ = ('data', 'pos')
+
+    def __init__(self, data):
+        # Marge de fin : une lecture porte toujours sur 9 octets (64 bits + décalage dans le premier octet)
+        self.data = bytes(data) + bytes(9)
+        self.pos = 0
+
+    def read(self, width):
+        start = self.pos >> 3
+        window = int.from_bytes(self.data[start:start + 9], 'big')
+        value = (window >> (72 - (self.pos & 7) - width)) & ((1 << width) - 1)
+        self.pos += width
+        return value
+
+    def bit(self):
+        value = (self.data[self.pos >> 3] >> (7 - (self.pos & 7))) & 1
+        self.pos += 1
+        return value
+
+def _write_dod(writer, dod):
+    if dod == 0:
+        writer.write(0, 1)
+        return
+    for prefix, prefix_width, width in DOD_CLASSES:
+        # Intervalle [-(2^(n-1) - 1), 2^(n-1)] décalé en entier positif
+        half = 1 << (width - 1)
+        if -half < dod <= half:
+            writer.write(prefix, prefix_width)
+            writer.write(dod + half - 1, width)
+            return
+    prefix, prefix_width, width = DOD_ESCAPE
+    writer.write(prefix, prefix_width)
+    writer.write(dod & _MASK64, width)
+
+def _read_dod(reader):
+    if not reader.bit():
+        return 0
+    for _, prefix_width, width in DOD_CLASSES:
+        if not reader.bit():
+            return reader.read(width) - (1 << (width - 1)) + 1
+    value = reader.read(DOD_ESCAPE[2])
+    return value - (1 << 64) if value >> 63 else value
+
+class _XorEncoder:
+    """
+    Codage des valeurs flottantes d'une série par XOR avec la valeur précédente (Gorilla) : une valeur inchangée
+    coûte 1 bit, une valeur dont les bits significatifs tiennent dans la fenêtre précédente 2 bits + la fenêtre
+    """
+    __slots__ = ('leading', 'trailing')
+
+    def __init__(self):
+        # Fenêtre (zéros de tête, zéros de fin) du dernier XOR écrit avec son en-tête
+        self.leading = -1
+        self.trailing = 0
+
+    def write(self, writer, xor):
+        if xor == 0:
+            writer.write(0, 1)
+            return
+        leading = min(64 - xor.bit_length(), 31)
+        trailing = (xor & -xor).bit_length() - 1
+        if self.leading >= 0 and leading >= self.leading and trailing >= self.trailing:
+            writer.write(0b10, 2)
+            writer.write(xor >> self.trailing, 64 - self.leading - self.trailing)
+            return
+        significant = 64 - leading - trailing
+        # Préfixe '11', zéros de tête sur 5 bits, nombre de bits significatifs - 1 sur 6 bits
+        writer.write((0b11 << 11) | (leading << 6) | (significant - 1), 13)
+        writer.write(xor >> trailing, significant)
+        self.leading = leading
+        self.trailing = trailing
+
+class _XorDecoder:
+    __slots__ = ('leading', 'trailing')
+
+    def __init__(self):
+        self.leading = 0
+        self.trailing = 0
+
+    def read(self, reader):
+        if not reader.bit():
+            return 0
+        if reader.bit():
+            header = reader.read(11)
+            self.leading = header >> 6
+            self.trailing = 64 - self.leading - (header & 0x3F) - 1
+        return reader.read(64 - self.leading - self.trailing) << self.trailing
+
+def encode(rows):
+    """
+    Compression d'une série d'échantillons : dates en delta-of-delta, cpu et ram par XOR (sans perte)
+    :param rows: Tableau RAW_DTYPE trié par date
+    :return: Bloc compressé (bytes)
+    """
+    count = len(rows)
+    if count == 0:
+        return HEADER.pack(0, 0)
+    ts = rows['ts'].astype(np.int64)
+    # Le premier intervalle est codé comme un écart à un intervalle nul
+    dods = np.diff(np.diff(ts), prepend=0).tolist()
+    cpu = np.ascontiguousarray(rows['cpu'], dtype=np.float64).view(np.uint64)
+    ram = np.ascontiguousarray(rows['ram'], dtype=np.float64).view(np.uint64)
+    cpu_xors = np.bitwise_xor(cpu[1:], cpu[:-1]).tolist()
+    ram_xors = np.bitwise_xor(ram[1:], ram[:-1]).tolist()
+
+    writer = _BitWriter()
+    writer.write(int(cpu[0]), 64)
+    writer.write(int(ram[0]), 64)
+    cpu_encoder, ram_encoder = _XorEncoder(), _XorEncoder()
+    for dod, cpu_xor, ram_xor in zip(dods, cpu_xors, ram_xors):
+        _write_dod(writer, dod)
+        cpu_encoder.write(writer, cpu_xor)
+        ram_encoder.write(writer, ram_xor)
+    return HEADER.pack(int(ts[0]), count) + writer.getvalue()
+
+def decode(block):
+    """
+    Décompression d'un bloc écrit par encode
+    :param block: Bloc compressé (bytes)
+    :return: Tableau RAW_DTYPE trié par date, identique à la série compressée
+    """
+    first_ts, count = HEADER.unpack_from(block)
+    rows = np.empty(count, dtype=RAW_DTYPE)
+    if count == 0:
+        return rows
+    reader = _BitReader(memoryview(block)[HEADER.size:])
+    ts = [first_ts] * count
+    cpu = [reader.read(64)] + [0] * (count - 1)
+    ram = [reader.read(64)] + [0] * (count - 1)
+    cpu_decoder, ram_decoder = _XorDecoder(), _XorDecoder()
+    delta = 0
+    for i in range(1, count):
+        delta += _read_dod(reader)
+        ts[i] = ts[i - 1] + delta
+        cpu[i] = cpu[i - 1] ^ cpu_decoder.read(reader)
+        ram[i] = ram[i - 1] ^ ram_decoder.read(reader)
+    rows['ts'] = ts
+    rows['cpu'] = np.array(cpu, dtype=np.uint64).view(np.float64)
+    rows['ram'] = np.array(ram, dtype=np.uint64).view(np.float64)
+    return rows
+
+def create_tables(conn):
+    """
+    Création de la table des blocs compressés : une ligne par hôte et par bloc de durée fixe,
+    début = début du bloc (ms depuis EPOCH) ; first_ts et last_ts bornent les dates des échantillons du bloc
+    :param conn: Connexion à la base de données
+    """
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS metrics_blocks (
+            host TEXT NOT NULL,
+            start INTEGER NOT NULL,
+            count INTEGER NOT NULL,
+            first_ts INTEGER NOT NULL,
+            last_ts INTEGER NOT NULL,
+            data BLOB NOT NULL,
+            PRIMARY KEY (host, start)
+        )
+    """)
+    # Lectures d'une période tous hôtes confondus et rétention
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_metrics_blocks_last_ts ON metrics_blocks (last_ts)")
+
+def write_block(conn, host, start, rows):
+    """
+    Ajout d'échantillons au bloc d'un hôte : un bloc existant est décompressé, complété puis recompressé
+    :param conn: Connexion à la base de données (dans une transaction)
+    :param host: Hôte des échantillons
+    :param start: Début du bloc (ms depuis EPOCH)
+    :param rows: Tableau RAW_DTYPE des échantillons du bloc, trié par date
+    """
+    existing = conn.execute("SELECT data FROM metrics_blocks WHERE host = ? AND start = ?", (host, start)).fetchone()
+    if existing is not None:
+        rows = np.concatenate((decode(existing[0]), rows))
+        # Tri stable : à date égale, les échantillons déjà compressés restent en premier
+        rows = rows[np.argsort(rows['ts'], kind='stable')]
+    conn.execute("""
+        INSERT OR REPLACE INTO metrics_blocks (host, start, count, first_ts, last_ts, data)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """, (host, start, len(rows), int(rows['ts'][0]), int(rows['ts'][-1]), encode(rows)))
+
+def read(conn, start, end, host=None):
+    """
+    Lecture des échantillons compressés d'une période
+    :param conn: Connexion à la base de données
+    :param start: Début de la période (ms depuis EPOCH, inclus)
+    :param end: Fin de la période (ms depuis EPOCH, exclue)
+    :param host: Hôte des échantillons ; None pour tous les hôtes
+    :return: Tableau RAW_DTYPE trié par date (vide si aucun bloc ne couvre la période)
+    """
+    condition, params = ("host = ? AND", (host,)) if host is not None else ("", ())
+    blocks = [decode(data) for (data,) in conn.execute(f"""
+        SELECT data
+        FROM metrics_blocks
+        WHERE {condition} last_ts >= ? AND first_ts < ?
+        ORDER BY first_ts ASC
+    """, (*params, start, end))]
+    if not blocks:
+        return np.empty(0, dtype=RAW_DTYPE)
+    rows = np.concatenate(blocks)
+    rows = rows[(rows['ts'] >= start) & (rows['ts'] < end)]
+    if host is None and len(blocks) > 1:
+        # Blocs de plusieurs hôtes entrelacés dans le temps
+        rows = rows[np.argsort(rows['ts'], kind='stable')]
+    return rows
+
+def windows(conn, start, end, host=None):
+    """
+    Périodes couvertes par des blocs, fusionnées quand elles se chevauchent (voir storage.iter_metrics_chunks)
+    :return: Liste de couples (premier échantillon, dernier échantillon), en ms depuis EPOCH, triés par date
+    """
+    condition, params = ("host = ? AND", (host,)) if host is not None else ("", ())
+    merged = []
+    for first_ts, last_ts in conn.execute(f"""
+        SELECT first_ts, last_ts
+        FROM metrics_blocks
+        WHERE {condition} last_ts >= ? AND first_ts < ?
+        ORDER BY first_ts ASC
+    """, (*params, start, end)):
+        if merged and first_ts <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], last_ts))
+        else:
+            merged.append((first_ts, last_ts))
+    return merged
+
+def delete_expired(conn, cutoff):
+    """
+    Suppression des blocs dont tous les échantillons sont antérieurs à une date (voir storage.apply_retention)
+    :param conn: Connexion à la base de données (dans une transaction)
+    :param cutoff: Date limite (ms depuis EPOCH, exclue)
+    :return: Nombre d'échantillons supprimés
+    """
+    count = conn.execute("SELECT COALESCE(SUM(count), 0) FROM metrics_blocks WHERE last_ts < ?", (cutoff,)).fetchone()[0]
+    conn.execute("DELETE FROM metrics_blocks WHERE last_ts < ?", (cutoff,))
+    return count
+
+def delete_oldest(conn, cutoff):
+    """
+    Suppression du plus ancien bloc dont tous les échantillons sont antérieurs à une date (voir storage._delete_oldest)
+    :param conn: Connexion à la base de données (dans une transaction)
+    :param cutoff: Date limite (ms depuis EPOCH, exclue)
+    :return: Nombre d'échantillons supprimés
+    """
+    row = conn.execute("""
+        SELECT host, start, count
+        FROM metrics_blocks
+        WHERE last_ts < ?
+        ORDER BY first_ts ASC
+        LIMIT 1
+    """, (cutoff,)).fetchone()
+    if row is None:
+        return 0
+    conn.execute("DELETE FROM metrics_blocks WHERE host = ? AND start = ?", row[:2])
+    return row[2]
@@ -0,0 +1,154 @@
+import shutil
+import sys
+from datetime import datetime
+
+import numpy as np
+
+from src.ringbuffer import RingBuffer
+
+# Caractères des sparklines, du plus bas au plus haut
+SPARKS = np.array(list("▁▂▃▄▅▆▇█"))
+
+# Historique affiché pour chaque tick
+HISTORY_DTYPE = np.dtype([('cpu', '<f4'), ('ram', '<f4')])
+
+# Séquences ANSI
+CLEAR_SCREEN = "\x1b[2J"
+CLEAR_LINE = "\x1b[K"
+HIDE_CURSOR = "\x1b[?25l"
+SHOW_CURSOR = "\x1b[?25h"
+
+def sparkline(values, low=0.0, high=100.0):
+    """
+    Représentation d'une série par une ligne de caractères de hauteurs croissantes
+    :param values: Valeurs de la série
+    :param low: Valeur affichée par le caractère le plus bas
+    :param high: Valeur affichée par le caractère le plus haut
+    :return: Chaîne d'un caractère par valeur (espace pour une valeur manquante)
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if len(values) == 0:
+        return ""
+    scaled = np.clip((values - low) / (high - low) * (len(SPARKS) - 1), 0, len(SPARKS) - 1)
+    chars = SPARKS[np.nan_to_num(scaled).round().astype(np.int64)]
+    chars[np.isnan(values)] = " "
+    return "".join(chars)
+
+def format_rate(value):
+    """
+    Mise en forme d'un débit en octets par seconde
+    :param value: Débit (en octets/s)
+    :return: Chaîne avec unité (ex : '1.5 MB/s')
+    """
+    for unit in ("B", "KB", "MB", "GB"):
+        if value < 1024 or unit == "GB":
+            return f"{value:.1f} {unit}/s"
+        value /= 1024
+
+class Dashboard:
+    """
+    Vue en direct dans le terminal : valeurs courantes, historique en sparklines et processus les plus consommateurs.
+    L'historique est conservé en mémoire dans un tampon circulaire alimenté par la boucle de collecte :
+    aucune lecture de la base. Seules les lignes modifiées depuis l'affichage précédent sont réécrites.
+    """
+
+    def __init__(self, history=600, stream=sys.stdout, size=None):
+        """
+        :param history: Nombre de ticks conservés pour les sparklines
+        :param stream: Flux de sortie (terminal)
+        :param size: Taille (colonnes, lignes) imposée ; None pour la taille du terminal
+        """
+        self.history = RingBuffer(history, HISTORY_DTYPE)
+        self.latest = None
+        self.stream = stream
+        self.size = size
+        self.screen = None  # Lignes actuellement affichées ; None avant le premier affichage
+        self.drawn_size = None
+
+    def update(self, metrics: dict):
+        """
+        Ajout d'un échantillon
+        :param metrics: Dictionnaire retourné par collector.collect_metrics
+        """
+        self.history.append((metrics['cpu'], metrics['ram']))
+        self.latest = metrics
+
+    def preload(self, arrays):
+        """
+        Reprise d'un historique enregistré (ex : collecte précédente), avant le premier échantillon
+        :param arrays: storage.MetricsArrays, du plus ancien au plus récent
+        """
+        history = np.empty(len(arrays.cpu), dtype=HISTORY_DTYPE)
+        history['cpu'] = arrays.cpu
+        history['ram'] = arrays.ram
+        self.history.extend(history)
+
+    def render(self, columns):
+        """
+        Construction des lignes de la vue
+        :param columns: Largeur disponible (en caractères)
+        :return: Liste de lignes, chacune tronquée à 'columns' caractères
+        """
+        metrics = self.latest
+        if metrics is None:
+            return []
+        label = 12
+        history = self.history.last(max(columns - label, 0))
+        lines = [
+            f"System Monitor  {datetime.fromisoformat(metrics['timestamp']):%H:%M:%S}  (Ctrl+C to quit)",
+            "",
+            f"CPU {metrics['cpu']:6.1f}%  " + sparkline(history['cpu']),
+            f"RAM {metrics['ram']:6.1f}%  " + sparkline(history['ram']),
+        ]
+
+        system = metrics.get('system')
+        if system is not None:
+            lines += [
+                f"Cores {len(system['cpu_cores']):>4}   " + sparkline(system['cpu_cores']),
+                f"Load {system['load1']:.2f} {system['load5']:.2f} {system['load15']:.2f} | "
+                f"Swap {system['swap']:.1f}% | Ctx switches {system['ctx_switches']:.0f}/s",
+                f"Disk read {format_rate(system['disk_read'])} write {format_rate(system['disk_write'])} | "
+                f"Net recv {format_rate(system['net_recv'])} sent {format_rate(system['net_sent'])}",
+            ]
+
+        lines += ["", f"{'PID':>7}  {'NAME':<24} {'CPU%':>6}"]
+        lines += [f"{proc['pid']:>7}  {proc['name']:<24.24} {proc['cpu_percent']:>6.1f}" for proc in metrics['top_processes']]
+        return [line[:columns] for line in lines]
+
+    def draw(self):
+        """
+        Affichage incrémental : seules les lignes différentes de l'affichage précédent sont réécrites
+        :return: Nombre de lignes réécrites
+        """
+        columns, rows = self.size or shutil.get_terminal_size()
+        lines = self.render(columns)[:rows]
+        output = []
+        # Premier affichage ou terminal redimensionné : effacement complet
+        if self.screen is None or self.drawn_size != (columns, rows):
+            output.append(HIDE_CURSOR + CLEAR_SCREEN)
+            self.screen = []
+            self.drawn_size = (columns, rows)
+
+        changed = 0
+        for row, line in enumerate(lines):
+            if row >= len(self.screen) or self.screen[row] != line:
+                # Positionnement du curseur (lignes numérotées à partir de 1) puis effacement de la fin de ligne
+                output.append(f"\x1b[{row + 1};1H{line}{CLEAR_LINE}")
+                changed += 1
+        for row in range(len(lines), len(self.screen)):
+            output.append(f"\x1b[{row + 1};1H{CLEAR_LINE}")
+        self.screen = lines
+
+        if output:
+            self.stream.write("".join(output))
+            self.stream.flush()
+        return changed
+
+    def close(self):
+        """
+        Restauration du curseur, placé sous la vue
+        """
+        if self.screen is not None:
+            self.stream.write(f"\x1b[{len(self.screen) + 1};1H{SHOW_CURSOR}\n")
+            self.stream.flush()
+            self.screen = None
@@ -0,0 +1,309 @@
+import functools
+import multiprocessing
+import time
+from multiprocessing.connection import wait
+
+from config.config import ENGINE_PROBE_TIMEOUT, ENGINE_RESTART_AFTER, ENGINE_START_TIMEOUT
+from src import collector, tracker
+
+class Probe:
+    """
+    Sonde d'un moteur de collecte : une mesure nommée, avec sa propre cadence et son délai maximal.
+    La fonction de mesure est créée par 'factory' dans le processus qui l'exécute : son état (échantillonneurs,
+    objets psutil) y reste d'un appel à l'autre.
+    """
+
+    def __init__(self, name, factory, interval=0.0, timeout=ENGINE_PROBE_TIMEOUT, default=None, keep_last=False,
+                 inline=False):
+        """
+        :param name: Clé de l'échantillon recevant la valeur (ex : 'top_processes')
+        :param factory: Fonction sans argument, importable par un autre processus (fonction de module ou
+                        functools.partial), retournant la fonction de mesure
+        :param interval: Délai minimal (en secondes) entre deux mesures ; 0 pour chaque tick
+        :param timeout: Attente maximale (en secondes) du résultat dans un tick
+        :param default: Valeur d'un tick sans nouvelle mesure ; None pour omettre la clé
+        :param keep_last: Reprendre la dernière mesure réussie plutôt que 'default' dans un tick sans nouvelle mesure
+        :param inline: Mesure exécutée dans le processus du moteur (mesures quasi instantanées : l'échange
+                       avec un processus coûterait plus que la mesure elle-même)
+        """
+        self.name = name
+        self.factory = factory
+        self.interval = interval
+        self.timeout = timeout
+        self.default = default
+        self.keep_last = keep_last
+        self.inline = inline
+
+def _serve(conn, factory):
+    """
+    Boucle d'un processus de sonde : signal de disponibilité une fois la sonde créée, puis une mesure par requête,
+    jusqu'à None ou la fermeture du tube
+    """
+    measure = factory()
+    conn.send((True, None))
+    while True:
+        try:
+            if conn.recv() is None:
+                return
+        except (EOFError, KeyboardInterrupt):
+            return
+        try:
+            result = (True, measure())
+        except Exception as error:
+            result = (False, repr(error))
+        conn.send(result)
+
+class _Worker:
+    """
+    Processus dédié à une sonde. Une seule mesure en cours à la fois : l'état de la sonde n'est jamais partagé.
+    """
+
+    def __init__(self, probe, context):
+        self.conn, child = context.Pipe()
+        self.process = context.Process(target=_serve, args=(child, probe.factory), daemon=True,
+                                       name=f"probe-{probe.name}")
+        self.process.start()
+        child.close()
+        # Date d'envoi de la requête en cours (ou du démarrage, jusqu'au signal de disponibilité) ; None si libre
+        self.sent_at = time.monotonic()
+        self.ready = False
+
+    def stop(self, timeout=1.0):
+        if self.sent_at is not None:
+            # Mesure en cours : la requête d'arrêt ne serait lue qu'à sa fin
+            self.kill()
+            return
+        try:
+            self.conn.send(None)
+        except OSError:
+            pass
+        self.process.join(timeout)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.conn.close()
+
+    def kill(self):
+        self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+class CollectionEngine:
+    """
+    Moteur de collecte parallèle : les sondes coûteuses (parcours des processus, métriques système, suivi détaillé)
+    s'exécutent chacune dans son propre processus, en même temps, et leurs résultats sont fusionnés en un échantillon
+    daté du début du tick. Une sonde lente ne retarde que sa propre valeur : au-delà de son délai, le tick est
+    produit sans elle (valeur par défaut ou dernière mesure). Une sonde qui échoue est comptée ; un processus bloqué
+    plus de 'restart_after' secondes ou terminé brutalement est remplacé.
+    """
+
+    def __init__(self, probes, restart_after=ENGINE_RESTART_AFTER, start_timeout=ENGINE_START_TIMEOUT,
+                 clock=time.monotonic, start_method="spawn"):
+        """
+        :param probes: Liste de Probe (noms uniques)
+        :param restart_after: Durée (en secondes) au-delà de laquelle une mesure sans réponse fait remplacer son processus
+        :param start_timeout: Durée (en secondes) au-delà de laquelle un processus qui n'a pas fini de démarrer
+                              (imports, création de la sonde) est remplacé
+        :param clock: Horloge monotone des cadences des sondes (injectable pour les tests)
+        :param start_method: Méthode de démarrage des processus (voir multiprocessing) : 'spawn' ne copie ni fil
+                             ni verrou du processus parent
+        """
+        names = [probe.name for probe in probes]
+        if len(set(names)) != len(names):
+            raise ValueError("probe names must be unique")
+        self.probes = probes
+        self.restart_after = restart_after
+        self.start_timeout = start_timeout
+        self.clock = clock
+        self.context = multiprocessing.get_context(start_method)
+        # timeouts : requêtes restées sans réponse à leur délai ; busy : ticks sans requête, le processus étant
+        # encore occupé (mesure déjà comptée en timeouts, ou démarrage)
+        self.stats = {probe.name: {"runs": 0, "timeouts": 0, "busy": 0, "errors": 0, "restarts": 0}
+                      for probe in probes}
+        self.last = {}
+        self.next_due = dict.fromkeys(names, 0.0)
+        self.inline = {}
+        self.workers = {}
+        try:
+            for probe in probes:
+                if probe.inline:
+                    self.inline[probe.name] = probe.factory()
+                else:
+                    self.workers[probe.name] = _Worker(probe, self.context)
+            # Attente du démarrage des processus : le premier tick n'en paie pas le coût
+            deadline = time.monotonic() + start_timeout
+            starting = [worker.conn for worker in self.workers.values()]
+            while starting and time.monotonic() < deadline:
+                for conn in wait(starting, deadline - time.monotonic()):
+                    starting.remove(conn)
+            self._drain()
+        except BaseException:
+            self.close()
+            raise
+
+    def _restart(self, probe):
+        self.workers[probe.name].kill()
+        self.workers[probe.name] = _Worker(probe, self.context)
+        self.stats[probe.name]["restarts"] += 1
+
+    def _record(self, probe, ok, value, results):
+        if ok:
+            self.stats[probe.name]["runs"] += 1
+            self.last[probe.name] = value
+            results[probe.name] = value
+        else:
+            self.stats[probe.name]["errors"] += 1
+
+    def collect(self):
+        """
+        Collecte d'un échantillon : envoi des mesures dues aux processus des sondes, mesures en ligne pendant ce temps,
+        puis attente des résultats, chacun au plus jusqu'au délai de sa sonde
+        :return: Dictionnaire au format de collector.collect_metrics
+        """
+        timestamp = collector.get_timestamp()
+        now = self.clock()
+        started = time.monotonic()
+        due = [probe for probe in self.probes if now >= self.next_due[probe.name]]
+        results = {}
+
+        # Requêtes aux processus libres ; un processus encore occupé (mesure abandonnée, démarrage) n'en reçoit pas
+        pending = {}
+        for probe in due:
+            if probe.inline:
+                continue
+            worker = self.workers[probe.name]
+            if worker.sent_at is not None:
+                self.stats[probe.name]["busy"] += 1
+                if started - worker.sent_at >= (self.restart_after if worker.ready else self.start_timeout):
+                    self._restart(probe)
+                continue
+            try:
+                worker.conn.send(True)
+            except OSError:
+                # Processus terminé entre deux ticks
+                self.stats[probe.name]["errors"] += 1
+                self._restart(probe)
+                continue
+            worker.sent_at = started
+            self.next_due[probe.name] = now + probe.interval
+            pending[worker.conn] = probe
+
+        for probe in due:
+            if probe.inline:
+                self.next_due[probe.name] = now + probe.interval
+                try:
+                    value = self.inline[probe.name]()
+                except Exception:
+                    self._record(probe, False, None, results)
+                else:
+                    self._record(probe, True, value, results)
+
+        # Attente des résultats, jusqu'au délai de chaque sonde
+        while pending:
+            deadline = min(started + probe.timeout for probe in pending.values())
+            ready = wait(list(pending), max(0.0, deadline - time.monotonic()))
+            for conn in ready:
+                probe = pending.pop(conn)
+                worker = self.workers[probe.name]
+                worker.sent_at = None
+                try:
+                    ok, value = conn.recv()
+                except (EOFError, OSError):
+                    # Processus mort pendant la mesure
+                    self.stats[probe.name]["errors"] += 1
+                    self._restart(probe)
+                    continue
+                self._record(probe, ok, value, results)
+            elapsed = time.monotonic() - started
+            for conn, probe in list(pending.items()):
+                if elapsed >= probe.timeout:
+                    # Le résultat arrivera trop tard pour ce tick : il sera ignoré (voir _drain)
+                    del pending[conn]
+                    self.stats[probe.name]["timeouts"] += 1
+        self._drain()
+
+        sample = {'timestamp': timestamp}
+        for probe in self.probes:
+            if probe.name in results:
+                value = results[probe.name]
+            elif probe.keep_last and probe.name in self.last:
+                value = self.last[probe.name]
+            else:
+                value = probe.default
+            if value is not None:
+                sample[probe.name] = value
+        return sample
+
+    def _drain(self):
+        """
+        Lecture sans attente des résultats arrivés après leur délai et des signaux de disponibilité : les résultats
+        sont écartés (leur date ne correspond plus à aucun tick) et le processus redevient libre
+        """
+        for name, worker in self.workers.items():
+            if worker.sent_at is None or not worker.conn.poll():
+                continue
+            try:
+                worker.conn.recv()
+                worker.sent_at = None
+                worker.ready = True
+            except (EOFError, OSError):
+                probe = next(probe for probe in self.probes if probe.name == name)
+                self._restart(probe)
+
+    def close(self):
+        """
+        Arrêt des processus des sondes
+        """
+        for worker in self.workers.values():
+            worker.stop()
+        self.workers = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+def cpu_probe():
+    # Amorçage : chaque appel mesure l'utilisation depuis l'appel précédent, sans bloquer
+    collector.get_cpu_usage(interval=None)
+    return functools.partial(collector.get_cpu_usage, None)
+
+def ram_probe():
+    return collector.get_ram_usage
+
+def process_probe(pids=None, cgroup=None, top_n=5):
+    sampler = collector.ProcessSampler(pids=pids, cgroup=cgroup)
+    sampler.sample(0)
+    return functools.partial(sampler.sample, top_n)
+
+def system_probe():
+    sampler = collector.SystemSampler()
+    sampler.sample()
+    return sampler.sample
+
+def tracker_probe(pids=None, cgroup=None):
+    process_tracker = tracker.ProcessTracker(pids=pids, cgroup=cgroup)
+    process_tracker.sample()
+    return process_tracker.sample
+
+def default_probes(pids=None, cgroup=None, track=False, process_interval=0.0, timeout=ENGINE_PROBE_TIMEOUT):
+    """
+    Sondes produisant les mêmes échantillons que collector.collect_metrics
+    :param pids, cgroup: Processus suivis (voir collector.ProcessSampler)
+    :param track: Suivi détaillé de ces processus (voir src/tracker.py)
+    :param process_interval: Délai minimal (en secondes) entre deux parcours des processus ; les ticks intermédiaires
+                             enregistrent une liste vide (comme 'cli top --record')
+    :param timeout: Attente maximale (en secondes) des sondes exécutées dans leur processus
+    :return: Liste de Probe
+    """
+    probes = [
+        Probe('cpu', cpu_probe, inline=True, keep_last=True, default=0.0),
+        Probe('ram', ram_probe, inline=True, keep_last=True, default=0.0),
+        Probe('top_processes', functools.partial(process_probe, pids, cgroup), interval=process_interval,
+              timeout=timeout, default=[]),
+        Probe('system', system_probe, timeout=timeout),
+    ]
+    if track:
+        probes.append(Probe('tracked', functools.partial(tracker_probe, pids, cgroup), timeout=timeout, default=[]))
+    return probes
@@ -0,0 +1,98 @@
+import csv
+import sys
+
+import numpy as np
+
+from config.config import DB_PATH, EXPORT_CHUNK_SIZE
+from src import storage
+
+FORMATS = ("csv", "jsonl", "parquet")
+
+def _iso_timestamps(chunk):
+    """
+    Dates d'un bloc au format ISO, converties en une seule opération vectorisée
+    """
+    return np.datetime_as_string(chunk['ts'].astype('datetime64[ms]'), unit='ms').tolist()
+
+def write_csv(chunks, file):
+    """
+    Écriture des blocs au format CSV (avec en-tête)
+    :param chunks: Itérable de blocs retournés par storage.iter_metrics_chunks
+    :param file: Fichier texte ouvert en écriture
+    :return: Nombre de lignes écrites
+    """
+    writer = csv.writer(file, lineterminator="\n")
+    writer.writerow(("timestamp", "cpu", "ram"))
+    count = 0
+    for chunk in chunks:
+        writer.writerows(zip(_iso_timestamps(chunk), chunk['cpu'].tolist(), chunk['ram'].tolist()))
+        count += len(chunk)
+    return count
+
+def write_jsonl(chunks, file):
+    """
+    Écriture des blocs au format JSON, un objet par ligne
+    :param chunks: Itérable de blocs retournés par storage.iter_metrics_chunks
+    :param file: Fichier texte ouvert en écriture
+    :return: Nombre de lignes écrites
+    """
+    count = 0
+    for chunk in chunks:
+        file.writelines(f'{{"timestamp": "{ts}", "cpu": {cpu!r}, "ram": {ram!r}}}\n'
+                        for ts, cpu, ram in zip(_iso_timestamps(chunk), chunk['cpu'].tolist(), chunk['ram'].tolist()))
+        count += len(chunk)
+    return count
+
+def write_parquet(chunks, path):
+    """
+    Écriture des blocs au format Parquet, un groupe de lignes par bloc (nécessite pyarrow)
+    :param chunks: Itérable de blocs retournés par storage.iter_metrics_chunks
+    :param path: Chemin du fichier
+    :return: Nombre de lignes écrites
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("Parquet export requires pyarrow (pip install pyarrow)")
+
+    schema = pa.schema([("timestamp", pa.timestamp("ms")), ("cpu", pa.float64()), ("ram", pa.float64())])
+    count = 0
+    with pq.ParquetWriter(path, schema) as writer:
+        for chunk in chunks:
+            writer.write_table(pa.table({
+                "timestamp": pa.array(chunk['ts'], type=pa.int64()).cast(pa.timestamp("ms")),
+                "cpu": pa.array(chunk['cpu']),
+                "ram": pa.array(chunk['ram'])
+            }, schema=schema))
+            count += len(chunk)
+    return count
+
+def export_metrics(output, fmt="csv", since=None, until=None, chunk_size=EXPORT_CHUNK_SIZE, db_path=DB_PATH,
+                   host=storage.LOCAL_HOST):
+    """
+    Export en flux d'une période de métriques : la mémoire utilisée est bornée par la taille des blocs
+    :param output: Chemin du fichier de sortie ; '-' pour la sortie standard (csv et jsonl uniquement)
+    :param fmt: Format de sortie : 'csv', 'jsonl' ou 'parquet'
+    :param since: Date de début (incluse) ; None pour depuis la première ligne
+    :param until: Date de fin (exclue) ; None pour jusqu'à la dernière ligne
+    :param chunk_size: Nombre de lignes lues et écrites à la fois
+    :param db_path: Chemin de la base de données
+    :param host: Hôte des lignes exportées (voir src/ingest.py) ; par défaut la machine locale
+    (les fichiers n'ont pas de colonne d'hôte : un export mélangeant plusieurs hôtes serait ambigu)
+    :return: Nombre de lignes exportées
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Format inconnu : {fmt} (attendu : {', '.join(FORMATS)})")
+
+    chunks = storage.iter_metrics_chunks(since, until, chunk_size, db_path, host)
+    if fmt == "parquet":
+        if output == "-":
+            raise ValueError("Parquet export needs an output file")
+        return write_parquet(chunks, output)
+
+    write = write_csv if fmt == "csv" else write_jsonl
+    if output == "-":
+        return write(chunks, sys.stdout)
+    with open(output, "w", newline="", encoding="utf-8") as file:
+        return write(chunks, file)
@@ -0,0 +1,239 @@
+import json
+import queue
+import sys
+import threading
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+
+from config.config import (DB_PATH, INGEST_BIND, INGEST_PORT, INGEST_QUEUE_SIZE, INGEST_MAX_SAMPLES, INGEST_MAX_BYTES,
+                           INGEST_WRITE_BATCH_SIZE, INGEST_READ_LIMIT, READ_CACHE_CAPACITY, WRITE_FLUSH_INTERVAL)
+from src import storage
+from src.cache import MetricsCache
+
+# Chemin de la requête d'envoi des échantillons
+INGEST_PATH = "/ingest"
+# Chemin de la requête de lecture des échantillons récents d'un hôte
+METRICS_PATH = "/metrics"
+
+class IngestHandler(BaseHTTPRequestHandler):
+    """
+    Réception des lots envoyés par les agents : POST /ingest avec un corps JSON {"host": ..., "samples": [...]}.
+    Réponses : 202 lot accepté, 400 lot ou Content-Length invalide, 404 chemin inconnu, 413 lot trop grand
+    (échantillons ou octets), 503 file d'écriture pleine.
+    Lecture des échantillons récents d'un hôte : GET /metrics?host=...&limit=... (ou &since=<date ISO>),
+    servie par le cache de lecture du serveur.
+    """
+    # Connexions persistantes : un agent envoie tous ses lots sur la même connexion
+    protocol_version = "HTTP/1.1"
+    # En-têtes et corps de la réponse partent en deux écritures : sans TCP_NODELAY, l'algorithme de Nagle
+    # et l'acquittement retardé de l'agent ajoutent ~40 ms à chaque requête
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        try:
+            length = int(self.headers["Content-Length"])
+            if length < 0:
+                raise ValueError(f"negative length {length}")
+        except (KeyError, TypeError, ValueError) as error:
+            # Corps de taille inconnue : il ne peut pas être lu, la connexion est fermée
+            self.server.ingest.count("rejected")
+            return self.reply(400, {"error": f"invalid Content-Length: {error}"}, {"Connection": "close"})
+        if length > INGEST_MAX_BYTES:
+            # Refus avant lecture : le corps n'est jamais chargé en mémoire
+            return self.reply(413, {"error": f"at most {INGEST_MAX_BYTES} bytes per request"}, {"Connection": "close"})
+        body = self.rfile.read(length)
+        if self.path != INGEST_PATH:
+            return self.reply(404, {"error": "unknown path"})
+
+        try:
+            payload = json.loads(body)
+            host, samples = payload["host"], payload["samples"]
+            if not isinstance(host, str) or not isinstance(samples, list):
+                raise TypeError("host must be a string and samples a list")
+            if len(samples) > INGEST_MAX_SAMPLES:
+                return self.reply(413, {"error": f"at most {INGEST_MAX_SAMPLES} samples per request"})
+            # Validation ici, dans le fil de la requête : le fil d'écriture ne reçoit que des lignes valides
+            rows = [storage.validate_metrics({**sample, 'host': host}) for sample in samples]
+        except (ValueError, KeyError, TypeError) as error:
+            self.server.ingest.count("rejected")
+            return self.reply(400, {"error": str(error)})
+
+        if not self.server.ingest.submit(rows):
+            # Contre-pression : l'agent conserve le lot et réessaie plus tard
+            return self.reply(503, {"error": "ingest queue full"}, {"Retry-After": "1"})
+        self.reply(202, {"accepted": len(rows)})
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path != METRICS_PATH:
+            return self.reply(404, {"error": "unknown path"})
+
+        query = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        try:
+            host = query["host"]
+            limit = int(query.get("limit", INGEST_READ_LIMIT))
+            since = datetime.fromisoformat(query["since"]) if "since" in query else None
+            if not 0 <= limit <= INGEST_MAX_SAMPLES:
+                raise ValueError(f"limit must be between 0 and {INGEST_MAX_SAMPLES}")
+        except (ValueError, KeyError) as error:
+            return self.reply(400, {"error": f"invalid query: {error}"})
+
+        cache = self.server.ingest.cache
+        if since is not None:
+            arrays = cache.get_time_metrics_arrays(since, host=host)
+        else:
+            arrays = cache.get_last_metrics_arrays(limit, host=host)
+        self.reply(200, {
+            "host": host,
+            "timestamps": np.datetime_as_string(arrays.timestamps, unit='ms').tolist(),
+            "cpu": arrays.cpu.tolist(),
+            "ram": arrays.ram.tolist()
+        })
+
+    def reply(self, status, content, headers=None):
+        """
+        Envoi d'une réponse JSON
+        :param status: Code HTTP
+        :param content: Objet sérialisé en JSON dans le corps de la réponse
+        :param headers: En-têtes supplémentaires
+        """
+        body = json.dumps(content).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Pas de ligne de journal par requête : plusieurs dizaines d'agents envoient en continu
+        pass
+
+class IngestServer:
+    """
+    Serveur d'ingestion central : les lots reçus des agents sont validés, mis en file puis écrits
+    par un fil unique au travers d'un storage.MetricsWriter, chaque échantillon étant marqué de son hôte.
+    La file est bornée : quand l'écriture ne suit plus, les agents reçoivent un 503 et réessaient plus tard.
+    Les échantillons écrits alimentent un cache de lecture partagé avec les requêtes GET /metrics.
+    """
+
+    def __init__(self, address=(INGEST_BIND, INGEST_PORT), db_path=DB_PATH, queue_size=INGEST_QUEUE_SIZE,
+                 batch_size=INGEST_WRITE_BATCH_SIZE, flush_interval=WRITE_FLUSH_INTERVAL,
+                 cache_capacity=READ_CACHE_CAPACITY):
+        """
+        :param address: Couple (adresse, port) d'écoute ; port 0 pour un port libre choisi par le système
+        :param db_path: Chemin de la base de données
+        :param queue_size: Nombre maximal de lots en attente d'écriture
+        :param batch_size: Nombre d'échantillons accumulés avant écriture (voir storage.MetricsWriter)
+        :param flush_interval: Délai maximal (en secondes) avant écriture
+        :param cache_capacity: Nombre d'échantillons récents, tous hôtes confondus, conservés en mémoire pour les lectures
+        """
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.cache_capacity = cache_capacity
+        self.cache = None
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.stats = {"accepted": 0, "rejected": 0, "throttled": 0, "written": 0, "failed": 0}
+        self.lock = threading.Lock()
+        self.threads = []
+
+        self.httpd = ThreadingHTTPServer(address, IngestHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.ingest = self
+        self.address = self.httpd.server_address
+
+    def count(self, name, value=1):
+        """
+        Incrément d'un compteur de self.stats
+        """
+        with self.lock:
+            self.stats[name] += value
+
+    def submit(self, rows):
+        """
+        Mise en file d'un lot validé, sans attente
+        :param rows: Liste de tuples retournés par storage.validate_metrics
+        :return: False si la file est pleine
+        """
+        try:
+            self.queue.put_nowait(rows)
+        except queue.Full:
+            self.count("throttled")
+            return False
+        self.count("accepted", len(rows))
+        return True
+
+    def _write(self, writer, rows=None):
+        """
+        Ajout d'un lot à l'écrivain (ou écriture du tampon si 'rows' est None).
+        Un échec d'écriture abandonne les échantillons en tampon sans arrêter le fil d'écriture :
+        la file continue d'être vidée et les lots suivants sont écrits.
+        """
+        try:
+            self.count("written", writer.flush() if rows is None else writer.extend(rows))
+        except Exception as error:
+            self.count("failed", len(writer.buffer))
+            print(f"[!] Ingest write failed, {len(writer.buffer)} samples dropped: {error!r}", file=sys.stderr)
+            writer.buffer = []
+
+    def _write_loop(self):
+        """
+        Écriture des lots en file jusqu'à la réception de None
+        """
+        # La connexion SQLite est créée dans le fil qui l'utilise
+        with storage.MetricsWriter(self.db_path, self.batch_size, self.flush_interval, cache=self.cache) as writer:
+            while True:
+                try:
+                    rows = self.queue.get(timeout=self.flush_interval)
+                except queue.Empty:
+                    self._write(writer)
+                    continue
+                if rows is None:
+                    break
+                # Les lots de tous les agents sont regroupés en transactions de 'batch_size' échantillons
+                self._write(writer, rows)
+            self._write(writer)
+
+    def start(self):
+        """
+        Démarrage du fil d'écriture et du serveur HTTP en arrière-plan
+        """
+        storage.init_database(self.db_path)
+        self.cache = MetricsCache(self.db_path, self.cache_capacity)
+        self.threads = [threading.Thread(target=self._write_loop, daemon=True),
+                        threading.Thread(target=self.httpd.serve_forever, daemon=True)]
+        for thread in self.threads:
+            thread.start()
+
+    def close(self):
+        """
+        Arrêt du serveur HTTP puis écriture des lots restants
+        """
+        if not self.threads:
+            return
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        # Attente bornée : la file pleine n'est vidée que si le fil d'écriture est toujours actif
+        writer = self.threads[0]
+        while writer.is_alive():
+            try:
+                self.queue.put(None, timeout=0.1)
+                break
+            except queue.Full:
+                continue
+        for thread in self.threads:
+            thread.join()
+        self.threads = []
+        self.cache.close()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,185 @@
+import functools
+import os
+import time
+
+import numpy as np
+import psutil
+
+from config.config import INSTRUMENT_ENABLED
+
+# Activation des mesures ; désactivées, les fonctions instrumentées ne font qu'un test de plus
+ENABLED = INSTRUMENT_ENABLED
+
+# Histogramme en puissances de 2 : la case b compte les durées de b bits (de 2^(b-1) à 2^b - 1 ns)
+BUCKETS = 64
+HISTOGRAM_DTYPE = np.dtype('<i8')
+
+# Percentiles affichés par 'cli selfstats'
+PERCENTILES = (50, 95, 99)
+
+class Stage:
+    """
+    Mesures accumulées d'une étape depuis la dernière écriture
+    """
+    __slots__ = ('count', 'total', 'max', 'buckets')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0
+        self.max = 0
+        self.buckets = [0] * BUCKETS
+
+# Étape -> Stage, remis à zéro à chaque écriture (voir write)
+stages = {}
+
+# Temps CPU et horloge à la dernière écriture, pour l'utilisation CPU du moniteur lui-même
+_last_usage = (time.process_time(), time.monotonic())
+
+def set_enabled(enabled):
+    """
+    Activation ou désactivation des mesures
+    :param enabled: Booléen
+    """
+    global ENABLED
+    ENABLED = enabled
+
+def record(stage, duration_ns):
+    """
+    Ajout d'une mesure
+    :param stage: Nom de l'étape (ex : 'collector.cpu')
+    :param duration_ns: Durée (en nanosecondes)
+    """
+    stats = stages.get(stage)
+    if stats is None:
+        stats = stages[stage] = Stage()
+    duration_ns = max(0, int(duration_ns))
+    stats.count += 1
+    stats.total += duration_ns
+    if duration_ns > stats.max:
+        stats.max = duration_ns
+    stats.buckets[min(duration_ns.bit_length(), BUCKETS - 1)] += 1
+
+def timed(stage):
+    """
+    Décorateur de mesure de la durée de chaque appel
+    :param stage: Nom de l'étape
+    """
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not ENABLED:
+                return func(*args, **kwargs)
+            start = time.perf_counter_ns()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record(stage, time.perf_counter_ns() - start)
+        return wrapper
+    return decorate
+
+def create_tables(conn):
+    """
+    Création des tables des mesures internes : une ligne par étape et par écriture, et l'utilisation
+    CPU/mémoire du moniteur à chaque écriture
+    :param conn: Connexion à la base de données
+    """
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS selfstats (
+            ts INTEGER NOT NULL,
+            pid INTEGER NOT NULL,
+            stage TEXT NOT NULL,
+            count INTEGER NOT NULL,
+            total_ns INTEGER NOT NULL,
+            max_ns INTEGER NOT NULL,
+            histogram BLOB NOT NULL
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_selfstats_ts ON selfstats (ts)")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS selfstats_process (
+            ts INTEGER NOT NULL,
+            pid INTEGER NOT NULL,
+            cpu_percent REAL NOT NULL,
+            rss INTEGER NOT NULL
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_selfstats_process_ts ON selfstats_process (ts)")
+
+def write(conn, ts):
+    """
+    Écriture des mesures accumulées depuis l'écriture précédente, à appeler dans une transaction
+    :param conn: Connexion à la base de données
+    :param ts: Date de l'écriture (en ms depuis EPOCH)
+    """
+    global stages, _last_usage
+    snapshot, stages = stages, {}
+    pid = os.getpid()
+    conn.executemany("""
+        INSERT INTO selfstats (ts, pid, stage, count, total_ns, max_ns, histogram)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    """, [
+        (ts, pid, name, stats.count, stats.total, stats.max, np.array(stats.buckets, dtype=HISTOGRAM_DTYPE).tobytes())
+        for name, stats in snapshot.items()
+    ])
+
+    cpu_time, clock = time.process_time(), time.monotonic()
+    elapsed = clock - _last_usage[1]
+    cpu_percent = (cpu_time - _last_usage[0]) / elapsed * 100 if elapsed > 0 else 0.0
+    _last_usage = (cpu_time, clock)
+    conn.execute("INSERT INTO selfstats_process (ts, pid, cpu_percent, rss) VALUES (?, ?, ?, ?)",
+                 (ts, pid, cpu_percent, psutil.Process().memory_info().rss))
+
+def decode_histogram(blob):
+    """
+    Décodage d'un histogramme de la colonne selfstats.histogram
+    :param blob: BLOB écrit par write
+    :return: Tableau int64 de BUCKETS cases
+    """
+    return np.frombuffer(blob, dtype=HISTOGRAM_DTYPE)
+
+def histogram_percentile(histogram, percentile):
+    """
+    Percentile d'un histogramme en puissances de 2
+    :param histogram: Comptes par case
+    :param percentile: Percentile voulu (0 à 100)
+    :return: Borne supérieure (en ns) de la case contenant le percentile ; 0 si l'histogramme est vide
+    """
+    total = histogram.sum()
+    if total == 0:
+        return 0
+    bucket = int(np.searchsorted(np.cumsum(histogram), total * percentile / 100))
+    return 2 ** bucket - 1
+
+def format_duration(ns):
+    """
+    Mise en forme d'une durée
+    :param ns: Durée (en nanosecondes)
+    :return: Chaîne avec unité (ex : '1.5ms')
+    """
+    for unit, scale in (("s", 1e9), ("ms", 1e6), ("us", 1e3)):
+        if ns >= scale:
+            return f"{ns / scale:.1f}{unit}"
+    return f"{ns:.0f}ns"
+
+def format_selfstats(stats):
+    """
+    Mise en forme des mesures internes d'une période
+    :param stats: Tuple retourné par storage.get_selfstats
+    :return: Chaîne à afficher
+    """
+    stage_stats, process = stats
+    header = f"{'stage':<34}{'count':>9}{'mean':>10}" + "".join(f"{f'p{p}':>10}" for p in PERCENTILES) + f"{'max':>10}"
+    lines = [header]
+    for name, values in sorted(stage_stats.items()):
+        mean = values['total_ns'] / values['count'] if values['count'] else 0
+        percentiles = [histogram_percentile(values['histogram'], p) for p in PERCENTILES]
+        lines.append(f"{name:<34}{values['count']:>9}{format_duration(mean):>10}"
+                     + "".join(f"{'<' + format_duration(value):>10}" for value in percentiles)
+                     + f"{format_duration(values['max_ns']):>10}")
+    if not stage_stats:
+        lines.append("(no measurements)")
+
+    if len(process):
+        lines += ["", f"Monitor process: CPU mean {process['cpu_percent'].mean():.2f}% max {process['cpu_percent'].max():.2f}% | "
+                      f"RSS last {process['rss'][-1] / 2 ** 20:.1f} MB max {process['rss'].max() / 2 ** 20:.1f} MB"]
+    return "\n".join(lines)
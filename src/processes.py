@@ -0,0 +1,126 @@
+import json
+
+# Champs d'un processus, dans l'ordre produit par collector.get_top_processes
+FIELDS = ('pid', 'name', 'cpu_percent')
+
+def create_tables(conn):
+    """
+    Création des tables des processus : dictionnaire des noms et processus de chaque échantillon
+    :param conn: Connexion à la base de données
+    """
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS process_names (
+            id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL UNIQUE
+        )
+    """)
+    # 'rank' conserve l'ordre de la liste d'origine (0 = processus le plus consommateur)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS metric_processes (
+            metric_id INTEGER NOT NULL,
+            rank INTEGER NOT NULL,
+            pid INTEGER NOT NULL,
+            name_id INTEGER NOT NULL,
+            cpu_percent REAL NOT NULL,
+            PRIMARY KEY (metric_id, rank)
+        ) WITHOUT ROWID
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_metric_processes_name ON metric_processes (name_id, metric_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_metric_processes_pid ON metric_processes (pid, metric_id)")
+
+def validate(processes):
+    """
+    Vérification d'une liste de processus
+    :param processes: Liste de dictionnaires contenant au moins pid (entier), name (chaîne) et cpu_percent (nombre)
+    """
+    if not isinstance(processes, list):
+        raise TypeError("top_processes must be a list")
+    for proc in processes:
+        if not isinstance(proc, dict) or not all(field in proc for field in FIELDS):
+            raise TypeError("top_processes items must be dicts with pid, name and cpu_percent")
+        # Types vérifiés ici : un lot reçu par le serveur d'ingestion ne doit pas échouer à l'écriture
+        pid, name, cpu_percent = proc['pid'], proc['name'], proc['cpu_percent']
+        if not isinstance(pid, int) or isinstance(pid, bool):
+            raise TypeError("top_processes pid must be an integer")
+        if not isinstance(name, str):
+            raise TypeError("top_processes name must be a string")
+        if not isinstance(cpu_percent, (int, float)) or isinstance(cpu_percent, bool):
+            raise TypeError("top_processes cpu_percent must be a number")
+
+def intern_names(conn, names, cache):
+    """
+    Identifiants des noms de processus, créés au besoin
+    :param conn: Connexion à la base de données
+    :param names: Noms à résoudre
+    :param cache: Dictionnaire nom -> identifiant, complété au fil des appels
+    :return: Le dictionnaire 'cache'
+    """
+    missing = {name for name in names if name not in cache}
+    for name in missing:
+        conn.execute("INSERT OR IGNORE INTO process_names (name) VALUES (?)", (name,))
+        cache[name] = conn.execute("SELECT id FROM process_names WHERE name = ?", (name,)).fetchone()[0]
+    return cache
+
+def write(conn, metric_ids, process_lists, cache):
+    """
+    Écriture des processus de plusieurs échantillons
+    :param conn: Connexion à la base de données
+    :param metric_ids: Identifiants des échantillons dans la table 'metrics'
+    :param process_lists: Liste de processus de chaque échantillon
+    :param cache: Dictionnaire nom -> identifiant (voir intern_names)
+    """
+    intern_names(conn, (proc['name'] for processes in process_lists for proc in processes), cache)
+    conn.executemany("""
+        INSERT INTO metric_processes (metric_id, rank, pid, name_id, cpu_percent)
+        VALUES (?, ?, ?, ?, ?)
+    """, [
+        (metric_id, rank, proc['pid'], cache[proc['name']], proc['cpu_percent'])
+        for metric_id, processes in zip(metric_ids, process_lists)
+        for rank, proc in enumerate(processes)
+    ])
+
+def load_json(conn, metric_filter, params):
+    """
+    Lecture des processus d'un ensemble d'échantillons, au format JSON historique de la colonne top_processes
+    :param conn: Connexion à la base de données
+    :param metric_filter: Requête SQL retournant les identifiants des échantillons voulus
+    :param params: Paramètres de la requête
+    :return: Dictionnaire identifiant d'échantillon -> liste JSON des processus
+    """
+    grouped = {}
+    for metric_id, pid, name, cpu_percent in conn.execute(f"""
+        SELECT mp.metric_id, mp.pid, pn.name, mp.cpu_percent
+        FROM metric_processes mp
+        JOIN process_names pn ON pn.id = mp.name_id
+        WHERE mp.metric_id IN ({metric_filter})
+        ORDER BY mp.metric_id, mp.rank
+    """, params):
+        grouped.setdefault(metric_id, []).append({'pid': pid, 'name': name, 'cpu_percent': cpu_percent})
+    return {metric_id: json.dumps(processes) for metric_id, processes in grouped.items()}
+
+def dump_json(processes):
+    """
+    Liste de processus au format JSON de load_json, sans passer par la base
+    :param processes: Liste de dictionnaires contenant au moins pid, name et cpu_percent
+    :return: Liste JSON identique à celle que load_json retournera une fois la liste écrite
+    """
+    # Mêmes conversions que les colonnes INTEGER et REAL de metric_processes
+    return json.dumps([
+        {'pid': int(proc['pid']), 'name': str(proc['name']), 'cpu_percent': float(proc['cpu_percent'])}
+        for proc in processes
+    ])
+
+def migrate_json(conn, chunk_size=10_000):
+    """
+    Transfert des listes JSON de la colonne metrics.top_processes vers les tables des processus
+    :param conn: Connexion à la base de données
+    :param chunk_size: Nombre d'échantillons traités par lot
+    """
+    cache = {}
+    cursor = conn.execute("SELECT id, top_processes FROM metrics WHERE top_processes IS NOT NULL AND top_processes != '[]'")
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            break
+        process_lists = [json.loads(raw) for _, raw in rows]
+        write(conn, [metric_id for metric_id, _ in rows], process_lists, cache)
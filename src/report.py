@@ -1,35 +1,293 @@
-import os
-import matplotlib.pyplot as plt
-
-from config.config import DATA_PATH, DB_PATH
-from src import storage
-
-def generate_plot(limit=100, since=None, save=False, filename="report.png", db_path=DB_PATH):
-    """
-    Génération d'un graphique des données enregistrées
-    :param limit: Nombre maximum de données à afficher
-    :param since: Date de début des données à afficher
-    :param save: Booléen indiquant la volonté d'enregistrer le fichier
-    :param filename: Nom du fichier s'il est enregistré
-    :param db_path: Chemin de la base de données
-    """
-    if since:
-        timestamps, cpu, ram, _ = storage.get_last_time_metrics(since, db_path)
-    else:
-        timestamps, cpu, ram, _ = storage.get_last_metrics(limit, db_path)
-
-    plt.figure(figsize=(12, 6))
-    plt.plot(timestamps, cpu, label="CPU Usage (%)", marker='o')
-    plt.plot(timestamps, ram, label="RAM Usage (%)", marker='s')
-    plt.xlabel("Time")
-    plt.ylabel("Usage (%)")
-    plt.title("System Metrics Over Time")
-    plt.legend()
-    plt.grid(True)
-    plt.tight_layout()
-
-    if save:
-        plt.savefig(os.path.join(DATA_PATH, filename))
-        print(f"[✓] Report saved as {filename}")
-    else:
-        plt.show()
\ No newline at end of file
+import json
+import os
+import numpy as np
+
+from config.config import (DATA_PATH, DB_PATH, REPORT_MAX_POINTS, STATS_WINDOW, STATS_THRESHOLD, STATS_EWMA_ALPHA,
+                           STATS_EWMA_BLOCK)
+from src import storage
+from src.backends import SQLiteBackend
+
+# Percentiles calculés pour chaque série
+PERCENTILES = (50, 95, 99)
+
+# Méthodes de détection des anomalies
+ANOMALY_METHODS = ("zscore", "ewma")
+
+def _pyplot(save):
+    """
+    Import différé de matplotlib : seules les commandes qui tracent un graphique paient son temps de chargement
+    :param save: Booléen indiquant un enregistrement dans un fichier : le backend non interactif Agg est alors imposé
+    :return: Module matplotlib.pyplot
+    """
+    import matplotlib
+    if save:
+        # Aucun affichage : ni fenêtre, ni dépendance à un serveur graphique
+        matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    return plt
+
+def decimate_minmax(timestamps, values, columns=REPORT_MAX_POINTS):
+    """
+    Réduction d'une série à au plus deux points par colonne de pixels : le minimum et le maximum de chaque colonne,
+    dans leur ordre d'apparition. Le tracé obtenu est identique à l'œil, pics compris.
+    :param timestamps: Dates de la série (triées)
+    :param values: Valeurs de la série
+    :param columns: Nombre de colonnes (largeur du graphique en pixels)
+    :return: Tuple (timestamps, values) réduit ; la série d'origine si elle est déjà assez courte
+    """
+    count = len(values)
+    if count <= 2 * columns:
+        return timestamps, values
+    size = -(-count // columns)  # Échantillons par colonne, arrondi supérieur
+    full = count // size * size
+    bins = np.asarray(values[:full]).reshape(-1, size)
+    offsets = np.arange(0, full, size)
+    indices = [bins.argmin(axis=1) + offsets, bins.argmax(axis=1) + offsets]
+    if full < count:
+        tail = values[full:]
+        indices.append(np.array([tail.argmin(), tail.argmax()]) + full)
+    indices = np.unique(np.concatenate(indices))
+    return timestamps[indices], values[indices]
+
+def generate_plot(limit=100, since=None, save=False, filename="report.png", db_path=DB_PATH, max_points=REPORT_MAX_POINTS,
+                  host=storage.LOCAL_HOST, backend=None):
+    """
+    Génération d'un graphique des données enregistrées
+    :param limit: Nombre maximum de données à afficher
+    :param since: Date de début des données à afficher
+    :param save: Booléen indiquant la volonté d'enregistrer le fichier
+    :param filename: Nom du fichier s'il est enregistré
+    :param db_path: Chemin de la base de données
+    :param max_points: Nombre de points visé (largeur du graphique en pixels) : au-delà, les agrégats sont utilisés
+                       sur une période, et les données brutes sont réduites au minimum et au maximum par colonne
+    :param host: Hôte des données (voir src/ingest.py) ; par défaut la machine locale
+    :param backend: Moteur de stockage lu (voir src/backends.py) ; None pour la base SQLite 'db_path'
+    """
+    backend = backend or SQLiteBackend(db_path, host)
+    resolution = None
+    if since:
+        resolution = backend.choose_resolution(since, max_points=max_points)
+
+    plt = _pyplot(save)
+    plt.figure(figsize=(12, 6))
+    if resolution is None:
+        if since:
+            timestamps, cpu, ram = backend.read_range(since)
+        else:
+            timestamps, cpu, ram = backend.read_last(limit)
+        # Lignes seules (sans marqueur par point), sur au plus deux points par colonne de pixels
+        plt.plot(*decimate_minmax(timestamps, cpu, max_points), label="CPU Usage (%)")
+        plt.plot(*decimate_minmax(timestamps, ram, max_points), label="RAM Usage (%)")
+    else:
+        # Moyenne par seau, encadrée par le minimum et le maximum
+        series = backend.read_rollup(resolution, since)
+        plt.plot(series.timestamps, series.cpu_avg, label=f"CPU Usage (%, {resolution} avg)")
+        plt.fill_between(series.timestamps, series.cpu_min, series.cpu_max, alpha=0.2)
+        plt.plot(series.timestamps, series.ram_avg, label=f"RAM Usage (%, {resolution} avg)")
+        plt.fill_between(series.timestamps, series.ram_min, series.ram_max, alpha=0.2)
+    plt.xlabel("Time")
+    plt.ylabel("Usage (%)")
+    plt.title("System Metrics Over Time")
+    plt.legend()
+    plt.grid(True)
+    plt.tight_layout()
+
+    if save:
+        plt.savefig(os.path.join(DATA_PATH, filename))
+        plt.close()
+        print(f"[✓] Report saved as {filename}")
+    else:
+        plt.show()
+
+
+def rolling_mean(values, window=STATS_WINDOW):
+    """
+    Moyenne glissante sur 'window' échantillons, par sommes cumulées (sans boucle Python)
+    :param values: Série de valeurs
+    :param window: Nombre d'échantillons de la fenêtre
+    :return: Tableau float64 de même taille ; NaN tant que la fenêtre n'est pas complète
+    """
+    values = np.asarray(values, dtype=np.float64)
+    result = np.full(len(values), np.nan)
+    if window <= 0 or len(values) < window:
+        return result
+    cumsum = np.cumsum(np.concatenate(([0.0], values)))
+    result[window - 1:] = (cumsum[window:] - cumsum[:-window]) / window
+    return result
+
+def ewma(values, alpha=STATS_EWMA_ALPHA, block=STATS_EWMA_BLOCK):
+    """
+    Moyenne mobile exponentielle : y[0] = x[0], puis y[t] = (1 - alpha) * y[t-1] + alpha * x[t].
+    La récurrence est résolue par blocs de 'block' échantillons : dans un bloc, y s'exprime par une somme cumulée
+    pondérée par des puissances de (1 - alpha), que l'on garde dans l'intervalle des float64 en limitant le bloc.
+    :param values: Série de valeurs
+    :param alpha: Poids du nouvel échantillon (0 < alpha <= 1)
+    :param block: Taille des blocs
+    :return: Tableau float64 de même taille
+    """
+    values = np.asarray(values, dtype=np.float64)
+    result = np.empty(len(values))
+    if not len(values):
+        return result
+    decay = 1.0 - alpha
+    if decay == 0:
+        return values.copy()
+    # Au-delà de 1e-300, les puissances inverses de 'decay' dépasseraient les float64
+    block = max(1, min(block, int(-300 / np.log10(decay))))
+    powers = decay ** np.arange(1, block + 1)
+    previous = values[0]
+    for start in range(0, len(values), block):
+        chunk = values[start:start + block]
+        weights = powers[:len(chunk)]
+        # y[k] = decay^(k+1) * y[-1] + alpha * sum_{j<=k} decay^(k-j) * x[j]
+        result[start:start + len(chunk)] = weights * (previous + alpha * np.cumsum(chunk / weights))
+        previous = result[start + len(chunk) - 1]
+    return result
+
+def zscore_anomalies(values, threshold=STATS_THRESHOLD):
+    """
+    Anomalies par score z : échantillons éloignés de la moyenne de plus de 'threshold' écarts-types
+    :param values: Série de valeurs
+    :param threshold: Seuil en nombre d'écarts-types
+    :return: Masque booléen des anomalies
+    """
+    values = np.asarray(values, dtype=np.float64)
+    std = values.std() if len(values) else 0.0
+    if std == 0:
+        return np.zeros(len(values), dtype=bool)
+    return np.abs(values - values.mean()) > threshold * std
+
+def ewma_anomalies(values, threshold=STATS_THRESHOLD, alpha=STATS_EWMA_ALPHA, warmup=STATS_WINDOW):
+    """
+    Anomalies par rapport à la tendance récente : échantillons éloignés de la moyenne mobile exponentielle précédente
+    de plus de 'threshold' écarts-types mobiles (variance mobile exponentielle des écarts)
+    :param values: Série de valeurs
+    :param threshold: Seuil en nombre d'écarts-types
+    :param alpha: Poids du nouvel échantillon dans les moyennes mobiles
+    :param warmup: Nombre de premiers échantillons jamais signalés, le temps que les moyennes se stabilisent
+    :return: Masque booléen des anomalies
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if len(values) < 2:
+        return np.zeros(len(values), dtype=bool)
+    mean = ewma(values, alpha)
+    # Écart de chaque échantillon à la moyenne précédente, puis variance mobile de ces écarts
+    deviation = values[1:] - mean[:-1]
+    variance = ewma(np.concatenate(([0.0], (1.0 - alpha) * deviation ** 2)), alpha)
+    flags = np.zeros(len(values), dtype=bool)
+    flags[1:] = np.abs(deviation) > threshold * np.sqrt(variance[:-1])
+    flags[:warmup] = False
+    return flags
+
+def compute_series_stats(values, window=STATS_WINDOW, method="zscore", threshold=STATS_THRESHOLD):
+    """
+    Statistiques d'une série : extrêmes, moyenne, écart-type, percentiles, moyenne glissante et anomalies
+    :param values: Série de valeurs
+    :param window: Fenêtre de la moyenne glissante (en échantillons)
+    :param method: Méthode de détection des anomalies (voir ANOMALY_METHODS)
+    :param threshold: Seuil de détection (en écarts-types)
+    :return: Dictionnaire ; None pour les statistiques d'une série vide
+    """
+    if method not in ANOMALY_METHODS:
+        raise ValueError(f"Méthode de détection inconnue : {method}")
+    values = np.asarray(values, dtype=np.float64)
+    rolling = rolling_mean(values, window)
+    if method == "zscore":
+        anomalies = zscore_anomalies(values, threshold)
+    else:
+        anomalies = ewma_anomalies(values, threshold, warmup=window)
+
+    empty = not len(values)
+    stats = {
+        'min': None if empty else float(values.min()),
+        'max': None if empty else float(values.max()),
+        'mean': None if empty else float(values.mean()),
+        'std': None if empty else float(values.std()),
+    }
+    percentiles = np.percentile(values, PERCENTILES) if not empty else [None] * len(PERCENTILES)
+    stats.update({f"p{p}": None if value is None else float(value) for p, value in zip(PERCENTILES, percentiles)})
+    # Pic de la moyenne glissante : charge la plus élevée tenue sur toute une fenêtre
+    stats['rolling_max'] = float(np.nanmax(rolling)) if not np.isnan(rolling).all() else None
+    stats['rolling_mean'] = rolling
+    stats['anomalies'] = np.flatnonzero(anomalies)
+    return stats
+
+def compute_stats(since, until=None, db_path=DB_PATH, host=storage.LOCAL_HOST, window=STATS_WINDOW, method="zscore",
+                  threshold=STATS_THRESHOLD, backend=None):
+    """
+    Statistiques du CPU et de la RAM sur une période
+    :param since: Date de début (incluse)
+    :param until: Date de fin (exclue) ; None pour aller jusqu'à la dernière ligne
+    :param db_path: Chemin de la base de données
+    :param host: Hôte des données (voir src/ingest.py) ; par défaut la machine locale
+    :param window: Fenêtre de la moyenne glissante (en échantillons)
+    :param method: Méthode de détection des anomalies (voir ANOMALY_METHODS)
+    :param threshold: Seuil de détection (en écarts-types)
+    :param backend: Moteur de stockage lu (voir src/backends.py) ; None pour la base SQLite 'db_path'
+    :return: Dictionnaire avec la période, le nombre d'échantillons, les dates et les statistiques de 'cpu' et 'ram'
+    """
+    arrays = (backend or SQLiteBackend(db_path, host)).read_range(since, until)
+    return {
+        'host': host,
+        'since': since,
+        'until': until,
+        'count': len(arrays.timestamps),
+        'method': method,
+        'window': window,
+        'threshold': threshold,
+        'timestamps': arrays.timestamps,
+        'cpu': compute_series_stats(arrays.cpu, window, method, threshold),
+        'ram': compute_series_stats(arrays.ram, window, method, threshold),
+    }
+
+def stats_to_dict(stats):
+    """
+    Conversion des statistiques en types JSON : dates ISO, anomalies datées, sans la moyenne glissante complète
+    :param stats: Dictionnaire retourné par compute_stats
+    :return: Dictionnaire sérialisable
+    """
+    timestamps = stats['timestamps'].astype('datetime64[ms]').astype(str)
+    result = {
+        'host': stats['host'],
+        'since': stats['since'].isoformat() if stats['since'] else None,
+        'until': stats['until'].isoformat() if stats['until'] else None,
+        'count': stats['count'],
+        'method': stats['method'],
+        'window': stats['window'],
+        'threshold': stats['threshold'],
+    }
+    for name in ('cpu', 'ram'):
+        series = {key: value for key, value in stats[name].items() if key not in ('rolling_mean', 'anomalies')}
+        series['anomalies'] = timestamps[stats[name]['anomalies']].tolist()
+        result[name] = series
+    return result
+
+def format_stats(stats, output="text"):
+    """
+    Mise en forme des statistiques
+    :param stats: Dictionnaire retourné par compute_stats
+    :param output: 'text' pour un tableau lisible, 'json' pour un document JSON
+    :return: Chaîne à afficher
+    """
+    data = stats_to_dict(stats)
+    if output == "json":
+        return json.dumps(data, indent=2)
+
+    period = f"{data['since']} -> {data['until'] or 'now'}"
+    lines = [
+        f"Host: {data['host'] or 'local'}  Period: {period}  Samples: {data['count']}",
+        "",
+        f"{'':<6}" + "".join(f"{key:>9}" for key in ('min', 'mean', 'max', 'std', *(f'p{p}' for p in PERCENTILES),
+                                                      'roll.max', 'anomal.')),
+    ]
+    for name in ('cpu', 'ram'):
+        series = data[name]
+        values = [series[key] for key in ('min', 'mean', 'max', 'std', *(f'p{p}' for p in PERCENTILES), 'rolling_max')]
+        lines.append(f"{name.upper():<6}" + "".join("        -" if value is None else f"{value:>9.2f}" for value in values)
+                     + f"{len(series['anomalies']):>9}")
+    lines += ["", f"Anomalies ({data['method']}, threshold {data['threshold']}, rolling window {data['window']} samples):"]
+    for name in ('cpu', 'ram'):
+        anomalies = data[name]['anomalies']
+        shown = ", ".join(anomalies[:10]) + (f" ... (+{len(anomalies) - 10})" if len(anomalies) > 10 else "")
+        lines.append(f"  {name.upper()}: {shown or 'none'}")
+    return "\n".join(lines)
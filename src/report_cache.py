@@ -0,0 +1,158 @@
+import os
+import sqlite3
+import time
+from datetime import datetime
+
+import numpy as np
+
+from config.config import DB_BUSY_TIMEOUT, DB_PATH, REPORT_CACHE_PATH, REPORT_CACHE_MAX_BYTES, ROLLUP_RESOLUTIONS
+from src import instrument, rollup, storage
+
+INT64_MAX = np.iinfo(np.int64).max
+
+class ReportCache:
+    """
+    Cache persistant des séries agrégées lues par les rapports, dans une base SQLite séparée : un rapport relancé
+    (ex : 'cli report --last day' toutes les minutes) ne relit dans la base des métriques que les seaux récents.
+
+    Une entrée par base, hôte et résolution contient les seaux fermés de la dernière période lue (tous sauf le dernier,
+    encore en cours de remplissage) et l'identifiant de la dernière ligne brute vue. À la lecture, les lignes brutes
+    insérées depuis sont examinées : seuls les seaux à partir de la plus ancienne date insérée sont relus
+    (échantillons reçus en retard, ex : serveur d'ingestion). Une base recréée ou des seaux supprimés par la rétention
+    invalident l'entrée. Au-delà de 'max_bytes', les entrées les moins récemment utilisées sont supprimées.
+    """
+
+    def __init__(self, path=REPORT_CACHE_PATH, max_bytes=REPORT_CACHE_MAX_BYTES):
+        """
+        :param path: Chemin de la base du cache
+        :param max_bytes: Taille maximale des séries conservées (en octets)
+        """
+        self.max_bytes = max_bytes
+        self.stats = {"hits": 0, "misses": 0, "buckets_read": 0}
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(path, timeout=DB_BUSY_TIMEOUT)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        # Cache reconstructible : pas de synchronisation disque à chaque écriture
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        with self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS report_series (
+                    db_path TEXT NOT NULL,
+                    host TEXT NOT NULL,
+                    resolution TEXT NOT NULL,
+                    start INTEGER NOT NULL,
+                    watermark INTEGER NOT NULL,
+                    last_id INTEGER NOT NULL,
+                    used REAL NOT NULL,
+                    data BLOB NOT NULL,
+                    PRIMARY KEY (db_path, host, resolution)
+                )
+            """)
+
+    def _load(self, key):
+        """
+        :return: Tuple (début, watermark, dernier identifiant, seaux storage.ROLLUP_DTYPE), ou None
+        """
+        row = self.conn.execute("""
+            SELECT start, watermark, last_id, data
+            FROM report_series
+            WHERE db_path = ? AND host = ? AND resolution = ?
+        """, key).fetchone()
+        if row is None:
+            return None
+        return row[0], row[1], row[2], np.frombuffer(row[3], dtype=storage.ROLLUP_DTYPE)
+
+    def _store(self, key, start, watermark, last_id, rows):
+        with self.conn:
+            self.conn.execute("""
+                INSERT OR REPLACE INTO report_series (db_path, host, resolution, start, watermark, last_id, used, data)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """, (*key, start, watermark, last_id, time.time(), rows.tobytes()))
+            # Éviction LRU : les entrées les plus anciennement utilisées en premier, jamais celle qui vient d'être écrite
+            total = self.conn.execute("SELECT COALESCE(SUM(LENGTH(data)), 0) FROM report_series").fetchone()[0]
+            for db_path, host, resolution, size in self.conn.execute("""
+                SELECT db_path, host, resolution, LENGTH(data) FROM report_series ORDER BY used ASC
+            """).fetchall():
+                if total <= self.max_bytes or (db_path, host, resolution) == key:
+                    break
+                self.conn.execute("DELETE FROM report_series WHERE db_path = ? AND host = ? AND resolution = ?",
+                                  (db_path, host, resolution))
+                total -= size
+
+    @instrument.timed("report_cache.get_rollup_arrays")
+    def get_rollup_arrays(self, resolution, since: datetime, until: datetime = None, db_path=DB_PATH,
+                          host=storage.LOCAL_HOST):
+        """
+        Équivalent de storage.get_rollup_arrays, servi depuis le cache pour les seaux fermés déjà lus
+        :param resolution: Nom de la résolution (voir ROLLUP_RESOLUTIONS, ex : '1m')
+        :param since: Date de début de récupération (incluse, arrondie au début de son seau)
+        :param until: Date de fin de récupération (exclue) ; None pour aller jusqu'au dernier seau
+        :param db_path: Chemin de la base de données
+        :param host: Hôte des agrégats
+        :return: storage.RollupArrays
+        """
+        seconds = dict(ROLLUP_RESOLUTIONS).get(resolution)
+        if seconds is None:
+            raise ValueError(f"Résolution inconnue : {resolution}")
+        bucket_ms = seconds * 1000
+        start = storage.to_epoch_ms(since) // bucket_ms * bucket_ms
+        end = storage.to_epoch_ms(until) if until is not None else INT64_MAX
+        key = (os.path.abspath(db_path), host, resolution)
+        entry = self._load(key)
+        table = rollup.table_name(resolution)
+
+        conn = storage.connect(db_path)
+        try:
+            with storage.read_snapshot(conn):
+                last_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM metrics").fetchone()[0]
+                cached, fetch_from = None, start
+                if entry is not None and entry[0] <= start and last_id >= entry[2]:
+                    _, watermark, cached_id, rows = entry
+                    # Plus ancienne date insérée depuis l'entrée : les seaux à partir du sien sont relus.
+                    # NOT INDEXED : parcours des seules lignes d'identifiant > cached_id, pas des index par date
+                    inserted = conn.execute("SELECT MIN(ts) FROM metrics NOT INDEXED WHERE id > ? AND host = ?",
+                                            (cached_id, host)).fetchone()[0]
+                    if inserted is not None:
+                        watermark = min(watermark, inserted // bucket_ms * bucket_ms)
+                    cached = rows[(rows['bucket'] >= start) & (rows['bucket'] < min(watermark, end))]
+                    # Seaux supprimés par la rétention depuis l'entrée : elle n'est plus valable
+                    first = conn.execute(f"SELECT MIN(bucket) FROM {table} WHERE host = ? AND bucket >= ?",
+                                         (host, start)).fetchone()[0]
+                    expected = int(cached['bucket'][0]) if len(cached) else None
+                    if expected != (first if first is not None and first < watermark else None):
+                        cached = None
+                    else:
+                        fetch_from = max(watermark, start)
+                tail = np.fromiter(conn.execute(f"""
+                    SELECT {', '.join(rollup.COLUMNS)}
+                    FROM {table}
+                    WHERE host = ? AND bucket >= ? AND bucket < ?
+                    ORDER BY bucket ASC
+                """, (host, fetch_from, end)), dtype=storage.ROLLUP_DTYPE)
+        finally:
+            conn.close()
+
+        self.stats["hits" if cached is not None else "misses"] += 1
+        self.stats["buckets_read"] += len(tail)
+        rows = tail if cached is None else np.concatenate((cached, tail))
+        if until is None and len(rows) > 1:
+            # Tous les seaux sauf le dernier, qui peut encore recevoir des lignes
+            self._store(key, start, int(rows['bucket'][-1]), last_id, rows[:-1])
+        return storage.RollupArrays(rows['bucket'].astype('datetime64[ms]'), np.ascontiguousarray(rows['count']),
+                                    *(np.ascontiguousarray(rows[column]) for column in rollup.COLUMNS[2:]))
+
+    def clear(self):
+        """
+        Suppression de toutes les entrées
+        """
+        with self.conn:
+            self.conn.execute("DELETE FROM report_series")
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
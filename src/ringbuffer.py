@@ -0,0 +1,90 @@
+import numpy as np
+
+class RingBuffer:
+    """
+    Tampon circulaire de taille fixe sur un tableau NumPy préalloué.
+    L'ajout est en temps constant et sans allocation ; une fois plein, chaque ajout écrase l'élément le plus ancien.
+    Les lectures retournent les éléments dans l'ordre d'ajout (du plus ancien au plus récent).
+    """
+
+    def __init__(self, capacity, dtype=np.float64):
+        """
+        :param capacity: Nombre maximal d'éléments conservés
+        :param dtype: Type des éléments (scalaire ou structuré)
+        """
+        if capacity <= 0:
+            raise ValueError("capacity must be strictly positive")
+        self.data = np.zeros(capacity, dtype=dtype)
+        self.capacity = capacity
+        self.end = 0    # Position du prochain ajout
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def append(self, item):
+        """
+        Ajout d'un élément
+        :param item: Valeur (ou tuple pour un type structuré)
+        """
+        self.data[self.end] = item
+        self.end = (self.end + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+
+    def extend(self, items):
+        """
+        Ajout de plusieurs éléments, en au plus deux copies
+        :param items: Tableau (ou séquence convertible) d'éléments
+        """
+        items = np.asarray(items, dtype=self.data.dtype)[-self.capacity:]
+        count = len(items)
+        head = min(count, self.capacity - self.end)
+        self.data[self.end:self.end + head] = items[:head]
+        self.data[:count - head] = items[head:]
+        self.end = (self.end + count) % self.capacity
+        self.size = min(self.size + count, self.capacity)
+
+    def last(self, n=None):
+        """
+        Derniers éléments ajoutés
+        :param n: Nombre d'éléments ; None pour tous
+        :return: Copie contiguë, du plus ancien au plus récent
+        """
+        n = self.size if n is None else max(0, min(n, self.size))
+        start = self.end - n
+        if start >= 0:
+            return self.data[start:self.end].copy()
+        return np.concatenate((self.data[start:], self.data[:self.end]))
+
+    def first(self, n):
+        """
+        Premiers éléments conservés (les prochains à être écrasés)
+        :param n: Nombre d'éléments
+        :return: Copie contiguë, du plus ancien au plus récent
+        """
+        n = max(0, min(n, self.size))
+        positions = (self.end - self.size + np.arange(n)) % self.capacity
+        return self.data[positions]
+
+    def values(self):
+        """
+        Tous les éléments conservés, du plus ancien au plus récent
+        """
+        return self.last()
+
+    def view(self):
+        """
+        Tous les éléments conservés, sans copie, dans l'ordre de stockage
+        (une fois le tampon plein, cet ordre n'est plus chronologique)
+        """
+        if self.size == self.capacity:
+            return self.data
+        # Avant d'être plein, le tampon est rempli depuis le début : les éléments sont contigus
+        return self.data[self.end - self.size:self.end]
+
+    def clear(self):
+        """
+        Suppression de tous les éléments
+        """
+        self.end = 0
+        self.size = 0
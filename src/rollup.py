@@ -0,0 +1,230 @@
+import numpy as np
+
+from config.config import ROLLUP_RESOLUTIONS
+
+# Lecture des lignes brutes en double précision pour le calcul des agrégats
+RAW_DTYPE = np.dtype([('ts', '<i8'), ('cpu', '<f8'), ('ram', '<f8')])
+
+# Statistiques calculées pour chaque métrique d'un seau
+STATS = ("min", "avg", "max", "p95")
+METRICS = ("cpu", "ram")
+COLUMNS = ["bucket", "count"] + [f"{metric}_{stat}" for metric in METRICS for stat in STATS]
+
+def table_name(name):
+    """
+    Nom de la table d'agrégats d'une résolution
+    :param name: Nom de la résolution (ex : '1m')
+    :return: Nom de la table
+    """
+    return f"metrics_{name}"
+
+def create_tables(conn):
+    """
+    Création des tables d'agrégats : une ligne par hôte et par seau, seau = début du seau (ms depuis EPOCH)
+    :param conn: Connexion à la base de données
+    """
+    stats = ", ".join(f"{column} REAL NOT NULL" for column in COLUMNS[2:])
+    for name, _ in ROLLUP_RESOLUTIONS:
+        table = table_name(name)
+        conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS {table} (
+                host TEXT NOT NULL,
+                bucket INTEGER NOT NULL,
+                count INTEGER NOT NULL,
+                {stats},
+                PRIMARY KEY (host, bucket)
+            ) WITHOUT ROWID
+        """)
+        # La rétention supprime les seaux les plus anciens, tous hôtes confondus
+        conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_bucket ON {table} (bucket)")
+
+def _percentile_sorted(values, starts, counts, q):
+    """
+    Percentile (interpolation linéaire) de groupes contigus de valeurs déjà triées dans chaque groupe
+    """
+    # Position relative au groupe : le résultat ne dépend pas de l'emplacement du groupe dans le tableau
+    rank = q * (counts - 1)
+    offset = np.floor(rank).astype(np.int64)
+    low = starts + offset
+    high = starts + np.ceil(rank).astype(np.int64)
+    return values[low] + (values[high] - values[low]) * (rank - offset)
+
+def aggregate(rows, resolution_ms):
+    """
+    Calcul vectorisé des agrégats par seau
+    :param rows: Tableau RAW_DTYPE trié par date
+    :param resolution_ms: Taille des seaux (en millisecondes)
+    :return: Liste de tuples dans l'ordre de COLUMNS
+    """
+    if len(rows) == 0:
+        return []
+    buckets = rows['ts'] // resolution_ms * resolution_ms
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    counts = np.diff(np.r_[starts, len(buckets)])
+
+    columns = [buckets[starts], counts]
+    for metric in METRICS:
+        values = rows[metric]
+        ordered = values[np.lexsort((values, buckets))]
+        columns += [
+            np.minimum.reduceat(values, starts),
+            np.add.reduceat(values, starts) / counts,
+            np.maximum.reduceat(values, starts),
+            _percentile_sorted(ordered, starts, counts, 0.95)
+        ]
+    return list(zip(*(column.tolist() for column in columns)))
+
+# Points connus de la répartition d'un seau : (statistique, part des lignes inférieures), la moyenne tenant lieu de médiane
+_QUANTILE_KNOTS = (("min", 0.0), ("avg", 0.5), ("p95", 0.95), ("max", 1.0))
+
+def _mixture_percentile(counts, knots, q):
+    """
+    Percentile d'un mélange de répartitions linéaires par morceaux
+    :param counts: Nombre de lignes de chaque seau
+    :param knots: Tableau (seaux, 4) des valeurs aux parts de _QUANTILE_KNOTS
+    :param q: Quantile voulu (0 à 1)
+    """
+    knots = np.maximum.accumulate(knots, axis=1)
+    parts = np.diff([part for _, part in _QUANTILE_KNOTS])
+    xs = np.unique(knots)
+    low, high = knots[:, :-1, None], knots[:, 1:, None]
+    width = high - low
+    # Part de chaque morceau de chaque seau sous chaque x : interpolée, ou en marche si le morceau est de largeur nulle
+    with np.errstate(divide='ignore', invalid='ignore'):
+        filled = np.where(width > 0, np.clip((xs - low) / width, 0, 1), (xs >= high).astype(float))
+    cdf = (counts[:, None] * (filled * parts[None, :, None]).sum(axis=1)).sum(axis=0) / counts.sum()
+    j = int(np.searchsorted(cdf, q, side='left'))
+    if j == 0:
+        return float(xs[0])
+    if j == len(xs):
+        return float(xs[-1])
+    return float(xs[j - 1] + (xs[j] - xs[j - 1]) * (q - cdf[j - 1]) / (cdf[j] - cdf[j - 1]))
+
+def approximate_p95(fine, resolution_ms):
+    """
+    p95 des seaux d'une résolution grossière, déduit des seaux de la résolution la plus fine : chaque seau fin
+    est vu comme une répartition linéaire entre son minimum, sa moyenne, son p95 et son maximum
+    (un seau grossier n'est jamais relu en entier)
+    :param fine: Tableau BUCKET_DTYPE des seaux fins, trié par seau
+    :param resolution_ms: Taille des seaux grossiers (en millisecondes)
+    :return: Dictionnaire métrique -> p95 par seau grossier, dans l'ordre des seaux
+    """
+    if len(fine) == 0:
+        return {metric: np.empty(0) for metric in METRICS}
+    groups = fine['bucket'] // resolution_ms * resolution_ms
+    bounds = np.r_[np.flatnonzero(np.r_[True, groups[1:] != groups[:-1]]), len(groups)]
+    counts = fine['count'].astype(np.float64)
+    result = {}
+    for metric in METRICS:
+        knots = np.stack([fine[f"{metric}_{stat}"] for stat, _ in _QUANTILE_KNOTS], axis=1)
+        result[metric] = np.array([_mixture_percentile(counts[start:end], knots[start:end], 0.95)
+                                   for start, end in zip(bounds[:-1], bounds[1:])])
+    return result
+
+# Seaux lus depuis une table d'agrégats ou calculés par aggregate, en double précision
+BUCKET_DTYPE = np.dtype([('bucket', '<i8'), ('count', '<i8')] + [(column, '<f8') for column in COLUMNS[2:]])
+
+def aggregate_levels(rows):
+    """
+    Agrégats de toutes les résolutions tels qu'ils sont stockés : exacts pour la plus fine,
+    p95 approché (voir approximate_p95) pour les plus grossières
+    :param rows: Tableau RAW_DTYPE trié par date
+    :return: Dictionnaire nom de résolution -> tableau BUCKET_DTYPE
+    """
+    (finest, finest_seconds), *coarser = ROLLUP_RESOLUTIONS
+    fine = np.array(aggregate(rows, finest_seconds * 1000), dtype=BUCKET_DTYPE)
+    levels = {finest: fine}
+    for name, seconds in coarser:
+        buckets = np.array(aggregate(rows, seconds * 1000), dtype=BUCKET_DTYPE)
+        for metric, p95 in approximate_p95(fine, seconds * 1000).items():
+            buckets[f"{metric}_p95"] = p95
+        levels[name] = buckets
+    return levels
+
+def _replace_buckets(conn, name, host, buckets):
+    table = table_name(name)
+    conn.executemany(f"INSERT OR REPLACE INTO {table} (host, {', '.join(COLUMNS)}) VALUES (?, {', '.join('?' * len(COLUMNS))})",
+                     [(host, *row) for row in buckets.tolist()])
+
+def _read_raw(conn, host, start, end):
+    return np.fromiter(conn.execute(
+        "SELECT ts, cpu, ram FROM metrics WHERE host = ? AND ts >= ? AND ts < ? ORDER BY ts ASC",
+        (host, start, end)), dtype=RAW_DTYPE)
+
+def _read_buckets(conn, name, host, start, end):
+    return np.fromiter(conn.execute(
+        f"SELECT {', '.join(COLUMNS)} FROM {table_name(name)} WHERE host = ? AND bucket >= ? AND bucket < ? ORDER BY bucket",
+        (host, start, end)), dtype=BUCKET_DTYPE)
+
+def _ranges(buckets, resolution_ms):
+    """
+    Regroupement de seaux triés en plages consécutives [début, fin[
+    """
+    ranges = []
+    for bucket in buckets:
+        if ranges and ranges[-1][1] == bucket:
+            ranges[-1][1] = bucket + resolution_ms
+        else:
+            ranges.append([bucket, bucket + resolution_ms])
+    return ranges
+
+# Fusion d'un lot dans un seau existant : les expressions lisent toutes l'ancienne ligne
+_MERGE_SET = ", ".join(["count = count + excluded.count"] + [
+    f"{metric}_min = MIN({metric}_min, excluded.{metric}_min), "
+    f"{metric}_avg = ({metric}_avg * count + excluded.{metric}_avg * excluded.count) / (count + excluded.count), "
+    f"{metric}_max = MAX({metric}_max, excluded.{metric}_max)"
+    for metric in METRICS
+])
+
+def refresh(conn, rows, host):
+    """
+    Mise à jour incrémentale des seaux touchés par de nouvelles lignes d'un hôte.
+    La résolution la plus fine est recalculée sur ses seaux touchés (quelques centaines de lignes au plus) ;
+    les plus grossières fusionnent le lot (nombre, moyenne, minimum, maximum) et déduisent leur p95 des seaux fins :
+    le coût ne dépend pas du nombre de lignes déjà présentes dans un seau grossier.
+    À appeler dans la transaction d'écriture des lignes brutes.
+    :param conn: Connexion à la base de données
+    :param rows: Tableau RAW_DTYPE des lignes insérées
+    :param host: Hôte des lignes insérées
+    """
+    if len(rows) == 0:
+        return
+    rows = np.sort(rows, order='ts', kind='stable')
+    (finest, finest_seconds), *coarser = ROLLUP_RESOLUTIONS
+    finest_ms = finest_seconds * 1000
+    for start, end in _ranges(np.unique(rows['ts'] // finest_ms * finest_ms).tolist(), finest_ms):
+        _replace_buckets(conn, finest, host, np.array(aggregate(_read_raw(conn, host, start, end), finest_ms),
+                                                      dtype=BUCKET_DTYPE))
+
+    for name, seconds in coarser:
+        resolution_ms = seconds * 1000
+        table = table_name(name)
+        batch = aggregate(rows, resolution_ms)
+        conn.executemany(f"""
+            INSERT INTO {table} (host, {', '.join(COLUMNS)}) VALUES (?, {', '.join('?' * len(COLUMNS))})
+            ON CONFLICT (host, bucket) DO UPDATE SET {_MERGE_SET}
+        """, [(host, *row) for row in batch])
+        for start, end in _ranges([row[0] for row in batch], resolution_ms):
+            fine = _read_buckets(conn, finest, host, start, end)
+            p95 = approximate_p95(fine, resolution_ms)
+            conn.executemany(f"UPDATE {table} SET {', '.join(f'{metric}_p95 = ?' for metric in METRICS)} "
+                             f"WHERE host = ? AND bucket = ?",
+                             zip(*(p95[metric].tolist() for metric in METRICS), [host] * len(fine),
+                                 np.unique(fine['bucket'] // resolution_ms * resolution_ms).tolist()))
+
+def rebuild(conn):
+    """
+    Recalcul complet des tables d'agrégats, hôte par hôte et par tranches pour borner la mémoire
+    :param conn: Connexion à la base de données
+    """
+    # Les tranches sont alignées sur tous les seaux : 24 seaux de la résolution la plus grossière
+    chunk = max(seconds for _, seconds in ROLLUP_RESOLUTIONS) * 1000 * 24
+    for host, low, high in conn.execute("SELECT host, MIN(ts), MAX(ts) FROM metrics GROUP BY host").fetchall():
+        start = low // chunk * chunk
+        while start <= high:
+            levels = aggregate_levels(_read_raw(conn, host, start, start + chunk))
+            for name, _ in ROLLUP_RESOLUTIONS:
+                conn.execute(f"DELETE FROM {table_name(name)} WHERE host = ? AND bucket >= ? AND bucket < ?",
+                             (host, start, start + chunk))
+                _replace_buckets(conn, name, host, levels[name])
+            start += chunk
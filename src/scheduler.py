@@ -0,0 +1,129 @@
+import asyncio
+import math
+import time
+from collections import deque
+
+from src import instrument
+
+class Scheduler:
+    """
+    Cadenceur de collecte à intervalle fixe.
+    Chaque tick est planifié sur une échéance absolue (start + n * interval) d'une horloge
+    monotone : le temps passé à collecter ne s'ajoute donc pas à l'intervalle et la dérive
+    ne s'accumule pas. Les ticks en retard et les ticks manqués sont comptabilisés.
+    """
+
+    def __init__(self, interval, tolerance=0.1, history=1000, clock=time.monotonic, sleep=time.sleep):
+        """
+        :param interval: Intervalle entre deux ticks (en secondes)
+        :param tolerance: Retard toléré avant qu'un tick soit compté en retard (fraction de l'intervalle)
+        :param history: Nombre de retards conservés pour le calcul de la gigue
+        :param clock: Horloge monotone (injectable pour les tests)
+        :param sleep: Fonction d'attente (injectable pour les tests)
+        """
+        if interval <= 0:
+            raise ValueError("interval must be strictly positive")
+        self.interval = interval
+        self.tolerance = tolerance
+        self.clock = clock
+        self.sleep = sleep
+
+        self.tick_count = 0
+        self.late_count = 0
+        self.missed_count = 0
+        self.max_lateness = 0.0
+        self.lateness = deque(maxlen=history)
+
+    def ticks(self, duration=None):
+        """
+        Générateur cadencé des ticks
+        :param duration: Durée totale (en secondes) ; None pour un cadencement sans fin
+        :return: Pour chaque tick, le retard (en secondes) par rapport à son échéance
+        """
+        start = self.clock()
+        index = 0
+        while True:
+            deadline = self._deadline(start, index, duration)
+            if deadline is None:
+                return
+            now = self.clock()
+            if now < deadline:
+                self.sleep(deadline - now)
+            lateness, index = self._reach(index, deadline)
+            yield lateness
+
+    async def ticks_async(self, duration=None):
+        """
+        Équivalent asynchrone de ticks : mêmes échéances, l'attente laisse la boucle asyncio exécuter les autres tâches
+        :param duration: Durée totale (en secondes) ; None pour un cadencement sans fin
+        :return: Pour chaque tick, le retard (en secondes) par rapport à son échéance
+        """
+        start = self.clock()
+        index = 0
+        while True:
+            deadline = self._deadline(start, index, duration)
+            if deadline is None:
+                return
+            now = self.clock()
+            if now < deadline:
+                await asyncio.sleep(deadline - now)
+            lateness, index = self._reach(index, deadline)
+            yield lateness
+
+    def _deadline(self, start, index, duration):
+        """
+        Échéance absolue d'un tick
+        :return: Date de l'échéance sur self.clock ; None au-delà de la durée totale
+        """
+        offset = index * self.interval
+        if duration is not None and offset >= duration:
+            return None
+        return start + offset
+
+    def _reach(self, index, deadline):
+        """
+        Comptabilisation d'un tick une fois son échéance atteinte
+        :return: Tuple (retard en secondes, index du tick suivant)
+        """
+        lateness = self.clock() - deadline
+        # Le tick a dépassé une ou plusieurs échéances suivantes : elles sont abandonnées
+        missed = math.floor(lateness / self.interval)
+        if missed > 0:
+            self.missed_count += missed
+            index += missed
+
+        self.record(lateness)
+        return lateness, index + 1
+
+    def record(self, lateness):
+        """
+        Comptabilisation du retard d'un tick
+        :param lateness: Retard (en secondes) par rapport à l'échéance
+        """
+        self.tick_count += 1
+        self.lateness.append(lateness)
+        if instrument.ENABLED:
+            instrument.record("scheduler.tick_drift", lateness * 1e9)
+        self.max_lateness = max(self.max_lateness, lateness)
+        if lateness > self.tolerance * self.interval:
+            self.late_count += 1
+
+    def stats(self):
+        """
+        Statistiques de cadencement
+        :return: Dictionnaire avec le nombre de ticks, en retard, manqués et la gigue (en secondes)
+        """
+        ordered = sorted(self.lateness)
+        if ordered:
+            mean = sum(ordered) / len(ordered)
+            p95 = ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))]
+        else:
+            mean = p95 = 0.0
+        return {
+            'ticks': self.tick_count,
+            'late': self.late_count,
+            'missed': self.missed_count,
+            'jitter_mean': mean,
+            'jitter_p95': p95,
+            'jitter_max': self.max_lateness
+        }
@@ -1,139 +1,1171 @@
-import sqlite3
-import os
-import json
-from datetime import datetime
-
-from config.config import DATA_PATH, DB_PATH
-
-def init_database(db_path=DB_PATH):
-    """
-    Initialisation de la base de données
-    :param db_path: Chemin de la base de données
-    """
-    os.makedirs(DATA_PATH, exist_ok=True)
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS metrics (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            timestamp TEXT NOT NULL,
-            cpu REAL NOT NULL,
-            ram REAL NOT NULL,
-            top_processes TEXT
-        )
-    """)
-    conn.commit()
-    conn.close()
-
-def delete_database(db_path=DB_PATH):
-    """
-    Suppression de la base de données
-    :param db_path: Chemin de la base de données
-    """
-    if os.path.exists(db_path):
-        os.remove(db_path)
-
-def insert_metrics(metrics: dict, db_path=DB_PATH):
-    """
-    Insertion de données dans la base de données
-    :param metrics: Dictionnaire contenant les données à insérer dans la base de données
-    :param db_path: Chemin de la base de données
-    """
-    # Vérification de la donnée timestamp
-    try:
-        datetime.fromisoformat(metrics['timestamp'])
-    except ValueError:
-        raise TypeError("timestamp must be an ISO format datetime string")
-
-    # Vérification de la donnée cpu
-    if not isinstance(metrics['cpu'], (int, float)):
-        raise TypeError("cpu must be a float")
-
-    # Vérification de la donnée ram
-    if not isinstance(metrics['ram'], (int, float)):
-        raise TypeError("ram must be a float")
-
-    # Vérification de la donnée top_processes
-    if not isinstance(metrics['top_processes'], list):
-        raise TypeError("top_processes must be a list")
-
-    # Insertion des données dans la base de données
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-
-    cursor.execute("""
-        INSERT INTO metrics (timestamp, cpu, ram, top_processes)
-        VALUES (?, ?, ?, ?)
-    """, (
-        metrics['timestamp'],
-        metrics['cpu'],
-        metrics['ram'],
-        json.dumps(metrics['top_processes'])  # on stocke les processus en JSON
-    ))
-
-    conn.commit()
-    conn.close()
-
-def get_last_metrics(limit=5, db_path=DB_PATH):
-    """
-    Récupération des dernières lignes ajoutées à la base de données
-    :param limit: Nombre de ligne à récupérer
-    :param db_path: Chemin de la base de données
-    :return: Quadruplets de listes avec timestamps, cpu, ram, et top_processes
-    """
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    cursor.execute("""
-        SELECT timestamp, cpu, ram, top_processes
-        FROM metrics
-        ORDER BY id DESC
-        LIMIT ?
-    """, (limit,))
-    rows = cursor.fetchall()
-    conn.close()
-
-    # Assurer une sortie toujours cohérente
-    if not rows:
-        return [], [], [], []
-
-    # Extraction des données de rows
-    timestamps = [datetime.fromisoformat(r[0]) for r in rows]
-    cpu = [r[1] for r in rows]
-    ram = [r[2] for r in rows]
-    top_processes = [r[3] for r in rows]
-
-    return timestamps, cpu, ram, top_processes
-
-def get_last_time_metrics(since: datetime, db_path=DB_PATH):
-    """
-    Récupération des lignes à partir d'une date donnée
-    :param since: Date de début de récupération
-    :param db_path: Chemin de la base de données
-    :return: Quadruplets de listes avec timestamps, cpu, ram, et top_processes
-    """
-    # Vérification de la donnée top_processes
-    if since is None:
-        raise ValueError("Le paramètre 'since' ne peut pas être None")
-
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    cursor.execute("""
-        SELECT timestamp, cpu, ram, top_processes
-        FROM metrics
-        WHERE timestamp >= ?
-        ORDER BY timestamp ASC
-    """, (since.isoformat(),))
-    rows = cursor.fetchall()
-    conn.close()
-
-    # Assurer une sortie toujours cohérente
-    if not rows:
-        return [], [], [], []
-
-    # Extraction des données de rows
-    timestamps = [datetime.fromisoformat(r[0]) for r in rows]
-    cpu = [r[1] for r in rows]
-    ram = [r[2] for r in rows]
-    top_processes = [r[3] for r in rows]
-
-    return timestamps, cpu, ram, top_processes
\ No newline at end of file
+import contextlib
+import functools
+import sqlite3
+import os
+import itertools
+import time
+from datetime import datetime, timedelta
+from typing import NamedTuple
+
+import numpy as np
+
+from config.config import (DATA_PATH, DB_PATH, WRITE_BATCH_SIZE, WRITE_FLUSH_INTERVAL, ROLLUP_RESOLUTIONS,
+                           REPORT_MAX_POINTS, EXPORT_CHUNK_SIZE, RETENTION_MAX_AGE, RETENTION_MAX_DB_SIZE,
+                           RETENTION_BATCH_SIZE, RETENTION_INTERVAL, RETENTION_MAX_BATCHES, SELFSTATS_INTERVAL,
+                           DB_BUSY_TIMEOUT, DB_RETRY_ATTEMPTS, DB_RETRY_DELAY, ARCHIVE_MIN_AGE, ARCHIVE_BLOCK_SECONDS)
+from src import compression, instrument, processes, rollup, system, tracker
+
+# Ligne brute (ts, cpu, ram) telle que lue depuis la base, avant découpage en colonnes
+ROW_DTYPE = np.dtype([('ts', '<i8'), ('cpu', '<f4'), ('ram', '<f4')])
+
+# Version du schéma, stockée dans 'PRAGMA user_version'
+SCHEMA_VERSION = 9
+
+# Hôte des échantillons collectés localement ; les autres sont reçus par le serveur d'ingestion (src/ingest.py)
+LOCAL_HOST = ""
+
+# Les dates sont stockées en millisecondes écoulées depuis EPOCH, sur l'heure locale (sans fuseau)
+EPOCH = datetime(1970, 1, 1)
+
+INSERT_METRICS_SQL = """
+    INSERT INTO metrics (ts, cpu, ram, host)
+    VALUES (?, ?, ?, ?)
+"""
+
+def to_epoch_ms(date: datetime):
+    """
+    Conversion d'une date en millisecondes depuis EPOCH
+    :param date: Date à convertir (une date avec fuseau est ramenée à l'heure locale)
+    :return: Nombre entier de millisecondes
+    """
+    if date.tzinfo is not None:
+        date = date.astimezone().replace(tzinfo=None)
+    return (date - EPOCH) // timedelta(milliseconds=1)
+
+def from_epoch_ms(ms: int):
+    """
+    Conversion de millisecondes depuis EPOCH en date
+    :param ms: Nombre entier de millisecondes
+    :return: Date correspondante
+    """
+    return EPOCH + timedelta(milliseconds=ms)
+
+def _iso_to_epoch_ms(value):
+    return to_epoch_ms(datetime.fromisoformat(value))
+
+def _migrate_v2(conn):
+    """
+    Schéma v2 : date en entier (ms depuis EPOCH) et index sur la date.
+    Une table v1 (date ISO en TEXT) est reconstruite sur place.
+    """
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(metrics)")]
+    if columns:
+        conn.execute("ALTER TABLE metrics RENAME TO metrics_v1")
+
+    conn.execute("""
+        CREATE TABLE metrics (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            ts INTEGER NOT NULL,
+            cpu REAL NOT NULL,
+            ram REAL NOT NULL,
+            top_processes TEXT
+        )
+    """)
+    # Index couvrant : les lectures par période de ts/cpu/ram n'accèdent pas à la table
+    conn.execute("CREATE INDEX idx_metrics_ts ON metrics (ts, cpu, ram)")
+
+    if columns:
+        conn.create_function("iso_to_epoch_ms", 1, _iso_to_epoch_ms, deterministic=True)
+        conn.execute("""
+            INSERT INTO metrics (id, ts, cpu, ram, top_processes)
+            SELECT id, iso_to_epoch_ms(timestamp), cpu, ram, top_processes
+            FROM metrics_v1
+        """)
+        conn.execute("DROP TABLE metrics_v1")
+
+def _migrate_v3(conn):
+    """
+    Schéma v3 : tables d'agrégats par seaux (voir src/rollup.py).
+    Leur schéma actuel dépend de la colonne metrics.host : elles sont créées et calculées par _migrate_v5.
+    """
+
+def _migrate_v4(conn):
+    """
+    Schéma v4 : processus normalisés (voir src/processes.py) à la place de la colonne JSON metrics.top_processes
+    """
+    processes.create_tables(conn)
+    processes.migrate_json(conn)
+    if sqlite3.sqlite_version_info >= (3, 35, 0):
+        conn.execute("ALTER TABLE metrics DROP COLUMN top_processes")
+    else:
+        # SQLite trop ancien pour supprimer une colonne : elle est seulement vidée
+        conn.execute("UPDATE metrics SET top_processes = NULL")
+
+def _migrate_v5(conn):
+    """
+    Schéma v5 : hôte de chaque échantillon et agrégats par hôte.
+    Les tables d'agrégats d'un schéma antérieur sont recalculées.
+    """
+    conn.execute(f"ALTER TABLE metrics ADD COLUMN host TEXT NOT NULL DEFAULT '{LOCAL_HOST}'")
+    # Index couvrant des lectures par hôte et par période
+    conn.execute("CREATE INDEX idx_metrics_host_ts ON metrics (host, ts, cpu, ram)")
+    for name, _ in ROLLUP_RESOLUTIONS:
+        conn.execute(f"DROP TABLE IF EXISTS {rollup.table_name(name)}")
+    rollup.create_tables(conn)
+    rollup.rebuild(conn)
+
+def _migrate_v6(conn):
+    """
+    Schéma v6 : métriques système détaillées (voir src/system.py)
+    """
+    system.create_tables(conn)
+
+def _migrate_v7(conn):
+    """
+    Schéma v7 : mesures internes du moniteur (voir src/instrument.py)
+    """
+    instrument.create_tables(conn)
+
+def _migrate_v8(conn):
+    """
+    Schéma v8 : blocs compressés des données brutes archivées (voir src/compression.py)
+    """
+    compression.create_tables(conn)
+
+def _migrate_v9(conn):
+    """
+    Schéma v9 : suivi détaillé de processus (voir src/tracker.py)
+    """
+    tracker.create_tables(conn)
+
+# Étapes de migration, dans l'ordre : (version atteinte, fonction)
+MIGRATIONS = [
+    (2, _migrate_v2),
+    (3, _migrate_v3),
+    (4, _migrate_v4),
+    (5, _migrate_v5),
+    (6, _migrate_v6),
+    (7, _migrate_v7),
+    (8, _migrate_v8),
+    (9, _migrate_v9),
+]
+
+def migrate(conn):
+    """
+    Mise à jour sur place du schéma de la base de données
+    :param conn: Connexion à la base de données
+    """
+    if conn.execute("PRAGMA user_version").fetchone()[0] >= SCHEMA_VERSION:
+        return
+
+    # Base vierge : le mode de vacuum incrémental doit être choisi avant la création des tables,
+    # et le mode WAL (persistant) permet aux lecteurs de ne jamais bloquer l'écrivain
+    if conn.execute("PRAGMA page_count").fetchone()[0] == 0:
+        conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        conn.execute("PRAGMA journal_mode=WAL")
+
+    # Verrou d'écriture pris avant de relire la version : une seule connexion migre
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        for target, step in MIGRATIONS:
+            if version < target:
+                step(conn)
+                version = target
+        conn.execute(f"PRAGMA user_version = {version}")
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+
+def connect(db_path=DB_PATH, check_same_thread=True):
+    """
+    Ouverture d'une connexion sur une base de données au schéma à jour
+    :param db_path: Chemin de la base de données
+    :param check_same_thread: False pour une connexion partagée entre fils (l'appelant sérialise alors les accès)
+    :return: Connexion SQLite
+    """
+    # Un verrou tenu par une autre connexion est attendu jusqu'à DB_BUSY_TIMEOUT avant l'erreur 'database is locked'
+    conn = sqlite3.connect(db_path, timeout=DB_BUSY_TIMEOUT, check_same_thread=check_same_thread)
+    migrate(conn)
+    return conn
+
+def is_locked(error):
+    """
+    Indique si une erreur SQLite est due à un verrou tenu par une autre connexion
+    :param error: Exception levée par sqlite3
+    """
+    message = str(error)
+    return isinstance(error, sqlite3.OperationalError) and ("locked" in message or "busy" in message)
+
+def retry_locked(func):
+    """
+    Décorateur de nouvelle tentative d'une opération refusée par un verrou, au-delà de l'attente DB_BUSY_TIMEOUT :
+    jusqu'à DB_RETRY_ATTEMPTS nouvelles tentatives, avec un délai doublé à chaque fois.
+    L'opération doit pouvoir être rejouée (transaction annulée en entier sur erreur).
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        delay = DB_RETRY_DELAY
+        for _ in range(DB_RETRY_ATTEMPTS):
+            try:
+                return func(*args, **kwargs)
+            except sqlite3.OperationalError as error:
+                if not is_locked(error):
+                    raise
+            time.sleep(delay)
+            delay *= 2
+        return func(*args, **kwargs)
+    return wrapper
+
+@contextlib.contextmanager
+def read_snapshot(conn):
+    """
+    Transaction de lecture : toutes les requêtes du bloc voient le même état de la base, même si un écrivain
+    valide des lignes entre deux requêtes (en mode WAL, le lecteur ne bloque pas l'écrivain)
+    :param conn: Connexion à la base de données (hors transaction)
+    """
+    conn.execute("BEGIN")
+    try:
+        yield conn
+    finally:
+        conn.rollback()
+
+def init_database(db_path=DB_PATH):
+    """
+    Initialisation de la base de données
+    :param db_path: Chemin de la base de données
+    """
+    os.makedirs(DATA_PATH, exist_ok=True)
+    conn = connect(db_path)
+    # Le mode WAL est persistant : il est conservé dans le fichier de la base
+    conn.execute("PRAGMA journal_mode=WAL")
+    # Une base créée sans vacuum incrémental est reconstruite une fois pour l'activer
+    if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+        conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        conn.execute("VACUUM")
+    conn.close()
+
+def delete_database(db_path=DB_PATH):
+    """
+    Suppression de la base de données
+    :param db_path: Chemin de la base de données
+    """
+    # En mode WAL, la base est accompagnée de ses fichiers -wal et -shm
+    for path in (db_path, db_path + "-wal", db_path + "-shm"):
+        if os.path.exists(path):
+            os.remove(path)
+
+def validate_metrics(metrics: dict):
+    """
+    Vérification du format des données avant insertion
+    :param metrics: Dictionnaire contenant les données à insérer dans la base de données
+                    ('host' est facultatif : LOCAL_HOST par défaut ; 'system' et 'tracked' sont facultatifs)
+    :return: Tuple (ts, cpu, ram, host, top_processes, system, tracked) prêt à être écrit par _write_batch
+    """
+    # Vérification de la donnée timestamp
+    try:
+        ts = to_epoch_ms(datetime.fromisoformat(metrics['timestamp']))
+    except ValueError:
+        raise TypeError("timestamp must be an ISO format datetime string")
+
+    # Vérification de la donnée cpu
+    if not isinstance(metrics['cpu'], (int, float)):
+        raise TypeError("cpu must be a float")
+
+    # Vérification de la donnée ram
+    if not isinstance(metrics['ram'], (int, float)):
+        raise TypeError("ram must be a float")
+
+    # Vérification de la donnée host
+    host = metrics.get('host', LOCAL_HOST)
+    if not isinstance(host, str):
+        raise TypeError("host must be a string")
+
+    # Vérification de la donnée top_processes
+    processes.validate(metrics['top_processes'])
+
+    # Vérification de la donnée system
+    system_metrics = metrics.get('system')
+    if system_metrics is not None:
+        system.validate(system_metrics)
+
+    # Vérification de la donnée tracked
+    tracked = metrics.get('tracked')
+    if tracked is not None:
+        tracker.validate(tracked)
+
+    return (
+        ts,
+        metrics['cpu'],
+        metrics['ram'],
+        host,
+        metrics['top_processes'],
+        system_metrics,
+        tracked
+    )
+
+def _write_batch(conn, rows, name_cache):
+    """
+    Écriture d'un lot d'échantillons validés, à appeler dans une transaction
+    :param conn: Connexion à la base de données
+    :param rows: Liste de tuples retournés par validate_metrics
+    :param name_cache: Dictionnaire nom de processus -> identifiant (voir processes.intern_names)
+    :return: Identifiants des échantillons écrits
+    """
+    conn.executemany(INSERT_METRICS_SQL, [row[:4] for row in rows])
+    # La transaction détient le verrou d'écriture : les identifiants du lot sont consécutifs
+    last_id = conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+    metric_ids = range(last_id - len(rows) + 1, last_id + 1)
+    processes.write(conn, metric_ids, [row[4] for row in rows], name_cache)
+    system.write(conn, metric_ids, [row[5] for row in rows])
+    tracker.write(conn, metric_ids, [row[6] for row in rows], name_cache)
+
+    # Un lot reçu par le serveur d'ingestion peut mélanger plusieurs hôtes
+    by_host = {}
+    for row in rows:
+        by_host.setdefault(row[3], []).append(row[:3])
+    for host, host_rows in by_host.items():
+        rollup.refresh(conn, np.array(host_rows, dtype=rollup.RAW_DTYPE), host)
+    return metric_ids
+
+@instrument.timed("storage.insert")
+@retry_locked
+def insert_metrics(metrics: dict, db_path=DB_PATH, cache=None):
+    """
+    Insertion de données dans la base de données
+    :param metrics: Dictionnaire contenant les données à insérer dans la base de données
+    :param db_path: Chemin de la base de données
+    :param cache: Cache de lecture à alimenter (voir src/cache.py) ; None pour aucun
+    """
+    row = validate_metrics(metrics)
+
+    # Insertion des données dans la base de données
+    conn = connect(db_path)
+    try:
+        with conn:
+            metric_ids = _write_batch(conn, [row], {})
+    finally:
+        conn.close()
+    if cache is not None:
+        cache.add(metric_ids, [row])
+
+class MetricsWriter:
+    """
+    Écriture des métriques par lots au travers d'une connexion unique et persistante.
+    Les échantillons sont mis en tampon puis écrits en une seule transaction dès que
+    'batch_size' échantillons sont accumulés ou que 'flush_interval' secondes se sont écoulées.
+    Le tampon est vidé à la fermeture : utiliser l'écrivain comme gestionnaire de contexte.
+    """
+
+    def __init__(self, db_path=DB_PATH, batch_size=WRITE_BATCH_SIZE, flush_interval=WRITE_FLUSH_INTERVAL,
+                 retention_interval=RETENTION_INTERVAL, cache=None, selfstats_interval=SELFSTATS_INTERVAL):
+        """
+        :param db_path: Chemin de la base de données
+        :param batch_size: Nombre d'échantillons accumulés avant écriture
+        :param flush_interval: Délai maximal (en secondes) entre deux écritures
+        :param retention_interval: Délai (en secondes) entre deux passes de rétention ; None pour les désactiver
+        :param cache: Cache de lecture alimenté à chaque écriture (voir src/cache.py) ; None pour aucun
+        :param selfstats_interval: Délai (en secondes) entre deux écritures des mesures internes (voir src/instrument.py) ;
+                                   None pour ne pas les écrire
+        """
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.retention_interval = retention_interval
+        self.selfstats_interval = selfstats_interval
+        self.buffer = []
+        self.last_flush = time.monotonic()
+        self.last_retention = self.last_flush
+        self.last_selfstats = self.last_flush
+        self.name_cache = {}
+        self.cache = cache
+
+        self.conn = connect(db_path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        # En mode WAL, NORMAL ne synchronise le disque qu'aux checkpoints
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+
+    def write(self, metrics: dict):
+        """
+        Ajout d'un échantillon au tampon, avec écriture si un seuil est atteint
+        :param metrics: Dictionnaire contenant les données à insérer dans la base de données
+        """
+        self.buffer.append(validate_metrics(metrics))
+        if len(self.buffer) >= self.batch_size or time.monotonic() - self.last_flush >= self.flush_interval:
+            self.flush()
+
+    def extend(self, rows):
+        """
+        Ajout d'échantillons déjà validés au tampon, avec écriture si un seuil est atteint
+        :param rows: Liste de tuples retournés par validate_metrics
+        :return: Nombre d'échantillons écrits (0 si aucun seuil n'est atteint)
+        """
+        self.buffer.extend(rows)
+        if len(self.buffer) >= self.batch_size or time.monotonic() - self.last_flush >= self.flush_interval:
+            return self.flush()
+        return 0
+
+    @instrument.timed("storage.flush")
+    def flush(self):
+        """
+        Écriture de tous les échantillons en attente en une seule transaction
+        :return: Nombre d'échantillons écrits
+        """
+        count = len(self.buffer)
+        if count:
+            metric_ids = self._commit()
+            # Après validation de la transaction : le cache ne contient que des lignes présentes en base
+            if self.cache is not None:
+                self.cache.add(metric_ids, self.buffer)
+            self.buffer = []
+        self.last_flush = time.monotonic()
+
+        # Passe de rétention bornée : l'écriture n'est jamais bloquée longtemps
+        if self.retention_interval is not None and self.last_flush - self.last_retention >= self.retention_interval:
+            apply_retention(self.conn, max_batches=RETENTION_MAX_BATCHES)
+            self.last_retention = time.monotonic()
+
+        if self.selfstats_interval is not None and self.last_flush - self.last_selfstats >= self.selfstats_interval:
+            self.write_selfstats()
+        return count
+
+    @retry_locked
+    def _commit(self):
+        """
+        Écriture du tampon en une transaction, rejouée si elle est refusée par un verrou
+        :return: Identifiants des échantillons écrits
+        """
+        try:
+            with self.conn:
+                return _write_batch(self.conn, self.buffer, self.name_cache)
+        except Exception:
+            # Transaction annulée : les noms de processus insérés par le lot n'existent plus
+            self.name_cache.clear()
+            raise
+
+    def write_selfstats(self):
+        """
+        Écriture des mesures internes accumulées depuis l'écriture précédente
+        """
+        if instrument.ENABLED:
+            with self.conn:
+                instrument.write(self.conn, to_epoch_ms(datetime.now()))
+        self.last_selfstats = time.monotonic()
+
+    def close(self):
+        """
+        Écriture des échantillons restants puis fermeture de la connexion
+        """
+        if self.conn is None:
+            return
+        try:
+            self.flush()
+            if self.selfstats_interval is not None:
+                self.write_selfstats()
+        finally:
+            self.conn.close()
+            self.conn = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+def write_selfstats(db_path=DB_PATH):
+    """
+    Écriture des mesures internes accumulées, pour les commandes qui n'utilisent pas MetricsWriter
+    :param db_path: Chemin de la base de données
+    """
+    if not instrument.ENABLED or not instrument.stages:
+        return
+    conn = connect(db_path)
+    with conn:
+        instrument.write(conn, to_epoch_ms(datetime.now()))
+    conn.close()
+
+def database_size(conn):
+    """
+    Taille occupée par les données (pages libres exclues)
+    :param conn: Connexion à la base de données
+    :return: Taille en octets
+    """
+    page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+    page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+    freelist = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    return (page_count - freelist) * page_size
+
+def _delete_metric_ids(conn, ids):
+    """
+    Suppression d'échantillons bruts et des lignes qui leur sont rattachées (processus, métriques système, processus suivis)
+    :param conn: Connexion à la base de données (dans une transaction)
+    :param ids: Liste de tuples (identifiant,)
+    """
+    conn.executemany("DELETE FROM metric_processes WHERE metric_id = ?", ids)
+    conn.executemany("DELETE FROM metrics_system WHERE metric_id = ?", ids)
+    conn.executemany("DELETE FROM metric_tracked WHERE metric_id = ?", ids)
+    conn.executemany("DELETE FROM metrics WHERE id = ?", ids)
+
+def _delete_oldest(conn, level, cutoff, batch_size):
+    """
+    Suppression, en une transaction, des plus anciennes lignes d'une résolution antérieures à 'cutoff'
+    :param level: 'raw' ou nom d'une résolution d'agrégats
+    :param cutoff: Date limite (ms depuis EPOCH, exclue)
+    :return: Nombre de lignes supprimées
+    """
+    with conn:
+        if level == "raw":
+            ids = [(row[0],) for row in conn.execute(
+                "SELECT id FROM metrics WHERE ts < ? ORDER BY ts ASC LIMIT ?", (cutoff, batch_size))]
+            if not ids:
+                # Données brutes restantes : blocs compressés, plus anciens que les lignes brutes
+                return compression.delete_oldest(conn, cutoff)
+            _delete_metric_ids(conn, ids)
+            return len(ids)
+        table = rollup.table_name(level)
+        return conn.execute(f"""
+            DELETE FROM {table} WHERE (host, bucket) IN (
+                SELECT host, bucket FROM {table} WHERE bucket < ? ORDER BY bucket ASC LIMIT ?
+            )
+        """, (cutoff, batch_size)).rowcount
+
+def apply_retention(conn, now: datetime = None, max_age=RETENTION_MAX_AGE, max_size=RETENTION_MAX_DB_SIZE,
+                    batch_size=RETENTION_BATCH_SIZE, max_batches=None):
+    """
+    Application de la politique de rétention par petites transactions, puis récupération de l'espace libéré
+    :param conn: Connexion à la base de données (hors transaction)
+    :param now: Date de référence pour l'âge des données ; None pour maintenant
+    :param max_age: Âge maximal par résolution (en jours) : 'raw' pour les données brutes, sinon nom de résolution
+    :param max_size: Taille maximale des données (en octets) ; au-delà, les plus anciennes lignes sont supprimées
+    :param batch_size: Nombre de lignes supprimées par transaction
+    :param max_batches: Nombre maximal de transactions par appel ; None pour aller jusqu'au bout
+    :return: Dictionnaire résolution -> nombre de lignes supprimées
+    """
+    now_ms = to_epoch_ms(now or datetime.now())
+    levels = ["raw"] + [name for name, _ in ROLLUP_RESOLUTIONS]
+    deleted = dict.fromkeys(levels, 0)
+    batches = 0
+
+    def budget_left():
+        return max_batches is None or batches < max_batches
+
+    # Âge maximal, résolution par résolution
+    for level in levels:
+        days = max_age.get(level)
+        if days is None:
+            continue
+        cutoff = now_ms - int(days * 86_400_000)
+        while budget_left():
+            count = _delete_oldest(conn, level, cutoff, batch_size)
+            batches += 1
+            deleted[level] += count
+            if count < batch_size:
+                break
+        # Blocs compressés et mesures internes : même âge maximal que les données brutes
+        if level == "raw":
+            with conn:
+                deleted[level] += compression.delete_expired(conn, cutoff)
+                conn.execute("DELETE FROM selfstats WHERE ts < ?", (cutoff,))
+                conn.execute("DELETE FROM selfstats_process WHERE ts < ?", (cutoff,))
+
+    # Taille maximale : les données les plus fines sont supprimées en premier
+    if max_size is not None:
+        for level in levels:
+            while budget_left() and database_size(conn) > max_size:
+                count = _delete_oldest(conn, level, np.iinfo(np.int64).max, batch_size)
+                batches += 1
+                deleted[level] += count
+                if count == 0:
+                    break
+
+    # Restitution des pages libérées au système de fichiers (une page par pas d'exécution : tout est consommé)
+    conn.execute("PRAGMA incremental_vacuum").fetchall()
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    return deleted
+
+def archive_metrics(older_than=ARCHIVE_MIN_AGE, db_path=DB_PATH, now: datetime = None,
+                    block_seconds=ARCHIVE_BLOCK_SECONDS):
+    """
+    Compression des données brutes anciennes en blocs de durée fixe (voir src/compression.py), une transaction par bloc.
+    Les échantillons archivés restent lus par get_last_time_metrics, get_time_metrics_arrays et iter_metrics_chunks,
+    mais plus par les lectures des derniers échantillons ; leurs processus et métriques système sont supprimés.
+    Les agrégats ne sont pas modifiés : un échantillon reçu plus tard dans un seau déjà archivé recalcule ce seau
+    sans les échantillons archivés, d'où l'âge minimal.
+    :param older_than: Âge minimal (en jours) des données archivées
+    :param db_path: Chemin de la base de données
+    :param now: Date de référence pour l'âge des données ; None pour maintenant
+    :param block_seconds: Durée couverte par un bloc (en secondes)
+    :return: Tuple (nombre d'échantillons archivés, nombre de blocs écrits)
+    """
+    block_ms = block_seconds * 1000
+    cutoff = to_epoch_ms(now or datetime.now()) - int(older_than * 86_400_000)
+    # Seuls des blocs entièrement antérieurs à la date limite sont archivés
+    cutoff -= cutoff % block_ms
+    archived = blocks = 0
+    conn = connect(db_path)
+    try:
+        while True:
+            with conn:
+                first = conn.execute("SELECT MIN(ts) FROM metrics WHERE ts < ?", (cutoff,)).fetchone()[0]
+                if first is None:
+                    break
+                start = first - first % block_ms
+                rows = conn.execute("""
+                    SELECT id, host, ts, cpu, ram
+                    FROM metrics
+                    WHERE ts >= ? AND ts < ?
+                    ORDER BY host, ts, id
+                """, (start, start + block_ms)).fetchall()
+                for host, group in itertools.groupby(rows, key=lambda row: row[1]):
+                    values = np.array([row[2:] for row in group], dtype=rollup.RAW_DTYPE)
+                    compression.write_block(conn, host, start, values)
+                    blocks += 1
+                _delete_metric_ids(conn, [(row[0],) for row in rows])
+                archived += len(rows)
+        conn.execute("PRAGMA incremental_vacuum").fetchall()
+    finally:
+        conn.close()
+    return archived, blocks
+
+def enforce_retention(db_path=DB_PATH, **kwargs):
+    """
+    Application complète de la politique de rétention (voir apply_retention)
+    :param db_path: Chemin de la base de données
+    :return: Dictionnaire résolution -> nombre de lignes supprimées
+    """
+    conn = connect(db_path)
+    try:
+        return apply_retention(conn, **kwargs)
+    finally:
+        conn.close()
+
+@instrument.timed("storage.get_last_metrics")
+@retry_locked
+def get_last_metrics(limit=5, db_path=DB_PATH):
+    """
+    Récupération des dernières lignes ajoutées à la base de données
+    :param limit: Nombre de ligne à récupérer
+    :param db_path: Chemin de la base de données
+    :return: Quadruplets de listes avec timestamps, cpu, ram, et top_processes
+    """
+    conn = connect(db_path)
+    # Même instantané pour les deux requêtes : les processus correspondent aux lignes lues
+    with read_snapshot(conn):
+        rows = conn.execute("""
+            SELECT id, ts, cpu, ram
+            FROM metrics
+            ORDER BY id DESC
+            LIMIT ?
+        """, (limit,)).fetchall()
+        process_json = processes.load_json(conn, "SELECT id FROM metrics ORDER BY id DESC LIMIT ?", (limit,))
+    conn.close()
+
+    # Assurer une sortie toujours cohérente
+    if not rows:
+        return [], [], [], []
+
+    # Extraction des données de rows
+    timestamps = [from_epoch_ms(r[1]) for r in rows]
+    cpu = [r[2] for r in rows]
+    ram = [r[3] for r in rows]
+    top_processes = [process_json.get(r[0], "[]") for r in rows]
+
+    return timestamps, cpu, ram, top_processes
+
+@instrument.timed("storage.get_last_time_metrics")
+@retry_locked
+def get_last_time_metrics(since: datetime, db_path=DB_PATH):
+    """
+    Récupération des lignes à partir d'une date donnée
+    :param since: Date de début de récupération
+    :param db_path: Chemin de la base de données
+    :return: Quadruplets de listes avec timestamps, cpu, ram, et top_processes
+    """
+    # Vérification de la donnée top_processes
+    if since is None:
+        raise ValueError("Le paramètre 'since' ne peut pas être None")
+
+    start = to_epoch_ms(since)
+    conn = connect(db_path)
+    with read_snapshot(conn):
+        rows = conn.execute("""
+            SELECT id, ts, cpu, ram
+            FROM metrics
+            WHERE ts >= ?
+            ORDER BY ts ASC
+        """, (start,)).fetchall()
+        process_json = processes.load_json(conn, "SELECT id FROM metrics WHERE ts >= ?", (start,))
+        archived = compression.read(conn, start, np.iinfo(np.int64).max)
+    conn.close()
+
+    entries = [(r[1], r[2], r[3], process_json.get(r[0], "[]")) for r in rows]
+    if len(archived):
+        # Échantillons archivés (sans processus) replacés dans l'ordre des dates ; tri stable
+        entries = [(*row, "[]") for row in archived.tolist()] + entries
+        entries.sort(key=lambda entry: entry[0])
+
+    # Assurer une sortie toujours cohérente
+    if not entries:
+        return [], [], [], []
+
+    # Extraction des données de rows
+    timestamps = [from_epoch_ms(r[0]) for r in entries]
+    cpu = [r[1] for r in entries]
+    ram = [r[2] for r in entries]
+    top_processes = [r[3] for r in entries]
+
+    return timestamps, cpu, ram, top_processes
+
+
+class MetricsArrays(NamedTuple):
+    """
+    Séries de métriques en colonnes contiguës, triées chronologiquement
+    """
+    timestamps: np.ndarray  # datetime64[ms]
+    cpu: np.ndarray         # float32
+    ram: np.ndarray         # float32
+
+def _fetch_arrays(cursor):
+    """
+    Remplissage des colonnes directement depuis le curseur, sans liste intermédiaire
+    :param cursor: Curseur d'une requête retournant (ts, cpu, ram)
+    :return: MetricsArrays
+    """
+    rows = np.fromiter(cursor, dtype=ROW_DTYPE)
+    return MetricsArrays(
+        rows['ts'].astype('datetime64[ms]'),
+        np.ascontiguousarray(rows['cpu']),
+        np.ascontiguousarray(rows['ram'])
+    )
+
+def merge_archived(arrays, archived):
+    """
+    Ajout d'échantillons archivés à des colonnes lues dans la table 'metrics'
+    :param arrays: MetricsArrays triées par date
+    :param archived: Tableau rollup.RAW_DTYPE trié par date (voir compression.read)
+    :return: MetricsArrays triées par date ; à date égale, les échantillons archivés en premier
+    """
+    if not len(archived):
+        return arrays
+    timestamps = np.concatenate((archived['ts'].astype('datetime64[ms]'), arrays.timestamps))
+    order = np.argsort(timestamps, kind='stable')
+    return MetricsArrays(
+        timestamps[order],
+        np.concatenate((archived['cpu'].astype(np.float32), arrays.cpu))[order],
+        np.concatenate((archived['ram'].astype(np.float32), arrays.ram))[order]
+    )
+
+@instrument.timed("storage.get_last_metrics_arrays")
+@retry_locked
+def get_last_metrics_arrays(limit=5, db_path=DB_PATH, host=None):
+    """
+    Récupération des dernières lignes ajoutées à la base de données, en colonnes NumPy
+    :param limit: Nombre de ligne à récupérer
+    :param db_path: Chemin de la base de données
+    :param host: Hôte des lignes (les plus récentes par date) ; None pour les dernières lignes ajoutées, tous hôtes confondus
+    :return: MetricsArrays, de la plus ancienne à la plus récente des lignes récupérées
+    """
+    conn = connect(db_path)
+    # Lecture dans l'ordre de l'index, du plus récent au plus ancien, puis retournement en mémoire :
+    # un second tri par SQLite coûterait plus cher que la lecture elle-même sur de longues séries
+    if host is None:
+        cursor = conn.execute("""
+            SELECT ts, cpu, ram
+            FROM metrics
+            ORDER BY id DESC
+            LIMIT ?
+        """, (limit,))
+    else:
+        cursor = conn.execute("""
+            SELECT ts, cpu, ram
+            FROM metrics
+            WHERE host = ?
+            ORDER BY ts DESC
+            LIMIT ?
+        """, (host, limit))
+    arrays = MetricsArrays(*(np.ascontiguousarray(column[::-1]) for column in _fetch_arrays(cursor)))
+    conn.close()
+    return arrays
+
+def _host_filter(host, column="host"):
+    """
+    Condition SQL et paramètres de sélection d'un hôte, à ajouter à une clause WHERE
+    :param host: Hôte ; None pour tous les hôtes
+    :param column: Colonne de l'hôte dans la requête
+    :return: Tuple (condition, paramètres)
+    """
+    if host is None:
+        return "", ()
+    return f"{column} = ? AND", (host,)
+
+@instrument.timed("storage.get_time_metrics_arrays")
+@retry_locked
+def get_time_metrics_arrays(since: datetime, until: datetime = None, db_path=DB_PATH, host=None):
+    """
+    Récupération des lignes d'une période donnée, en colonnes NumPy
+    :param since: Date de début de récupération (incluse)
+    :param until: Date de fin de récupération (exclue) ; None pour aller jusqu'à la dernière ligne
+    :param db_path: Chemin de la base de données
+    :param host: Hôte des lignes ; None pour tous les hôtes
+    :return: MetricsArrays
+    """
+    if since is None:
+        raise ValueError("Le paramètre 'since' ne peut pas être None")
+
+    start = to_epoch_ms(since)
+    end = to_epoch_ms(until) if until is not None else np.iinfo(np.int64).max
+    condition, params = _host_filter(host)
+    conn = connect(db_path)
+    with read_snapshot(conn):
+        cursor = conn.execute(f"""
+            SELECT ts, cpu, ram
+            FROM metrics
+            WHERE {condition} ts >= ? AND ts < ?
+            ORDER BY ts ASC
+        """, (*params, start, end))
+        arrays = _fetch_arrays(cursor)
+        archived = compression.read(conn, start, end, host)
+    conn.close()
+    return merge_archived(arrays, archived)
+
+
+# Colonnes d'une table d'agrégats, telles que lues par get_rollup_arrays
+ROLLUP_DTYPE = np.dtype([('bucket', '<i8'), ('count', '<i8')] + [(column, '<f4') for column in rollup.COLUMNS[2:]])
+
+def iter_metrics_chunks(since: datetime = None, until: datetime = None, chunk_size=EXPORT_CHUNK_SIZE, db_path=DB_PATH,
+                        host=None):
+    """
+    Lecture d'une période par blocs de taille fixe : la mémoire utilisée ne dépend pas de la taille de la période
+    :param since: Date de début (incluse) ; None pour depuis la première ligne
+    :param until: Date de fin (exclue) ; None pour jusqu'à la dernière ligne
+    :param chunk_size: Nombre maximal de lignes par bloc
+    :param db_path: Chemin de la base de données
+    :param host: Hôte des lignes ; None pour tous les hôtes
+    :return: Générateur de tableaux structurés rollup.RAW_DTYPE (ts en ms depuis EPOCH, cpu, ram en double précision)
+    """
+    start = to_epoch_ms(since) if since is not None else np.iinfo(np.int64).min
+    end = to_epoch_ms(until) if until is not None else np.iinfo(np.int64).max
+    condition, params = _host_filter(host)
+    conn = connect(db_path)
+
+    def raw_rows(low, high):
+        return conn.execute(f"""
+            SELECT ts, cpu, ram
+            FROM metrics
+            WHERE {condition} ts >= ? AND ts < ?
+            ORDER BY ts ASC
+        """, (*params, low, high))
+
+    def chunks(low, high):
+        cursor = raw_rows(low, high)
+        while True:
+            chunk = np.fromiter(itertools.islice(cursor, chunk_size), dtype=rollup.RAW_DTYPE)
+            if len(chunk) == 0:
+                break
+            yield chunk
+
+    try:
+        # Périodes archivées (au plus un bloc chacune) : blocs et lignes brutes de la période fusionnés en mémoire
+        position = start
+        for first_ts, last_ts in compression.windows(conn, start, end, host):
+            low, high = max(first_ts, start), min(last_ts + 1, end)
+            yield from chunks(position, low)
+            rows = np.concatenate((compression.read(conn, low, high, host),
+                                   np.fromiter(raw_rows(low, high), dtype=rollup.RAW_DTYPE)))
+            rows = rows[np.argsort(rows['ts'], kind='stable')]
+            for offset in range(0, len(rows), chunk_size):
+                yield rows[offset:offset + chunk_size]
+            position = high
+        yield from chunks(position, end)
+    finally:
+        conn.close()
+
+class RollupArrays(NamedTuple):
+    """
+    Séries agrégées par seaux en colonnes contiguës, triées chronologiquement
+    """
+    timestamps: np.ndarray  # datetime64[ms], début de chaque seau
+    count: np.ndarray       # int64, nombre de lignes brutes du seau
+    cpu_min: np.ndarray
+    cpu_avg: np.ndarray
+    cpu_max: np.ndarray
+    cpu_p95: np.ndarray
+    ram_min: np.ndarray
+    ram_avg: np.ndarray
+    ram_max: np.ndarray
+    ram_p95: np.ndarray
+
+@instrument.timed("storage.get_rollup_arrays")
+@retry_locked
+def get_rollup_arrays(resolution, since: datetime, until: datetime = None, db_path=DB_PATH, host=LOCAL_HOST):
+    """
+    Récupération des agrégats d'une résolution sur une période donnée, en colonnes NumPy
+    :param resolution: Nom de la résolution (voir ROLLUP_RESOLUTIONS, ex : '1m')
+    :param since: Date de début de récupération (incluse, arrondie au début de son seau)
+    :param until: Date de fin de récupération (exclue) ; None pour aller jusqu'au dernier seau
+    :param db_path: Chemin de la base de données
+    :param host: Hôte des agrégats
+    :return: RollupArrays
+    """
+    seconds = dict(ROLLUP_RESOLUTIONS).get(resolution)
+    if seconds is None:
+        raise ValueError(f"Résolution inconnue : {resolution}")
+
+    start = to_epoch_ms(since) // (seconds * 1000) * (seconds * 1000)
+    end = to_epoch_ms(until) if until is not None else np.iinfo(np.int64).max
+    conn = connect(db_path)
+    cursor = conn.execute(f"""
+        SELECT {', '.join(rollup.COLUMNS)}
+        FROM {rollup.table_name(resolution)}
+        WHERE host = ? AND bucket >= ? AND bucket < ?
+        ORDER BY bucket ASC
+    """, (host, start, end))
+    rows = np.fromiter(cursor, dtype=ROLLUP_DTYPE)
+    conn.close()
+
+    return RollupArrays(rows['bucket'].astype('datetime64[ms]'), np.ascontiguousarray(rows['count']),
+                        *(np.ascontiguousarray(rows[column]) for column in rollup.COLUMNS[2:]))
+
+@retry_locked
+def choose_resolution(since: datetime, until: datetime = None, max_points=REPORT_MAX_POINTS, db_path=DB_PATH,
+                      host=LOCAL_HOST):
+    """
+    Choix de la résolution la plus fine ne dépassant pas environ 'max_points' points sur la période.
+    Les comptages sont bornés : le coût ne dépend pas du nombre de lignes brutes.
+    :param since: Date de début de la période
+    :param until: Date de fin de la période (exclue) ; None pour aller jusqu'à la dernière ligne
+    :param max_points: Nombre de points visé (environ la largeur du graphique en pixels)
+    :param db_path: Chemin de la base de données
+    :param host: Hôte des données
+    :return: None pour les données brutes, sinon le nom de la résolution
+    """
+    start = to_epoch_ms(since)
+    end = to_epoch_ms(until) if until is not None else np.iinfo(np.int64).max
+    budget = 2 * max_points
+
+    conn = connect(db_path)
+    try:
+        # Comptages sur un même instantané : les agrégats correspondent aux lignes brutes comptées
+        with read_snapshot(conn):
+            candidates = [(None, "metrics", "ts")] + [(name, rollup.table_name(name), "bucket") for name, _ in ROLLUP_RESOLUTIONS]
+            for name, table, column in candidates:
+                count = conn.execute(f"""
+                    SELECT COUNT(*) FROM (
+                        SELECT 1 FROM {table} WHERE host = ? AND {column} >= ? AND {column} < ? LIMIT ?
+                    )
+                """, (host, start, end, budget + 1)).fetchone()[0]
+                if count <= budget:
+                    return name
+            return ROLLUP_RESOLUTIONS[-1][0]
+    finally:
+        conn.close()
+
+
+class SystemArrays(NamedTuple):
+    """
+    Métriques système détaillées en colonnes contiguës, triées chronologiquement
+    """
+    timestamps: np.ndarray    # datetime64[ms]
+    cpu_cores: np.ndarray     # float32 (échantillons, cœurs), % par cœur
+    load1: np.ndarray
+    load5: np.ndarray
+    load15: np.ndarray
+    swap: np.ndarray          # %
+    disk_read: np.ndarray     # octets/s
+    disk_write: np.ndarray    # octets/s
+    net_recv: np.ndarray      # octets/s
+    net_sent: np.ndarray      # octets/s
+    ctx_switches: np.ndarray  # par seconde
+
+SYSTEM_DTYPE = np.dtype([('ts', '<i8')] + [(field, '<f4') for field in system.FIELDS])
+
+@instrument.timed("storage.get_system_arrays")
+@retry_locked
+def get_system_arrays(since: datetime = None, until: datetime = None, db_path=DB_PATH, host=None):
+    """
+    Récupération des métriques système détaillées d'une période, en colonnes NumPy
+    :param since: Date de début (incluse) ; None pour depuis la première ligne
+    :param until: Date de fin (exclue) ; None pour jusqu'à la dernière ligne
+    :param db_path: Chemin de la base de données
+    :param host: Hôte des lignes ; None pour tous les hôtes
+    :return: SystemArrays (seuls les échantillons collectés avec les métriques système sont retournés)
+    """
+    start = to_epoch_ms(since) if since is not None else np.iinfo(np.int64).min
+    end = to_epoch_ms(until) if until is not None else np.iinfo(np.int64).max
+    condition, params = _host_filter(host, "m.host")
+    conn = connect(db_path)
+    rows = conn.execute(f"""
+        SELECT m.ts, {', '.join(f's.{field}' for field in system.FIELDS)}, s.cpu_cores
+        FROM metrics m
+        JOIN metrics_system s ON s.metric_id = m.id
+        WHERE {condition} m.ts >= ? AND m.ts < ?
+        ORDER BY m.ts ASC
+    """, (*params, start, end)).fetchall()
+    conn.close()
+
+    columns = np.fromiter((row[:-1] for row in rows), dtype=SYSTEM_DTYPE, count=len(rows))
+    return SystemArrays(columns['ts'].astype('datetime64[ms]'), system.decode_cores([row[-1] for row in rows]),
+                        *(np.ascontiguousarray(columns[field]) for field in system.FIELDS))
+
+
+class ProcessHistory(NamedTuple):
+    """
+    Historique d'un processus en colonnes contiguës, trié chronologiquement
+    """
+    timestamps: np.ndarray   # datetime64[ms], date de l'échantillon
+    pid: np.ndarray          # int64
+    cpu_percent: np.ndarray  # float32
+    rank: np.ndarray         # int64, 0 = processus le plus consommateur de l'échantillon
+
+PROCESS_DTYPE = np.dtype([('ts', '<i8'), ('pid', '<i8'), ('cpu_percent', '<f4'), ('rank', '<i8')])
+
+@instrument.timed("storage.get_process_history")
+@retry_locked
+def get_process_history(name=None, pid=None, since: datetime = None, until: datetime = None, dominant_only=False, db_path=DB_PATH):
+    """
+    Historique de consommation CPU d'un processus, désigné par son nom et/ou son pid
+    :param name: Nom du processus
+    :param pid: Identifiant du processus
+    :param since: Date de début (incluse) ; None pour depuis la première ligne
+    :param until: Date de fin (exclue) ; None pour jusqu'à la dernière ligne
+    :param dominant_only: Ne garder que les échantillons où le processus était le plus consommateur
+    :param db_path: Chemin de la base de données
+    :return: ProcessHistory
+    """
+    if name is None and pid is None:
+        raise ValueError("Au moins un des paramètres 'name' ou 'pid' doit être renseigné")
+
+    conditions = ["m.ts >= ?", "m.ts < ?"]
+    params = [to_epoch_ms(since) if since is not None else np.iinfo(np.int64).min,
+              to_epoch_ms(until) if until is not None else np.iinfo(np.int64).max]
+    if name is not None:
+        conditions.append("mp.name_id = (SELECT id FROM process_names WHERE name = ?)")
+        params.append(name)
+    if pid is not None:
+        conditions.append("mp.pid = ?")
+        params.append(pid)
+    if dominant_only:
+        conditions.append("mp.rank = 0")
+
+    conn = connect(db_path)
+    cursor = conn.execute(f"""
+        SELECT m.ts, mp.pid, mp.cpu_percent, mp.rank
+        FROM metric_processes mp
+        JOIN metrics m ON m.id = mp.metric_id
+        WHERE {' AND '.join(conditions)}
+        ORDER BY m.ts ASC
+    """, params)
+    rows = np.fromiter(cursor, dtype=PROCESS_DTYPE)
+    conn.close()
+
+    return ProcessHistory(rows['ts'].astype('datetime64[ms]'), np.ascontiguousarray(rows['pid']),
+                          np.ascontiguousarray(rows['cpu_percent']), np.ascontiguousarray(rows['rank']))
+
+
+class TrackedHistory(NamedTuple):
+    """
+    Mesures des processus suivis (voir src/tracker.py) en colonnes contiguës, triées par date puis par pid
+    """
+    timestamps: np.ndarray   # datetime64[ms], date de l'échantillon
+    pid: np.ndarray          # int64
+    cpu_time: np.ndarray     # float64, secondes CPU depuis l'échantillon précédent
+    cpu_percent: np.ndarray  # float32
+    rss: np.ndarray          # int64, octets
+    read_bytes: np.ndarray   # int64, octets lus depuis l'échantillon précédent (-1 si illisible)
+    write_bytes: np.ndarray  # int64, octets écrits depuis l'échantillon précédent (-1 si illisible)
+    threads: np.ndarray      # int64
+    fds: np.ndarray          # int64, descripteurs ouverts (-1 si illisible)
+    names: list              # nom de chaque ligne
+    cgroups: list            # chemin du cgroup de chaque ligne (voir tracker.container_id)
+
+TRACKED_DTYPE = np.dtype([('ts', '<i8'), ('pid', '<i8'), ('cpu_time', '<f8'), ('cpu_percent', '<f4'), ('rss', '<i8'),
+                          ('read_bytes', '<i8'), ('write_bytes', '<i8'), ('threads', '<i8'), ('fds', '<i8')])
+
+@instrument.timed("storage.get_tracked_history")
+@retry_locked
+def get_tracked_history(pid=None, name=None, cgroup=None, since: datetime = None, until: datetime = None,
+                        host=LOCAL_HOST, db_path=DB_PATH):
+    """
+    Historique des processus suivis d'une période, éventuellement restreint à un processus ou à un cgroup
+    :param pid: Identifiant du processus ; None pour tous
+    :param name: Nom du processus ; None pour tous
+    :param cgroup: Chemin du cgroup (sous-cgroups compris) ; None pour tous
+    :param since: Date de début (incluse) ; None pour depuis la première ligne
+    :param until: Date de fin (exclue) ; None pour jusqu'à la dernière ligne
+    :param host: Hôte des échantillons
+    :param db_path: Chemin de la base de données
+    :return: TrackedHistory
+    """
+    conditions = ["m.host = ?", "m.ts >= ?", "m.ts < ?"]
+    params = [host, to_epoch_ms(since) if since is not None else np.iinfo(np.int64).min,
+              to_epoch_ms(until) if until is not None else np.iinfo(np.int64).max]
+    if pid is not None:
+        conditions.append("mt.pid = ?")
+        params.append(pid)
+    if name is not None:
+        conditions.append("mt.name_id = (SELECT id FROM process_names WHERE name = ?)")
+        params.append(name)
+    if cgroup is not None:
+        conditions.append("(tc.path = ? OR tc.path LIKE ? ESCAPE '\\')")
+        # Chemins stockés tels que dans /proc/<pid>/cgroup : absolus depuis la racine des cgroups
+        path = "/" + cgroup.strip("/")
+        prefix = path.rstrip("/").replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        params += [path, prefix + "/%"]
+
+    conn = connect(db_path)
+    rows = conn.execute(f"""
+        SELECT m.ts, mt.pid, mt.cpu_time, mt.cpu_percent, mt.rss, COALESCE(mt.read_bytes, -1),
+               COALESCE(mt.write_bytes, -1), mt.threads, COALESCE(mt.fds, -1), pn.name, tc.path
+        FROM metric_tracked mt
+        JOIN metrics m ON m.id = mt.metric_id
+        JOIN process_names pn ON pn.id = mt.name_id
+        JOIN tracked_cgroups tc ON tc.id = mt.cgroup_id
+        WHERE {' AND '.join(conditions)}
+        ORDER BY m.ts ASC, mt.pid ASC
+    """, params).fetchall()
+    conn.close()
+
+    columns = np.fromiter((row[:-2] for row in rows), dtype=TRACKED_DTYPE, count=len(rows))
+    return TrackedHistory(columns['ts'].astype('datetime64[ms]'),
+                          *(np.ascontiguousarray(columns[field]) for field in TRACKED_DTYPE.names[1:]),
+                          [row[-2] for row in rows], [row[-1] for row in rows])
+
+
+# Utilisation CPU et mémoire du moniteur, telle qu'écrite par instrument.write
+SELFSTATS_PROCESS_DTYPE = np.dtype([('ts', '<i8'), ('pid', '<i8'), ('cpu_percent', '<f4'), ('rss', '<i8')])
+
+@retry_locked
+def get_selfstats(since: datetime = None, until: datetime = None, db_path=DB_PATH):
+    """
+    Mesures internes du moniteur sur une période (voir src/instrument.py)
+    :param since: Date de début (incluse) ; None pour depuis la première écriture
+    :param until: Date de fin (exclue) ; None pour jusqu'à la dernière écriture
+    :param db_path: Chemin de la base de données
+    :return: Tuple (étape -> dictionnaire count, total_ns, max_ns, histogram cumulés ; tableau SELFSTATS_PROCESS_DTYPE)
+    """
+    params = (to_epoch_ms(since) if since is not None else np.iinfo(np.int64).min,
+              to_epoch_ms(until) if until is not None else np.iinfo(np.int64).max)
+    conn = connect(db_path)
+    stages = {}
+    # Les deux tables sont écrites dans la même transaction : elles sont lues sur le même instantané
+    with read_snapshot(conn):
+        for stage, count, total_ns, max_ns, histogram in conn.execute("""
+            SELECT stage, count, total_ns, max_ns, histogram
+            FROM selfstats
+            WHERE ts >= ? AND ts < ?
+        """, params):
+            stats = stages.setdefault(stage, {'count': 0, 'total_ns': 0, 'max_ns': 0,
+                                              'histogram': np.zeros(instrument.BUCKETS, dtype=np.int64)})
+            stats['count'] += count
+            stats['total_ns'] += total_ns
+            stats['max_ns'] = max(stats['max_ns'], max_ns)
+            stats['histogram'] += instrument.decode_histogram(histogram)
+        process = np.fromiter(conn.execute("""
+            SELECT ts, pid, cpu_percent, rss
+            FROM selfstats_process
+            WHERE ts >= ? AND ts < ?
+            ORDER BY ts ASC
+        """, params), dtype=SELFSTATS_PROCESS_DTYPE)
+    conn.close()
+    return stages, process
@@ -0,0 +1,67 @@
+import numpy as np
+
+# Métriques système détaillées d'un échantillon, dans l'ordre produit par collector.SystemSampler
+FIELDS = ('load1', 'load5', 'load15', 'swap', 'disk_read', 'disk_write', 'net_recv', 'net_sent', 'ctx_switches')
+
+# Utilisation par cœur stockée en un seul BLOB de float32 : 128 cœurs = 512 octets, ni 128 lignes ni JSON
+CORES_DTYPE = np.dtype('<f4')
+
+def create_tables(conn):
+    """
+    Création de la table des métriques système : une ligne par échantillon, clé = identifiant dans 'metrics'
+    :param conn: Connexion à la base de données
+    """
+    columns = ", ".join(f"{field} REAL NOT NULL" for field in FIELDS)
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS metrics_system (
+            metric_id INTEGER PRIMARY KEY,
+            {columns},
+            cpu_cores BLOB NOT NULL
+        )
+    """)
+
+def validate(system):
+    """
+    Vérification des métriques système d'un échantillon
+    :param system: Dictionnaire retourné par collector.SystemSampler.sample
+    """
+    if not isinstance(system, dict):
+        raise TypeError("system must be a dict")
+    for field in FIELDS:
+        if not isinstance(system.get(field), (int, float)):
+            raise TypeError(f"system['{field}'] must be a float")
+    cores = system.get('cpu_cores')
+    if not isinstance(cores, list) or not all(isinstance(value, (int, float)) for value in cores):
+        raise TypeError("system['cpu_cores'] must be a list of floats")
+
+def write(conn, metric_ids, systems):
+    """
+    Écriture des métriques système de plusieurs échantillons
+    :param conn: Connexion à la base de données
+    :param metric_ids: Identifiants des échantillons dans la table 'metrics'
+    :param systems: Métriques système de chaque échantillon (None si non collectées)
+    """
+    conn.executemany(f"""
+        INSERT INTO metrics_system (metric_id, {', '.join(FIELDS)}, cpu_cores)
+        VALUES ({', '.join('?' * (len(FIELDS) + 2))})
+    """, [
+        (metric_id, *(system[field] for field in FIELDS), np.asarray(system['cpu_cores'], dtype=CORES_DTYPE).tobytes())
+        for metric_id, system in zip(metric_ids, systems)
+        if system is not None
+    ])
+
+def decode_cores(blobs):
+    """
+    Décodage des utilisations par cœur de plusieurs échantillons
+    :param blobs: Liste de BLOB de la colonne cpu_cores
+    :return: Tableau float32 (échantillons, cœurs) ; si le nombre de cœurs varie, les cœurs absents valent NaN
+    """
+    width = max((len(blob) for blob in blobs), default=0) // CORES_DTYPE.itemsize
+    if all(len(blob) == width * CORES_DTYPE.itemsize for blob in blobs):
+        # Cas courant : une seule conversion pour toute la période
+        return np.frombuffer(b"".join(blobs), dtype=CORES_DTYPE).reshape(len(blobs), width).astype(np.float32)
+    cores = np.full((len(blobs), width), np.nan, dtype=np.float32)
+    for row, blob in enumerate(blobs):
+        values = np.frombuffer(blob, dtype=CORES_DTYPE)
+        cores[row, :len(values)] = values
+    return cores
@@ -0,0 +1,300 @@
+import os
+import re
+import time
+
+import psutil
+
+from src import collector, instrument, processes
+
+# Mesures d'un processus suivi, dans l'ordre des colonnes de la table 'metric_tracked'
+FIELDS = ('cpu_time', 'cpu_percent', 'rss', 'read_bytes', 'write_bytes', 'threads', 'fds')
+
+# Mesures qui peuvent manquer (fichiers /proc d'un processus d'un autre utilisateur) : None, écrit NULL
+OPTIONAL_FIELDS = ('read_bytes', 'write_bytes', 'fds')
+
+# Identifiant de conteneur dans un chemin de cgroup (docker, podman, containerd, CRI-O)
+CONTAINER_ID = re.compile(r"(?<![0-9a-f])([0-9a-f]{64})(?![0-9a-f])")
+
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+def create_tables(conn):
+    """
+    Création des tables du suivi détaillé : dictionnaire des cgroups et mesures des processus suivis de chaque échantillon
+    (les noms sont ceux de la table process_names, voir src/processes.py)
+    :param conn: Connexion à la base de données
+    """
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS tracked_cgroups (
+            id INTEGER PRIMARY KEY,
+            path TEXT NOT NULL UNIQUE
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS metric_tracked (
+            metric_id INTEGER NOT NULL,
+            pid INTEGER NOT NULL,
+            name_id INTEGER NOT NULL,
+            cgroup_id INTEGER NOT NULL,
+            cpu_time REAL NOT NULL,
+            cpu_percent REAL NOT NULL,
+            rss INTEGER NOT NULL,
+            read_bytes INTEGER,
+            write_bytes INTEGER,
+            threads INTEGER NOT NULL,
+            fds INTEGER,
+            PRIMARY KEY (metric_id, pid)
+        ) WITHOUT ROWID
+    """)
+    # Historique d'un pid sur une longue période ; les filtres par nom et par cgroup parcourent la période
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_metric_tracked_pid ON metric_tracked (pid, metric_id)")
+
+def validate(tracked):
+    """
+    Vérification d'une liste de processus suivis
+    :param tracked: Liste de dictionnaires retournés par ProcessTracker.sample
+    """
+    if not isinstance(tracked, list):
+        raise TypeError("tracked must be a list")
+    for proc in tracked:
+        if not isinstance(proc, dict):
+            raise TypeError("tracked items must be dicts")
+        pid = proc.get('pid')
+        if not isinstance(pid, int) or isinstance(pid, bool):
+            raise TypeError("tracked pid must be an integer")
+        if not isinstance(proc.get('name'), str) or not isinstance(proc.get('cgroup'), str):
+            raise TypeError("tracked name and cgroup must be strings")
+        for field in FIELDS:
+            value = proc.get(field)
+            if value is None and field in OPTIONAL_FIELDS:
+                continue
+            if not isinstance(value, (int, float)) or isinstance(value, bool):
+                raise TypeError(f"tracked {field} must be a number")
+
+def intern_cgroups(conn, paths):
+    """
+    Identifiants des chemins de cgroup, créés au besoin
+    :param conn: Connexion à la base de données (dans une transaction)
+    :param paths: Chemins à résoudre
+    :return: Dictionnaire chemin -> identifiant
+    """
+    ids = {}
+    for path in set(paths):
+        conn.execute("INSERT OR IGNORE INTO tracked_cgroups (path) VALUES (?)", (path,))
+        ids[path] = conn.execute("SELECT id FROM tracked_cgroups WHERE path = ?", (path,)).fetchone()[0]
+    return ids
+
+def write(conn, metric_ids, tracked_lists, name_cache):
+    """
+    Écriture des processus suivis de plusieurs échantillons
+    :param conn: Connexion à la base de données
+    :param metric_ids: Identifiants des échantillons dans la table 'metrics'
+    :param tracked_lists: Liste des processus suivis de chaque échantillon (None si aucun suivi)
+    :param name_cache: Dictionnaire nom -> identifiant (voir processes.intern_names)
+    """
+    pairs = [(metric_id, tracked) for metric_id, tracked in zip(metric_ids, tracked_lists) if tracked]
+    if not pairs:
+        return
+    processes.intern_names(conn, (proc['name'] for _, tracked in pairs for proc in tracked), name_cache)
+    # Peu de cgroups distincts par lot : résolus sans cache, rien à invalider si la transaction est annulée
+    cgroup_ids = intern_cgroups(conn, (proc['cgroup'] for _, tracked in pairs for proc in tracked))
+    conn.executemany(f"""
+        INSERT OR REPLACE INTO metric_tracked (metric_id, pid, name_id, cgroup_id, {', '.join(FIELDS)})
+        VALUES ({', '.join('?' * (len(FIELDS) + 4))})
+    """, [
+        (metric_id, proc['pid'], name_cache[proc['name']], cgroup_ids[proc['cgroup']], *(proc[field] for field in FIELDS))
+        for metric_id, tracked in pairs
+        for proc in tracked
+    ])
+
+def container_id(cgroup):
+    """
+    Conteneur d'un processus, déduit du chemin de son cgroup
+    :param cgroup: Chemin du cgroup (ex : '/system.slice/docker-<id>.scope')
+    :return: Identifiant court (12 caractères) du conteneur, ou None hors conteneur
+    """
+    match = CONTAINER_ID.search(cgroup)
+    return match.group(1)[:12] if match else None
+
+def find_container_cgroup(container, root=collector.CGROUP_ROOT):
+    """
+    Cgroup d'un conteneur, désigné par le début de son identifiant
+    :param container: Identifiant du conteneur (au moins les 12 premiers caractères, comme 'docker ps')
+    :param root: Racine des cgroups
+    :return: Chemin du cgroup relatif à 'root' (voir collector.read_cgroup_pids)
+    """
+    if not re.fullmatch(r"[0-9a-f]{12,64}", container):
+        raise ValueError("container must be a hexadecimal container id (at least 12 characters)")
+    for path, dirs, _ in os.walk(root):
+        for name in dirs:
+            match = CONTAINER_ID.search(name)
+            if match and match.group(1).startswith(container):
+                # Premier cgroup trouvé : celui du conteneur, ses sous-cgroups sont parcourus ensuite
+                return os.path.relpath(os.path.join(path, name), root)
+    raise ValueError(f"no cgroup found for container {container}")
+
+def read_cgroup(pid):
+    """
+    Cgroup d'un processus, lu une fois à l'ouverture
+    :param pid: Identifiant du processus
+    :return: Chemin du cgroup v2, sinon du premier contrôleur v1 hors de la racine ; '/' par défaut
+    """
+    try:
+        with open(f"/proc/{pid}/cgroup") as file:
+            lines = file.read().splitlines()
+    except OSError:
+        return "/"
+    paths = [line.split(":", 2) for line in lines if line.count(":") >= 2]
+    for hierarchy, controllers, path in paths:
+        if hierarchy == "0" and not controllers and path != "/":
+            return path
+    return next((path for _, _, path in paths if path != "/"), "/")
+
+def _read_file(path):
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        return os.read(fd, 4096)
+    finally:
+        os.close(fd)
+
+def read_proc_counters(pid):
+    """
+    Compteurs d'un processus lus directement dans /proc, sans psutil
+    :param pid: Identifiant du processus
+    :return: Tuple (date de démarrage, temps CPU en secondes, RSS en octets, octets lus, octets écrits, fils, descripteurs) ;
+             les octets et descripteurs valent None si /proc/<pid>/io ou /proc/<pid>/fd sont inaccessibles
+    """
+    fields = collector.read_proc_stat(pid)
+    read_bytes = write_bytes = fds = None
+    try:
+        io = _read_file(f"/proc/{pid}/io")
+        start = io.index(b"read_bytes: ") + 12
+        read_bytes = int(io[start:io.index(b"\n", start)])
+        start = io.index(b"write_bytes: ", start) + 13
+        write_bytes = int(io[start:io.index(b"\n", start)])
+    except (PermissionError, ValueError):
+        pass
+    try:
+        fds = len(os.listdir(f"/proc/{pid}/fd"))
+    except PermissionError:
+        pass
+    # Champs après le nom : 12e utime, 13e stime, 18e num_threads, 20e starttime, 22e rss (en pages)
+    return (int(fields[19]), (int(fields[11]) + int(fields[12])) / collector.CLOCK_TICKS,
+            int(fields[21]) * PAGE_SIZE, read_bytes, write_bytes, int(fields[17]), fds)
+
+def read_psutil_counters(proc):
+    """
+    Équivalent de read_proc_counters sans /proc (autres systèmes), par psutil
+    :param proc: psutil.Process
+    """
+    with proc.oneshot():
+        times = proc.cpu_times()
+        try:
+            io = proc.io_counters()
+            read_bytes, write_bytes = io.read_bytes, io.write_bytes
+        except (psutil.AccessDenied, AttributeError):
+            read_bytes = write_bytes = None
+        try:
+            fds = proc.num_fds() if hasattr(proc, "num_fds") else proc.num_handles()
+        except psutil.AccessDenied:
+            fds = None
+        return (proc.create_time(), times.user + times.system, proc.memory_info().rss, read_bytes, write_bytes,
+                proc.num_threads(), fds)
+
+class ProcessTracker:
+    """
+    Suivi détaillé d'un ensemble de processus d'un tick à l'autre : tous les processus choisis sont mesurés à chaque tick,
+    qu'ils soient ou non parmi les plus consommateurs. Un tick lit, pour chaque processus, /proc/<pid>/stat, io et fd ;
+    le nom et le cgroup ne sont lus qu'à la première rencontre du processus. Les temps CPU et octets d'E/S sont
+    des différences avec le tick précédent.
+    """
+
+    def __init__(self, pids=None, cgroup=None, clock=time.monotonic):
+        """
+        :param pids: Processus suivis ; None pour tous (ou tous ceux du cgroup)
+        :param cgroup: Cgroup dont tous les processus sont suivis, y compris ceux créés pendant le suivi
+                       (voir collector.read_cgroup_pids et find_container_cgroup)
+        :param clock: Horloge monotone (injectable pour les tests)
+        """
+        # Même sélection des processus que l'échantillonneur des processus les plus consommateurs
+        self.selection = collector.ProcessSampler(pids=pids, cgroup=cgroup)
+        self.clock = clock
+        self.max_percent = collector.get_max_cpu_percent()
+        # pid -> [psutil.Process, nom, cgroup, date de démarrage, temps CPU, octets lus, octets écrits] du tick précédent
+        self.handles = {}
+        self.last_time = None
+
+    def _open(self, pid):
+        try:
+            proc = psutil.Process(pid)
+            name = proc.name()
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            return None
+        return [proc, name, read_cgroup(pid) if collector.PROC_AVAILABLE else "/", None, None, None, None]
+
+    def _counters(self, entry):
+        if collector.PROC_AVAILABLE:
+            try:
+                return read_proc_counters(entry[0].pid)
+            except (FileNotFoundError, ProcessLookupError):
+                raise psutil.NoSuchProcess(entry[0].pid)
+        return read_psutil_counters(entry[0])
+
+    @instrument.timed("tracker.sample")
+    def sample(self):
+        """
+        Mesure de tous les processus suivis
+        :return: Liste de dictionnaires pid, name, cgroup, cpu_time (secondes CPU depuis le tick précédent),
+                 cpu_percent, rss (octets), read_bytes, write_bytes (octets depuis le tick précédent), threads, fds ;
+                 triée par pid. À la première mesure d'un processus, les différences valent 0.
+        """
+        now = self.clock()
+        elapsed = now - self.last_time if self.last_time is not None else None
+        self.last_time = now
+
+        handles = {}
+        tracked = []
+        for pid in sorted(self.selection.target_pids()):
+            entry = self.handles.get(pid) or self._open(pid)
+            if entry is None:
+                continue
+            try:
+                counters = self._counters(entry)
+                if entry[3] is not None and counters[0] != entry[3]:
+                    # pid réutilisé par un autre processus : nouvelle entrée, sans différence avec l'ancien
+                    entry = self._open(pid)
+                    if entry is None:
+                        continue
+                    counters = self._counters(entry)
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                continue
+            start, cpu_total, rss, read_total, write_total, threads, fds = counters
+            previous_cpu, previous_read, previous_write = entry[4:7]
+            entry[3:7] = [start, cpu_total, read_total, write_total]
+            handles[pid] = entry
+
+            cpu_time = max(cpu_total - previous_cpu, 0.0) if previous_cpu is not None else 0.0
+            cpu_percent = min(round(cpu_time / elapsed * 100, 1), self.max_percent) if elapsed else 0.0
+            tracked.append({
+                'pid': pid,
+                'name': entry[1],
+                'cgroup': entry[2],
+                'cpu_time': round(cpu_time, 3),
+                'cpu_percent': cpu_percent,
+                'rss': rss,
+                'read_bytes': _delta(read_total, previous_read),
+                'write_bytes': _delta(write_total, previous_write),
+                'threads': threads,
+                'fds': fds
+            })
+
+        # Les processus disparus sont oubliés
+        self.handles = handles
+        return tracked
+
+def _delta(total, previous):
+    """
+    Différence d'un compteur cumulé avec le tick précédent : None si illisible, 0 à la première mesure
+    """
+    if total is None:
+        return None
+    return max(total - previous, 0) if previous is not None else 0
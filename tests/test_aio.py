@@ -0,0 +1,137 @@
+import asyncio
+import threading
+import time
+import pytest
+from datetime import datetime, timedelta
+
+from src import storage
+from src.aio import AsyncMetricsWriter, SampleHub, samples
+from config.config import DB_TEST_PATH
+
+BASE = datetime(2025, 8, 24, 12, 0, 0)
+
+@pytest.fixture(autouse=True)
+def setup_and_teardown():
+    ###########################################################
+    #                          SETUP                          #
+    ###########################################################
+    storage.init_database(DB_TEST_PATH)
+
+    yield  # Exécution des tests
+
+    ###########################################################
+    #                         TEARDOWN                        #
+    ###########################################################
+    storage.delete_database(DB_TEST_PATH)
+
+class FakeCollect:
+    """
+    Collecte factice : appel bloquant d'une durée fixe, échantillons numérotés
+    """
+    def __init__(self, cost=0.0):
+        self.cost = cost
+        self.calls = 0
+        self.threads = set()
+
+    def __call__(self):
+        time.sleep(self.cost)
+        self.threads.add(threading.get_ident())
+        i = self.calls
+        self.calls += 1
+        return {
+            'timestamp': (BASE + timedelta(seconds=i)).isoformat(),
+            'cpu': float(i),
+            'ram': 50.0,
+            'top_processes': [{'pid': i, 'name': f"proc-{i % 3}", 'cpu_percent': 1.0}]
+        }
+
+def test_samples_do_not_block_the_event_loop():
+    """
+    Les échantillons doivent arriver à intervalle fixe, la collecte bloquante étant exécutée hors de la boucle
+    """
+    collect = FakeCollect(cost=0.04)
+
+    async def main():
+        beats = 0
+        stop = asyncio.Event()
+
+        async def heartbeat():
+            nonlocal beats
+            while not stop.is_set():
+                beats += 1
+                await asyncio.sleep(0.005)
+
+        task = asyncio.create_task(heartbeat())
+        received = [sample async for sample in samples(0.05, duration=0.5, collect=collect)]
+        stop.set()
+        await task
+        return received, beats
+
+    received, beats = asyncio.run(main())
+    assert [sample['cpu'] for sample in received] == [float(i) for i in range(10)]
+    assert threading.get_ident() not in collect.threads
+    # 0.4 s de collecte bloquante sur 0.5 s : la boucle a continué de tourner pendant les appels
+    assert beats >= 40
+
+def test_hub_shares_one_collection_between_subscribers():
+    """
+    Tous les abonnés doivent recevoir les mêmes échantillons pour une seule collecte par tick ;
+    un abonné lent perd ses plus anciens échantillons sans retarder les autres
+    """
+    collect = FakeCollect()
+
+    async def main():
+        hub = SampleHub(0.02, duration=0.2, collect=collect)
+        subscriptions = [hub.subscribe() for _ in range(3)]
+        slow = hub.subscribe(maxsize=2)
+
+        async def consume(subscription):
+            return [sample['cpu'] async for sample in subscription]
+
+        async def consume_late(subscription):
+            await asyncio.sleep(0.3)
+            return [sample['cpu'] async for sample in subscription]
+
+        async with hub:
+            results = await asyncio.gather(*(consume(s) for s in subscriptions), consume_late(slow))
+        return hub, slow, results
+
+    hub, slow, results = asyncio.run(main())
+    assert collect.calls == hub.stats["samples"] == 10
+    expected = [float(i) for i in range(10)]
+    assert results[:3] == [expected] * 3
+    # File de 2 : le dernier échantillon reste avant la fin du flux
+    assert results[3] == [9.0]
+    assert slow.dropped == 9 and hub.stats["dropped"] == 9
+    assert not hub.subscribers
+
+def test_async_writer_writes_batches():
+    """
+    L'écrivain asynchrone doit écrire tous les échantillons du flux par lots, y compris le dernier lot incomplet
+    """
+    async def main():
+        hub = SampleHub(0.01, duration=0.25, collect=FakeCollect())
+        subscription = hub.subscribe()
+        async with hub, AsyncMetricsWriter(DB_TEST_PATH, batch_size=10, retention_interval=None) as writer:
+            await writer.consume(subscription)
+            assert writer.written == 20 and len(writer.buffer) == 5
+        return writer
+
+    writer = asyncio.run(main())
+    assert writer.written == 25
+    timestamps, cpu, _, processes = storage.get_last_metrics(100, DB_TEST_PATH)
+    assert cpu[::-1] == [float(i) for i in range(25)]
+    assert timestamps[-1] == BASE
+    assert '"proc-0"' in processes[-1]
+
+def test_async_writer_rejects_invalid_data():
+    """
+    L'écrivain asynchrone doit appliquer les mêmes vérifications que MetricsWriter
+    """
+    async def main():
+        async with AsyncMetricsWriter(DB_TEST_PATH) as writer:
+            with pytest.raises(TypeError):
+                await writer.write({'timestamp': BASE.isoformat(), 'cpu': "high", 'ram': 50.0, 'top_processes': []})
+            assert writer.buffer == []
+
+    asyncio.run(main())
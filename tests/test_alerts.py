@@ -0,0 +1,169 @@
+import json
+import threading
+import numpy as np
+import pytest
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from src import alerts
+
+BASE = datetime(2025, 8, 24, 12, 0, 0)
+RATE = 10_000  # Échantillons par seconde des flux synthétiques
+
+class ListSink:
+    def __init__(self):
+        self.alerts = []
+
+    def send(self, alert):
+        self.alerts.append(alert)
+
+    def close(self):
+        pass
+
+def stream(cpu, ram=None, system=None):
+    """
+    Flux synthétique à RATE échantillons par seconde
+    """
+    for i, value in enumerate(cpu):
+        sample = {'timestamp': (BASE + timedelta(microseconds=i * 1_000_000 // RATE)).isoformat(),
+                  'cpu': float(value), 'ram': float(ram[i]) if ram is not None else 50.0, 'top_processes': []}
+        if system is not None:
+            sample['system'] = {'load1': float(system[i])}
+        yield sample
+
+def run(rules, samples):
+    sink = ListSink()
+    engine = alerts.AlertEngine(rules, [sink])
+    for sample in samples:
+        engine.process(sample)
+    return engine, [(alert['rule'], alert['state'], alert['timestamp']) for alert in sink.alerts]
+
+def at(i):
+    return (BASE + timedelta(microseconds=i * 1_000_000 // RATE)).isoformat()
+
+def test_threshold_catches_short_burst():
+    """
+    Test du seuil : une rafale de 5 ms dans un flux à 10 000 échantillons/s déclenche une alerte puis sa résolution
+    """
+    cpu = np.full(20_000, 20.0)
+    cpu[12_000:12_050] = 99.0
+    engine, fired = run([alerts.ThresholdRule("spike", "cpu", ">", 95)], stream(cpu))
+    assert fired == [("spike", "firing", at(12_000)), ("spike", "resolved", at(12_050))]
+    assert engine.stats == {"samples": 20_000, "fired": 1, "resolved": 1, "sink_errors": 0}
+
+def test_sustained_requires_duration():
+    """
+    Test de la durée minimale : une interruption remet la durée à zéro
+    """
+    cpu = np.full(30_000, 10.0)
+    cpu[1_000:5_000] = 90.0     # 0.4 s : trop court
+    cpu[5_001:20_000] = 90.0    # 1.5 s : alerte après 1 s
+    engine, fired = run([alerts.SustainedRule("busy", "cpu", ">=", 90, 1.0)], stream(cpu))
+    assert fired == [("busy", "firing", at(15_001)), ("busy", "resolved", at(20_000))]
+
+def test_rate_of_change():
+    """
+    Test de la variation par seconde sur une fenêtre : une rampe de 100 points/s est détectée, pas le bruit
+    """
+    rng = np.random.default_rng(0)
+    ram = np.full(30_000, 50.0)
+    ram[:5_000] += rng.uniform(-0.5, 0.5, 5_000)      # Bruit : au plus 5 points/s sur la fenêtre
+    ram[10_000:15_000] += np.linspace(0, 50, 5_000)   # +50 points en 0.5 s
+    ram[15_000:] += 50
+    rule = alerts.RateRule("ram-climb", "ram", ">", 20, 0.2)
+    engine, fired = run([rule], stream(np.zeros(30_000), ram=ram))
+    assert [state for _, state, _ in fired] == ["firing", "resolved"]
+    first = datetime.fromisoformat(fired[0][2])
+    assert BASE + timedelta(seconds=1.0) < first < BASE + timedelta(seconds=1.1)
+    assert len(rule.points) <= 0.2 * RATE + 1
+
+@pytest.mark.parametrize("op", [">", ">=", "<", "<="])
+def test_percentile_matches_numpy(op):
+    """
+    Test du percentile sur fenêtre glissante : identique à numpy (rang le plus proche) à chaque échantillon
+    """
+    rng = np.random.default_rng(1)
+    cpu = np.round(rng.gamma(2.0, 10.0, 12_000), 0)
+    cpu[6_000:7_000] += 40  # Période chargée : le p90 franchit le seuil
+    window = 0.25
+    rule = alerts.PercentileRule("p90", "cpu", op, 50.0, window, 90)
+    compare = alerts.OPERATORS[op]
+    ts = np.arange(len(cpu)) / RATE
+    for i, value in enumerate(cpu):
+        active, _ = rule.update(float(ts[i]), float(value))
+        if i % 37 == 0:
+            values = cpu[(ts > ts[i] - window) & (ts <= ts[i])]
+            expected = ts[i] >= window and compare(np.percentile(values, 90, method='inverted_cdf'), 50.0)
+            assert active == expected, i
+    assert len(rule.flags) == window * RATE
+
+def test_rule_requires_update():
+    """
+    Test de la classe de base : une règle sans méthode update ne peut pas être créée
+    """
+    with pytest.raises(TypeError):
+        alerts.Rule("base", "cpu", ">", 90)
+
+def test_missing_metric_is_skipped():
+    """
+    Test d'une métrique absente de l'échantillon (collecte sans métriques système) : la règle est ignorée
+    """
+    engine, fired = run([alerts.ThresholdRule("load", "load1", ">", 0)], stream([10.0, 20.0]))
+    assert fired == []
+
+def test_config_and_sinks(tmp_path, capsys):
+    """
+    Test du fichier de configuration et des destinations : console, fichier et webhook (y compris injoignable)
+    """
+    received = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            received.append(json.loads(self.rfile.read(int(self.headers["Content-Length"]))))
+            self.send_response(204)
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    log_path = tmp_path / "alerts.log"
+    config = {
+        "rules": [{"name": "cpu-high", "type": "threshold", "metric": "cpu", "value": 90}],
+        "sinks": [{"type": "stdout"}, {"type": "log", "path": str(log_path)},
+                  {"type": "webhook", "url": f"127.0.0.1:{server.server_address[1]}/alerts"},
+                  {"type": "webhook", "url": "http://127.0.0.1:1/alerts", "timeout": 0.5}],
+    }
+    path = tmp_path / "alerts.json"
+    path.write_text(json.dumps(config))
+    try:
+        with alerts.AlertEngine.from_config(str(path)) as engine:
+            for sample in stream([10.0, 95.0, 20.0]):
+                engine.process(sample)
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert [alert['state'] for alert in received] == ["firing", "resolved"]
+    assert received[0]['value'] == 95.0 and received[0]['timestamp'] == at(1)
+    assert [json.loads(line) for line in log_path.read_text().splitlines()] == received
+    assert capsys.readouterr().out.count("[ALERT]") == 2
+    # Webhook injoignable : compté, sans interrompre la collecte
+    assert engine.stats["sink_errors"] == 2
+
+@pytest.mark.parametrize("rule", [
+    {"type": "threshold", "metric": "cpu", "value": 90},
+    {"name": "a", "type": "spike", "metric": "cpu", "value": 90},
+    {"name": "a", "type": "threshold", "metric": "cpu", "op": "!=", "value": 90},
+    {"name": "a", "type": "threshold", "metric": "cpu", "value": "90"},
+    {"name": "a", "type": "sustained", "metric": "cpu", "value": 90},
+    {"name": "a", "type": "percentile", "metric": "cpu", "value": 90, "window": 60, "percentile": 150},
+])
+def test_invalid_rules_are_rejected(rule):
+    """
+    Test de la validation des règles : une configuration incomplète ou invalide est refusée au chargement
+    """
+    with pytest.raises(ValueError):
+        alerts.parse_rule(rule)
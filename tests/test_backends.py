@@ -0,0 +1,155 @@
+import os
+import shutil
+import numpy as np
+import pytest
+from datetime import datetime, timedelta
+
+from src import storage
+from src.backends import SQLiteBackend, SegmentBackend
+from config.config import DATA_PATH, DB_TEST_PATH
+
+SEGMENT_TEST_PATH = os.path.join(DATA_PATH, "segments_test")
+
+BASE = datetime(2025, 8, 24, 12, 0, 0)
+
+@pytest.fixture(autouse=True)
+def setup_and_teardown():
+    ###########################################################
+    #                          SETUP                          #
+    ###########################################################
+    storage.init_database(DB_TEST_PATH)
+
+    yield  # Exécution des tests
+
+    ###########################################################
+    #                         TEARDOWN                        #
+    ###########################################################
+    storage.delete_database(DB_TEST_PATH)
+    shutil.rmtree(SEGMENT_TEST_PATH, ignore_errors=True)
+
+def open_backend(kind):
+    # Petits segments : les lectures traversent plusieurs fichiers
+    if kind == "sqlite":
+        return SQLiteBackend(DB_TEST_PATH)
+    return SegmentBackend(SEGMENT_TEST_PATH, max_records=7)
+
+@pytest.fixture(params=["sqlite", "segment"])
+def kind(request):
+    return request.param
+
+def make_rows(seconds):
+    # Valeurs exactes en float32 : les deux moteurs doivent retourner les mêmes nombres
+    return [storage.validate_metrics({
+        'timestamp': (BASE + timedelta(seconds=s)).isoformat(),
+        'cpu': (s % 8) * 0.5,
+        'ram': 40.0 + (s % 5) * 0.25,
+        'top_processes': []
+    }) for s in seconds]
+
+def assert_arrays(arrays, seconds):
+    seconds = np.array(sorted(seconds))
+    expected = (np.datetime64(BASE, 'ms') + seconds * np.timedelta64(1000, 'ms'))
+    assert np.array_equal(arrays.timestamps, expected)
+    assert np.array_equal(arrays.cpu, ((seconds % 8) * 0.5).astype(np.float32))
+    assert np.array_equal(arrays.ram, (40.0 + (seconds % 5) * 0.25).astype(np.float32))
+
+def test_read_range_and_last(kind):
+    """
+    Test des lectures d'une période et des derniers échantillons, y compris avec des lots écrits dans le désordre
+    """
+    with open_backend(kind) as backend:
+        assert backend.write_batch(make_rows(range(0, 30))) == 30
+        # Lot plus ancien que le précédent, lui-même dans le désordre
+        assert backend.write_batch(make_rows([-5, -1, -3, -2, -4])) == 5
+        backend.write({'timestamp': (BASE + timedelta(seconds=30)).isoformat(), 'cpu': 3.0, 'ram': 40.0, 'top_processes': []})
+
+        assert_arrays(backend.read_range(BASE - timedelta(seconds=10)), range(-5, 31))
+        assert_arrays(backend.read_range(BASE + timedelta(seconds=3), BASE + timedelta(seconds=12)), range(3, 12))
+        assert_arrays(backend.read_range(None, BASE), range(-5, 0))
+        assert_arrays(backend.read_last(4), range(27, 31))
+        assert_arrays(backend.read_last(1000), range(-5, 31))
+        assert len(backend.read_last(0).timestamps) == 0
+        assert len(backend.read_range(BASE + timedelta(hours=1)).timestamps) == 0
+
+def test_rollup(kind):
+    """
+    Test des agrégats : mêmes seaux et mêmes valeurs sur les deux moteurs, fin de période non alignée comprise
+    """
+    seconds = range(0, 300)
+    with open_backend(kind) as backend:
+        backend.write_batch(make_rows(seconds))
+        series = backend.read_rollup("1m", BASE + timedelta(seconds=30), BASE + timedelta(seconds=150))
+
+    # Début arrondi au seau, seaux complets jusqu'à la fin (exclue)
+    assert np.array_equal(series.timestamps, np.datetime64(BASE, 'ms') + np.arange(3) * np.timedelta64(60_000, 'ms'))
+    assert series.count.tolist() == [60, 60, 60]
+    values = (np.arange(60) % 8) * 0.5
+    assert series.cpu_min[0] == values.min() and series.cpu_max[0] == values.max()
+    assert series.cpu_avg[0] == np.float32(values.mean())
+    assert series.ram_p95[0] == np.float32(41.0)
+
+    # Même résultat que les agrégats maintenus par SQLite
+    with SQLiteBackend(DB_TEST_PATH) as reference:
+        if kind != "sqlite":
+            reference.write_batch(make_rows(seconds))
+        expected = reference.read_rollup("1h", BASE)
+    with open_backend(kind) as backend:
+        hourly = backend.read_rollup("1h", BASE)
+    for got, want in zip(hourly, expected):
+        assert np.array_equal(got, want)
+
+def test_retention(kind):
+    """
+    Test de la rétention : les échantillons plus anciens que l'âge maximal ne sont plus lus
+    """
+    with open_backend(kind) as backend:
+        backend.write_batch(make_rows(range(0, 40)))
+        now = BASE + timedelta(days=1, seconds=25)
+        assert backend.apply_retention(1, now=now) == 25
+        assert backend.apply_retention(1, now=now) == 0
+        assert_arrays(backend.read_range(BASE), range(25, 40))
+        assert_arrays(backend.read_last(100), range(25, 40))
+        # Écriture après suppression des segments expirés
+        backend.write_batch(make_rows(range(40, 45)))
+        assert_arrays(backend.read_last(100), range(25, 45))
+
+def test_reopen(kind):
+    """
+    Test de la persistance : un moteur rouvert relit les données et continue d'écrire
+    """
+    with open_backend(kind) as backend:
+        backend.write_batch(make_rows(range(0, 10)))
+        backend.apply_retention(1, now=BASE + timedelta(days=1, seconds=2))
+    with open_backend(kind) as backend:
+        assert_arrays(backend.read_range(None), range(2, 10))
+        backend.write_batch(make_rows(range(10, 20)))
+    with open_backend(kind) as backend:
+        assert_arrays(backend.read_last(100), range(2, 20))
+
+def test_choose_resolution(kind):
+    """
+    Test du choix de la résolution : données brutes sous le budget, agrégats au-delà
+    """
+    with open_backend(kind) as backend:
+        backend.write_batch(make_rows(range(0, 300)))
+        assert backend.choose_resolution(BASE, max_points=200) is None
+        assert backend.choose_resolution(BASE, max_points=100) == "1m"
+
+def test_sqlite_backend_reads_through_cache():
+    """
+    Test du cache de lecture du moteur SQLite : échantillons écrits par le moteur servis depuis la mémoire,
+    mêmes résultats qu'une lecture directe de la base
+    """
+    with SQLiteBackend(DB_TEST_PATH) as backend:
+        backend.write_batch(make_rows(range(0, 30)))
+        assert_arrays(backend.read_last(10), range(20, 30))
+        assert_arrays(backend.read_range(BASE + timedelta(seconds=5)), range(5, 30))
+        assert backend.cache.stats == {"hits": 2, "misses": 0}
+
+    with SQLiteBackend(DB_TEST_PATH) as backend, SQLiteBackend(DB_TEST_PATH, cache_capacity=0) as direct:
+        # Moteur rouvert : cache vide, lectures complétées par la base
+        for read in (lambda b: b.read_last(12), lambda b: b.read_range(BASE, BASE + timedelta(seconds=20))):
+            for got, want in zip(read(backend), read(direct)):
+                assert np.array_equal(got, want)
+        assert backend.cache.stats == {"hits": 0, "misses": 2}
+        assert direct.cache is None
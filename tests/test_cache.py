@@ -0,0 +1,145 @@
+import numpy as np
+import pytest
+from datetime import datetime, timedelta
+
+from src import storage
+from src.cache import MetricsCache
+from config.config import DB_TEST_PATH
+
+BASE = datetime(2025, 8, 24, 12, 0, 0)
+
+@pytest.fixture(autouse=True)
+def setup_and_teardown():
+    ###########################################################
+    #                          SETUP                          #
+    ###########################################################
+    storage.init_database(DB_TEST_PATH)
+
+    yield  # Exécution des tests
+
+    ###########################################################
+    #                         TEARDOWN                        #
+    ###########################################################
+    storage.delete_database(DB_TEST_PATH)
+
+def make_sample(i):
+    # Dates en double (deux échantillons par seconde) et valeurs entières : cas où l'ordre et les types comptent
+    return {
+        'timestamp': (BASE + timedelta(seconds=i // 2, microseconds=1500)).isoformat(),
+        'cpu': i % 7,
+        'ram': 50.0 + (i % 3) / 3,
+        'top_processes': [{'pid': i, 'name': f"proc-{i % 4}", 'cpu_percent': i % 5}] if i % 3 else []
+    }
+
+def assert_same_reads(cache):
+    """
+    Chaque lecture du cache doit être identique à la même lecture dans la base
+    """
+    for limit in (0, 1, 5, 20, 50, 1000):
+        assert cache.get_last_metrics(limit) == storage.get_last_metrics(limit, DB_TEST_PATH)
+        expected = storage.get_last_metrics_arrays(limit, DB_TEST_PATH)
+        for column, values in zip(expected, cache.get_last_metrics_arrays(limit)):
+            assert values.dtype == column.dtype
+            np.testing.assert_array_equal(values, column)
+
+    for offset in (-10, 0, 3, 10, 15, 20, 1000):
+        since = BASE + timedelta(seconds=offset)
+        assert cache.get_last_time_metrics(since) == storage.get_last_time_metrics(since, DB_TEST_PATH)
+        for until in (None, since + timedelta(seconds=4)):
+            expected = storage.get_time_metrics_arrays(since, until, db_path=DB_TEST_PATH)
+            for column, values in zip(expected, cache.get_time_metrics_arrays(since, until)):
+                assert values.dtype == column.dtype
+                np.testing.assert_array_equal(values, column)
+
+def test_cache_reads_match_database():
+    """
+    Les lectures servies par le cache (entièrement ou complétées par la base) doivent être identiques à la base
+    """
+    # Lignes antérieures au cache : lues dans la base
+    for i in range(10):
+        storage.insert_metrics(make_sample(i), DB_TEST_PATH)
+
+    cache = MetricsCache(DB_TEST_PATH, capacity=16)
+    with storage.MetricsWriter(DB_TEST_PATH, batch_size=3, cache=cache) as writer:
+        for i in range(10, 40):
+            writer.write(make_sample(i))
+    assert len(cache.buffer) == 16
+    # Les 16 derniers échantillons couvrent les 8 dernières secondes
+    cache.get_time_metrics_arrays(BASE + timedelta(seconds=12))
+    assert cache.stats == {"hits": 1, "misses": 0}
+    assert_same_reads(cache)
+    cache.close()
+
+def test_cache_hit_and_miss_counters():
+    """
+    Une lecture couverte par le cache ne doit pas interroger la base ; sinon elle compte comme un échec
+    """
+    storage.insert_metrics(make_sample(0), DB_TEST_PATH)
+    cache = MetricsCache(DB_TEST_PATH, capacity=10)
+    for i in range(1, 6):
+        storage.insert_metrics(make_sample(i), DB_TEST_PATH, cache=cache)
+
+    cache.get_last_metrics(5)
+    cache.get_last_time_metrics(BASE + timedelta(seconds=1))
+    assert cache.stats == {"hits": 2, "misses": 0}
+
+    # Le premier échantillon est antérieur au cache
+    cache.get_last_metrics(6)
+    cache.get_last_time_metrics(BASE)
+    assert cache.stats == {"hits": 2, "misses": 2}
+    cache.close()
+
+def test_cache_detects_writes_from_other_connections():
+    """
+    Les écritures et suppressions faites hors du cache (autre processus, rétention) ne doivent pas fausser les lectures
+    """
+    cache = MetricsCache(DB_TEST_PATH, capacity=100)
+    for i in range(30):
+        storage.insert_metrics(make_sample(i), DB_TEST_PATH, cache=cache)
+
+    # Écriture d'une autre connexion : le cache repart de la base
+    storage.insert_metrics(make_sample(30), DB_TEST_PATH)
+    assert_same_reads(cache)
+    for i in range(31, 40):
+        storage.insert_metrics(make_sample(i), DB_TEST_PATH, cache=cache)
+    assert len(cache.buffer) == 9
+    assert_same_reads(cache)
+
+    # Rétention : les plus anciennes lignes du cache disparaissent, les autres restent servies depuis la mémoire
+    storage.enforce_retention(DB_TEST_PATH, now=BASE + timedelta(seconds=17, microseconds=1500),
+                              max_age={"raw": 1 / 86400}, max_size=None)
+    assert len(cache.get_last_metrics(100)[0]) == 8
+    assert len(cache.buffer) == 8
+    assert_same_reads(cache)
+    cache.close()
+
+def test_cache_reads_by_host_match_database():
+    """
+    Les lectures d'un hôte doivent être identiques à la base, y compris pour des lots reçus dans le désordre
+    """
+    def sample(i, host):
+        # Lots d'un agent en retard : dates antérieures aux derniers échantillons déjà écrits
+        return storage.validate_metrics({**make_sample((i * 7) % 40), 'host': host})
+
+    with storage.MetricsWriter(DB_TEST_PATH) as writer:
+        writer.extend([sample(i, "web-1") for i in range(10)])
+    cache = MetricsCache(DB_TEST_PATH, capacity=24)
+    with storage.MetricsWriter(DB_TEST_PATH, batch_size=5, cache=cache) as writer:
+        for i in range(10, 40):
+            writer.extend([sample(i, ("web-1", "web-2", storage.LOCAL_HOST)[i % 3])])
+
+    for host in (None, storage.LOCAL_HOST, "web-1", "web-2", "unknown"):
+        for limit in (0, 1, 5, 8, 20, 100):
+            expected = storage.get_last_metrics_arrays(limit, DB_TEST_PATH, host=host)
+            for column, values in zip(expected, cache.get_last_metrics_arrays(limit, host=host)):
+                assert values.dtype == column.dtype
+                np.testing.assert_array_equal(values, column)
+        for offset in (-10, 0, 5, 12, 18, 1000):
+            since = BASE + timedelta(seconds=offset)
+            for until in (None, since + timedelta(seconds=4)):
+                expected = storage.get_time_metrics_arrays(since, until, db_path=DB_TEST_PATH, host=host)
+                for column, values in zip(expected, cache.get_time_metrics_arrays(since, until, host=host)):
+                    assert values.dtype == column.dtype
+                    np.testing.assert_array_equal(values, column)
+    assert cache.stats["hits"] > 0
+    cache.close()
@@ -1,121 +1,281 @@
-import pytest
-from datetime import datetime
-import json
-
-from src import collector
-
-def test_collect_metrics_timestamp_is_iso():
-    """
-    Le timestamp doit être une chaîne ISO 8601 valide
-    """
-    data = collector.collect_metrics()
-    ts = data['timestamp']
-    assert isinstance(ts, str)
-    try:
-        parsed = datetime.fromisoformat(ts)
-    except ValueError:
-        assert False, "timestamp is not a valid ISO format"
-
-def test_get_cpu_usage():
-    """
-    L'application doit pouvoir récupérer le taux d'utilisation courant du CPU
-    """
-    cpu = collector.get_cpu_usage()
-    assert isinstance(cpu, float)
-    assert 0 <= cpu <= 100
-
-def test_get_max_cpu_percent():
-    """
-    L'application doit avoir une valeur maximale d'utilisation CPU doit être un float supérieur ou égal à 100% (valable pour les machines avec au moins 1 cœur)
-    """
-    from src.collector import get_max_cpu_percent
-    max_cpu = get_max_cpu_percent()
-    assert isinstance(max_cpu, float)
-    assert max_cpu >= 100.0
-
-def test_get_ram_usage():
-    """
-    L'application doit pouvoir récupérer le taux d'utilisation courant de la RAM
-    """
-    ram = collector.get_ram_usage()
-    assert isinstance(ram, float)
-    assert 0 <= ram <= 100
-
-def test_get_top_processes():
-    """
-    L'application doit pouvoir récupérer une liste de processus les plus consommateur du CPU
-    """
-    processes = collector.get_top_processes()
-    assert isinstance(processes, list)
-    assert all('pid' in p and 'name' in p and 'cpu_percent' in p for p in processes)
-
-def test_get_top_processes_with_zero():
-    """
-    get_top_processes() doit retourner une liste vide si top_n=0
-    """
-    processes = collector.get_top_processes(top_n=0)
-    assert processes == []
-
-@pytest.mark.parametrize("n", [1, 3, 5, 10])
-def test_get_top_processes_various_n(n):
-    """
-    get_top_processes() doit récupérer une liste de processus les plus consommateur du CPU pour diverse valeur de top_n
-    """
-    processes = collector.get_top_processes(top_n=n)
-    assert len(processes) <= n
-
-def test_get_top_processes_values():
-    """
-    L'application doit, pour chaque processus retourné, avoir des valeurs cohérentes
-    """
-    processes = collector.get_top_processes()
-    max_cpu = collector.get_max_cpu_percent()
-
-    # En CI ou VM, psutil peut surestimer le cpu_percent
-    # On tolère jusqu’à +20% du max théorique
-    margin = max_cpu * 0.2  # tolérance de 20%
-
-    for proc in processes:
-        assert isinstance(proc['pid'], int)
-        assert isinstance(proc['name'], str)
-        assert isinstance(proc['cpu_percent'], float)
-        assert 0.0 <= proc['cpu_percent'] <= max_cpu + margin
-
-def test_collect_metrics_structure():
-    """
-    L'application doit pouvoir collecter les données suivantes dans un dictionnaire : timestamp, cpu, ram, top_processes
-    """
-    data = collector.collect_metrics()
-    assert 'timestamp' in data
-    assert 'cpu' in data
-    assert 'ram' in data
-    assert 'top_processes' in data
-
-def test_collect_metrics_data_content():
-    """
-    L'application ne doit pas avoir de perte sur la cohérence des données collectées
-    """
-    data = collector.collect_metrics()
-
-    # timestamp
-    ts = data['timestamp']
-    assert isinstance(ts, str)
-    datetime.fromisoformat(ts)
-
-    # CPU / RAM
-    assert isinstance(data['cpu'], float)
-    assert 0 <= data['cpu'] <= 100
-    assert isinstance(data['ram'], float)
-    assert 0 <= data['ram'] <= 100
-
-    # Processus
-    processes = data['top_processes']
-    assert isinstance(processes, list)
-    for proc in processes:
-        assert isinstance(proc['pid'], int)
-        assert isinstance(proc['name'], str)
-        assert isinstance(proc['cpu_percent'], float)
-
-    # Vérifie que JSON serialization fonctionne (utile pour stockage)
-    json_string = json.dumps(processes)
-    assert isinstance(json_string, str)
\ No newline at end of file
+import pytest
+from datetime import datetime
+import json
+
+from src import collector
+
+def test_collect_metrics_timestamp_is_iso():
+    """
+    Le timestamp doit être une chaîne ISO 8601 valide
+    """
+    data = collector.collect_metrics()
+    ts = data['timestamp']
+    assert isinstance(ts, str)
+    try:
+        parsed = datetime.fromisoformat(ts)
+    except ValueError:
+        assert False, "timestamp is not a valid ISO format"
+
+def test_get_cpu_usage():
+    """
+    L'application doit pouvoir récupérer le taux d'utilisation courant du CPU
+    """
+    cpu = collector.get_cpu_usage()
+    assert isinstance(cpu, float)
+    assert 0 <= cpu <= 100
+
+def test_get_max_cpu_percent():
+    """
+    L'application doit avoir une valeur maximale d'utilisation CPU doit être un float supérieur ou égal à 100% (valable pour les machines avec au moins 1 cœur)
+    """
+    from src.collector import get_max_cpu_percent
+    max_cpu = get_max_cpu_percent()
+    assert isinstance(max_cpu, float)
+    assert max_cpu >= 100.0
+
+def test_get_ram_usage():
+    """
+    L'application doit pouvoir récupérer le taux d'utilisation courant de la RAM
+    """
+    ram = collector.get_ram_usage()
+    assert isinstance(ram, float)
+    assert 0 <= ram <= 100
+
+def test_get_top_processes():
+    """
+    L'application doit pouvoir récupérer une liste de processus les plus consommateur du CPU
+    """
+    processes = collector.get_top_processes()
+    assert isinstance(processes, list)
+    assert all('pid' in p and 'name' in p and 'cpu_percent' in p for p in processes)
+
+def test_get_top_processes_with_zero():
+    """
+    get_top_processes() doit retourner une liste vide si top_n=0
+    """
+    processes = collector.get_top_processes(top_n=0)
+    assert processes == []
+
+@pytest.mark.parametrize("n", [1, 3, 5, 10])
+def test_get_top_processes_various_n(n):
+    """
+    get_top_processes() doit récupérer une liste de processus les plus consommateur du CPU pour diverse valeur de top_n
+    """
+    processes = collector.get_top_processes(top_n=n)
+    assert len(processes) <= n
+
+def test_get_top_processes_values():
+    """
+    L'application doit, pour chaque processus retourné, avoir des valeurs cohérentes
+    """
+    processes = collector.get_top_processes()
+    max_cpu = collector.get_max_cpu_percent()
+
+    # En CI ou VM, psutil peut surestimer le cpu_percent
+    # On tolère jusqu’à +20% du max théorique
+    margin = max_cpu * 0.2  # tolérance de 20%
+
+    for proc in processes:
+        assert isinstance(proc['pid'], int)
+        assert isinstance(proc['name'], str)
+        assert isinstance(proc['cpu_percent'], float)
+        assert 0.0 <= proc['cpu_percent'] <= max_cpu + margin
+
+def test_collect_metrics_structure():
+    """
+    L'application doit pouvoir collecter les données suivantes dans un dictionnaire : timestamp, cpu, ram, top_processes
+    """
+    data = collector.collect_metrics()
+    assert 'timestamp' in data
+    assert 'cpu' in data
+    assert 'ram' in data
+    assert 'top_processes' in data
+
+def test_collect_metrics_data_content():
+    """
+    L'application ne doit pas avoir de perte sur la cohérence des données collectées
+    """
+    data = collector.collect_metrics()
+
+    # timestamp
+    ts = data['timestamp']
+    assert isinstance(ts, str)
+    datetime.fromisoformat(ts)
+
+    # CPU / RAM
+    assert isinstance(data['cpu'], float)
+    assert 0 <= data['cpu'] <= 100
+    assert isinstance(data['ram'], float)
+    assert 0 <= data['ram'] <= 100
+
+    # Processus
+    processes = data['top_processes']
+    assert isinstance(processes, list)
+    for proc in processes:
+        assert isinstance(proc['pid'], int)
+        assert isinstance(proc['name'], str)
+        assert isinstance(proc['cpu_percent'], float)
+
+    # Vérifie que JSON serialization fonctionne (utile pour stockage)
+    json_string = json.dumps(processes)
+    assert isinstance(json_string, str)
+
+def test_get_cpu_usage_non_blocking():
+    """
+    La mesure CPU non bloquante doit retourner immédiatement une valeur cohérente
+    """
+    import time
+    collector.get_cpu_usage(interval=None)
+    start = time.monotonic()
+    cpu = collector.get_cpu_usage(interval=None)
+    assert time.monotonic() - start < 0.5
+    assert isinstance(cpu, float)
+    assert 0 <= cpu <= 100
+
+@pytest.fixture
+def busy_process():
+    """
+    Processus enfant consommant du CPU en continu
+    """
+    import subprocess
+    import sys
+    proc = subprocess.Popen([sys.executable, "-c", "while True: pass"])
+    yield proc
+    proc.kill()
+    proc.wait()
+
+def test_process_sampler_first_sample_has_no_delta():
+    """
+    Sans tick précédent, l'échantillonneur ne doit pas inventer de consommation CPU
+    """
+    import os
+    sampler = collector.ProcessSampler(pids=[os.getpid()])
+    processes = sampler.sample()
+    assert [p['pid'] for p in processes] == [os.getpid()]
+    assert processes[0]['cpu_percent'] == 0.0
+
+def test_process_sampler_measures_busy_process(busy_process):
+    """
+    L'échantillonneur doit mesurer la consommation CPU entre deux ticks
+    """
+    import time
+    sampler = collector.ProcessSampler(pids=[busy_process.pid])
+    sampler.sample()
+    time.sleep(0.5)
+    processes = sampler.sample()
+    assert processes[0]['pid'] == busy_process.pid
+    assert 20.0 <= processes[0]['cpu_percent'] <= collector.get_max_cpu_percent()
+
+def test_process_sampler_top_n_order():
+    """
+    L'échantillonneur doit retourner au plus top_n processus, du plus au moins consommateur
+    """
+    sampler = collector.ProcessSampler()
+    sampler.sample()
+    processes = sampler.sample(top_n=3)
+    assert len(processes) <= 3
+    cpu = [p['cpu_percent'] for p in processes]
+    assert cpu == sorted(cpu, reverse=True)
+    assert sampler.sample(top_n=0) == []
+
+def test_process_sampler_forgets_dead_processes(busy_process):
+    """
+    Les processus terminés doivent être retirés du cache de l'échantillonneur
+    """
+    sampler = collector.ProcessSampler(pids=[busy_process.pid])
+    sampler.sample()
+    assert busy_process.pid in sampler.handles
+    busy_process.kill()
+    busy_process.wait()
+    assert sampler.sample() == []
+    assert busy_process.pid not in sampler.handles
+
+def test_process_sampler_detects_pid_reuse():
+    """
+    Un pid repris par un autre processus (date de démarrage différente) doit être rouvert :
+    nouveau nom, et aucune consommation calculée par rapport au temps CPU de l'ancien processus
+    """
+    import os
+    sampler = collector.ProcessSampler(pids=[os.getpid()])
+    sampler.sample()
+    entry = sampler.handles[os.getpid()]
+    # Entrée d'un ancien processus au même pid : autre nom, autre date de démarrage, temps CPU nul
+    entry[1], entry[2], entry[3] = "old-process", 0.0, entry[3] - 1
+    processes = sampler.sample()
+    assert processes[0]['name'] != "old-process"
+    assert processes[0]['cpu_percent'] == 0.0
+    assert sampler.handles[os.getpid()] is not entry
+    # Même processus : l'entrée est conservée d'un tick à l'autre
+    entry = sampler.handles[os.getpid()]
+    sampler.sample()
+    assert sampler.handles[os.getpid()] is entry
+
+def test_process_sampler_cgroup_subset(tmp_path):
+    """
+    L'échantillonneur doit pouvoir se limiter aux processus d'un cgroup
+    """
+    import os
+    (tmp_path / "cgroup.procs").write_text(f"{os.getpid()}\n")
+    assert collector.read_cgroup_pids(str(tmp_path)) == {os.getpid()}
+    assert collector.read_cgroup_pids(str(tmp_path / "missing")) == set()
+
+    sampler = collector.ProcessSampler(cgroup=str(tmp_path))
+    assert [p['pid'] for p in sampler.sample()] == [os.getpid()]
+
+def write_stat(path, cores, ctxt):
+    """
+    Écriture d'un fichier au format de /proc/stat
+    :param cores: Liste de temps (user, idle) par cœur
+    :param ctxt: Nombre cumulé de changements de contexte
+    """
+    lines = ["cpu  0 0 0 0 0 0 0 0 0 0"]
+    lines += [f"cpu{i} {user} 0 0 {idle} 0 0 0 0 0 0" for i, (user, idle) in enumerate(cores)]
+    lines += ["intr 1 2 3", f"ctxt {ctxt}", "btime 0"]
+    path.write_text("\n".join(lines) + "\n")
+
+def test_parse_cpu_stat():
+    """
+    L'analyse de /proc/stat doit retourner les temps de chaque cœur (sans la ligne totale) et les changements de contexte
+    """
+    times, ctx_switches = collector.parse_cpu_stat(
+        b"cpu  9 9 9 9 9 9 9 9 0 0\ncpu0 1 2 3 4 5 6 7 8 0 0\ncpu1 10 20 30 40 50 60 70 80 0 0\nintr 5 6\nctxt 1234\n")
+    assert times.tolist() == [[1, 2, 3, 4, 5, 6, 7, 8], [10, 20, 30, 40, 50, 60, 70, 80]]
+    assert ctx_switches == 1234
+
+    times, ctx_switches = collector.read_cpu_times()
+    assert times.shape[1] >= 5
+    assert ctx_switches >= 0
+
+def test_system_sampler_computes_deltas(tmp_path):
+    """
+    Les taux par cœur et les changements de contexte doivent être calculés par différence avec le tick précédent
+    """
+    now = [0.0]
+    stat = tmp_path / "stat"
+    sampler = collector.SystemSampler(stat_path=str(stat), clock=lambda: now[0])
+
+    write_stat(stat, [(100, 100), (100, 100), (100, 100)], 1000)
+    first = sampler.sample()
+    assert first['cpu_cores'] == [0.0, 0.0, 0.0]
+    assert first['ctx_switches'] == 0.0
+
+    now[0] = 2.0
+    write_stat(stat, [(200, 100), (125, 175), (100, 300)], 1500)
+    system = sampler.sample()
+    assert system['cpu_cores'] == [100.0, 25.0, 0.0]
+    assert system['ctx_switches'] == 250.0
+    assert set(system) == {'cpu_cores', 'load1', 'load5', 'load15', 'swap',
+                           'disk_read', 'disk_write', 'net_recv', 'net_sent', 'ctx_switches'}
+    assert all(system[key] >= 0 for key in ('disk_read', 'disk_write', 'net_recv', 'net_sent'))
+
+def test_collect_metrics_with_system_sampler():
+    """
+    Avec un SystemSampler, les métriques détaillées doivent être ajoutées à l'échantillon
+    """
+    import psutil
+    sampler = collector.SystemSampler()
+    sampler.sample()
+    data = collector.collect_metrics(cpu_interval=None, system_sampler=sampler)
+    assert len(data['system']['cpu_cores']) == psutil.cpu_count()
+    assert 'system' not in collector.collect_metrics(cpu_interval=None)
+    json.dumps(data)
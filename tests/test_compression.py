@@ -0,0 +1,169 @@
+import os
+import numpy as np
+import pytest
+from datetime import datetime, timedelta
+
+from src import compression, export, rollup, storage
+from src.cache import MetricsCache
+from config.config import DATA_PATH, DB_TEST_PATH
+
+EXPORT_TEST_PATH = os.path.join(DATA_PATH, "test_compression.csv")
+BASE = datetime(2025, 8, 24, 12, 0, 0)
+# Date de référence : tous les échantillons écrits par les tests ont plus d'un jour
+NOW = BASE + timedelta(days=3)
+
+@pytest.fixture(autouse=True)
+def setup_and_teardown():
+    ###########################################################
+    #                          SETUP                          #
+    ###########################################################
+    storage.init_database(DB_TEST_PATH)
+
+    yield  # Exécution des tests
+
+    ###########################################################
+    #                         TEARDOWN                        #
+    ###########################################################
+    storage.delete_database(DB_TEST_PATH)
+    if os.path.exists(EXPORT_TEST_PATH):
+        os.remove(EXPORT_TEST_PATH)
+
+def make_rows(count, seed=0):
+    # Collecte réaliste : environ un échantillon par seconde avec gigue, valeurs au dixième
+    rng = np.random.default_rng(seed)
+    rows = np.zeros(count, dtype=rollup.RAW_DTYPE)
+    rows['ts'] = storage.to_epoch_ms(BASE) + np.arange(count) * 1000 + rng.integers(-3, 4, count)
+    rows['cpu'] = np.round(np.clip(30 + np.cumsum(rng.normal(0, 2, count)), 0, 100), 1)
+    rows['ram'] = np.round(np.clip(50 + np.cumsum(rng.normal(0, 0.1, count)), 0, 100), 1)
+    return rows
+
+def write_rows(rows, host=storage.LOCAL_HOST):
+    with storage.MetricsWriter(DB_TEST_PATH) as writer:
+        for ts, cpu, ram in rows.tolist():
+            writer.write({
+                'timestamp': storage.from_epoch_ms(ts).isoformat(),
+                'cpu': cpu,
+                'ram': ram,
+                'host': host,
+                'top_processes': [{'pid': 1, 'name': 'init', 'cpu_percent': 0.5}]
+            })
+
+def assert_same_bits(got, want):
+    assert got.dtype == want.dtype
+    assert got.tobytes() == want.tobytes()
+
+@pytest.mark.parametrize("values", [
+    [],
+    [(0, 1.5, 2.5)],
+    [(1000, 1.5, 2.5), (1000, 1.5, 2.5)],
+    [(-5, np.nan, -0.0), (3, np.inf, 0.0), (4, -np.inf, 5e-324), (2 ** 62, 1e308, -1e-308)],
+    [(0, 1.0, 1.0), (1, 2.0, 1.0), (86_400_000 * 365, 3.0, 1.0), (86_400_000 * 365 + 1, 3.0, 1.0)],
+])
+def test_roundtrip_edge_cases(values):
+    """
+    Test de la compression sans perte : série vide, dates égales ou très éloignées, NaN, infinis, -0.0, sous-normaux
+    """
+    rows = np.array(values, dtype=rollup.RAW_DTYPE)
+    assert_same_bits(compression.decode(compression.encode(rows)), rows)
+
+def test_roundtrip_and_size():
+    """
+    Test de la compression d'une collecte réaliste : restitution exacte et moins de 10 octets par
+    échantillon (24 octets non compressés)
+    """
+    rows = make_rows(5000)
+    block = compression.encode(rows)
+    assert_same_bits(compression.decode(block), rows)
+    assert len(block) / len(rows) < 10
+
+def test_archive_reads_are_transparent():
+    """
+    Test de l'archivage : les lectures d'une période retournent les mêmes échantillons avant et après,
+    sans les processus des échantillons archivés ; les échantillons récents ne sont pas archivés
+    """
+    rows = make_rows(3 * 3600)
+    write_rows(rows)
+    since = BASE - timedelta(hours=1)
+    before_lists = storage.get_last_time_metrics(since, DB_TEST_PATH)
+    before_arrays = storage.get_time_metrics_arrays(since, db_path=DB_TEST_PATH)
+    before_range = storage.get_time_metrics_arrays(BASE + timedelta(minutes=50), BASE + timedelta(minutes=70),
+                                                   db_path=DB_TEST_PATH)
+
+    # Date de référence : les deux premières heures ont plus d'un jour
+    now = BASE + timedelta(days=1, hours=2, minutes=30)
+    archived, blocks = storage.archive_metrics(1, DB_TEST_PATH, now=now)
+    assert (archived, blocks) == (np.count_nonzero(rows['ts'] < storage.to_epoch_ms(BASE + timedelta(hours=2))), 2)
+    assert storage.archive_metrics(1, DB_TEST_PATH, now=now) == (0, 0)
+
+    after_lists = storage.get_last_time_metrics(since, DB_TEST_PATH)
+    assert after_lists[:3] == before_lists[:3]
+    assert after_lists[3][:archived] == ["[]"] * archived
+    assert after_lists[3][archived:] == before_lists[3][archived:]
+    for got, want in zip(storage.get_time_metrics_arrays(since, db_path=DB_TEST_PATH), before_arrays):
+        assert np.array_equal(got, want)
+    for got, want in zip(storage.get_time_metrics_arrays(BASE + timedelta(minutes=50), BASE + timedelta(minutes=70),
+                                                         db_path=DB_TEST_PATH), before_range):
+        assert np.array_equal(got, want)
+    # Mêmes résultats par le cache de lecture, ouvert après l'archivage
+    cache = MetricsCache(DB_TEST_PATH)
+    for got, want in zip(cache.get_time_metrics_arrays(since), before_arrays):
+        assert np.array_equal(got, want)
+    assert cache.get_last_time_metrics(since)[:3] == before_lists[:3]
+    cache.close()
+
+    # Export en flux : blocs de taille fixe, période archivée comprise
+    chunks = list(storage.iter_metrics_chunks(chunk_size=1000, db_path=DB_TEST_PATH))
+    assert all(0 < len(chunk) <= 1000 for chunk in chunks)
+    exported = np.concatenate(chunks)
+    assert np.array_equal(exported['ts'], rows['ts'])
+    assert np.array_equal(exported['cpu'], rows['cpu'])
+    assert export.export_metrics(EXPORT_TEST_PATH, "csv", db_path=DB_TEST_PATH) == len(rows)
+
+def test_archive_merges_late_rows_and_hosts():
+    """
+    Test de l'archivage d'échantillons reçus en retard dans un bloc existant, et de blocs de plusieurs hôtes
+    """
+    rows = make_rows(600)
+    write_rows(rows[::2])
+    write_rows(rows[:100], host="web-1")
+    storage.archive_metrics(1, DB_TEST_PATH, now=NOW)
+    write_rows(rows[1::2])
+    archived, blocks = storage.archive_metrics(1, DB_TEST_PATH, now=NOW)
+    assert (archived, blocks) == (300, 1)
+
+    local = storage.get_time_metrics_arrays(BASE - timedelta(hours=1), db_path=DB_TEST_PATH, host=storage.LOCAL_HOST)
+    assert np.array_equal(local.timestamps, rows['ts'].astype('datetime64[ms]'))
+    web = storage.get_time_metrics_arrays(BASE - timedelta(hours=1), db_path=DB_TEST_PATH, host="web-1")
+    assert np.array_equal(web.cpu, rows['cpu'][:100].astype(np.float32))
+    both = storage.get_time_metrics_arrays(BASE - timedelta(hours=1), db_path=DB_TEST_PATH)
+    assert len(both.timestamps) == 700
+    assert np.all(np.diff(both.timestamps.astype(np.int64)) >= 0)
+
+def test_retention_deletes_blocks():
+    """
+    Test de la rétention : les blocs entièrement expirés sont supprimés et comptés comme données brutes
+    """
+    rows = make_rows(2 * 3600)
+    write_rows(rows)
+    storage.archive_metrics(1, DB_TEST_PATH, now=NOW)
+    conn = storage.connect(DB_TEST_PATH)
+    # Âge maximal atteint pour la première heure seulement
+    deleted = storage.apply_retention(conn, now=BASE + timedelta(days=7, hours=1, minutes=30), max_size=None)
+    assert deleted["raw"] == np.count_nonzero(rows['ts'] < storage.to_epoch_ms(BASE + timedelta(hours=1)))
+    assert conn.execute("SELECT COUNT(*) FROM metrics_blocks").fetchone()[0] == 1
+    conn.close()
+
+def test_archive_shrinks_database():
+    """
+    Test du gain de place : au moins 5 fois moins d'octets par échantillon après archivage
+    """
+    rows = make_rows(2 * 3600)
+    write_rows(rows)
+    conn = storage.connect(DB_TEST_PATH)
+    before = storage.database_size(conn)
+    storage.archive_metrics(1, DB_TEST_PATH, now=NOW)
+    after = storage.database_size(conn)
+    blocks = conn.execute("SELECT SUM(LENGTH(data)) FROM metrics_blocks").fetchone()[0]
+    conn.close()
+    assert blocks * 5 < before
+    assert after < before
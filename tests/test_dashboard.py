@@ -0,0 +1,108 @@
+import io
+
+import numpy as np
+
+from src import storage
+from src.dashboard import Dashboard, sparkline, format_rate, CLEAR_SCREEN, SHOW_CURSOR
+
+def make_metrics(i, processes=None, system=None):
+    data = {
+        'timestamp': f"2025-08-24T12:00:{i:02d}",
+        'cpu': float(i * 10 % 100),
+        'ram': 50.0,
+        'top_processes': processes if processes is not None else [{'pid': 1, 'name': 'init', 'cpu_percent': 0.5}]
+    }
+    if system is not None:
+        data['system'] = system
+    return data
+
+def test_sparkline():
+    """
+    Une sparkline doit compter un caractère par valeur, du plus bas (0) au plus haut (100)
+    """
+    assert sparkline([0, 50, 100]) == "▁▅█"
+    assert sparkline([-10, 200]) == "▁█"
+    assert sparkline([float('nan'), 100]) == " █"
+    assert sparkline([]) == ""
+
+def test_format_rate():
+    """
+    Les débits doivent être affichés avec l'unité adaptée
+    """
+    assert format_rate(512) == "512.0 B/s"
+    assert format_rate(1536) == "1.5 KB/s"
+    assert format_rate(3 * 1024 ** 3) == "3.0 GB/s"
+
+def test_dashboard_renders_history_and_processes():
+    """
+    La vue doit afficher les valeurs courantes, l'historique et les processus, sans dépasser la largeur disponible
+    """
+    dashboard = Dashboard(history=5, size=(40, 30))
+    for i in range(8):
+        dashboard.update(make_metrics(i))
+    lines = dashboard.render(40)
+    assert lines[2].startswith("CPU   70.0%")
+    # Seuls les 5 derniers ticks sont conservés
+    assert lines[2].endswith(sparkline([30, 40, 50, 60, 70]))
+    assert any("init" in line for line in lines)
+    assert all(len(line) <= 40 for line in lines)
+
+    system = {'cpu_cores': [0.0, 100.0], 'load1': 1.0, 'load5': 0.5, 'load15': 0.25, 'swap': 2.0,
+              'disk_read': 2048.0, 'disk_write': 0.0, 'net_recv': 0.0, 'net_sent': 0.0, 'ctx_switches': 100.0}
+    dashboard.update(make_metrics(9, system=system))
+    lines = dashboard.render(200)
+    assert lines[4].endswith("▁█")
+    assert "2.0 KB/s" in lines[6]
+
+def test_dashboard_redraws_only_changed_lines():
+    """
+    Après le premier affichage, seules les lignes modifiées doivent être réécrites
+    """
+    stream = io.StringIO()
+    dashboard = Dashboard(history=10, stream=stream, size=(80, 30))
+    dashboard.update(make_metrics(0))
+    first = dashboard.draw()
+    assert CLEAR_SCREEN in stream.getvalue()
+    assert first == len(dashboard.render(80))
+
+    # Même seconde, mêmes processus : seules les lignes CPU et RAM (sparklines) changent
+    stream.seek(0)
+    stream.truncate()
+    metrics = make_metrics(0)
+    metrics['cpu'] = 99.0
+    dashboard.update(metrics)
+    assert dashboard.draw() == 2
+    assert CLEAR_SCREEN not in stream.getvalue()
+    assert "init" not in stream.getvalue()
+
+    # Un processus en moins : sa ligne est effacée
+    dashboard.update(make_metrics(0, processes=[]))
+    dashboard.draw()
+    assert len(dashboard.screen) == len(dashboard.render(80))
+
+    dashboard.close()
+    assert stream.getvalue().endswith(SHOW_CURSOR + "\n")
+
+def test_dashboard_full_redraw_on_resize():
+    """
+    Un redimensionnement du terminal doit provoquer un effacement complet
+    """
+    stream = io.StringIO()
+    dashboard = Dashboard(stream=stream, size=(80, 30))
+    dashboard.update(make_metrics(0))
+    dashboard.draw()
+    dashboard.size = (60, 30)
+    stream.seek(0)
+    stream.truncate()
+    dashboard.draw()
+    assert CLEAR_SCREEN in stream.getvalue()
+
+def test_dashboard_preloads_recorded_history():
+    """
+    L'historique enregistré doit précéder les nouveaux ticks dans les sparklines
+    """
+    dashboard = Dashboard(history=5, size=(40, 30))
+    recorded = np.array([10.0, 20.0, 30.0, 40.0], dtype=np.float32)
+    dashboard.preload(storage.MetricsArrays(np.zeros(4, dtype='datetime64[ms]'), recorded, recorded))
+    dashboard.update(make_metrics(9))
+    assert dashboard.render(40)[2].endswith(sparkline([10, 20, 30, 40, 90]))
@@ -0,0 +1,141 @@
+import functools
+import os
+import time
+import pytest
+
+from src import engine, storage
+from src.engine import CollectionEngine, Probe
+from config.config import DB_TEST_PATH
+
+@pytest.fixture(autouse=True)
+def setup_and_teardown():
+    ###########################################################
+    #                          SETUP                          #
+    ###########################################################
+    storage.init_database(DB_TEST_PATH)
+
+    yield  # Exécution des tests
+
+    ###########################################################
+    #                         TEARDOWN                        #
+    ###########################################################
+    storage.delete_database(DB_TEST_PATH)
+
+# Sondes de test : fonctions de module, pour être recréées dans les processus des sondes
+
+def slow_probe(delay, value):
+    def measure():
+        time.sleep(delay)
+        return value
+    return measure
+
+def failing_probe():
+    def measure():
+        raise RuntimeError("probe failure")
+    return measure
+
+def crashing_probe():
+    return functools.partial(os._exit, 1)
+
+def counter_probe():
+    calls = []
+
+    def measure():
+        calls.append(None)
+        return len(calls)
+    return measure
+
+def test_default_probes_sample():
+    """
+    Test des sondes par défaut : l'échantillon fusionné a le format de collector.collect_metrics et s'enregistre
+    """
+    with CollectionEngine(engine.default_probes(timeout=5.0)) as collection:
+        data = collection.collect()
+    assert {'timestamp', 'cpu', 'ram', 'top_processes', 'system'} <= set(data)
+    assert 0 <= data['cpu'] <= 100 and 0 <= data['ram'] <= 100
+    assert 'load1' in data['system']
+    storage.insert_metrics(data, DB_TEST_PATH)
+    timestamps, cpu, ram, _ = storage.get_last_metrics(1, DB_TEST_PATH)
+    assert len(timestamps) == 1 and cpu == [data['cpu']]
+
+def test_probes_run_concurrently():
+    """
+    Test du parallélisme : trois sondes de 0.3 s donnent un tick d'environ 0.3 s, et non 0.9 s
+    """
+    probes = [Probe(name, functools.partial(slow_probe, 0.3, name), timeout=2.0) for name in ("a", "b", "c")]
+    with CollectionEngine(probes) as collection:
+        start = time.monotonic()
+        data = collection.collect()
+        elapsed = time.monotonic() - start
+    assert (data['a'], data['b'], data['c']) == ("a", "b", "c")
+    assert elapsed < 0.6
+
+def test_hung_probe_does_not_stall_tick():
+    """
+    Test d'une sonde bloquée : le tick se termine à son délai, sans sa valeur ; son processus est remplacé ensuite
+    """
+    probes = [Probe('fast', functools.partial(slow_probe, 0, 1)),
+              Probe('hung', functools.partial(slow_probe, 60, 2), timeout=0.2, default=[])]
+    with CollectionEngine(probes, restart_after=0.5) as collection:
+        start = time.monotonic()
+        data = collection.collect()
+        assert time.monotonic() - start < 1.0
+        assert data['fast'] == 1 and data['hung'] == []
+        # Toujours occupé : pas de nouvelle requête, le tick n'attend pas
+        start = time.monotonic()
+        data = collection.collect()
+        assert time.monotonic() - start < 0.2
+        assert data['fast'] == 1 and data['hung'] == []
+        time.sleep(0.5)
+        collection.collect()
+        stats = collection.stats['hung']
+    # Une seule requête a dépassé son délai ; les deux ticks suivants l'ont trouvé occupé
+    assert stats['restarts'] == 1 and stats['timeouts'] == 1 and stats['busy'] == 2 and stats['runs'] == 0
+    assert collection.stats['fast']['runs'] == 3
+
+def test_failing_and_crashing_probes():
+    """
+    Test d'une sonde qui lève une exception et d'une sonde qui termine son processus : les ticks continuent,
+    l'erreur est comptée et le processus terminé est remplacé
+    """
+    probes = [Probe('ok', functools.partial(slow_probe, 0, 1)),
+              Probe('failing', failing_probe, default=0),
+              Probe('crashing', crashing_probe, timeout=2.0)]
+    with CollectionEngine(probes) as collection:
+        ticks = 0
+        # Entre deux plantages, le tick continue pendant le démarrage du processus de remplacement
+        while collection.stats['crashing']['restarts'] < 3 and ticks < 200:
+            data = collection.collect()
+            assert data['ok'] == 1 and data['failing'] == 0 and 'crashing' not in data
+            ticks += 1
+            time.sleep(0.05)
+        stats = collection.stats
+    assert stats['ok']['runs'] == ticks
+    assert stats['failing']['errors'] == ticks and stats['failing']['restarts'] == 0
+    assert stats['crashing']['errors'] == 3 and stats['crashing']['restarts'] == 3
+    # Le démarrage des processus de remplacement n'est pas compté comme un délai dépassé
+    assert stats['crashing']['timeouts'] == 0
+
+def test_probe_intervals():
+    """
+    Test des cadences propres à chaque sonde (horloge simulée) : entre deux mesures, dernière valeur ou valeur par défaut
+    """
+    now = [0.0]
+    probes = [Probe('every', counter_probe, inline=True),
+              Probe('kept', counter_probe, interval=10, inline=True, keep_last=True),
+              Probe('scan', counter_probe, interval=10, default=[])]
+    with CollectionEngine(probes, clock=lambda: now[0]) as collection:
+        samples = []
+        for tick in range(12):
+            now[0] = tick * 2.0
+            samples.append(collection.collect())
+    assert [sample['every'] for sample in samples] == list(range(1, 13))
+    assert [sample['kept'] for sample in samples] == [1] * 5 + [2] * 5 + [3] * 2
+    assert [sample['scan'] for sample in samples] == [1, [], [], [], [], 2, [], [], [], [], 3, []]
+
+def test_duplicate_probe_names():
+    """
+    Test de la validation : deux sondes du même nom sont refusées
+    """
+    with pytest.raises(ValueError):
+        CollectionEngine([Probe('a', counter_probe, inline=True), Probe('a', counter_probe, inline=True)])
@@ -0,0 +1,116 @@
+import csv
+import json
+import os
+import pytest
+import numpy as np
+from datetime import datetime, timedelta
+
+from src import export, storage
+from config.config import DATA_PATH, DB_TEST_PATH
+
+EXPORT_TEST_PATH = os.path.join(DATA_PATH, "test_export")
+BASE = datetime(2025, 8, 24, 12, 0, 0)
+
+@pytest.fixture(autouse=True)
+def setup_and_teardown():
+    ###########################################################
+    #                          SETUP                          #
+    ###########################################################
+    storage.init_database(DB_TEST_PATH)
+    with storage.MetricsWriter(DB_TEST_PATH) as writer:
+        for i in range(10):
+            writer.write({
+                'timestamp': (BASE + timedelta(seconds=i)).isoformat(),
+                'cpu': 10.5 + i,
+                'ram': 40.25 + i,
+                'top_processes': []
+            })
+
+    yield  # Exécution des tests
+
+    ###########################################################
+    #                         TEARDOWN                        #
+    ###########################################################
+    storage.delete_database(DB_TEST_PATH)
+    for ext in ("csv", "jsonl", "parquet"):
+        if os.path.exists(f"{EXPORT_TEST_PATH}.{ext}"):
+            os.remove(f"{EXPORT_TEST_PATH}.{ext}")
+
+def test_iter_metrics_chunks_respects_chunk_size():
+    """
+    La lecture par blocs ne doit jamais retourner plus de 'chunk_size' lignes à la fois
+    """
+    chunks = list(storage.iter_metrics_chunks(chunk_size=3, db_path=DB_TEST_PATH))
+    assert [len(chunk) for chunk in chunks] == [3, 3, 3, 1]
+    ts = np.concatenate([chunk['ts'] for chunk in chunks])
+    assert ts.tolist() == [storage.to_epoch_ms(BASE + timedelta(seconds=i)) for i in range(10)]
+
+def test_iter_metrics_chunks_range():
+    """
+    La lecture par blocs doit inclure 'since' et exclure 'until'
+    """
+    chunks = storage.iter_metrics_chunks(BASE + timedelta(seconds=2), BASE + timedelta(seconds=5), db_path=DB_TEST_PATH)
+    assert np.concatenate(list(chunks))['cpu'].tolist() == [12.5, 13.5, 14.5]
+
+def test_export_csv():
+    """
+    L'application doit pouvoir exporter les métriques au format CSV sans perte
+    """
+    path = f"{EXPORT_TEST_PATH}.csv"
+    count = export.export_metrics(path, "csv", chunk_size=4, db_path=DB_TEST_PATH)
+    assert count == 10
+
+    with open(path, newline="") as file:
+        rows = list(csv.DictReader(file))
+    assert len(rows) == 10
+    assert datetime.fromisoformat(rows[0]['timestamp']) == BASE
+    assert float(rows[0]['cpu']) == 10.5
+    assert float(rows[9]['ram']) == 49.25
+
+def test_export_jsonl():
+    """
+    L'application doit pouvoir exporter les métriques au format JSON, un objet par ligne
+    """
+    path = f"{EXPORT_TEST_PATH}.jsonl"
+    count = export.export_metrics(path, "jsonl", since=BASE + timedelta(seconds=8), chunk_size=4, db_path=DB_TEST_PATH)
+    assert count == 2
+
+    with open(path) as file:
+        rows = [json.loads(line) for line in file]
+    assert [row['cpu'] for row in rows] == [18.5, 19.5]
+    assert datetime.fromisoformat(rows[1]['timestamp']) == BASE + timedelta(seconds=9)
+
+def test_export_parquet():
+    """
+    L'application doit pouvoir exporter les métriques au format Parquet lorsque pyarrow est installé
+    """
+    pq = pytest.importorskip("pyarrow.parquet")
+    path = f"{EXPORT_TEST_PATH}.parquet"
+    assert export.export_metrics(path, "parquet", chunk_size=4, db_path=DB_TEST_PATH) == 10
+
+    table = pq.read_table(path)
+    assert table.num_rows == 10
+    assert table.column("cpu").to_pylist()[0] == 10.5
+
+def test_export_defaults_to_local_host():
+    """
+    L'export doit, comme le rapport, se limiter par défaut à la machine locale : les fichiers n'ont pas de colonne d'hôte
+    """
+    with storage.MetricsWriter(DB_TEST_PATH) as writer:
+        writer.extend([storage.validate_metrics({
+            'timestamp': (BASE + timedelta(seconds=i)).isoformat(), 'cpu': 99.0, 'ram': 99.0, 'top_processes': [],
+            'host': "web-1"
+        }) for i in range(3)])
+
+    path = f"{EXPORT_TEST_PATH}.csv"
+    assert export.export_metrics(path, "csv", db_path=DB_TEST_PATH) == 10
+    assert export.export_metrics(path, "csv", db_path=DB_TEST_PATH, host="web-1") == 3
+    with open(path, newline="") as file:
+        assert [float(row['cpu']) for row in csv.DictReader(file)] == [99.0] * 3
+
+def test_export_rejects_unknown_format():
+    """
+    L'application doit tomber en erreur sur un format d'export inconnu
+    """
+    with pytest.raises(ValueError):
+        export.export_metrics(f"{EXPORT_TEST_PATH}.xml", "xml", db_path=DB_TEST_PATH)
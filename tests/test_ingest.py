@@ -0,0 +1,272 @@
+import json
+import socket
+import sqlite3
+import threading
+import time
+import http.client
+import pytest
+from datetime import datetime, timedelta
+
+from src import storage
+from src.agent import Agent
+from src.ingest import IngestServer, INGEST_PATH, METRICS_PATH
+from config.config import DB_TEST_PATH, INGEST_MAX_BYTES
+
+BASE = datetime(2025, 8, 24, 12, 0, 0)
+
+@pytest.fixture(autouse=True)
+def setup_and_teardown():
+    ###########################################################
+    #                          SETUP                          #
+    ###########################################################
+    storage.init_database(DB_TEST_PATH)
+
+    yield  # Exécution des tests
+
+    ###########################################################
+    #                         TEARDOWN                        #
+    ###########################################################
+    storage.delete_database(DB_TEST_PATH)
+
+def make_sample(i):
+    return {
+        'timestamp': (BASE + timedelta(seconds=i)).isoformat(),
+        'cpu': float(i % 100),
+        'ram': 50.0,
+        'top_processes': [{'pid': 1, 'name': 'init', 'cpu_percent': 0.5}]
+    }
+
+def server_url(server):
+    return f"{server.address[0]}:{server.address[1]}"
+
+def post(address, payload):
+    conn = http.client.HTTPConnection(*address, timeout=5)
+    conn.request("POST", INGEST_PATH, json.dumps(payload).encode())
+    status = conn.getresponse().status
+    conn.close()
+    return status
+
+def get(address, path):
+    conn = http.client.HTTPConnection(*address, timeout=5)
+    conn.request("GET", path)
+    response = conn.getresponse()
+    status, content = response.status, json.loads(response.read())
+    conn.close()
+    return status, content
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def test_several_agents_push_to_ingest_server():
+    """
+    Les échantillons de plusieurs agents simultanés doivent tous être écrits, marqués de leur hôte
+    """
+    with IngestServer(("127.0.0.1", 0), DB_TEST_PATH) as server:
+        def run_agent(name):
+            agent = Agent(server_url(server), host=name, batch_size=10)
+            for i in range(55):
+                agent.add(make_sample(i))
+            agent.send(force=True)
+            agent.close()
+            assert agent.stats["sent"] == 55 and not agent.buffer
+
+        threads = [threading.Thread(target=run_agent, args=(f"host-{n}",)) for n in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    assert server.stats["accepted"] == server.stats["written"] == 220
+    for n in range(4):
+        arrays = storage.get_time_metrics_arrays(BASE, db_path=DB_TEST_PATH, host=f"host-{n}")
+        assert arrays.timestamps.tolist() == [BASE + timedelta(seconds=i) for i in range(55)]
+    # Les processus et agrégats sont écrits comme pour une collecte locale
+    _, _, _, processes = storage.get_last_metrics(1, DB_TEST_PATH)
+    assert json.loads(processes[0])[0]['name'] == 'init'
+    assert storage.get_rollup_arrays("1m", BASE, db_path=DB_TEST_PATH, host="host-0").count.tolist() == [55]
+
+def test_ingest_serves_recent_samples_from_cache():
+    """
+    Les échantillons récents d'un hôte doivent être servis par le cache du serveur, identiques à la base
+    """
+    with IngestServer(("127.0.0.1", 0), DB_TEST_PATH, batch_size=1) as server:
+        for n in range(2):
+            samples = [{**make_sample(i), 'cpu': float(i + n)} for i in range(30)]
+            assert post(server.address, {"host": f"host-{n}", "samples": samples}) == 202
+        # Lots écrits par le fil d'écriture avant la lecture
+        while server.stats["written"] < 60:
+            time.sleep(0.01)
+
+        status, content = get(server.address, f"{METRICS_PATH}?host=host-1&limit=5")
+        assert status == 200 and content["host"] == "host-1"
+        assert [datetime.fromisoformat(ts) for ts in content["timestamps"]] == [BASE + timedelta(seconds=i) for i in range(25, 30)]
+        assert content["cpu"] == [float(i + 1) for i in range(25, 30)]
+
+        since = (BASE + timedelta(seconds=28)).isoformat()
+        status, content = get(server.address, f"{METRICS_PATH}?host=host-0&since={since}")
+        expected = storage.get_time_metrics_arrays(BASE + timedelta(seconds=28), db_path=DB_TEST_PATH, host="host-0")
+        assert content["cpu"] == expected.cpu.tolist() and content["ram"] == expected.ram.tolist()
+        assert server.cache.stats == {"hits": 2, "misses": 0}
+
+        assert get(server.address, f"{METRICS_PATH}?limit=5")[0] == 400
+        assert get(server.address, f"{METRICS_PATH}?host=host-0&limit=-1")[0] == 400
+        assert get(server.address, "/unknown")[0] == 404
+
+def test_ingest_rejects_invalid_batches():
+    """
+    Un lot invalide doit être refusé en entier (400) et abandonné par l'agent
+    """
+    with IngestServer(("127.0.0.1", 0), DB_TEST_PATH) as server:
+        assert post(server.address, {"host": "web-1", "samples": [make_sample(0), {'cpu': 1.0}]}) == 400
+        assert post(server.address, {"samples": []}) == 400
+
+        agent = Agent(server_url(server), host="web-1", batch_size=2)
+        agent.add(make_sample(0))
+        agent.add({**make_sample(1), 'cpu': "high"})
+        agent.close()
+        assert agent.stats["rejected"] == 2 and not agent.buffer
+
+    assert server.stats["rejected"] == 3
+    assert len(storage.get_time_metrics_arrays(BASE, db_path=DB_TEST_PATH).timestamps) == 0
+
+def raw_post(address, headers, body=b""):
+    """
+    Requête POST aux en-têtes choisis (Content-Length absent, invalide ou trop grand)
+    """
+    with socket.create_connection(address, timeout=5) as sock:
+        lines = [f"POST {INGEST_PATH} HTTP/1.1", f"Host: {address[0]}"]
+        lines += [f"{name}: {value}" for name, value in headers.items()]
+        sock.sendall(("\r\n".join(lines) + "\r\n\r\n").encode() + body)
+        response = sock.makefile("rb").readline()
+    return int(response.split()[1])
+
+def test_ingest_checks_content_length():
+    """
+    Un Content-Length absent ou invalide doit être refusé (400), un corps trop grand avant sa lecture (413)
+    """
+    with IngestServer(("127.0.0.1", 0), DB_TEST_PATH) as server:
+        assert raw_post(server.address, {}) == 400
+        assert raw_post(server.address, {"Content-Length": "abc"}) == 400
+        assert raw_post(server.address, {"Content-Length": "-1"}) == 400
+        # Le corps annoncé n'est jamais envoyé : la réponse n'attend pas sa lecture
+        assert raw_post(server.address, {"Content-Length": str(INGEST_MAX_BYTES + 1)}) == 413
+        assert post(server.address, {"host": "web-1", "samples": [make_sample(0)]}) == 202
+    assert server.stats["rejected"] == 3
+
+def test_ingest_rejects_badly_typed_processes():
+    """
+    Des processus mal typés doivent être refusés à la réception (400) plutôt que de faire échouer l'écriture
+    """
+    with IngestServer(("127.0.0.1", 0), DB_TEST_PATH) as server:
+        for process in ({'pid': "1", 'name': 'init', 'cpu_percent': 0.5},
+                        {'pid': 1, 'name': ["init"], 'cpu_percent': 0.5},
+                        {'pid': 1, 'name': 'init', 'cpu_percent': "0.5"}):
+            sample = {**make_sample(0), 'top_processes': [process]}
+            assert post(server.address, {"host": "web-1", "samples": [sample]}) == 400
+    assert server.stats["rejected"] == 3 and server.stats["failed"] == 0
+
+def test_ingest_survives_write_failures(monkeypatch):
+    """
+    Un échec d'écriture doit abandonner le lot en cours sans arrêter le fil d'écriture
+    """
+    commit = storage.MetricsWriter._commit
+    failures = iter([True])
+
+    def failing_commit(writer):
+        if next(failures, False):
+            raise sqlite3.OperationalError("disk I/O error")
+        return commit(writer)
+
+    monkeypatch.setattr(storage.MetricsWriter, "_commit", failing_commit)
+    with IngestServer(("127.0.0.1", 0), DB_TEST_PATH, batch_size=1) as server:
+        assert post(server.address, {"host": "web-1", "samples": [make_sample(0)]}) == 202
+        # Le lot suivant est écrit par le même fil
+        assert post(server.address, {"host": "web-1", "samples": [make_sample(1)]}) == 202
+        writer = server.threads[0]
+
+    assert not writer.is_alive()
+    assert server.stats["failed"] == 1 and server.stats["written"] == 1
+    arrays = storage.get_time_metrics_arrays(BASE, db_path=DB_TEST_PATH, host="web-1")
+    assert arrays.timestamps.tolist() == [BASE + timedelta(seconds=1)]
+
+def test_ingest_close_does_not_block_without_writer():
+    """
+    L'arrêt ne doit pas bloquer sur une file pleine quand le fil d'écriture est arrêté
+    """
+    server = IngestServer(("127.0.0.1", 0), DB_TEST_PATH, queue_size=1)
+    server.start()
+    server.queue.put(None)  # Arrêt du fil d'écriture
+    server.threads[0].join(timeout=5)
+    server.queue.put([])    # File pleine
+    server.close()
+    assert not server.threads
+
+def test_ingest_returns_503_when_queue_is_full():
+    """
+    Quand l'écriture ne suit plus, le serveur doit refuser les lots (503) et l'agent doit les conserver
+    """
+    # Serveur HTTP seul, sans fil d'écriture : la file n'est jamais vidée
+    server = IngestServer(("127.0.0.1", 0), DB_TEST_PATH, queue_size=1)
+    thread = threading.Thread(target=server.httpd.serve_forever, daemon=True)
+    thread.start()
+    try:
+        assert post(server.address, {"host": "web-1", "samples": [make_sample(0)]}) == 202
+
+        clock = FakeClock()
+        agent = Agent(server_url(server), host="web-1", batch_size=1, clock=clock)
+        agent.add(make_sample(1))
+        assert len(agent.buffer) == 1
+        assert agent.stats["retries"] == 1
+        assert agent.retry_at == pytest.approx(1.0)  # Retry-After du serveur
+
+        # Pas de nouvelle tentative avant la fin du délai
+        agent.add(make_sample(2))
+        assert agent.stats["retries"] == 1 and len(agent.buffer) == 2
+        agent.close()
+    finally:
+        server.httpd.shutdown()
+        server.httpd.server_close()
+    assert server.stats["throttled"] == 1
+
+def test_agent_retries_after_server_outage():
+    """
+    L'agent doit conserver ses échantillons tant que le serveur est injoignable, avec un délai croissant entre les tentatives
+    """
+    # Port libre : personne n'écoute
+    probe = socket.socket()
+    probe.bind(("127.0.0.1", 0))
+    port = probe.getsockname()[1]
+    probe.close()
+
+    clock = FakeClock()
+    agent = Agent(f"http://127.0.0.1:{port}", host="web-1", batch_size=2, max_backoff=4.0, clock=clock)
+    for i in range(2):
+        agent.add(make_sample(i))  # Première tentative au deuxième échantillon
+    delays = [agent.retry_at]
+    for _ in range(3):
+        clock.now = agent.retry_at
+        agent.send()
+        delays.append(agent.retry_at - clock.now)
+    assert delays == [1.0, 2.0, 4.0, 4.0]
+    assert len(agent.buffer) == 2
+
+    with IngestServer(("127.0.0.1", 0), DB_TEST_PATH) as server:
+        agent.address = server.address
+        clock.now = agent.retry_at
+        assert agent.send() == 2
+        agent.close()
+    assert len(storage.get_time_metrics_arrays(BASE, db_path=DB_TEST_PATH, host="web-1").timestamps) == 2
+
+def test_agent_buffer_drops_oldest_samples():
+    """
+    Au-delà de 'max_buffer' échantillons en attente, les plus anciens doivent être abandonnés
+    """
+    agent = Agent("127.0.0.1:1", batch_size=100, max_buffer=3)
+    for i in range(5):
+        agent.add(make_sample(i))
+    assert [sample['cpu'] for sample in agent.buffer] == [2.0, 3.0, 4.0]
+    assert agent.stats["dropped"] == 2
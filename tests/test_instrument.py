@@ -0,0 +1,88 @@
+import pytest
+import numpy as np
+from datetime import datetime, timedelta
+
+from src import instrument, storage
+from src.scheduler import Scheduler
+from config.config import DB_TEST_PATH
+
+BASE = datetime(2025, 8, 24, 12, 0, 0)
+
+@pytest.fixture(autouse=True)
+def setup_and_teardown():
+    ###########################################################
+    #                          SETUP                          #
+    ###########################################################
+    storage.init_database(DB_TEST_PATH)
+    instrument.stages = {}
+
+    yield  # Exécution des tests
+
+    ###########################################################
+    #                         TEARDOWN                        #
+    ###########################################################
+    instrument.set_enabled(True)
+    instrument.stages = {}
+    storage.delete_database(DB_TEST_PATH)
+
+def test_histogram_buckets_and_percentiles():
+    """
+    Chaque durée doit tomber dans la case de sa puissance de 2, et les percentiles en être la borne supérieure
+    """
+    for duration in (0, 1, 1000, 1023, 1024, 5_000_000):
+        instrument.record("stage", duration)
+    stats = instrument.stages["stage"]
+    assert stats.count == 6 and stats.total == 5_003_048 and stats.max == 5_000_000
+    histogram = np.array(stats.buckets)
+    assert histogram[[0, 1, 10, 11, 23]].tolist() == [1, 1, 2, 1, 1]
+
+    assert instrument.histogram_percentile(histogram, 50) == 1023
+    assert instrument.histogram_percentile(histogram, 99) == 2 ** 23 - 1
+    assert instrument.histogram_percentile(np.zeros(instrument.BUCKETS), 50) == 0
+
+def test_timed_records_only_when_enabled():
+    """
+    Les fonctions instrumentées doivent être mesurées (y compris en cas d'exception), sauf si les mesures sont désactivées
+    """
+    @instrument.timed("test.double")
+    def double(value):
+        if value is None:
+            raise ValueError("value")
+        return value * 2
+
+    assert double(21) == 42
+    with pytest.raises(ValueError):
+        double(None)
+    assert instrument.stages["test.double"].count == 2
+    assert double.__name__ == "double"
+
+    instrument.set_enabled(False)
+    assert double(1) == 2
+    assert instrument.stages["test.double"].count == 2
+    scheduler = Scheduler(1.0, clock=lambda: 0.0, sleep=lambda _: None)
+    next(scheduler.ticks())
+    assert "scheduler.tick_drift" not in instrument.stages
+
+def test_selfstats_are_stored_and_merged():
+    """
+    Les mesures doivent être écrites par MetricsWriter, cumulées à la lecture puis purgées avec les données brutes
+    """
+    with storage.MetricsWriter(DB_TEST_PATH, selfstats_interval=0) as writer:
+        for i in range(3):
+            writer.write({'timestamp': (BASE + timedelta(seconds=i)).isoformat(), 'cpu': 1.0, 'ram': 2.0, 'top_processes': []})
+            writer.flush()
+    storage.get_last_metrics_arrays(3, DB_TEST_PATH)
+    storage.write_selfstats(DB_TEST_PATH)
+
+    stages, process = storage.get_selfstats(db_path=DB_TEST_PATH)
+    # Au moins une mesure par appel explicite de flush
+    assert stages["storage.flush"]['count'] == stages["storage.flush"]['histogram'].sum() >= 3
+    assert stages["storage.get_last_metrics_arrays"]['count'] == 1
+    assert len(process) >= 2 and (process['rss'] > 0).all()
+    text = instrument.format_selfstats((stages, process))
+    assert "storage.flush" in text and "Monitor process" in text
+
+    # Rétention : les mesures suivent l'âge maximal des données brutes
+    storage.enforce_retention(DB_TEST_PATH, now=datetime.now() + timedelta(days=2), max_age={"raw": 1}, max_size=None)
+    stages, process = storage.get_selfstats(db_path=DB_TEST_PATH)
+    assert stages == {} and len(process) == 0
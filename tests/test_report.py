@@ -1,71 +1,178 @@
-import os
-import sqlite3
-import pytest
-
-from src import report, storage
-from config.config import DATA_PATH, DB_TEST_PATH
-
-TEST_PLOT_PATH = os.path.join(DATA_PATH, "test_report.png")
-
-@pytest.fixture(autouse=True)
-def setup_and_teardown():
-    ###########################################################
-    #                          SETUP                          #
-    ###########################################################
-    print("\n[SETUP] Initialisation avant les tests du module")
-    os.makedirs(DATA_PATH, exist_ok=True)
-    conn = sqlite3.connect(DB_TEST_PATH)
-    cursor = conn.cursor()
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS metrics (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            timestamp TEXT NOT NULL,
-            cpu REAL NOT NULL,
-            ram REAL NOT NULL,
-            top_processes TEXT
-        )
-    """)
-    # Insertion de lignes factices
-    from datetime import datetime, timedelta
-    now = datetime.now()
-    for i in range(10):
-        ts = (now - timedelta(seconds=i * 60)).isoformat()
-        cursor.execute("""
-            INSERT INTO metrics (timestamp, cpu, ram, top_processes)
-            VALUES (?, ?, ?, ?)
-        """, (ts, 50 + i, 60 + i, "[]"))
-    conn.commit()
-    conn.close()
-    assert os.path.exists(DB_TEST_PATH)
-
-    yield  # Exécution des tests
-
-    ###########################################################
-    #                         TEARDOWN                        #
-    ###########################################################
-    print("\n[TEARDOWN] Nettoyage après les tests du module")
-    storage.delete_database(DB_TEST_PATH)
-    assert not os.path.exists(DB_TEST_PATH)
-
-    if os.path.exists(TEST_PLOT_PATH):
-        os.remove(TEST_PLOT_PATH)
-    assert not os.path.exists(TEST_PLOT_PATH)
-
-
-
-def test_generate_plot_file_saving():
-    """
-    L'application doit pouvoir créer une image de rapport non vide
-    """
-    report.generate_plot(limit=5, save=True, filename="test_report.png", db_path=DB_TEST_PATH)
-    assert os.path.exists(TEST_PLOT_PATH)
-    assert os.path.getsize(TEST_PLOT_PATH) > 0
-
-def test_generate_plot_no_crash_on_display():
-    """
-    L'application doit pouvoir faire l'affichage du rapport sans crash
-    """
-    try:
-        report.generate_plot(limit=5, save=False, db_path=DB_TEST_PATH)
-    except Exception as e:
-        pytest.fail(f"generate_plot failed when display was requested: {e}")
+import os
+import sqlite3
+import pytest
+
+from src import report, storage
+from config.config import DATA_PATH, DB_TEST_PATH
+
+TEST_PLOT_PATH = os.path.join(DATA_PATH, "test_report.png")
+
+@pytest.fixture(autouse=True)
+def setup_and_teardown():
+    ###########################################################
+    #                          SETUP                          #
+    ###########################################################
+    print("\n[SETUP] Initialisation avant les tests du module")
+    os.makedirs(DATA_PATH, exist_ok=True)
+    conn = sqlite3.connect(DB_TEST_PATH)
+    cursor = conn.cursor()
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS metrics (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp TEXT NOT NULL,
+            cpu REAL NOT NULL,
+            ram REAL NOT NULL,
+            top_processes TEXT
+        )
+    """)
+    # Insertion de lignes factices
+    from datetime import datetime, timedelta
+    now = datetime.now()
+    for i in range(10):
+        ts = (now - timedelta(seconds=i * 60)).isoformat()
+        cursor.execute("""
+            INSERT INTO metrics (timestamp, cpu, ram, top_processes)
+            VALUES (?, ?, ?, ?)
+        """, (ts, 50 + i, 60 + i, "[]"))
+    conn.commit()
+    conn.close()
+    assert os.path.exists(DB_TEST_PATH)
+
+    yield  # Exécution des tests
+
+    ###########################################################
+    #                         TEARDOWN                        #
+    ###########################################################
+    print("\n[TEARDOWN] Nettoyage après les tests du module")
+    storage.delete_database(DB_TEST_PATH)
+    assert not os.path.exists(DB_TEST_PATH)
+
+    if os.path.exists(TEST_PLOT_PATH):
+        os.remove(TEST_PLOT_PATH)
+    assert not os.path.exists(TEST_PLOT_PATH)
+
+
+
+def test_generate_plot_file_saving():
+    """
+    L'application doit pouvoir créer une image de rapport non vide
+    """
+    report.generate_plot(limit=5, save=True, filename="test_report.png", db_path=DB_TEST_PATH)
+    assert os.path.exists(TEST_PLOT_PATH)
+    assert os.path.getsize(TEST_PLOT_PATH) > 0
+
+def test_generate_plot_no_crash_on_display():
+    """
+    L'application doit pouvoir faire l'affichage du rapport sans crash
+    """
+    try:
+        report.generate_plot(limit=5, save=False, db_path=DB_TEST_PATH)
+    except Exception as e:
+        pytest.fail(f"generate_plot failed when display was requested: {e}")
+
+def test_generate_plot_since_file_saving():
+    """
+    L'application doit pouvoir créer une image de rapport à partir d'une date donnée
+    """
+    from datetime import datetime, timedelta
+    since = datetime.now() - timedelta(hours=1)
+    report.generate_plot(since=since, save=True, filename="test_report.png", db_path=DB_TEST_PATH)
+    assert os.path.exists(TEST_PLOT_PATH)
+    assert os.path.getsize(TEST_PLOT_PATH) > 0
+
+def test_generate_plot_uses_rollups_on_long_ranges():
+    """
+    L'application doit pouvoir créer une image de rapport à partir des agrégats lorsque la période est trop dense
+    """
+    from datetime import datetime, timedelta
+    storage.init_database(DB_TEST_PATH)
+    since = datetime.now() - timedelta(days=1)
+    assert storage.choose_resolution(since, max_points=2, db_path=DB_TEST_PATH) is not None
+    report.generate_plot(since=since, save=True, filename="test_report.png", db_path=DB_TEST_PATH, max_points=2)
+    assert os.path.exists(TEST_PLOT_PATH)
+    assert os.path.getsize(TEST_PLOT_PATH) > 0
+
+def test_rolling_mean_and_ewma_match_loops():
+    """
+    Les calculs vectorisés doivent donner les mêmes valeurs que les définitions écrites en boucle
+    """
+    import numpy as np
+    values = np.random.default_rng(0).uniform(0, 100, 5000)
+
+    rolling = report.rolling_mean(values, window=7)
+    assert np.isnan(rolling[:6]).all()
+    np.testing.assert_allclose(rolling[6:], [values[i - 6:i + 1].mean() for i in range(6, len(values))])
+
+    expected = [values[0]]
+    for value in values[1:]:
+        expected.append(0.9 * expected[-1] + 0.1 * value)
+    # Petits blocs : plusieurs reprises de la récurrence d'un bloc à l'autre
+    np.testing.assert_allclose(report.ewma(values, alpha=0.1, block=100), expected)
+    np.testing.assert_allclose(report.ewma(values, alpha=1.0), values)
+
+def test_series_stats_and_anomalies():
+    """
+    Les statistiques doivent correspondre à NumPy et les deux méthodes doivent signaler un pic isolé
+    """
+    import numpy as np
+    values = 30 + np.random.default_rng(1).normal(0, 1, 2000)
+    values[1500] = 90
+    for method in report.ANOMALY_METHODS:
+        stats = report.compute_series_stats(values, window=60, method=method, threshold=6)
+        assert stats['anomalies'].tolist() == [1500]
+    assert stats['p95'] == pytest.approx(np.percentile(values, 95))
+    assert stats['max'] == 90
+    assert stats['rolling_max'] == pytest.approx(max(values[i - 59:i + 1].mean() for i in range(59, 2000)))
+
+    empty = report.compute_series_stats([], method="ewma")
+    assert empty['mean'] is None and empty['p99'] is None and empty['rolling_max'] is None
+    with pytest.raises(ValueError):
+        report.compute_series_stats(values, method="median")
+
+def test_compute_stats_text_and_json_output():
+    """
+    Les statistiques d'une période doivent pouvoir être affichées en texte et exportées en JSON
+    """
+    import json
+    from datetime import datetime, timedelta
+    stats = report.compute_stats(datetime.now() - timedelta(hours=1), db_path=DB_TEST_PATH, window=3)
+    assert stats['count'] == 10
+
+    data = json.loads(report.format_stats(stats, "json"))
+    assert data['count'] == 10
+    assert data['cpu']['min'] == 50 and data['cpu']['max'] == 59
+    assert data['ram']['p50'] == pytest.approx(64.5)
+    assert data['cpu']['anomalies'] == []
+
+    text = report.format_stats(stats, "text")
+    assert "Samples: 10" in text
+    assert text.splitlines()[3].startswith("CPU")
+
+def test_cli_import_does_not_load_matplotlib():
+    """
+    Le chargement de la CLI (collect, top, ...) ne doit pas payer l'import de matplotlib
+    """
+    import subprocess
+    import sys
+    result = subprocess.run([sys.executable, "-c", "import sys, src.cli; print('matplotlib' in sys.modules)"],
+                            capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == "False"
+
+def test_decimate_minmax_keeps_extremes():
+    """
+    La réduction doit garder au plus deux points par colonne, dans l'ordre, sans perdre les pics
+    """
+    import numpy as np
+    values = np.random.default_rng(2).uniform(20, 80, 100_003).astype(np.float32)
+    values[12_345], values[99_999] = 100, 0
+    timestamps = np.arange(len(values)).astype('datetime64[s]')
+
+    reduced_ts, reduced = report.decimate_minmax(timestamps, values, columns=500)
+    assert len(reduced) <= 2 * 500 + 2
+    assert np.all(np.diff(reduced_ts.astype(np.int64)) > 0)
+    assert reduced.max() == 100 and reduced.min() == 0
+    # Chaque point conservé est un point d'origine
+    assert np.array_equal(values[reduced_ts.astype(np.int64)], reduced)
+
+    short = values[:800]
+    assert report.decimate_minmax(timestamps[:800], short, columns=500)[1] is short
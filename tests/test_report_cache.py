@@ -0,0 +1,139 @@
+import numpy as np
+import pytest
+from datetime import datetime, timedelta
+
+from src import storage
+from src.backends import SQLiteBackend
+from src.report_cache import ReportCache
+from config.config import DB_TEST_PATH
+
+BASE = datetime(2025, 8, 24, 12, 0, 0)
+
+@pytest.fixture(autouse=True)
+def setup_and_teardown():
+    ###########################################################
+    #                          SETUP                          #
+    ###########################################################
+    storage.init_database(DB_TEST_PATH)
+
+    yield  # Exécution des tests
+
+    ###########################################################
+    #                         TEARDOWN                        #
+    ###########################################################
+    storage.delete_database(DB_TEST_PATH)
+
+@pytest.fixture
+def cache(tmp_path):
+    with ReportCache(str(tmp_path / "report_cache.db")) as report_cache:
+        yield report_cache
+
+def write_minutes(first, last, cpu=10.0, host=None):
+    """
+    Écriture d'un échantillon toutes les 20 secondes de la minute 'first' à la minute 'last' (exclue)
+    """
+    with storage.MetricsWriter(DB_TEST_PATH, retention_interval=None, selfstats_interval=None) as writer:
+        for seconds in range(first * 60, last * 60, 20):
+            sample = {'timestamp': (BASE + timedelta(seconds=seconds)).isoformat(), 'cpu': cpu + seconds % 60,
+                      'ram': 50.0, 'top_processes': []}
+            if host is not None:
+                sample['host'] = host
+            writer.write(sample)
+
+def assert_same(cached, direct):
+    for field, a, b in zip(storage.RollupArrays._fields, cached, direct):
+        assert np.array_equal(a, b), field
+
+def test_cache_reads_only_new_buckets(cache):
+    """
+    Test d'un rapport relancé : seuls les seaux postérieurs au dernier seau fermé sont relus dans la base
+    """
+    write_minutes(0, 30)
+    first = cache.get_rollup_arrays("1m", BASE, db_path=DB_TEST_PATH)
+    assert len(first.timestamps) == 30
+    assert cache.stats == {"hits": 0, "misses": 1, "buckets_read": 30}
+
+    write_minutes(30, 32)
+    second = cache.get_rollup_arrays("1m", BASE, db_path=DB_TEST_PATH)
+    assert_same(second, storage.get_rollup_arrays("1m", BASE, db_path=DB_TEST_PATH))
+    # Dernier seau de la première lecture (encore ouvert à ce moment-là) et deux nouveaux seaux
+    assert cache.stats == {"hits": 1, "misses": 1, "buckets_read": 33}
+
+    # Période plus courte : servie depuis la même entrée
+    later = cache.get_rollup_arrays("1m", BASE + timedelta(minutes=10, seconds=30), db_path=DB_TEST_PATH)
+    assert_same(later, storage.get_rollup_arrays("1m", BASE + timedelta(minutes=10), db_path=DB_TEST_PATH))
+    assert cache.stats["hits"] == 2
+
+def test_cache_rereads_late_samples(cache):
+    """
+    Test des échantillons reçus en retard : les seaux à partir du plus ancien échantillon inséré sont relus
+    """
+    write_minutes(0, 30)
+    cache.get_rollup_arrays("1m", BASE, db_path=DB_TEST_PATH)
+    write_minutes(5, 6, cpu=90.0)
+    write_minutes(0, 1, cpu=90.0, host="remote")  # Autre hôte : sans effet sur l'entrée
+
+    result = cache.get_rollup_arrays("1m", BASE, db_path=DB_TEST_PATH)
+    assert_same(result, storage.get_rollup_arrays("1m", BASE, db_path=DB_TEST_PATH))
+    assert result.count[5] == 6
+    assert cache.stats["buckets_read"] == 30 + 25
+
+def test_cache_until_and_resolutions(cache):
+    """
+    Test des lectures bornées et des résolutions : chaque lecture égale celle de la base
+    """
+    write_minutes(0, 150)
+    for resolution in ("1m", "1h"):
+        for since, until in [(BASE, None), (BASE + timedelta(minutes=20), BASE + timedelta(minutes=70)),
+                             (BASE, None), (BASE + timedelta(minutes=90), None)]:
+            assert_same(cache.get_rollup_arrays(resolution, since, until, db_path=DB_TEST_PATH),
+                        storage.get_rollup_arrays(resolution, since, until, db_path=DB_TEST_PATH))
+    with pytest.raises(ValueError):
+        cache.get_rollup_arrays("1d", BASE, db_path=DB_TEST_PATH)
+
+def test_cache_invalidated_by_retention_and_recreation(cache):
+    """
+    Test de l'invalidation : seaux supprimés par la rétention, base supprimée puis recréée
+    """
+    write_minutes(0, 30)
+    cache.get_rollup_arrays("1m", BASE, db_path=DB_TEST_PATH)
+    conn = storage.connect(DB_TEST_PATH)
+    storage.apply_retention(conn, now=BASE + timedelta(days=1, minutes=10), max_age={"1m": 1}, max_size=None)
+    conn.close()
+    result = cache.get_rollup_arrays("1m", BASE, db_path=DB_TEST_PATH)
+    assert_same(result, storage.get_rollup_arrays("1m", BASE, db_path=DB_TEST_PATH))
+    assert len(result.timestamps) == 20
+    assert cache.stats["misses"] == 2
+
+    storage.delete_database(DB_TEST_PATH)
+    storage.init_database(DB_TEST_PATH)
+    write_minutes(0, 3, cpu=70.0)
+    result = cache.get_rollup_arrays("1m", BASE, db_path=DB_TEST_PATH)
+    assert_same(result, storage.get_rollup_arrays("1m", BASE, db_path=DB_TEST_PATH))
+    assert cache.stats["misses"] == 3
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    """
+    Test de la taille maximale : les entrées les moins récemment utilisées sont supprimées
+    """
+    write_minutes(0, 30)
+    write_minutes(0, 30, host="remote")
+    entry_size = 29 * storage.ROLLUP_DTYPE.itemsize
+    with ReportCache(str(tmp_path / "report_cache.db"), max_bytes=entry_size) as cache:
+        cache.get_rollup_arrays("1m", BASE, db_path=DB_TEST_PATH)
+        cache.get_rollup_arrays("1m", BASE, db_path=DB_TEST_PATH, host="remote")
+        hosts = [row[0] for row in cache.conn.execute("SELECT host FROM report_series")]
+        assert hosts == ["remote"]
+
+def test_backend_reads_through_cache(cache):
+    """
+    Test de l'intégration au moteur SQLite : les agrégats lus passent par le cache
+    """
+    write_minutes(0, 30)
+    backend = SQLiteBackend(DB_TEST_PATH, report_cache=cache)
+    try:
+        for _ in range(2):
+            assert_same(backend.read_rollup("1m", BASE), storage.get_rollup_arrays("1m", BASE, db_path=DB_TEST_PATH))
+    finally:
+        backend.close()
+    assert (cache.stats["misses"], cache.stats["hits"]) == (1, 1)
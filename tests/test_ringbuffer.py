@@ -0,0 +1,58 @@
+import pytest
+import numpy as np
+
+from src.ringbuffer import RingBuffer
+
+def test_ring_buffer_keeps_insertion_order():
+    """
+    Les éléments doivent être relus du plus ancien au plus récent, les plus anciens étant écrasés une fois plein
+    """
+    buffer = RingBuffer(4)
+    for value in range(3):
+        buffer.append(value)
+    assert len(buffer) == 3
+    assert buffer.values().tolist() == [0, 1, 2]
+
+    for value in range(3, 7):
+        buffer.append(value)
+    assert len(buffer) == 4
+    assert buffer.values().tolist() == [3, 4, 5, 6]
+    assert buffer.last(2).tolist() == [5, 6]
+    assert buffer.last(10).tolist() == [3, 4, 5, 6]
+    assert buffer.last(0).tolist() == []
+    assert buffer.first(3).tolist() == [3, 4, 5]
+    assert buffer.first(10).tolist() == [3, 4, 5, 6]
+
+def test_ring_buffer_extend_matches_append():
+    """
+    L'ajout groupé doit donner le même contenu qu'une suite d'ajouts, y compris au-delà de la capacité
+    """
+    for sizes in ([2, 3], [5, 1, 7], [10], [0, 4]):
+        grouped, single = RingBuffer(5), RingBuffer(5)
+        start = 0
+        for size in sizes:
+            values = np.arange(start, start + size)
+            grouped.extend(values)
+            for value in values:
+                single.append(value)
+            start += size
+        assert grouped.values().tolist() == single.values().tolist()
+        assert len(grouped) == len(single)
+
+def test_ring_buffer_structured_dtype():
+    """
+    Le tampon doit accepter un type structuré, les lectures étant des copies indépendantes du tampon
+    """
+    buffer = RingBuffer(3, dtype=[('cpu', '<f4'), ('ram', '<f4')])
+    buffer.append((10.0, 20.0))
+    buffer.append((11.0, 21.0))
+    values = buffer.values()
+    values['cpu'][0] = -1.0
+    np.testing.assert_allclose(buffer.values()['cpu'], [10.0, 11.0])
+    np.testing.assert_allclose(buffer.values()['ram'], [20.0, 21.0])
+
+    buffer.clear()
+    assert len(buffer) == 0
+
+    with pytest.raises(ValueError):
+        RingBuffer(0)
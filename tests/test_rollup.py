@@ -0,0 +1,136 @@
+import os
+import sqlite3
+import numpy as np
+import pytest
+from datetime import datetime, timedelta
+
+from src import rollup, storage
+from config.config import DB_TEST_PATH
+
+BASE = datetime(2025, 8, 24, 12, 0, 0)
+
+@pytest.fixture(autouse=True)
+def setup_and_teardown():
+    storage.init_database(DB_TEST_PATH)
+    assert os.path.exists(DB_TEST_PATH)
+    yield
+    storage.delete_database(DB_TEST_PATH)
+    assert not os.path.exists(DB_TEST_PATH)
+
+def make_sample(seconds, cpu, ram):
+    return {
+        'timestamp': (BASE + timedelta(seconds=seconds)).isoformat(),
+        'cpu': cpu,
+        'ram': ram,
+        'top_processes': []
+    }
+
+def read_table(name):
+    conn = sqlite3.connect(DB_TEST_PATH)
+    rows = conn.execute(f"SELECT {', '.join(rollup.COLUMNS)} FROM {rollup.table_name(name)} ORDER BY bucket").fetchall()
+    conn.close()
+    return rows
+
+def test_aggregate_matches_numpy():
+    """
+    Les agrégats vectorisés doivent correspondre à un calcul seau par seau
+    """
+    rng = np.random.default_rng(0)
+    rows = np.zeros(500, dtype=rollup.RAW_DTYPE)
+    rows['ts'] = np.sort(rng.integers(0, 10 * 60_000, 500))
+    rows['cpu'] = rng.uniform(0, 100, 500)
+    rows['ram'] = rng.uniform(0, 100, 500)
+
+    result = rollup.aggregate(rows, 60_000)
+    assert len(result) == 10
+    for bucket, count, cpu_min, cpu_avg, cpu_max, cpu_p95, ram_min, ram_avg, ram_max, ram_p95 in result:
+        mask = rows['ts'] // 60_000 * 60_000 == bucket
+        assert count == mask.sum()
+        cpu = rows['cpu'][mask]
+        ram = rows['ram'][mask]
+        assert (cpu_min, cpu_max) == (cpu.min(), cpu.max())
+        assert cpu_avg == pytest.approx(cpu.mean())
+        assert cpu_p95 == pytest.approx(np.percentile(cpu, 95))
+        assert ram_p95 == pytest.approx(np.percentile(ram, 95))
+        assert (ram_min, ram_max) == (ram.min(), ram.max())
+        assert ram_avg == pytest.approx(ram.mean())
+
+def test_aggregate_empty():
+    """
+    Aucun seau ne doit être produit sans données
+    """
+    assert rollup.aggregate(np.zeros(0, dtype=rollup.RAW_DTYPE), 60_000) == []
+
+def test_insert_metrics_updates_rollups():
+    """
+    Chaque insertion doit mettre à jour les seaux concernés
+    """
+    storage.insert_metrics(make_sample(0, 10.0, 50.0), DB_TEST_PATH)
+    storage.insert_metrics(make_sample(30, 30.0, 70.0), DB_TEST_PATH)
+    storage.insert_metrics(make_sample(60, 90.0, 10.0), DB_TEST_PATH)
+
+    minutes = read_table("1m")
+    assert len(minutes) == 2
+    bucket, count, cpu_min, cpu_avg, cpu_max, _, ram_min, ram_avg, ram_max, _ = minutes[0]
+    assert bucket == storage.to_epoch_ms(BASE)
+    assert count == 2
+    assert (cpu_min, cpu_avg, cpu_max) == (10.0, 20.0, 30.0)
+    assert (ram_min, ram_avg, ram_max) == (50.0, 60.0, 70.0)
+
+    hours = read_table("1h")
+    assert len(hours) == 1
+    assert hours[0][1] == 3
+    assert hours[0][4] == 90.0
+
+def test_incremental_refresh_matches_rebuild():
+    """
+    Les agrégats tenus à jour par l'écrivain doivent être identiques à un recalcul complet
+    """
+    rng = np.random.default_rng(1)
+    with storage.MetricsWriter(DB_TEST_PATH, batch_size=37, flush_interval=3600) as writer:
+        for i in range(2000):
+            writer.write(make_sample(i * 3, float(rng.uniform(0, 100)), float(rng.uniform(0, 100))))
+
+    incremental = {name: read_table(name) for name, _ in rollup.ROLLUP_RESOLUTIONS}
+    conn = sqlite3.connect(DB_TEST_PATH)
+    with conn:
+        rollup.rebuild(conn)
+    conn.close()
+    rebuilt = {name: read_table(name) for name, _ in rollup.ROLLUP_RESOLUTIONS}
+
+    # Résolution la plus fine recalculée à l'identique ; au-dessus, seule la moyenne fusionnée diffère (arrondis)
+    finest = rollup.ROLLUP_RESOLUTIONS[0][0]
+    assert incremental[finest] == rebuilt[finest]
+    for name, _ in rollup.ROLLUP_RESOLUTIONS[1:]:
+        assert len(incremental[name]) == len(rebuilt[name])
+        for got, want in zip(incremental[name], rebuilt[name]):
+            assert got == pytest.approx(want, rel=1e-12)
+    assert sum(row[1] for row in rebuilt["1m"]) == 2000
+    assert sum(row[1] for row in rebuilt["1h"]) == 2000
+
+def test_coarse_p95_is_derived_from_finest_buckets():
+    """
+    Le p95 d'une résolution grossière doit être déduit des seaux les plus fins, proche du p95 exact,
+    et un seau grossier ne doit jamais être relu en entier lors d'une écriture
+    """
+    rng = np.random.default_rng(2)
+    with storage.MetricsWriter(DB_TEST_PATH, batch_size=50, flush_interval=3600) as writer:
+        for i in range(3600):
+            writer.write(make_sample(i, float(rng.uniform(0, 100)), float(rng.normal(50, 5))))
+
+    (bucket, count, *_, cpu_p95, _, _, _, ram_p95), = read_table("1h")
+    assert count == 3600
+    conn = sqlite3.connect(DB_TEST_PATH)
+    cpu, ram = np.array(conn.execute("SELECT cpu, ram FROM metrics").fetchall()).T
+    assert cpu_p95 == pytest.approx(np.percentile(cpu, 95), abs=1.5)
+    assert ram_p95 == pytest.approx(np.percentile(ram, 95), abs=0.5)
+
+    # Une écriture ne relit que les lignes brutes de sa minute
+    queries = []
+    conn.set_trace_callback(queries.append)
+    with conn:
+        storage._write_batch(conn, [storage.validate_metrics(make_sample(3599, 1.0, 1.0))], {})
+    conn.close()
+    raw_reads = [query for query in queries if "FROM metrics WHERE host" in query]
+    assert len(raw_reads) == 1
+    assert f"ts >= {storage.to_epoch_ms(BASE) + 59 * 60_000}" in raw_reads[0]
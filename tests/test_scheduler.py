@@ -0,0 +1,81 @@
+import pytest
+
+from src.scheduler import Scheduler
+
+class FakeClock:
+    """
+    Horloge factice : l'attente avance le temps, et chaque tick peut coûter un temps de travail
+    """
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+def test_scheduler_rejects_invalid_interval():
+    """
+    Le cadenceur doit refuser un intervalle nul ou négatif
+    """
+    with pytest.raises(ValueError):
+        Scheduler(0)
+
+def test_scheduler_keeps_fixed_cadence():
+    """
+    Le temps de collecte ne doit pas s'ajouter à l'intervalle : les ticks restent alignés sur leurs échéances
+    """
+    clock = FakeClock()
+    scheduler = Scheduler(1.0, clock=clock, sleep=clock.sleep)
+    starts = []
+    for _ in scheduler.ticks(duration=10):
+        starts.append(clock.now)
+        clock.now += 0.3  # temps de collecte
+
+    assert starts == [100.0 + i for i in range(10)]
+    stats = scheduler.stats()
+    assert stats['ticks'] == 10
+    assert stats['late'] == 0
+    assert stats['missed'] == 0
+    assert stats['jitter_max'] == 0.0
+
+def test_scheduler_sub_second_interval():
+    """
+    Le cadenceur doit tenir des intervalles inférieurs à la seconde
+    """
+    clock = FakeClock()
+    scheduler = Scheduler(0.1, clock=clock, sleep=clock.sleep)
+    count = sum(1 for _ in scheduler.ticks(duration=1.0))
+    assert count == 10
+
+def test_scheduler_reports_late_and_missed_ticks():
+    """
+    Un tick trop long doit être compté en retard et les échéances dépassées comptées comme manquées
+    """
+    clock = FakeClock()
+    scheduler = Scheduler(1.0, clock=clock, sleep=clock.sleep)
+    starts = []
+    for i, lateness in enumerate(scheduler.ticks(duration=10)):
+        starts.append(clock.now)
+        if i == 2:
+            clock.now += 2.5  # collecte anormalement longue
+
+    # Le tick 3 part avec 1.5s de retard, le tick 4 est abandonné, puis la cadence reprend
+    assert starts[:5] == [100.0, 101.0, 102.0, 104.5, 105.0]
+    stats = scheduler.stats()
+    assert stats['missed'] == 1
+    assert stats['late'] == 1
+    assert stats['jitter_max'] == pytest.approx(1.5)
+    assert stats['ticks'] == 9
+
+def test_scheduler_measures_real_jitter():
+    """
+    Sur une horloge réelle, la gigue mesurée doit rester faible devant l'intervalle
+    """
+    scheduler = Scheduler(0.02)
+    for _ in scheduler.ticks(duration=0.2):
+        pass
+    stats = scheduler.stats()
+    assert stats['ticks'] >= 8
+    assert 0.0 <= stats['jitter_mean'] <= stats['jitter_max']
@@ -1,262 +1,925 @@
-import pytest
-import sqlite3
-import os
-import json
-from datetime import datetime, timedelta
-
-from src import collector, storage
-from config.config import DB_TEST_PATH
-
-@pytest.fixture(autouse=True)
-def setup_and_teardown():
-    ###########################################################
-    #                          SETUP                          #
-    ###########################################################
-    print("\n[SETUP] Initialisation avant les tests du module")
-    storage.init_database(DB_TEST_PATH)
-    assert os.path.exists(DB_TEST_PATH)
-
-    yield  # Exécution des tests
-
-    ###########################################################
-    #                         TEARDOWN                        #
-    ###########################################################
-    print("\n[TEARDOWN] Nettoyage après les tests du module")
-    storage.delete_database(DB_TEST_PATH)
-    assert not os.path.exists(DB_TEST_PATH)
-
-
-
-def test_init_database_creates_file_and_table():
-    """
-    L'application doit pouvoir créer le fichier de base de données et la table 'metrics'
-    """
-    conn = sqlite3.connect(DB_TEST_PATH)
-    cursor = conn.cursor()
-    cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='metrics';")
-    assert cursor.fetchone() is not None
-    conn.close()
-
-def test_storage_insert_and_read():
-    """
-    L'application doit pouvoir initier la base de données au besoin, ajouter et lire des données dans la base de données
-    """
-    data = collector.collect_metrics()
-    storage.insert_metrics(data, DB_TEST_PATH)
-
-    ts, cpu, ram, processes = storage.get_last_metrics(1, DB_TEST_PATH)
-
-    assert isinstance(ts[0], datetime)
-
-    assert isinstance(cpu[0], float)
-    assert isinstance(ram[0], float)
-
-    proc_list = json.loads(processes[0])
-    assert isinstance(proc_list, list)
-    assert all('pid' in p and 'name' in p and 'cpu_percent' in p for p in proc_list)
-
-def test_insert_and_read_manual_data():
-    """
-    L'application doit pouvoir insérer des données manuellement et les relire correctement
-    """
-    mock_data = {
-        'timestamp': '2025-08-23T12:00:00',
-        'cpu': 12.5,
-        'ram': 43.2,
-        'top_processes': [
-            {'pid': 123, 'name': 'test_process', 'cpu_percent': 10.0}
-        ]
-    }
-
-    storage.insert_metrics(mock_data, DB_TEST_PATH)
-    ts, cpu, ram, processes = storage.get_last_metrics(1, DB_TEST_PATH)
-
-    assert ts[0] == datetime.fromisoformat(mock_data['timestamp'])
-    assert abs(cpu[0] - mock_data['cpu']) < 0.01
-    assert abs(ram[0] - mock_data['ram']) < 0.01
-
-    loaded = json.loads(processes[0])
-    assert loaded[0]['pid'] == 123
-    assert loaded[0]['name'] == 'test_process'
-    assert loaded[0]['cpu_percent'] == 10.0
-
-def test_insert_fails_on_null_timestamp():
-    """
-    L'application doit tomber en erreur lors d'une valeur à NULL
-    """
-    bad_data = {
-        'timestamp': None,
-        'cpu': 10.0,
-        'ram': 20.0,
-        'top_processes': []
-    }
-
-    with pytest.raises(TypeError):
-        storage.insert_metrics(bad_data, DB_TEST_PATH)
-
-def test_insert_with_invalid_timestamp_type_1():
-    """
-    L'application doit tomber en erreur lors d'un bon type mais au mauvais format sur 'timestamp'
-    """
-    bad_data = {
-        'timestamp': "not a datetime",
-        'cpu': 10.0,
-        'ram': 20.0,
-        'top_processes': []
-    }
-
-    with pytest.raises(TypeError):
-        storage.insert_metrics(bad_data, DB_TEST_PATH)
-
-def test_insert_with_invalid_timestamp_type_2():
-    """
-    L'application doit tomber en erreur lors d'un type incorrect sur 'timestamp'
-    """
-    bad_data = {
-        'timestamp': 12345,
-        'cpu': 10.0,
-        'ram': 20.0,
-        'top_processes': []
-    }
-
-    with pytest.raises(TypeError):
-        storage.insert_metrics(bad_data, DB_TEST_PATH)
-
-def test_insert_with_invalid_cpu_type():
-    """
-    L'application doit tomber en erreur lors d'un type incorrect sur 'cpu'
-    """
-    bad_data = {
-        'timestamp': '2025-08-23T14:00:00',
-        'cpu': "not a float",
-        'ram': 20.0,
-        'top_processes': []
-    }
-
-    with pytest.raises(TypeError):
-        storage.insert_metrics(bad_data, DB_TEST_PATH)
-
-def test_insert_with_invalid_ram_type():
-    """
-    L'application doit tomber en erreur lors d'un type incorrect sur 'ram'
-    """
-    bad_data = {
-        'timestamp': '2025-08-23T14:00:00',
-        'cpu': 10.0,
-        'ram': "not a float",
-        'top_processes': []
-    }
-
-    with pytest.raises(TypeError):
-        storage.insert_metrics(bad_data, DB_TEST_PATH)
-
-def test_insert_with_invalid_top_processes_type():
-    """
-    L'application doit tomber en erreur lors d'un type incorrect sur 'top_processes'
-    """
-    bad_data = {
-        'timestamp': '2025-08-23T14:00:00',
-        'cpu': 10.0,
-        'ram': 20.0,
-        'top_processes': "not a list"
-    }
-
-    with pytest.raises(TypeError):
-        storage.insert_metrics(bad_data, DB_TEST_PATH)
-
-def test_insert_with_non_serializable_processes():
-    """
-    L'application doit tomber en errur lors d'une valeur non sérialisable en JSON sur 'top_processes'
-    """
-    bad_data = {
-        'timestamp': '2025-08-23T14:00:00',
-        'cpu': 10.0,
-        'ram': 20.0,
-        'top_processes': set([1, 2, 3])
-    }
-
-    with pytest.raises(TypeError):
-        storage.insert_metrics(bad_data, DB_TEST_PATH)
-
-def test_get_last_time_metrics_returns_correct_data():
-    """
-    L'application doit pouvoir renvoyer uniquement les métriques postérieures à une date donnée
-    """
-    # Insertion de 3 lignes espacées dans le temps
-    base_time = datetime(2025, 8, 23, 15, 0, 0)
-    for i in range(3):
-        mock_data = {
-            'timestamp': (base_time + timedelta(seconds=i)).isoformat(),
-            'cpu': 10.0 + i,
-            'ram': 30.0 + i,
-            'top_processes': []
-        }
-        storage.insert_metrics(mock_data, DB_TEST_PATH)
-
-    # On interroge à partir de la 2e
-    since = base_time + timedelta(seconds=1)
-    ts, cpu, ram, processes = storage.get_last_time_metrics(since, DB_TEST_PATH)
-
-    assert len(ts) == 2
-    assert ts[0] == base_time + timedelta(seconds=1)
-    assert cpu == [11.0, 12.0]
-    assert ram == [31.0, 32.0]
-
-def test_get_last_time_metrics_with_future_date_returns_empty():
-    """
-    L'application ne doit rien retourner si la date 'since' est dans le futur
-    """
-    future = datetime.now() + timedelta(days=365)
-    ts, cpu, ram, processes = storage.get_last_time_metrics(future, DB_TEST_PATH)
-
-    assert ts == []
-    assert cpu == []
-    assert ram == []
-    assert processes == []
-
-def test_get_last_time_metrics_includes_exact_match():
-    """
-    L'application doit inclure les données dont le timestamp est exactement égal à la date 'since'
-    """
-    # Timestamp exact à tester
-    exact_time = datetime(2025, 8, 23, 16, 0, 0)
-    storage.insert_metrics({
-        'timestamp': exact_time.isoformat(),
-        'cpu': 42.0,
-        'ram': 84.0,
-        'top_processes': []
-    }, DB_TEST_PATH)
-
-    ts, cpu, ram, _ = storage.get_last_time_metrics(exact_time, DB_TEST_PATH)
-    assert exact_time in ts
-    assert 42.0 in cpu
-    assert 84.0 in ram
-
-def test_get_last_time_metrics_with_none_raises():
-    """
-    L'application doit lever une exception si 'since' est None
-    """
-    with pytest.raises(ValueError):
-        storage.get_last_time_metrics(None, DB_TEST_PATH)
-
-def test_get_last_time_metrics_returns_sorted_data():
-    """
-    Les données retournées doivent être triées chronologiquement croissante (ASC)
-    """
-    times = [
-        datetime(2025, 8, 23, 18, 0, 10),
-        datetime(2025, 8, 23, 18, 0, 5),
-        datetime(2025, 8, 23, 18, 0, 20)
-    ]
-
-    for t in times:
-        storage.insert_metrics({
-            'timestamp': t.isoformat(),
-            'cpu': 10.0,
-            'ram': 10.0,
-            'top_processes': []
-        }, DB_TEST_PATH)
-
-    ts, _, _, _ = storage.get_last_time_metrics(datetime(2025, 8, 23, 18, 0, 0), DB_TEST_PATH)
-
-    assert ts == sorted(ts)
\ No newline at end of file
+import pytest
+import sqlite3
+import os
+import json
+import multiprocessing
+import threading
+import time
+import numpy as np
+from datetime import datetime, timedelta
+
+from src import collector, storage
+from config.config import DB_TEST_PATH
+
+@pytest.fixture(autouse=True)
+def setup_and_teardown():
+    ###########################################################
+    #                          SETUP                          #
+    ###########################################################
+    print("\n[SETUP] Initialisation avant les tests du module")
+    storage.init_database(DB_TEST_PATH)
+    assert os.path.exists(DB_TEST_PATH)
+
+    yield  # Exécution des tests
+
+    ###########################################################
+    #                         TEARDOWN                        #
+    ###########################################################
+    print("\n[TEARDOWN] Nettoyage après les tests du module")
+    storage.delete_database(DB_TEST_PATH)
+    assert not os.path.exists(DB_TEST_PATH)
+
+
+
+def test_init_database_creates_file_and_table():
+    """
+    L'application doit pouvoir créer le fichier de base de données et la table 'metrics'
+    """
+    conn = sqlite3.connect(DB_TEST_PATH)
+    cursor = conn.cursor()
+    cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='metrics';")
+    assert cursor.fetchone() is not None
+    conn.close()
+
+def test_storage_insert_and_read():
+    """
+    L'application doit pouvoir initier la base de données au besoin, ajouter et lire des données dans la base de données
+    """
+    data = collector.collect_metrics()
+    storage.insert_metrics(data, DB_TEST_PATH)
+
+    ts, cpu, ram, processes = storage.get_last_metrics(1, DB_TEST_PATH)
+
+    assert isinstance(ts[0], datetime)
+
+    assert isinstance(cpu[0], float)
+    assert isinstance(ram[0], float)
+
+    proc_list = json.loads(processes[0])
+    assert isinstance(proc_list, list)
+    assert all('pid' in p and 'name' in p and 'cpu_percent' in p for p in proc_list)
+
+def test_insert_and_read_manual_data():
+    """
+    L'application doit pouvoir insérer des données manuellement et les relire correctement
+    """
+    mock_data = {
+        'timestamp': '2025-08-23T12:00:00',
+        'cpu': 12.5,
+        'ram': 43.2,
+        'top_processes': [
+            {'pid': 123, 'name': 'test_process', 'cpu_percent': 10.0}
+        ]
+    }
+
+    storage.insert_metrics(mock_data, DB_TEST_PATH)
+    ts, cpu, ram, processes = storage.get_last_metrics(1, DB_TEST_PATH)
+
+    assert ts[0] == datetime.fromisoformat(mock_data['timestamp'])
+    assert abs(cpu[0] - mock_data['cpu']) < 0.01
+    assert abs(ram[0] - mock_data['ram']) < 0.01
+
+    loaded = json.loads(processes[0])
+    assert loaded[0]['pid'] == 123
+    assert loaded[0]['name'] == 'test_process'
+    assert loaded[0]['cpu_percent'] == 10.0
+
+def test_insert_fails_on_null_timestamp():
+    """
+    L'application doit tomber en erreur lors d'une valeur à NULL
+    """
+    bad_data = {
+        'timestamp': None,
+        'cpu': 10.0,
+        'ram': 20.0,
+        'top_processes': []
+    }
+
+    with pytest.raises(TypeError):
+        storage.insert_metrics(bad_data, DB_TEST_PATH)
+
+def test_insert_with_invalid_timestamp_type_1():
+    """
+    L'application doit tomber en erreur lors d'un bon type mais au mauvais format sur 'timestamp'
+    """
+    bad_data = {
+        'timestamp': "not a datetime",
+        'cpu': 10.0,
+        'ram': 20.0,
+        'top_processes': []
+    }
+
+    with pytest.raises(TypeError):
+        storage.insert_metrics(bad_data, DB_TEST_PATH)
+
+def test_insert_with_invalid_timestamp_type_2():
+    """
+    L'application doit tomber en erreur lors d'un type incorrect sur 'timestamp'
+    """
+    bad_data = {
+        'timestamp': 12345,
+        'cpu': 10.0,
+        'ram': 20.0,
+        'top_processes': []
+    }
+
+    with pytest.raises(TypeError):
+        storage.insert_metrics(bad_data, DB_TEST_PATH)
+
+def test_insert_with_invalid_cpu_type():
+    """
+    L'application doit tomber en erreur lors d'un type incorrect sur 'cpu'
+    """
+    bad_data = {
+        'timestamp': '2025-08-23T14:00:00',
+        'cpu': "not a float",
+        'ram': 20.0,
+        'top_processes': []
+    }
+
+    with pytest.raises(TypeError):
+        storage.insert_metrics(bad_data, DB_TEST_PATH)
+
+def test_insert_with_invalid_ram_type():
+    """
+    L'application doit tomber en erreur lors d'un type incorrect sur 'ram'
+    """
+    bad_data = {
+        'timestamp': '2025-08-23T14:00:00',
+        'cpu': 10.0,
+        'ram': "not a float",
+        'top_processes': []
+    }
+
+    with pytest.raises(TypeError):
+        storage.insert_metrics(bad_data, DB_TEST_PATH)
+
+def test_insert_with_invalid_top_processes_type():
+    """
+    L'application doit tomber en erreur lors d'un type incorrect sur 'top_processes'
+    """
+    bad_data = {
+        'timestamp': '2025-08-23T14:00:00',
+        'cpu': 10.0,
+        'ram': 20.0,
+        'top_processes': "not a list"
+    }
+
+    with pytest.raises(TypeError):
+        storage.insert_metrics(bad_data, DB_TEST_PATH)
+
+def test_insert_with_non_serializable_processes():
+    """
+    L'application doit tomber en errur lors d'une valeur non sérialisable en JSON sur 'top_processes'
+    """
+    bad_data = {
+        'timestamp': '2025-08-23T14:00:00',
+        'cpu': 10.0,
+        'ram': 20.0,
+        'top_processes': set([1, 2, 3])
+    }
+
+    with pytest.raises(TypeError):
+        storage.insert_metrics(bad_data, DB_TEST_PATH)
+
+@pytest.mark.parametrize("process", [
+    {'pid': "1", 'name': 'init', 'cpu_percent': 0.5},
+    {'pid': True, 'name': 'init', 'cpu_percent': 0.5},
+    {'pid': 1, 'name': None, 'cpu_percent': 0.5},
+    {'pid': 1, 'name': 'init', 'cpu_percent': "0.5"}
+])
+def test_insert_with_badly_typed_process(process):
+    """
+    L'application doit tomber en erreur lorsqu'un processus de 'top_processes' a un pid, un nom ou un cpu_percent mal typé
+    """
+    bad_data = {
+        'timestamp': '2025-08-23T14:00:00',
+        'cpu': 10.0,
+        'ram': 20.0,
+        'top_processes': [process]
+    }
+
+    with pytest.raises(TypeError):
+        storage.insert_metrics(bad_data, DB_TEST_PATH)
+
+def test_get_last_time_metrics_returns_correct_data():
+    """
+    L'application doit pouvoir renvoyer uniquement les métriques postérieures à une date donnée
+    """
+    # Insertion de 3 lignes espacées dans le temps
+    base_time = datetime(2025, 8, 23, 15, 0, 0)
+    for i in range(3):
+        mock_data = {
+            'timestamp': (base_time + timedelta(seconds=i)).isoformat(),
+            'cpu': 10.0 + i,
+            'ram': 30.0 + i,
+            'top_processes': []
+        }
+        storage.insert_metrics(mock_data, DB_TEST_PATH)
+
+    # On interroge à partir de la 2e
+    since = base_time + timedelta(seconds=1)
+    ts, cpu, ram, processes = storage.get_last_time_metrics(since, DB_TEST_PATH)
+
+    assert len(ts) == 2
+    assert ts[0] == base_time + timedelta(seconds=1)
+    assert cpu == [11.0, 12.0]
+    assert ram == [31.0, 32.0]
+
+def test_get_last_time_metrics_with_future_date_returns_empty():
+    """
+    L'application ne doit rien retourner si la date 'since' est dans le futur
+    """
+    future = datetime.now() + timedelta(days=365)
+    ts, cpu, ram, processes = storage.get_last_time_metrics(future, DB_TEST_PATH)
+
+    assert ts == []
+    assert cpu == []
+    assert ram == []
+    assert processes == []
+
+def test_get_last_time_metrics_includes_exact_match():
+    """
+    L'application doit inclure les données dont le timestamp est exactement égal à la date 'since'
+    """
+    # Timestamp exact à tester
+    exact_time = datetime(2025, 8, 23, 16, 0, 0)
+    storage.insert_metrics({
+        'timestamp': exact_time.isoformat(),
+        'cpu': 42.0,
+        'ram': 84.0,
+        'top_processes': []
+    }, DB_TEST_PATH)
+
+    ts, cpu, ram, _ = storage.get_last_time_metrics(exact_time, DB_TEST_PATH)
+    assert exact_time in ts
+    assert 42.0 in cpu
+    assert 84.0 in ram
+
+def test_get_last_time_metrics_with_none_raises():
+    """
+    L'application doit lever une exception si 'since' est None
+    """
+    with pytest.raises(ValueError):
+        storage.get_last_time_metrics(None, DB_TEST_PATH)
+
+def test_get_last_time_metrics_returns_sorted_data():
+    """
+    Les données retournées doivent être triées chronologiquement croissante (ASC)
+    """
+    times = [
+        datetime(2025, 8, 23, 18, 0, 10),
+        datetime(2025, 8, 23, 18, 0, 5),
+        datetime(2025, 8, 23, 18, 0, 20)
+    ]
+
+    for t in times:
+        storage.insert_metrics({
+            'timestamp': t.isoformat(),
+            'cpu': 10.0,
+            'ram': 10.0,
+            'top_processes': []
+        }, DB_TEST_PATH)
+
+    ts, _, _, _ = storage.get_last_time_metrics(datetime(2025, 8, 23, 18, 0, 0), DB_TEST_PATH)
+
+    assert ts == sorted(ts)
+
+def make_mock_data(i=0):
+    """
+    Génération d'un échantillon factice valide
+    :param i: Décalage en secondes par rapport à une date de référence
+    :return: Dictionnaire d'échantillon
+    """
+    return {
+        'timestamp': (datetime(2025, 8, 24, 12, 0, 0) + timedelta(seconds=i)).isoformat(),
+        'cpu': 10.0 + i,
+        'ram': 20.0 + i,
+        'top_processes': [{'pid': 1, 'name': 'init', 'cpu_percent': 0.5}]
+    }
+
+def count_rows(db_path=DB_TEST_PATH):
+    conn = sqlite3.connect(db_path)
+    count = conn.execute("SELECT COUNT(*) FROM metrics").fetchone()[0]
+    conn.close()
+    return count
+
+def test_init_database_enables_wal():
+    """
+    La base de données doit être initialisée en mode WAL
+    """
+    conn = sqlite3.connect(DB_TEST_PATH)
+    mode = conn.execute("PRAGMA journal_mode").fetchone()[0]
+    conn.close()
+    assert mode == "wal"
+
+def test_writer_buffers_until_batch_size():
+    """
+    L'écrivain ne doit écrire sur disque qu'une fois la taille de lot atteinte
+    """
+    with storage.MetricsWriter(DB_TEST_PATH, batch_size=3, flush_interval=3600) as writer:
+        writer.write(make_mock_data(0))
+        writer.write(make_mock_data(1))
+        assert count_rows() == 0
+        writer.write(make_mock_data(2))
+        assert count_rows() == 3
+        assert writer.buffer == []
+
+def test_writer_flushes_on_interval():
+    """
+    L'écrivain doit écrire sur disque dès que le délai maximal est écoulé
+    """
+    with storage.MetricsWriter(DB_TEST_PATH, batch_size=1000, flush_interval=0) as writer:
+        writer.write(make_mock_data(0))
+        assert count_rows() == 1
+
+def test_writer_flushes_on_close():
+    """
+    Aucun échantillon en attente ne doit être perdu à la fermeture de l'écrivain
+    """
+    writer = storage.MetricsWriter(DB_TEST_PATH, batch_size=1000, flush_interval=3600)
+    for i in range(5):
+        writer.write(make_mock_data(i))
+    assert count_rows() == 0
+    writer.close()
+    assert count_rows() == 5
+
+    # Une double fermeture ne doit pas lever d'erreur
+    writer.close()
+
+def test_writer_flushes_on_exception():
+    """
+    Les échantillons en attente doivent être écrits même si le bloc est interrompu
+    """
+    with pytest.raises(KeyboardInterrupt):
+        with storage.MetricsWriter(DB_TEST_PATH, batch_size=1000, flush_interval=3600) as writer:
+            writer.write(make_mock_data(0))
+            writer.write(make_mock_data(1))
+            raise KeyboardInterrupt
+    assert count_rows() == 2
+
+def test_writer_data_matches_insert_metrics():
+    """
+    Les données écrites par lots doivent être relues comme celles de insert_metrics
+    """
+    with storage.MetricsWriter(DB_TEST_PATH) as writer:
+        writer.write(make_mock_data(0))
+
+    ts, cpu, ram, processes = storage.get_last_metrics(1, DB_TEST_PATH)
+    assert ts[0] == datetime(2025, 8, 24, 12, 0, 0)
+    assert cpu == [10.0]
+    assert ram == [20.0]
+    assert json.loads(processes[0])[0]['name'] == 'init'
+
+def test_writer_rejects_invalid_data():
+    """
+    L'écrivain doit appliquer les mêmes vérifications que insert_metrics
+    """
+    bad_data = make_mock_data(0)
+    bad_data['cpu'] = "not a float"
+    with storage.MetricsWriter(DB_TEST_PATH) as writer:
+        with pytest.raises(TypeError):
+            writer.write(bad_data)
+        assert writer.buffer == []
+
+def create_legacy_database(rows):
+    """
+    Création d'une base au schéma v1 (date ISO en TEXT, sans index)
+    :param rows: Liste de tuples (timestamp, cpu, ram, top_processes)
+    """
+    storage.delete_database(DB_TEST_PATH)
+    conn = sqlite3.connect(DB_TEST_PATH)
+    conn.execute("""
+        CREATE TABLE metrics (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp TEXT NOT NULL,
+            cpu REAL NOT NULL,
+            ram REAL NOT NULL,
+            top_processes TEXT
+        )
+    """)
+    conn.executemany("INSERT INTO metrics (timestamp, cpu, ram, top_processes) VALUES (?, ?, ?, ?)", rows)
+    conn.commit()
+    conn.close()
+
+def test_epoch_ms_round_trip():
+    """
+    La conversion date <-> millisecondes doit être exacte à la milliseconde
+    """
+    date = datetime(2025, 8, 23, 12, 34, 56, 789000)
+    assert storage.to_epoch_ms(datetime(1970, 1, 1)) == 0
+    assert storage.from_epoch_ms(storage.to_epoch_ms(date)) == date
+
+def test_init_database_stores_integer_timestamps():
+    """
+    Les dates doivent être stockées en entier et indexées
+    """
+    storage.insert_metrics(make_mock_data(0), DB_TEST_PATH)
+
+    conn = sqlite3.connect(DB_TEST_PATH)
+    ts = conn.execute("SELECT ts FROM metrics").fetchone()[0]
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    indexes = [r[1] for r in conn.execute("PRAGMA index_list(metrics)")]
+    conn.close()
+
+    assert ts == storage.to_epoch_ms(datetime(2025, 8, 24, 12, 0, 0))
+    assert version == storage.SCHEMA_VERSION
+    assert "idx_metrics_ts" in indexes
+
+def test_range_query_uses_time_index():
+    """
+    Une lecture par période ne doit ni parcourir toute la table ni trier les résultats
+    """
+    conn = storage.connect(DB_TEST_PATH)
+    plan = " ".join(r[3] for r in conn.execute(
+        "EXPLAIN QUERY PLAN SELECT ts, cpu, ram FROM metrics WHERE ts >= ? ORDER BY ts ASC", (0,)))
+    conn.close()
+
+    assert "COVERING INDEX idx_metrics_ts" in plan
+    assert "TEMP B-TREE" not in plan
+
+def test_legacy_database_is_upgraded_in_place():
+    """
+    Une base au schéma v1 doit être migrée sans perte de données à la première connexion
+    """
+    create_legacy_database([
+        ('2025-08-23T12:00:00', 12.5, 43.2, '[{"pid": 1, "name": "init", "cpu_percent": 0.0}]'),
+        ('2025-08-23T12:00:01.250000', 13.5, 44.2, '[]'),
+        ('2025-08-23T12:00:02', 14.5, 45.2, '[]'),
+    ])
+
+    ts, cpu, ram, processes = storage.get_last_time_metrics(datetime(2025, 8, 23, 12, 0, 1), DB_TEST_PATH)
+    assert ts == [datetime(2025, 8, 23, 12, 0, 1, 250000), datetime(2025, 8, 23, 12, 0, 2)]
+    assert cpu == [13.5, 14.5]
+    assert ram == [44.2, 45.2]
+
+    # Les identifiants sont conservés et les insertions suivantes continuent la séquence
+    storage.insert_metrics(make_mock_data(0), DB_TEST_PATH)
+    conn = sqlite3.connect(DB_TEST_PATH)
+    ids = [r[0] for r in conn.execute("SELECT id FROM metrics ORDER BY id")]
+    tables = [r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")]
+    conn.close()
+    assert ids == [1, 2, 3, 4]
+    assert "metrics_v1" not in tables
+
+def test_get_last_metrics_arrays_matches_list_api():
+    """
+    Les colonnes NumPy doivent contenir les mêmes données que get_last_metrics, dans l'ordre chronologique
+    """
+    for i in range(5):
+        storage.insert_metrics(make_mock_data(i), DB_TEST_PATH)
+
+    arrays = storage.get_last_metrics_arrays(3, DB_TEST_PATH)
+    ts, cpu, ram, _ = storage.get_last_metrics(3, DB_TEST_PATH)
+
+    assert arrays.timestamps.dtype == np.dtype('datetime64[ms]')
+    assert arrays.cpu.dtype == np.float32
+    assert arrays.ram.dtype == np.float32
+    assert arrays.cpu.flags['C_CONTIGUOUS'] and arrays.ram.flags['C_CONTIGUOUS']
+    assert arrays.timestamps.tolist() == ts[::-1]
+    np.testing.assert_allclose(arrays.cpu, cpu[::-1])
+    np.testing.assert_allclose(arrays.ram, ram[::-1])
+
+def test_get_time_metrics_arrays_range():
+    """
+    La lecture en colonnes d'une période doit inclure 'since' et exclure 'until'
+    """
+    for i in range(5):
+        storage.insert_metrics(make_mock_data(i), DB_TEST_PATH)
+
+    base = datetime(2025, 8, 24, 12, 0, 0)
+    arrays = storage.get_time_metrics_arrays(base + timedelta(seconds=1), base + timedelta(seconds=4), DB_TEST_PATH)
+    assert arrays.timestamps.tolist() == [base + timedelta(seconds=i) for i in (1, 2, 3)]
+    np.testing.assert_allclose(arrays.cpu, [11.0, 12.0, 13.0])
+
+    everything = storage.get_time_metrics_arrays(base, db_path=DB_TEST_PATH)
+    assert len(everything.timestamps) == 5
+
+def test_get_time_metrics_arrays_empty():
+    """
+    Une période sans données doit retourner des colonnes vides du bon type
+    """
+    arrays = storage.get_time_metrics_arrays(datetime.now() + timedelta(days=365), db_path=DB_TEST_PATH)
+    assert len(arrays.timestamps) == 0
+    assert arrays.timestamps.dtype == np.dtype('datetime64[ms]')
+    assert arrays.cpu.dtype == np.float32
+
+    with pytest.raises(ValueError):
+        storage.get_time_metrics_arrays(None, db_path=DB_TEST_PATH)
+
+def test_get_rollup_arrays():
+    """
+    La lecture des agrégats doit retourner un seau par minute, du plus ancien au plus récent
+    """
+    with storage.MetricsWriter(DB_TEST_PATH) as writer:
+        for i in range(180):
+            writer.write(make_mock_data(i))
+
+    series = storage.get_rollup_arrays("1m", datetime(2025, 8, 24, 12, 0, 30), db_path=DB_TEST_PATH)
+    assert series.timestamps.tolist() == [datetime(2025, 8, 24, 12, minute) for minute in range(3)]
+    assert series.count.tolist() == [60, 60, 60]
+    np.testing.assert_allclose(series.cpu_min, [10.0, 70.0, 130.0])
+    np.testing.assert_allclose(series.cpu_avg, [39.5, 99.5, 159.5])
+    assert series.cpu_avg.dtype == np.float32
+
+    with pytest.raises(ValueError):
+        storage.get_rollup_arrays("1y", datetime(2025, 8, 24), db_path=DB_TEST_PATH)
+
+def test_choose_resolution():
+    """
+    La résolution choisie doit être la plus fine donnant au plus environ 'max_points' points
+    """
+    with storage.MetricsWriter(DB_TEST_PATH) as writer:
+        for i in range(600):
+            writer.write(make_mock_data(i))
+
+    since = datetime(2025, 8, 24)
+    assert storage.choose_resolution(since, max_points=400, db_path=DB_TEST_PATH) is None
+    assert storage.choose_resolution(since, max_points=100, db_path=DB_TEST_PATH) == "1m"
+    assert storage.choose_resolution(since, max_points=2, db_path=DB_TEST_PATH) == "1h"
+
+def test_legacy_database_rollups_are_backfilled():
+    """
+    La migration doit calculer les agrégats des données existantes
+    """
+    create_legacy_database([(f'2025-08-23T12:{minute:02d}:{second:02d}', 50.0, 50.0, '[]')
+                            for minute in range(3) for second in (0, 30)])
+    series = storage.get_rollup_arrays("1m", datetime(2025, 8, 23), db_path=DB_TEST_PATH)
+    assert series.count.tolist() == [2, 2, 2]
+
+def test_insert_with_invalid_host_type():
+    """
+    L'application doit refuser un hôte qui n'est pas une chaîne
+    """
+    data = make_mock_data(0)
+    data['host'] = 42
+    with pytest.raises(TypeError):
+        storage.insert_metrics(data, DB_TEST_PATH)
+
+def test_samples_are_tagged_by_host():
+    """
+    Les lectures par hôte et les agrégats ne doivent porter que sur les échantillons de cet hôte
+    """
+    with storage.MetricsWriter(DB_TEST_PATH) as writer:
+        for i in range(120):
+            writer.write(make_mock_data(i))
+            writer.write({**make_mock_data(i), 'host': 'web-1', 'cpu': 90.0})
+
+    base = datetime(2025, 8, 24, 12, 0, 0)
+    local = storage.get_time_metrics_arrays(base, db_path=DB_TEST_PATH, host=storage.LOCAL_HOST)
+    remote = storage.get_time_metrics_arrays(base, db_path=DB_TEST_PATH, host='web-1')
+    everything = storage.get_time_metrics_arrays(base, db_path=DB_TEST_PATH)
+    assert len(local.timestamps) == len(remote.timestamps) == 120
+    assert len(everything.timestamps) == 240
+    assert (remote.cpu == 90.0).all()
+    np.testing.assert_allclose(storage.get_last_metrics_arrays(2, DB_TEST_PATH, host=storage.LOCAL_HOST).cpu, [128.0, 129.0])
+
+    local_series = storage.get_rollup_arrays("1m", base, db_path=DB_TEST_PATH)
+    remote_series = storage.get_rollup_arrays("1m", base, db_path=DB_TEST_PATH, host='web-1')
+    assert local_series.count.tolist() == remote_series.count.tolist() == [60, 60]
+    np.testing.assert_allclose(local_series.cpu_max, [69.0, 129.0])
+    np.testing.assert_allclose(remote_series.cpu_max, [90.0, 90.0])
+
+def test_host_range_query_uses_host_index():
+    """
+    Une lecture par hôte et par période doit utiliser l'index couvrant (host, ts)
+    """
+    conn = storage.connect(DB_TEST_PATH)
+    plan = " ".join(r[3] for r in conn.execute(
+        "EXPLAIN QUERY PLAN SELECT ts, cpu, ram FROM metrics WHERE host = ? AND ts >= ? ORDER BY ts ASC", ('web-1', 0)))
+    conn.close()
+
+    assert "COVERING INDEX idx_metrics_host_ts" in plan
+    assert "TEMP B-TREE" not in plan
+
+def make_system_data(i, cores):
+    data = make_mock_data(i)
+    data['system'] = {'cpu_cores': cores, 'load1': 1.0, 'load5': 0.5, 'load15': 0.25, 'swap': 3.0,
+                      'disk_read': 1024.0, 'disk_write': 2048.0, 'net_recv': 10.0, 'net_sent': 20.0, 'ctx_switches': 300.0 + i}
+    return data
+
+def test_system_metrics_round_trip():
+    """
+    Les métriques système doivent être relues en colonnes, l'utilisation par cœur en tableau (échantillons, cœurs)
+    """
+    with storage.MetricsWriter(DB_TEST_PATH) as writer:
+        writer.write(make_mock_data(0))
+        for i in range(1, 4):
+            writer.write(make_system_data(i, [float(i), 50.0, 100.0]))
+
+    arrays = storage.get_system_arrays(db_path=DB_TEST_PATH)
+    assert arrays.timestamps.tolist() == [datetime(2025, 8, 24, 12, 0, i) for i in range(1, 4)]
+    assert arrays.cpu_cores.shape == (3, 3) and arrays.cpu_cores.dtype == np.float32
+    np.testing.assert_allclose(arrays.cpu_cores[:, 0], [1.0, 2.0, 3.0])
+    np.testing.assert_allclose(arrays.ctx_switches, [301.0, 302.0, 303.0])
+    np.testing.assert_allclose(arrays.disk_write, [2048.0] * 3)
+
+    # Un seul BLOB par échantillon, quel que soit le nombre de cœurs
+    conn = sqlite3.connect(DB_TEST_PATH)
+    assert conn.execute("SELECT COUNT(*) FROM metrics_system").fetchone()[0] == 3
+    conn.close()
+
+def test_system_metrics_with_varying_core_count():
+    """
+    Un nombre de cœurs variable d'un échantillon à l'autre doit être complété par des NaN
+    """
+    storage.insert_metrics(make_system_data(0, [10.0, 20.0]), DB_TEST_PATH)
+    storage.insert_metrics(make_system_data(1, [10.0, 20.0, 30.0, 40.0]), DB_TEST_PATH)
+
+    cores = storage.get_system_arrays(db_path=DB_TEST_PATH).cpu_cores
+    assert cores.shape == (2, 4)
+    assert np.isnan(cores[0, 2:]).all()
+    np.testing.assert_allclose(cores[1], [10.0, 20.0, 30.0, 40.0])
+
+def test_insert_with_invalid_system_metrics():
+    """
+    L'application doit refuser des métriques système incomplètes ou mal typées
+    """
+    data = make_system_data(0, [10.0])
+    del data['system']['swap']
+    with pytest.raises(TypeError):
+        storage.insert_metrics(data, DB_TEST_PATH)
+
+    data = make_system_data(0, "10.0")
+    with pytest.raises(TypeError):
+        storage.insert_metrics(data, DB_TEST_PATH)
+
+def make_process_data(i, processes):
+    data = make_mock_data(i)
+    data['top_processes'] = [{'pid': pid, 'name': name, 'cpu_percent': cpu} for pid, name, cpu in processes]
+    return data
+
+def test_process_names_are_interned():
+    """
+    Chaque nom de processus ne doit être stocké qu'une seule fois
+    """
+    with storage.MetricsWriter(DB_TEST_PATH) as writer:
+        for i in range(10):
+            writer.write(make_process_data(i, [(1, 'python', 50.0), (2, 'bash', 1.0)]))
+    storage.insert_metrics(make_process_data(10, [(3, 'python', 5.0)]), DB_TEST_PATH)
+
+    conn = sqlite3.connect(DB_TEST_PATH)
+    names = [r[0] for r in conn.execute("SELECT name FROM process_names ORDER BY name")]
+    count = conn.execute("SELECT COUNT(*) FROM metric_processes").fetchone()[0]
+    columns = [r[1] for r in conn.execute("PRAGMA table_info(metrics)")]
+    conn.close()
+
+    assert names == ['bash', 'python']
+    assert count == 21
+    assert 'top_processes' not in columns
+
+def test_insert_with_invalid_process_item():
+    """
+    L'application doit tomber en erreur lorsqu'un processus ne contient pas pid, name et cpu_percent
+    """
+    bad_data = make_mock_data(0)
+    bad_data['top_processes'] = [{'pid': 1}]
+    with pytest.raises(TypeError):
+        storage.insert_metrics(bad_data, DB_TEST_PATH)
+
+def test_get_process_history():
+    """
+    L'application doit pouvoir retracer la consommation CPU d'un processus par nom ou par pid
+    """
+    storage.insert_metrics(make_process_data(0, [(10, 'python', 80.0), (20, 'bash', 5.0)]), DB_TEST_PATH)
+    storage.insert_metrics(make_process_data(1, [(20, 'bash', 60.0), (10, 'python', 40.0)]), DB_TEST_PATH)
+    storage.insert_metrics(make_process_data(2, [(30, 'python', 90.0)]), DB_TEST_PATH)
+
+    history = storage.get_process_history(name='python', db_path=DB_TEST_PATH)
+    assert history.timestamps.tolist() == [datetime(2025, 8, 24, 12, 0, i) for i in range(3)]
+    assert history.pid.tolist() == [10, 10, 30]
+    np.testing.assert_allclose(history.cpu_percent, [80.0, 40.0, 90.0])
+
+    by_pid = storage.get_process_history(pid=20, since=datetime(2025, 8, 24, 12, 0, 1), db_path=DB_TEST_PATH)
+    assert by_pid.pid.tolist() == [20]
+
+    dominant = storage.get_process_history(name='python', dominant_only=True, db_path=DB_TEST_PATH)
+    assert dominant.pid.tolist() == [10, 30]
+
+    assert len(storage.get_process_history(name='unknown', db_path=DB_TEST_PATH).pid) == 0
+    with pytest.raises(ValueError):
+        storage.get_process_history(db_path=DB_TEST_PATH)
+
+def test_legacy_process_json_is_migrated():
+    """
+    Les listes JSON des bases existantes doivent être migrées vers les tables des processus sans perte
+    """
+    legacy_json = '[{"pid": 1, "name": "init", "cpu_percent": 0.5}, {"pid": 42, "name": "python", "cpu_percent": 12.0}]'
+    create_legacy_database([
+        ('2025-08-23T12:00:00', 12.5, 43.2, legacy_json),
+        ('2025-08-23T12:00:01', 13.5, 44.2, '[]'),
+    ])
+
+    _, _, _, processes = storage.get_last_metrics(2, DB_TEST_PATH)
+    assert processes == ['[]', legacy_json]
+    assert storage.get_process_history(name='python', db_path=DB_TEST_PATH).pid.tolist() == [42]
+
+def file_size(db_path=DB_TEST_PATH):
+    """
+    Taille sur disque de la base, journal WAL compris
+    """
+    return sum(os.path.getsize(path) for path in (db_path, db_path + "-wal") if os.path.exists(path))
+
+def test_init_database_enables_incremental_vacuum():
+    """
+    La base de données doit être initialisée en mode de vacuum incrémental, y compris une base existante
+    """
+    conn = sqlite3.connect(DB_TEST_PATH)
+    assert conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2
+    conn.close()
+
+    create_legacy_database([('2025-08-23T12:00:00', 12.5, 43.2, '[]')])
+    storage.init_database(DB_TEST_PATH)
+    conn = sqlite3.connect(DB_TEST_PATH)
+    assert conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2
+    conn.close()
+
+def test_retention_max_age_per_resolution():
+    """
+    Les données plus anciennes que l'âge maximal de leur résolution doivent être supprimées, processus compris
+    """
+    with storage.MetricsWriter(DB_TEST_PATH) as writer:
+        for i in range(0, 7200, 10):
+            writer.write({**make_process_data(i, [(1, 'init', 1.0)]), 'system': make_system_data(i, [1.0])['system']})
+
+    now = datetime(2025, 8, 24, 14, 0, 0)
+    deleted = storage.enforce_retention(DB_TEST_PATH, now=now, max_age={"raw": 1 / 24, "1m": 1 / 24, "1h": None},
+                                        max_size=None, batch_size=50)
+    assert deleted == {"raw": 360, "1m": 60, "1h": 0}
+
+    conn = sqlite3.connect(DB_TEST_PATH)
+    oldest = conn.execute("SELECT MIN(ts) FROM metrics").fetchone()[0]
+    orphans = conn.execute("SELECT COUNT(*) FROM metric_processes WHERE metric_id NOT IN (SELECT id FROM metrics)").fetchone()[0]
+    system_orphans = conn.execute("SELECT COUNT(*) FROM metrics_system WHERE metric_id NOT IN (SELECT id FROM metrics)").fetchone()[0]
+    hours = conn.execute("SELECT COUNT(*) FROM metrics_1h").fetchone()[0]
+    conn.close()
+    assert oldest == storage.to_epoch_ms(datetime(2025, 8, 24, 13, 0, 0))
+    assert orphans == system_orphans == 0
+    assert hours == 2
+
+def test_retention_max_batches_bounds_each_pass():
+    """
+    Une passe de rétention ne doit pas dépasser son nombre maximal de transactions
+    """
+    with storage.MetricsWriter(DB_TEST_PATH) as writer:
+        for i in range(100):
+            writer.write(make_mock_data(i))
+
+    deleted = storage.enforce_retention(DB_TEST_PATH, now=datetime(2030, 1, 1), max_age={"raw": 1}, max_size=None,
+                                        batch_size=10, max_batches=3)
+    assert deleted["raw"] == 30
+    assert count_rows() == 70
+
+def test_retention_keeps_file_size_bounded_under_load():
+    """
+    Sous une charge continue, la taille du fichier doit se stabiliser sous la taille maximale configurée
+    """
+    max_size = 256 * 1024
+    sizes = []
+    with storage.MetricsWriter(DB_TEST_PATH, batch_size=200, retention_interval=None) as writer:
+        for step in range(30):
+            for i in range(step * 1000, (step + 1) * 1000):
+                writer.write(make_process_data(i, [(1, 'init', 1.0), (2, 'python', 50.0)]))
+            writer.flush()
+            storage.apply_retention(writer.conn, now=datetime(2025, 8, 24), max_age={}, max_size=max_size,
+                                    batch_size=500, max_batches=20)
+            sizes.append(file_size())
+
+    conn = sqlite3.connect(DB_TEST_PATH)
+    assert storage.database_size(conn) <= max_size
+    conn.close()
+    # Le fichier cesse de grossir : les dernières mesures restent sous une borne fixe
+    assert max(sizes[-10:]) <= 2 * max_size
+    assert max(sizes[-10:]) <= max(sizes[:10]) * 1.5 + max_size
+    assert count_rows() > 0
+
+def read_consistently(db_path, stop, results):
+    """
+    Lectures en boucle jusqu'à 'stop' ; chaque échantillon i porte le processus de pid i (cpu = 10 + i)
+    :param results: File recevant None une fois le lecteur démarré, puis (erreurs, nombre de lectures, latence maximale en secondes)
+    """
+    errors, reads, worst = [], 0, 0.0
+    results.put(None)
+    while not stop.is_set():
+        start = time.perf_counter()
+        try:
+            ts, cpu, ram, processes = storage.get_last_metrics(20, db_path)
+            storage.get_time_metrics_arrays(datetime(2025, 8, 24), db_path=db_path)
+            storage.choose_resolution(datetime(2025, 8, 24), db_path=db_path)
+            for value, process_json in zip(cpu, processes):
+                if [proc['pid'] for proc in json.loads(process_json)] != [int(value) - 10]:
+                    errors.append(f"inconsistent read: cpu={value} processes={process_json}")
+        except Exception as error:
+            errors.append(repr(error))
+        worst = max(worst, time.perf_counter() - start)
+        reads += 1
+    results.put((errors[:5], reads, worst))
+
+def test_concurrent_readers_and_writer():
+    """
+    Un écrivain à 100 insertions/s et plusieurs lecteurs (threads et processus) doivent fonctionner ensemble
+    sans erreur 'database is locked', avec des lectures cohérentes et une latence bornée
+    """
+    import queue
+    # Processus lancés par 'spawn', avant les threads : un fork ne copie pas de verrou tenu par un autre thread
+    context = multiprocessing.get_context("spawn")
+    threads_stop, processes_stop = threading.Event(), context.Event()
+    thread_results, process_results = queue.Queue(), context.Queue()
+    readers = [context.Process(target=read_consistently, args=(DB_TEST_PATH, processes_stop, process_results))
+               for _ in range(2)]
+    readers += [threading.Thread(target=read_consistently, args=(DB_TEST_PATH, threads_stop, thread_results))
+                for _ in range(3)]
+    for reader in readers:
+        reader.start()
+    # L'écriture commence une fois tous les lecteurs démarrés
+    for _ in range(2):
+        assert process_results.get(timeout=60) is None
+    for _ in range(3):
+        assert thread_results.get(timeout=60) is None
+
+    inserts, rate = 200, 100
+    start = time.monotonic()
+    with storage.MetricsWriter(DB_TEST_PATH, batch_size=1, retention_interval=None) as writer:
+        for i in range(inserts):
+            time.sleep(max(0.0, start + i / rate - time.monotonic()))
+            writer.write(make_process_data(i, [(i, f"proc-{i % 3}", 1.0)]))
+    threads_stop.set()
+    processes_stop.set()
+    results = [process_results.get(timeout=60) for _ in range(2)] + [thread_results.get(timeout=60) for _ in range(3)]
+    for reader in readers:
+        reader.join(timeout=60)
+
+    assert count_rows() == inserts
+    for errors, reads, worst in results:
+        assert errors == []
+        assert worst < 1.0
+    assert all(reads > 0 for _, reads, _ in results)
+
+def test_read_snapshot_sees_a_single_state():
+    """
+    Les requêtes d'un instantané de lecture ne doivent pas voir les lignes validées après sa première requête
+    """
+    storage.insert_metrics(make_mock_data(0), DB_TEST_PATH)
+    conn = storage.connect(DB_TEST_PATH)
+    with storage.read_snapshot(conn):
+        before = conn.execute("SELECT COUNT(*) FROM metrics").fetchone()[0]
+        storage.insert_metrics(make_mock_data(1), DB_TEST_PATH)
+        during = conn.execute("SELECT COUNT(*) FROM metrics").fetchone()[0]
+    after = conn.execute("SELECT COUNT(*) FROM metrics").fetchone()[0]
+    conn.close()
+    assert (before, during, after) == (1, 1, 2)
+
+def test_writer_retries_when_database_is_locked(monkeypatch):
+    """
+    Une écriture refusée par un verrou doit être rejouée, sans perte d'échantillon ni de nom de processus
+    """
+    monkeypatch.setattr(storage, "DB_BUSY_TIMEOUT", 0.05)
+    monkeypatch.setattr(storage, "DB_RETRY_DELAY", 0.05)
+    locked, done = threading.Event(), threading.Event()
+
+    def hold_lock():
+        # Connexion concurrente ouverte dans le thread qui l'utilise (sqlite3 l'impose)
+        blocker = sqlite3.connect(DB_TEST_PATH, isolation_level=None)
+        blocker.execute("BEGIN IMMEDIATE")
+        locked.set()
+        time.sleep(0.2)
+        blocker.execute("COMMIT")
+        blocker.close()
+        done.set()
+
+    with storage.MetricsWriter(DB_TEST_PATH, batch_size=100, retention_interval=None) as writer:
+        writer.write(make_process_data(0, [(1, 'python', 1.0)]))
+        holder = threading.Thread(target=hold_lock)
+        holder.start()
+        locked.wait(timeout=5)
+        assert writer.flush() == 1
+        assert done.is_set()
+        writer.write(make_process_data(1, [(1, 'python', 1.0)]))
+    holder.join()
+
+    ts, cpu, ram, processes = storage.get_last_metrics(2, DB_TEST_PATH)
+    assert [json.loads(p)[0]['name'] for p in processes] == ['python', 'python']
+
+def test_retry_locked_only_retries_lock_errors(monkeypatch):
+    """
+    Seules les erreurs de verrou doivent être rejouées, et au plus DB_RETRY_ATTEMPTS fois
+    """
+    monkeypatch.setattr(storage, "DB_RETRY_DELAY", 0)
+    calls = []
+
+    @storage.retry_locked
+    def operation(error):
+        calls.append(error)
+        if error is not None and len(calls) <= 10:
+            raise error
+
+    operation(None)
+    assert len(calls) == 1
+    calls.clear()
+    with pytest.raises(sqlite3.OperationalError, match="locked"):
+        operation(sqlite3.OperationalError("database is locked"))
+    assert len(calls) == storage.DB_RETRY_ATTEMPTS + 1
+    calls.clear()
+    with pytest.raises(sqlite3.OperationalError, match="no such table"):
+        operation(sqlite3.OperationalError("no such table: foo"))
+    assert len(calls) == 1
@@ -0,0 +1,155 @@
+import os
+import subprocess
+import psutil
+import pytest
+from datetime import datetime, timedelta
+
+from src import collector, storage, tracker
+from config.config import DB_TEST_PATH
+
+BASE = datetime(2025, 8, 24, 12, 0, 0)
+CONTAINER = "3f4e5d6c7b8a" + "0" * 52
+
+@pytest.fixture(autouse=True)
+def setup_and_teardown():
+    ###########################################################
+    #                          SETUP                          #
+    ###########################################################
+    storage.init_database(DB_TEST_PATH)
+
+    yield  # Exécution des tests
+
+    ###########################################################
+    #                         TEARDOWN                        #
+    ###########################################################
+    storage.delete_database(DB_TEST_PATH)
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def make_tracked(pid, name="worker", cgroup="/", cpu_time=0.5, read_bytes=100):
+    return {'pid': pid, 'name': name, 'cgroup': cgroup, 'cpu_time': cpu_time, 'cpu_percent': cpu_time * 100,
+            'rss': 4096, 'read_bytes': read_bytes, 'write_bytes': 0, 'threads': 1, 'fds': 3}
+
+def write_samples(tracked_lists):
+    with storage.MetricsWriter(DB_TEST_PATH) as writer:
+        for i, tracked in enumerate(tracked_lists):
+            writer.write({'timestamp': (BASE + timedelta(seconds=i)).isoformat(), 'cpu': 1.0, 'ram': 2.0,
+                          'top_processes': [], 'tracked': tracked})
+
+@pytest.mark.skipif(not collector.PROC_AVAILABLE, reason="/proc required")
+def test_tracker_measures_deltas():
+    """
+    Test du suivi : temps CPU et E/S en différence avec le tick précédent, RSS, fils et descripteurs du processus
+    """
+    clock = FakeClock()
+    process_tracker = tracker.ProcessTracker(pids=[os.getpid()], clock=clock)
+    first = process_tracker.sample()
+    assert len(first) == 1
+    assert first[0]['cpu_time'] == 0.0 and first[0]['cpu_percent'] == 0.0
+
+    # Consommation CPU entre deux ticks
+    own = psutil.Process()
+    deadline = collector.get_process_times(own)[1] + 0.05
+    while collector.get_process_times(own)[1] < deadline:
+        pass
+    clock.now = 1.0
+    (sample,) = process_tracker.sample()
+    assert sample['pid'] == os.getpid()
+    assert sample['cpu_time'] >= 0.04
+    assert sample['cpu_percent'] == pytest.approx(sample['cpu_time'] * 100, abs=0.1)
+    assert sample['rss'] > 0 and sample['threads'] >= 1 and sample['fds'] >= 3
+    assert sample['cgroup'] == tracker.read_cgroup(os.getpid())
+    tracker.validate([sample])
+
+@pytest.mark.skipif(not collector.PROC_AVAILABLE, reason="/proc required")
+def test_tracker_follows_cgroup_and_forgets_exited(tmp_path):
+    """
+    Test du suivi d'un cgroup : les processus ajoutés sont suivis, les processus terminés oubliés,
+    et un pid réutilisé repart sans différence
+    """
+    child = subprocess.Popen(["sleep", "60"])
+    procs = tmp_path / "cgroup.procs"
+    procs.write_text(f"{os.getpid()}\n")
+    try:
+        process_tracker = tracker.ProcessTracker(cgroup=str(tmp_path))
+        assert [proc['pid'] for proc in process_tracker.sample()] == [os.getpid()]
+        procs.write_text(f"{os.getpid()}\n{child.pid}\n")
+        assert {proc['pid'] for proc in process_tracker.sample()} == {os.getpid(), child.pid}
+
+        # Autre processus derrière le même pid : date de démarrage différente
+        process_tracker.handles[os.getpid()][3] -= 1
+        process_tracker.handles[os.getpid()][4] = -100.0
+        own = next(proc for proc in process_tracker.sample() if proc['pid'] == os.getpid())
+        assert own['cpu_time'] == 0.0
+    finally:
+        child.kill()
+        child.wait()
+    assert [proc['pid'] for proc in process_tracker.sample()] == [os.getpid()]
+
+def test_container_attribution(tmp_path):
+    """
+    Test de l'attribution aux conteneurs : identifiant déduit du cgroup, cgroup retrouvé depuis l'identifiant
+    """
+    assert tracker.container_id(f"/system.slice/docker-{CONTAINER}.scope") == CONTAINER[:12]
+    assert tracker.container_id(f"/kubepods/besteffort/pod1/cri-containerd-{CONTAINER}") == CONTAINER[:12]
+    assert tracker.container_id("/user.slice/user-1000.slice/session-2.scope") is None
+
+    scope = tmp_path / "system.slice" / f"docker-{CONTAINER}.scope"
+    (scope / "init").mkdir(parents=True)
+    assert tracker.find_container_cgroup(CONTAINER[:12], root=str(tmp_path)) == f"system.slice/docker-{CONTAINER}.scope"
+    with pytest.raises(ValueError):
+        tracker.find_container_cgroup("0123456789ab", root=str(tmp_path))
+    with pytest.raises(ValueError):
+        tracker.find_container_cgroup("web", root=str(tmp_path))
+
+def test_tracked_history():
+    """
+    Test de l'écriture et de la relecture des processus suivis, par pid, nom et cgroup (sous-cgroups compris)
+    """
+    docker = f"/system.slice/docker-{CONTAINER}.scope"
+    write_samples([
+        [make_tracked(10, cgroup=docker), make_tracked(20, name="db", cgroup=docker + "/init", read_bytes=None)],
+        [make_tracked(10, cgroup=docker, cpu_time=0.25)],
+        None,
+        [make_tracked(30, cgroup="/system.slice/docker_other.scope")],
+    ])
+
+    history = storage.get_tracked_history(db_path=DB_TEST_PATH)
+    assert history.pid.tolist() == [10, 20, 10, 30]
+    assert history.read_bytes.tolist() == [100, -1, 100, 100]
+    assert history.names == ["worker", "db", "worker", "worker"]
+    assert history.timestamps[2] == history.timestamps[0] + 1000
+
+    assert storage.get_tracked_history(pid=10, db_path=DB_TEST_PATH).cpu_time.tolist() == [0.5, 0.25]
+    assert storage.get_tracked_history(name="db", db_path=DB_TEST_PATH).pid.tolist() == [20]
+    in_container = storage.get_tracked_history(cgroup=docker.lstrip("/"), db_path=DB_TEST_PATH)
+    assert in_container.pid.tolist() == [10, 20, 10]
+    assert {tracker.container_id(path) for path in in_container.cgroups} == {CONTAINER[:12]}
+    # '_' n'est pas un joker
+    assert storage.get_tracked_history(cgroup="/system.slice/docker_", db_path=DB_TEST_PATH).pid.tolist() == []
+
+    # Rétention : les processus suivis disparaissent avec leur échantillon
+    conn = storage.connect(DB_TEST_PATH)
+    storage.apply_retention(conn, now=BASE + timedelta(days=7, seconds=1), max_size=None)
+    conn.close()
+    assert storage.get_tracked_history(db_path=DB_TEST_PATH).pid.tolist() == [10, 30]
+
+@pytest.mark.parametrize("tracked", [
+    {'pid': 1},
+    [make_tracked(1) | {'pid': True}],
+    [make_tracked(1) | {'cgroup': None}],
+    [make_tracked(1) | {'rss': None}],
+    [make_tracked(1) | {'threads': "2"}],
+])
+def test_validate_rejects_bad_tracked(tracked):
+    """
+    Test de la validation des processus suivis : un lot mal formé est refusé avant l'écriture
+    """
+    with pytest.raises(TypeError):
+        storage.validate_metrics({'timestamp': BASE.isoformat(), 'cpu': 1.0, 'ram': 2.0, 'top_processes': [],
+                                  'tracked': tracked})